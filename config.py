@@ -42,6 +42,15 @@ class BaseConfig:
     # Uploads
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
+    # Recibos de coleta: arquivar PDFs em instance/recibos (por hash) e por quantos dias
+    RECIBOS_ARQUIVAR = os.getenv('RECIBOS_ARQUIVAR', 'False').lower() == 'true'
+    RECIBOS_RETENCAO_DIAS = int(os.getenv('RECIBOS_RETENCAO_DIAS', '90'))
+    # Reimpressão em lote: máximo de recibos por PDF e processos do pool local (sem Redis)
+    RECIBOS_LOTE_MAXIMO = int(os.getenv('RECIBOS_LOTE_MAXIMO', '500'))
+    RECIBOS_LOTE_PROCESSOS = int(os.getenv('RECIBOS_LOTE_PROCESSOS', '2'))
+    # PDFs de lotes ficam disponíveis pelo mesmo tempo que o resultado do job (24h)
+    RECIBOS_LOTE_RETENCAO_HORAS = int(os.getenv('RECIBOS_LOTE_RETENCAO_HORAS', '24'))
+    
     # Logging
     LOG_DIR = os.path.join(BASE_DIR, 'instance', 'logs')
     LOG_LEVEL = 'INFO'
@@ -31,6 +31,7 @@ Autor: Sistema SAP - Fase 8
 Data: Outubro 2025
 """
 
+import fnmatch
 import functools
 import hashlib
 from typing import Callable, List, Optional, Any, Union
@@ -281,6 +282,23 @@ def cached_with_invalidation(
     return cached(timeout=timeout, key_prefix=key_prefix)
 
 
+def _keys_matching(pattern: str) -> List[str]:
+    """
+    Lista as chaves do backend de cache que casam com um padrão glob.
+    
+    Redis usa KEYS (chaves gravadas com o prefixo flask_cache_); o SimpleCache
+    (dev/testes) guarda as chaves em memória, sem prefixo.
+    """
+    backend = cache_instance.cache
+    
+    if hasattr(backend, '_read_client'):
+        # Redis pattern matching
+        return [key.decode() if isinstance(key, bytes) else key
+                for key in backend._read_client.keys(f"flask_cache_{pattern}")]
+    
+    return fnmatch.filter(list(getattr(backend, '_cache', {}).keys()), pattern)
+
+
 def invalidate_cache(
     events: Union[str, List[str]],
     specific_keys: Optional[List[str]] = None
@@ -321,14 +339,7 @@ def invalidate_cache(
             for pattern in patterns:
                 # Buscar chaves que correspondem ao padrão
                 try:
-                    # Redis pattern matching
-                    matching_keys = cache_instance.cache._read_client.keys(
-                        f"flask_cache_{pattern}"
-                    )
-                    keys_to_invalidate.update(
-                        [key.decode() if isinstance(key, bytes) else key 
-                         for key in matching_keys]
-                    )
+                    keys_to_invalidate.update(_keys_matching(pattern))
                 except Exception as e:
                     current_app.logger.warning(
                         f"Erro ao buscar chaves para padrão {pattern}: {str(e)}"
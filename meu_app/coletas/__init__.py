@@ -1 +1,2 @@
 from .routes import coletas_bp
+from . import commands  # noqa: F401  (registra os comandos CLI no blueprint)
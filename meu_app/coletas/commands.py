@@ -0,0 +1,26 @@
+"""
+Comandos de linha de comando do módulo de coletas
+
+Uso:
+    flask coletas recalcular-coletado
+    flask coletas limpar-recibos  (cron diário, com RECIBOS_ARQUIVAR ativo)
+"""
+import click
+
+from .receipt_service import ReceiptService
+from .routes import coletas_bp
+from .services.coleta_service import ColetaService
+
+
+@coletas_bp.cli.command('recalcular-coletado')
+def recalcular_coletado():
+    """Reconstrói ItemPedido.quantidade_coletada a partir das coletas registradas"""
+    corrigidos = ColetaService.recalcular_quantidades_coletadas()
+    click.echo(f"Itens com quantidade coletada corrigida: {corrigidos}")
+
+
+@coletas_bp.cli.command('limpar-recibos')
+def limpar_recibos():
+    """Remove recibos arquivados mais antigos que RECIBOS_RETENCAO_DIAS"""
+    removidos = ReceiptService.limpar_recibos_antigos()
+    click.echo(f"Recibos arquivados removidos: {removidos}")
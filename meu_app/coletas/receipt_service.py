@@ -1,17 +1,27 @@
 """
 Serviço para geração de recibo de coleta em PDF
 Modelo EXATO baseado na interface mostrada
+
+Os estilos e os desenhos fixos do layout são montados uma vez por processo;
+cada recibo é renderizado em memória e pode, opcionalmente, ser arquivado
+em disco pelo hash dos dados da coleta, com política de retenção
+(`flask coletas limpar-recibos`).
 """
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.graphics.shapes import Drawing, Rect, Line
-from reportlab.graphics import renderPDF
+from reportlab.lib.enums import TA_CENTER
+from reportlab.graphics.shapes import Drawing, Rect, Line, String
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, List, Optional
+import hashlib
+import json
 import os
+import time
 from flask import current_app
 
 
@@ -19,298 +29,325 @@ class ReceiptService:
     """Serviço para geração de recibos de coleta"""
     
     @staticmethod
-    def gerar_recibo_pdf(coleta_data):
+    @lru_cache(maxsize=1)
+    def _layout() -> Dict:
         """
-        Gera um recibo PDF EXATO como o modelo mostrado
+        Monta estilos e desenhos fixos do recibo (uma vez por processo)
         
-        Args:
-            coleta_data: Dicionário com dados da coleta
-            
         Returns:
-            str: Caminho do arquivo PDF gerado
+            Dict: estilos de parágrafo, estilo da tabela e desenhos estáticos
         """
-        try:
-            # Criar diretório de recibos se não existir
-            receipts_dir = os.path.join(current_app.instance_path, 'recibos')
-            os.makedirs(receipts_dir, exist_ok=True)
-            
-            # Nome do arquivo
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"recibo_coleta_{coleta_data['pedido_id']}_{timestamp}.pdf"
-            filepath = os.path.join(receipts_dir, filename)
-            
-            # Criar documento PDF
-            doc = SimpleDocTemplate(
-                filepath,
-                pagesize=A4,
-                rightMargin=2*cm,
-                leftMargin=2*cm,
-                topMargin=2*cm,
-                bottomMargin=2*cm
-            )
-            
-            # Estilos
-            styles = getSampleStyleSheet()
-            
-            # Estilo para título principal "Recibo de Coleta"
-            main_title_style = ParagraphStyle(
-                'MainTitle',
-                parent=styles['Heading1'],
-                fontSize=20,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                spaceAfter=20,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Estilo para informações do pedido
-            info_style = ParagraphStyle(
-                'OrderInfo',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.black,
-                spaceAfter=8,
-                fontName='Helvetica'
-            )
-            
-            # Estilo para cabeçalho da tabela
-            table_header_style = ParagraphStyle(
-                'TableHeader',
-                parent=styles['Normal'],
-                fontSize=11,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                spaceAfter=10,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Estilo para assinaturas
-            signature_style = ParagraphStyle(
-                'SignatureStyle',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                spaceAfter=15,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Estilo para documento de identificação
-            doc_style = ParagraphStyle(
-                'DocStyle',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                spaceAfter=10,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Lista de elementos para o PDF
-            story = []
-            
+        styles = getSampleStyleSheet()
+        
+        def estilo(nome, parent='Normal', **kwargs):
+            kwargs.setdefault('textColor', colors.black)
+            return ParagraphStyle(nome, parent=styles[parent], **kwargs)
+        
+        estilos = {
             # Título principal "Recibo de Coleta"
-            story.append(Paragraph("📄 Recibo de Coleta", main_title_style))
-            story.append(Spacer(1, 0.5*cm))
-            
-            # Informações do pedido e coleta
-            pedido_info = f"""
-            <b>Pedido:</b> #{coleta_data['pedido_id']}<br/>
-            <b>Cliente:</b> {coleta_data.get('cliente_nome', 'N/A')}<br/>
-            <b>Data da Coleta:</b> {coleta_data.get('data_coleta', datetime.now().strftime('%d/%m/%Y %H:%M'))}<br/>
-            <b>Coletado por:</b> {coleta_data.get('nome_retirada', 'N/A')}<br/>
-            <b>Liberado por:</b> {coleta_data.get('nome_conferente', 'N/A')}
-            """
-            story.append(Paragraph(pedido_info, info_style))
-            story.append(Spacer(1, 0.5*cm))
-            
-            # Cabeçalho da tabela de itens
-            story.append(Paragraph("Itens Coletados", table_header_style))
-            
-            # Criar tabela de itens coletados
-            items_data = [['Produto', 'Quantidade Coletada']]
-            
-            for item in coleta_data.get('itens_coleta', []):
-                produto_nome = item.get('produto_nome', 'N/A')
-                quantidade = item.get('quantidade', 0)
-                
-                items_data.append([
-                    produto_nome,
-                    str(quantidade)
-                ])
-            
-            # Tabela de itens
-            items_table = Table(items_data, colWidths=[12*cm, 4*cm])
-            items_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            
-            story.append(items_table)
-            story.append(Spacer(1, 0.5*cm))
-            
-            # ========================================
-            # SEÇÃO DE ASSINATURAS - LAYOUT PROFISSIONAL
-            # ========================================
-            
-            # Título da seção
-            assinaturas_title = ParagraphStyle(
-                'AssinaturasTitle',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                spaceAfter=20,
-                fontName='Helvetica-Bold'
-            )
-            story.append(Paragraph("ASSINATURAS", assinaturas_title))
-            story.append(Spacer(1, 0.3*cm))
-            
-            # ========================================
-            # ASSINATURA DO CLIENTE (Pessoa que Coletou)
-            # ========================================
-            
-            # Nome completo
-            cliente_nome_style = ParagraphStyle(
-                'ClienteNome',
-                parent=styles['Normal'],
-                fontSize=11,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-                spaceAfter=5
-            )
-            story.append(Paragraph(f"RETIRADO POR: {coleta_data.get('nome_retirada', 'N/A').upper()}", cliente_nome_style))
-            
-            # Linha pontilhada para assinatura (mais larga e visível)
-            linha_assinatura = Drawing(12*cm, 0.8*cm)
-            linha_assinatura.add(Line(0, 0.4*cm, 12*cm, 0.4*cm, 
-                                     strokeColor=colors.black,
-                                     strokeWidth=1,
-                                     strokeDashArray=[3, 3]))
-            story.append(linha_assinatura)
-            
+            'titulo': estilo('MainTitle', 'Heading1', fontSize=20, alignment=TA_CENTER,
+                             spaceAfter=20, fontName='Helvetica-Bold'),
+            # Informações do pedido
+            'info': estilo('OrderInfo', fontSize=12, spaceAfter=8, fontName='Helvetica'),
+            # Cabeçalho da tabela
+            'cabecalho_tabela': estilo('TableHeader', fontSize=11, alignment=TA_CENTER,
+                                       spaceAfter=10, fontName='Helvetica-Bold'),
+            # Título da seção de assinaturas
+            'assinaturas': estilo('AssinaturasTitle', 'Heading2', fontSize=14, alignment=TA_CENTER,
+                                  spaceAfter=20, fontName='Helvetica-Bold'),
+            # Nome de quem retira/libera
+            'nome': estilo('ClienteNome', fontSize=11, alignment=TA_CENTER,
+                           fontName='Helvetica-Bold', spaceAfter=5),
             # Texto "Assinatura" abaixo da linha
-            assinatura_label_style = ParagraphStyle(
-                'AssinaturaLabel',
-                parent=styles['Normal'],
-                fontSize=9,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                fontName='Helvetica',
-                spaceAfter=8
-            )
-            story.append(Paragraph("Assinatura do Cliente", assinatura_label_style))
-            
+            'assinatura_label': estilo('AssinaturaLabel', fontSize=9, alignment=TA_CENTER,
+                                       fontName='Helvetica', spaceAfter=8),
             # CPF/Documento
-            doc_cliente_style = ParagraphStyle(
-                'DocCliente',
-                parent=styles['Normal'],
-                fontSize=10,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-                spaceAfter=8
-            )
-            story.append(Paragraph(f"CPF/RG: {coleta_data.get('documento_retirada', '_________________')}", doc_cliente_style))
-            
-            story.append(Spacer(1, 0.5*cm))
-            
-            # ========================================
-            # ASSINATURA DO FUNCIONÁRIO (Conferente)
-            # ========================================
-            
-            story.append(Paragraph(f"LIBERADO POR: {coleta_data.get('nome_conferente', 'N/A').upper()}", cliente_nome_style))
-            
-            # Linha pontilhada para assinatura
-            linha_funcionario = Drawing(12*cm, 0.8*cm)
-            linha_funcionario.add(Line(0, 0.4*cm, 12*cm, 0.4*cm,
-                                      strokeColor=colors.black,
-                                      strokeWidth=1,
-                                      strokeDashArray=[3, 3]))
-            story.append(linha_funcionario)
-            
-            # Texto "Assinatura" abaixo
-            story.append(Paragraph("Assinatura do Funcionário Responsável", assinatura_label_style))
-            
-            # CPF do conferente
-            story.append(Paragraph(f"CPF: {coleta_data.get('cpf_conferente', '_________________')}", doc_cliente_style))
-            
-            story.append(Spacer(1, 0.5*cm))
-            
-            # ========================================
-            # ÁREA PARA ANEXAR DOCUMENTO (MUITO MAIOR)
-            # ========================================
-            
-            # Título com instrução
-            doc_title_style = ParagraphStyle(
-                'DocTitle',
-                parent=styles['Normal'],
-                fontSize=12,
-                textColor=colors.black,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold',
-                spaceAfter=10
-            )
-            story.append(Paragraph("⚠️ ANEXAR CÓPIA DO DOCUMENTO DE IDENTIFICAÇÃO ABAIXO ⚠️", doc_title_style))
-            
-            # Retângulo para colar documento (otimizado para caber em 1 página)
-            doc_drawing = Drawing(16*cm, 4*cm)
-            
-            # Retângulo tracejado bem destacado
-            rect = Rect(0, 0, 16*cm, 4*cm)
-            rect.strokeColor = colors.black
-            rect.strokeWidth = 2
-            rect.strokeDashArray = [8, 4]
-            rect.fillColor = colors.whitesmoke
-            doc_drawing.add(rect)
-            
-            # Texto dentro do retângulo
-            from reportlab.graphics.shapes import String
-            texto_centralizado = String(8*cm, 2*cm, 
-                                       "COLAR CÓPIA DO DOCUMENTO AQUI",
-                                       fontSize=16,
-                                       fillColor=colors.grey,
-                                       textAnchor='middle')
-            doc_drawing.add(texto_centralizado)
-            
-            # Moldura interna (guia visual)
-            moldura_interna = Rect(0.3*cm, 0.3*cm, 15.4*cm, 3.4*cm)
-            moldura_interna.strokeColor = colors.lightgrey
-            moldura_interna.strokeWidth = 1
-            moldura_interna.strokeDashArray = [3, 3]
-            moldura_interna.fillColor = None
-            doc_drawing.add(moldura_interna)
-            
-            story.append(doc_drawing)
-            story.append(Spacer(1, 0.5*cm))
-            
+            'documento': estilo('DocCliente', fontSize=10, alignment=TA_CENTER,
+                                fontName='Helvetica-Bold', spaceAfter=8),
+            # Título da área do documento de identificação
+            'documento_titulo': estilo('DocTitle', fontSize=12, alignment=TA_CENTER,
+                                       fontName='Helvetica-Bold', spaceAfter=10),
             # Rodapé com data/hora de emissão
-            rodape_style = ParagraphStyle(
-                'Rodape',
-                parent=styles['Normal'],
-                fontSize=8,
-                textColor=colors.grey,
-                alignment=TA_CENTER,
-                fontName='Helvetica'
-            )
-            data_emissao = datetime.now().strftime('%d/%m/%Y às %H:%M:%S')
-            story.append(Paragraph(f"Recibo emitido em {data_emissao} pelo Sistema SAP", rodape_style))
-            
-            # Construir PDF
-            doc.build(story)
+            'rodape': estilo('Rodape', fontSize=8, textColor=colors.grey, alignment=TA_CENTER,
+                             fontName='Helvetica'),
+        }
+        
+        tabela_itens = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+        
+        # Linha pontilhada para assinatura
+        linha_assinatura = Drawing(12*cm, 0.8*cm)
+        linha_assinatura.add(Line(0, 0.4*cm, 12*cm, 0.4*cm,
+                                  strokeColor=colors.black,
+                                  strokeWidth=1,
+                                  strokeDashArray=[3, 3]))
+        
+        # Retângulo para colar documento (otimizado para caber em 1 página)
+        area_documento = Drawing(16*cm, 4*cm)
+        rect = Rect(0, 0, 16*cm, 4*cm)
+        rect.strokeColor = colors.black
+        rect.strokeWidth = 2
+        rect.strokeDashArray = [8, 4]
+        rect.fillColor = colors.whitesmoke
+        area_documento.add(rect)
+        area_documento.add(String(8*cm, 2*cm,
+                                  "COLAR CÓPIA DO DOCUMENTO AQUI",
+                                  fontSize=16,
+                                  fillColor=colors.grey,
+                                  textAnchor='middle'))
+        # Moldura interna (guia visual)
+        moldura_interna = Rect(0.3*cm, 0.3*cm, 15.4*cm, 3.4*cm)
+        moldura_interna.strokeColor = colors.lightgrey
+        moldura_interna.strokeWidth = 1
+        moldura_interna.strokeDashArray = [3, 3]
+        moldura_interna.fillColor = None
+        area_documento.add(moldura_interna)
+        
+        return {
+            'estilos': estilos,
+            'tabela_itens': tabela_itens,
+            'linha_assinatura': linha_assinatura,
+            'area_documento': area_documento,
+        }
+    
+    @staticmethod
+    def montar_elementos(coleta_data: Dict) -> List:
+        """
+        Monta os elementos (flowables) de um recibo
+        
+        Args:
+            coleta_data: Dicionário com dados da coleta
             
-            current_app.logger.info(f"Recibo PDF gerado: {filepath}")
-            return filepath
+        Returns:
+            List: Elementos do recibo, prontos para um SimpleDocTemplate
+        """
+        layout = ReceiptService._layout()
+        estilos = layout['estilos']
+        story = []
+        
+        # Título principal "Recibo de Coleta"
+        story.append(Paragraph("📄 Recibo de Coleta", estilos['titulo']))
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Informações do pedido e coleta
+        pedido_info = f"""
+        <b>Pedido:</b> #{coleta_data['pedido_id']}<br/>
+        <b>Cliente:</b> {coleta_data.get('cliente_nome', 'N/A')}<br/>
+        <b>Data da Coleta:</b> {coleta_data.get('data_coleta') or datetime.now().strftime('%d/%m/%Y %H:%M')}<br/>
+        <b>Coletado por:</b> {coleta_data.get('nome_retirada', 'N/A')}<br/>
+        <b>Liberado por:</b> {coleta_data.get('nome_conferente', 'N/A')}
+        """
+        story.append(Paragraph(pedido_info, estilos['info']))
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Tabela de itens coletados
+        story.append(Paragraph("Itens Coletados", estilos['cabecalho_tabela']))
+        items_data = [['Produto', 'Quantidade Coletada']]
+        for item in coleta_data.get('itens_coleta', []):
+            items_data.append([
+                item.get('produto_nome', 'N/A'),
+                str(item.get('quantidade', 0))
+            ])
+        items_table = Table(items_data, colWidths=[12*cm, 4*cm])
+        items_table.setStyle(layout['tabela_itens'])
+        story.append(items_table)
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Seção de assinaturas
+        story.append(Paragraph("ASSINATURAS", estilos['assinaturas']))
+        story.append(Spacer(1, 0.3*cm))
+        
+        # Assinatura do cliente (pessoa que coletou)
+        story.append(Paragraph(f"RETIRADO POR: {(coleta_data.get('nome_retirada') or 'N/A').upper()}", estilos['nome']))
+        story.append(layout['linha_assinatura'])
+        story.append(Paragraph("Assinatura do Cliente", estilos['assinatura_label']))
+        story.append(Paragraph(f"CPF/RG: {coleta_data.get('documento_retirada') or '_________________'}", estilos['documento']))
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Assinatura do funcionário (conferente)
+        story.append(Paragraph(f"LIBERADO POR: {(coleta_data.get('nome_conferente') or 'N/A').upper()}", estilos['nome']))
+        story.append(layout['linha_assinatura'])
+        story.append(Paragraph("Assinatura do Funcionário Responsável", estilos['assinatura_label']))
+        story.append(Paragraph(f"CPF: {coleta_data.get('cpf_conferente') or '_________________'}", estilos['documento']))
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Área para anexar documento
+        story.append(Paragraph("⚠️ ANEXAR CÓPIA DO DOCUMENTO DE IDENTIFICAÇÃO ABAIXO ⚠️", estilos['documento_titulo']))
+        story.append(layout['area_documento'])
+        story.append(Spacer(1, 0.5*cm))
+        
+        # Rodapé com data/hora de emissão
+        data_emissao = datetime.now().strftime('%d/%m/%Y às %H:%M:%S')
+        story.append(Paragraph(f"Recibo emitido em {data_emissao} pelo Sistema SAP", estilos['rodape']))
+        
+        return story
+    
+    @staticmethod
+    def _renderizar(story: List) -> bytes:
+        """Renderiza os elementos num PDF A4 em memória"""
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=2*cm,
+            leftMargin=2*cm,
+            topMargin=2*cm,
+            bottomMargin=2*cm
+        )
+        doc.build(story)
+        return buffer.getvalue()
+    
+    @staticmethod
+    def renderizar_recibo(coleta_data: Dict) -> bytes:
+        """
+        Gera o recibo PDF EXATO como o modelo mostrado, em memória
+        
+        Args:
+            coleta_data: Dicionário com dados da coleta
             
+        Returns:
+            bytes: Conteúdo do PDF
+        """
+        try:
+            pdf = ReceiptService._renderizar(ReceiptService.montar_elementos(coleta_data))
+            current_app.logger.info(f"Recibo PDF gerado: pedido {coleta_data['pedido_id']} ({len(pdf)} bytes)")
+            return pdf
         except Exception as e:
             current_app.logger.error(f"Erro ao gerar recibo PDF: {str(e)}")
             raise e
+    
+    @staticmethod
+    def renderizar_recibos(coletas_data: List[Dict]) -> bytes:
+        """
+        Gera um único PDF com um recibo por página (reimpressão em lote)
+        
+        Não depende de contexto Flask: roda também em processos do pool de
+        lotes e no worker RQ.
+        
+        Args:
+            coletas_data: Lista de dicionários com dados das coletas
+            
+        Returns:
+            bytes: Conteúdo do PDF
+        """
+        story = []
+        for indice, coleta_data in enumerate(coletas_data):
+            if indice:
+                story.append(PageBreak())
+            story.extend(ReceiptService.montar_elementos(coleta_data))
+        return ReceiptService._renderizar(story)
+    
+    @staticmethod
+    def _diretorio_recibos() -> str:
+        return os.path.join(current_app.instance_path, 'recibos')
+    
+    @staticmethod
+    def arquivar_recibo(pdf: bytes, coleta_data: Dict) -> Optional[str]:
+        """
+        Arquiva o recibo pelo pedido e SHA-256 dos dados da coleta (se RECIBOS_ARQUIVAR estiver ativo)
+        
+        O PDF muda a cada emissão (data/hora no rodapé, metadados do ReportLab),
+        por isso a chave vem dos dados: a mesma coleta é gravada uma única vez,
+        com a primeira emissão. A gravação é atômica; a limpeza dos vencidos
+        fica com `flask coletas limpar-recibos`, fora das requisições.
+        
+        Args:
+            pdf: Conteúdo do PDF
+            coleta_data: Dados usados para renderizar o recibo
+            
+        Returns:
+            Optional[str]: Caminho do arquivo ou None se o arquivamento estiver desativado ou falhar
+        """
+        if not current_app.config.get('RECIBOS_ARQUIVAR', False):
+            return None
+        
+        try:
+            dados = json.dumps(coleta_data, sort_keys=True, default=str, ensure_ascii=False)
+            sha256 = hashlib.sha256(dados.encode('utf-8')).hexdigest()
+            diretorio = os.path.join(ReceiptService._diretorio_recibos(), sha256[:2])
+            caminho = os.path.join(diretorio, f"{coleta_data.get('pedido_id')}_{sha256}.pdf")
+            
+            if not os.path.exists(caminho):
+                os.makedirs(diretorio, exist_ok=True)
+                temporario = f"{caminho}.{os.getpid()}.tmp"
+                with open(temporario, 'wb') as arquivo:
+                    arquivo.write(pdf)
+                os.replace(temporario, caminho)
+            
+            return caminho
+        except Exception as e:
+            current_app.logger.error(f"Erro ao arquivar recibo PDF: {str(e)}")
+            return None
+    
+    @staticmethod
+    def limpar_lotes_antigos(diretorio: str, retencao_horas: float) -> int:
+        """
+        Remove os PDFs de reimpressão em lote (e temporários órfãos) mais antigos que a retenção
+        
+        Não depende de contexto Flask: roda no job que gera o lote.
+        
+        Args:
+            diretorio: Diretório dos lotes (instance/recibos/lotes)
+            retencao_horas: Horas de retenção
+            
+        Returns:
+            int: Quantidade de arquivos removidos
+        """
+        limite = time.time() - retencao_horas * 3600
+        removidos = 0
+        try:
+            entradas = list(os.scandir(diretorio))
+        except OSError:
+            return 0
+        for entrada in entradas:
+            if not entrada.name.endswith(('.pdf', '.tmp')):
+                continue
+            try:
+                if entrada.stat().st_mtime < limite:
+                    os.remove(entrada.path)
+                    removidos += 1
+            except OSError:
+                continue
+        return removidos
+    
+    @staticmethod
+    def limpar_recibos_antigos(retencao_dias: int = None) -> int:
+        """
+        Remove recibos arquivados há mais tempo que a retenção configurada
+        
+        Args:
+            retencao_dias: Dias de retenção (padrão: RECIBOS_RETENCAO_DIAS)
+            
+        Returns:
+            int: Quantidade de arquivos removidos
+        """
+        if retencao_dias is None:
+            retencao_dias = current_app.config.get('RECIBOS_RETENCAO_DIAS', 90)
+        limite = time.time() - retencao_dias * 86400
+        removidos = 0
+        
+        for raiz, _, arquivos in os.walk(ReceiptService._diretorio_recibos()):
+            for nome in arquivos:
+                if not nome.endswith('.pdf'):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    if os.path.getmtime(caminho) < limite:
+                        os.remove(caminho)
+                        removidos += 1
+                except OSError as e:
+                    current_app.logger.warning(f"Não foi possível remover recibo {caminho}: {str(e)}")
+        
+        if removidos:
+            current_app.logger.info(f"Recibos antigos removidos: {removidos}")
+        return removidos
@@ -5,9 +5,12 @@ Integra funcionalidades do módulo logística
 from flask import Blueprint, render_template, current_app, flash, request, redirect, url_for, session, send_file, jsonify
 from ..decorators import login_obrigatorio, permissao_necessaria
 from app.auth.rbac import requires_logistica
+import io
 import json
+import re
 import traceback
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
 
 coletas_bp = Blueprint('coletas', __name__, url_prefix='/coletas')
 from .services.coleta_service import ColetaService
@@ -23,15 +26,16 @@ def index():
     """Lista pedidos para coleta - interface simples e direta"""
     try:
         filtro = request.args.get('filtro', 'pendentes')
-        pedidos = ColetaService.listar_pedidos_para_coleta(filtro)
+        page = request.args.get('page', 1, type=int)
+        resultado = ColetaService.listar_pedidos_para_coleta(filtro, page=page)
         
         current_app.logger.info(f"Lista de coletas acessada por {session.get('usuario_nome', 'N/A')} - Filtro: {filtro}")
         
-        return render_template('coletas/lista_coletas.html', pedidos=pedidos, filtro=filtro)
+        return render_template('coletas/lista_coletas.html', pedidos=resultado['pedidos'], paginacao=resultado, filtro=filtro)
     except Exception as e:
         current_app.logger.error(f"Erro ao listar pedidos para coleta: {str(e)}")
         flash('Erro ao carregar lista de coletas', 'error')
-        return render_template('coletas/lista_coletas.html', pedidos=[], filtro='pendentes')
+        return render_template('coletas/lista_coletas.html', pedidos=[], paginacao=None, filtro='pendentes')
 
 
 @coletas_bp.route('/dashboard')
@@ -41,16 +45,17 @@ def dashboard():
     """Dashboard com filtros (funcionalidade do logística)"""
     try:
         filtro = request.args.get('filtro', 'pendentes')
+        page = request.args.get('page', 1, type=int)
         
-        pedidos = ColetaService.listar_pedidos_para_coleta(filtro)
+        resultado = ColetaService.listar_pedidos_para_coleta(filtro, page=page)
         
         current_app.logger.info(f"Dashboard coletas acessado por {session.get('usuario_nome', 'N/A')} - Filtro: {filtro}")
         
-        return render_template('coletas/dashboard.html', pedidos=pedidos, filtro=filtro)
+        return render_template('coletas/dashboard.html', pedidos=resultado['pedidos'], paginacao=resultado, filtro=filtro)
     except Exception as e:
         current_app.logger.error(f"Erro ao carregar dashboard: {str(e)}")
         flash(f"Erro ao carregar dashboard: {str(e)}", 'error')
-        return render_template('coletas/dashboard.html', pedidos=[], filtro='pendentes')
+        return render_template('coletas/dashboard.html', pedidos=[], paginacao=None, filtro='pendentes')
 
 
 @coletas_bp.route('/processar/<int:pedido_id>', methods=['GET', 'POST'])
@@ -125,10 +130,16 @@ def processar_coleta(pedido_id):
                         'itens_coleta': itens_recibo
                     }
                     
-                    pdf_path = ReceiptService.gerar_recibo_pdf(coleta_data)
+                    pdf = ReceiptService.renderizar_recibo(coleta_data)
+                    ReceiptService.arquivar_recibo(pdf, coleta_data)
                     
                     flash(f'{mensagem} Recibo gerado com sucesso!', 'success')
-                    return send_file(pdf_path, as_attachment=True, download_name=f'recibo_coleta_{pedido_id}.pdf')
+                    return send_file(
+                        io.BytesIO(pdf),
+                        mimetype='application/pdf',
+                        as_attachment=True,
+                        download_name=f'recibo_coleta_{pedido_id}.pdf'
+                    )
                     
                 except Exception as e:
                     current_app.logger.error(f"Erro ao gerar recibo: {str(e)}")
@@ -200,12 +211,85 @@ def historico_coletas(pedido_id):
 def pedidos_coletados():
     """Lista pedidos coletados (funcionalidade do logística)"""
     try:
-        pedidos = ColetaService.listar_pedidos_coletados()
-        return render_template('coletas/pedidos_coletados.html', pedidos=pedidos)
+        page = request.args.get('page', 1, type=int)
+        resultado = ColetaService.listar_pedidos_coletados(page=page)
+        return render_template('coletas/pedidos_coletados.html', pedidos=resultado['pedidos'], paginacao=resultado)
     except Exception as e:
         current_app.logger.error(f"Erro ao listar pedidos coletados: {str(e)}")
         flash('Erro ao carregar pedidos coletados', 'error')
-        return render_template('coletas/pedidos_coletados.html', pedidos=[])
+        return render_template('coletas/pedidos_coletados.html', pedidos=[], paginacao=None)
+
+
+@coletas_bp.route('/recibos/lote', methods=['POST'])
+@login_obrigatorio
+@permissao_necessaria('acesso_logistica')
+def gerar_recibos_lote():
+    """
+    Gera, em background, um PDF com os recibos de várias coletas
+    
+    Aceita JSON ou formulário com 'coleta_ids' (lista) ou 'data_inicio' e
+    'data_fim' (YYYY-MM-DD, inclusive). Responde 202 com o ID do job; o
+    status (e a URL de download, ao terminar) sai em /jobs/<job_id>/status.
+    """
+    from ..queue import enqueue_lote_recibos_job
+    
+    dados = request.get_json(silent=True) or request.form
+    try:
+        if hasattr(dados, 'getlist'):
+            coleta_ids = [int(valor) for valor in dados.getlist('coleta_ids') if valor]
+        else:
+            coleta_ids = [int(valor) for valor in (dados.get('coleta_ids') or [])]
+        
+        data_inicio = dados.get('data_inicio')
+        data_fim = dados.get('data_fim')
+        data_inicio = datetime.strptime(data_inicio, '%Y-%m-%d') if data_inicio else None
+        data_fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1) if data_fim else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos: informe coleta_ids ou datas no formato AAAA-MM-DD'}), 400
+    
+    if not coleta_ids and not (data_inicio and data_fim):
+        return jsonify({'success': False, 'message': 'Informe coleta_ids ou data_inicio e data_fim'}), 400
+    
+    limite = current_app.config.get('RECIBOS_LOTE_MAXIMO', 500)
+    coletas_data = ColetaService.dados_recibos(coleta_ids, data_inicio, data_fim, limite=limite + 1)
+    if not coletas_data:
+        return jsonify({'success': False, 'message': 'Nenhuma coleta encontrada'}), 404
+    if len(coletas_data) > limite:
+        return jsonify({'success': False, 'message': f'Máximo de {limite} recibos por lote'}), 400
+    
+    job_id = uuid.uuid4().hex
+    destino = os.path.join(current_app.instance_path, 'recibos', 'lotes', f'{job_id}.pdf')
+    download_url = url_for('coletas.baixar_recibos_lote', job_id=job_id)
+    
+    if not enqueue_lote_recibos_job(job_id, coletas_data, destino, download_url):
+        return jsonify({'success': False, 'message': 'Não foi possível iniciar a geração dos recibos'}), 503
+    
+    current_app.logger.info(
+        f"Recibos em lote solicitados por {session.get('usuario_nome', 'N/A')}: {len(coletas_data)} coletas (job {job_id})"
+    )
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'total_recibos': len(coletas_data),
+        'status_url': url_for('jobs.get_job_status', job_id=job_id),
+        'download_url': download_url
+    }), 202
+
+
+@coletas_bp.route('/recibos/lote/<job_id>.pdf')
+@login_obrigatorio
+@permissao_necessaria('acesso_logistica')
+def baixar_recibos_lote(job_id):
+    """Download do PDF gerado por gerar_recibos_lote"""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return jsonify({'success': False, 'message': 'Job inválido'}), 404
+    
+    caminho = os.path.join(current_app.instance_path, 'recibos', 'lotes', f'{job_id}.pdf')
+    if not os.path.exists(caminho):
+        return jsonify({'success': False, 'message': 'Recibos ainda não disponíveis'}), 404
+    
+    return send_file(caminho, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'recibos_coleta_{job_id[:8]}.pdf')
 
 
 # Rota de compatibilidade com logística
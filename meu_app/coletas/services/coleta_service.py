@@ -2,89 +2,182 @@
 Serviço unificado para operações de coleta - VERSÃO CONSOLIDADA
 Implementa a sugestão CLI #2: Refatoração para unificar funcionalidades
 """
+from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 from flask import current_app
-from sqlalchemy import func
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
 
 from meu_app.models import (
-    db, Pedido, Coleta, ItemColetado, ItemPedido, 
+    db, Pedido, Coleta, ItemColetado, ItemPedido, Pagamento,
     Usuario, Estoque, MovimentacaoEstoque, StatusColeta, StatusPedido
 )
+from meu_app.estoques.reserva_service import ReservaEstoqueService
+from meu_app.error_handlers import retry_on_stale_data
+from meu_app.paginacao import paginacao
 
 
 class ColetaService:
     """Serviço unificado para operações relacionadas à coleta"""
     
+    # Paginação padrão das listagens de coleta
+    POR_PAGINA = 25
+
+    @staticmethod
+    def _subqueries_totais():
+        """
+        Subqueries agregadas por pedido: itens/valor/coletado e valor pago
+
+        Returns:
+            Tuple: (itens, pagamentos), cada uma agrupada por pedido_id
+        """
+        itens = db.session.query(
+            ItemPedido.pedido_id.label('pedido_id'),
+            func.sum(ItemPedido.quantidade).label('total_itens'),
+            func.sum(ItemPedido.valor_total_venda).label('total_venda'),
+            func.sum(ItemPedido.quantidade_coletada).label('total_coletado')
+        ).group_by(ItemPedido.pedido_id).subquery()
+
+        pagamentos = db.session.query(
+            Pagamento.pedido_id.label('pedido_id'),
+            func.sum(Pagamento.valor).label('total_pago')
+        ).group_by(Pagamento.pedido_id).subquery()
+
+        return itens, pagamentos
+
+    @staticmethod
+    def recalcular_quantidades_coletadas() -> int:
+        """
+        Reconstrói ItemPedido.quantidade_coletada a partir dos itens coletados
+
+        Reparo do contador mantido por processar_coleta; corrige só os itens
+        divergentes, num único UPDATE, e faz commit.
+
+        Returns:
+            int: Quantidade de itens corrigidos
+        """
+        try:
+            soma_coletada = db.session.query(
+                func.coalesce(func.sum(ItemColetado.quantidade_coletada), 0)
+            ).filter(
+                ItemColetado.item_pedido_id == ItemPedido.id
+            ).scalar_subquery()
+
+            corrigidos = ItemPedido.query.filter(
+                ItemPedido.quantidade_coletada != soma_coletada
+            ).update({
+                ItemPedido.quantidade_coletada: soma_coletada,
+                ItemPedido.versao: ItemPedido.versao + 1
+            }, synchronize_session=False)
+            db.session.commit()
+
+            current_app.logger.info(f"Quantidades coletadas recalculadas: {corrigidos} itens corrigidos")
+            return corrigidos
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro ao recalcular quantidades coletadas: {str(e)}")
+            raise
+
     @staticmethod
-    def listar_pedidos_para_coleta(filtro: str = 'pendentes') -> List[Dict]:
+    def listar_pedidos_para_coleta(filtro: str = 'pendentes', page: int = 1, per_page: int = None) -> Dict:
         """
-        Lista pedidos com filtro unificado (pendentes/coletados)
+        Lista pedidos com filtro unificado (pendentes/coletados), paginada
+        
+        Totais de itens, pagamentos e coleta (contador persistido em ItemPedido)
+        vêm de subqueries agrupadas por pedido e o filtro é aplicado no SQL, então cada página custa um número
+        fixo de queries, independente da quantidade de pedidos e itens.
         
         Args:
             filtro: Filtro ('pendentes', 'coletados', 'todos')
+            page: Página (começa em 1)
+            per_page: Pedidos por página
         
         Returns:
-            List[Dict]: Lista de pedidos com informações de coleta
+            Dict: pedidos (lista de dicts com informações de coleta), metadados
+            de paginação e resumo do filtro inteiro
         """
+        per_page = per_page or ColetaService.POR_PAGINA
+        resultado = paginacao(1, per_page, 0)
+        resultado.update({
+            'pedidos': [],
+            'resumo': {'total_pedidos': 0, 'pendentes': 0, 'coletados': 0, 'valor_total': 0.0}
+        })
+        
         try:
-            # Buscar pedidos com eager loading otimizado
-            pedidos = Pedido.query.options(
-                db.joinedload(Pedido.cliente),
-                db.joinedload(Pedido.itens).joinedload(ItemPedido.produto),
-                db.joinedload(Pedido.pagamentos)
-            ).all()
+            itens, pagamentos = ColetaService._subqueries_totais()
+            
+            total_itens = itens.c.total_itens
+            total_venda = itens.c.total_venda
+            total_pago = func.coalesce(pagamentos.c.total_pago, 0)
+            total_coletado = itens.c.total_coletado
+            
+            coletado_completo = total_coletado >= total_itens
+            pagamento_aprovado = total_pago >= total_venda
+            
+            query = db.session.query(
+                Pedido, total_itens, total_venda, total_pago, total_coletado
+            ).join(
+                itens, itens.c.pedido_id == Pedido.id
+            ).outerjoin(
+                pagamentos, pagamentos.c.pedido_id == Pedido.id
+            )
             
-            lista_pedidos = []
+            # Aplicar filtro no SQL
+            if filtro == 'pendentes':
+                query = query.filter(pagamento_aprovado, total_coletado < total_itens)
+            elif filtro == 'coletados':
+                query = query.filter(coletado_completo)
+            elif filtro != 'todos':
+                return resultado
+            
+            # Resumo do filtro inteiro (não só da página) numa query agregada
+            filtrados = query.with_entities(
+                Pedido.id.label('pedido_id'),
+                total_venda.label('total_venda'),
+                case((coletado_completo, 1), else_=0).label('completo')
+            ).subquery()
+            qtd_pedidos, qtd_coletados, valor_total = db.session.query(
+                func.count(filtrados.c.pedido_id),
+                func.coalesce(func.sum(filtrados.c.completo), 0),
+                func.coalesce(func.sum(filtrados.c.total_venda), 0)
+            ).one()
+            
+            resultado.update(paginacao(page, per_page, qtd_pedidos))
+            resultado['resumo'] = {
+                'total_pedidos': qtd_pedidos,
+                'pendentes': qtd_pedidos - int(qtd_coletados),
+                'coletados': int(qtd_coletados),
+                'valor_total': float(valor_total)
+            }
             
-            for pedido in pedidos:
-                # Calcular totais financeiros
-                total_venda = sum(i.valor_total_venda for i in pedido.itens)
-                total_pago = sum(p.valor for p in pedido.pagamentos)
-                
-                # Calcular quantidades
-                total_itens_pedido = sum(item.quantidade for item in pedido.itens)
-                total_itens_coletados = 0
-                
-                for item in pedido.itens:
-                    total_coletado_item = db.session.query(
-                        func.coalesce(func.sum(ItemColetado.quantidade_coletada), 0)
-                    ).join(Coleta).filter(
-                        Coleta.pedido_id == pedido.id,
-                        ItemColetado.item_pedido_id == item.id
-                    ).scalar()
-                    total_itens_coletados += total_coletado_item
-                
-                # Determinar status de coleta
-                coletado_completo = total_itens_coletados >= total_itens_pedido
-                pagamento_aprovado = total_pago >= total_venda
-                
-                # Aplicar filtro
-                incluir_pedido = False
-                
-                if filtro == 'pendentes':
-                    incluir_pedido = pagamento_aprovado and not coletado_completo
-                elif filtro == 'coletados':
-                    incluir_pedido = coletado_completo
-                elif filtro == 'todos':
-                    incluir_pedido = True
-                
-                if incluir_pedido:
-                    lista_pedidos.append({
-                        'pedido': pedido,
-                        'total_itens': total_itens_pedido,
-                        'itens_coletados': total_itens_coletados,
-                        'itens_pendentes': total_itens_pedido - total_itens_coletados,
-                        'total_venda': total_venda,
-                        'total_pago': total_pago,
-                        'coletado_completo': coletado_completo,
-                        'pagamento_aprovado': pagamento_aprovado
-                    })
-            
-            return lista_pedidos
+            linhas = query.options(
+                db.joinedload(Pedido.cliente)
+            ).order_by(
+                Pedido.data.desc(), Pedido.id.desc()
+            ).offset(
+                (resultado['page'] - 1) * per_page
+            ).limit(per_page).all()
+            
+            for pedido, qtd_itens, valor_venda, valor_pago, qtd_coletada in linhas:
+                qtd_itens = int(qtd_itens or 0)
+                qtd_coletada = int(qtd_coletada or 0)
+                resultado['pedidos'].append({
+                    'pedido': pedido,
+                    'total_itens': qtd_itens,
+                    'itens_coletados': qtd_coletada,
+                    'itens_pendentes': qtd_itens - qtd_coletada,
+                    'total_venda': valor_venda,
+                    'total_pago': valor_pago,
+                    'coletado_completo': qtd_coletada >= qtd_itens,
+                    'pagamento_aprovado': valor_pago >= valor_venda
+                })
+            
+            return resultado
             
         except Exception as e:
             current_app.logger.error(f"Erro ao listar pedidos para coleta: {str(e)}")
-            return []
+            return resultado
 
     @staticmethod
     def buscar_detalhes_pedido(pedido_id: int) -> Optional[Dict]:
@@ -109,21 +202,22 @@ class ColetaService:
             if not pedido:
                 return None
             
-            # Calcular quantidades já coletadas e pendentes
+            # Estoque por produto numa query agrupada
+            disponibilidade = ReservaEstoqueService.disponibilidade(item.produto_id for item in pedido.itens)
+            
+            # Estoque livre para este pedido = em estoque − reservas dos outros pedidos
+            reserva_propria = {}
+            if ReservaEstoqueService.pedido_reserva_estoque(pedido):
+                for item in pedido.itens:
+                    reserva_propria[item.produto_id] = reserva_propria.get(item.produto_id, 0) + item.quantidade_pendente
+            
+            # Quantidades coletadas e pendentes vêm do contador persistido
             for item in pedido.itens:
-                total_coletado = db.session.query(
-                    func.coalesce(func.sum(ItemColetado.quantidade_coletada), 0)
-                ).join(Coleta).filter(
-                    Coleta.pedido_id == pedido.id,
-                    ItemColetado.item_pedido_id == item.id
-                ).scalar()
-                
-                item.quantidade_coletada = total_coletado
-                item.quantidade_pendente = item.quantidade - total_coletado
-                
                 # Verificar estoque disponível
-                estoque = Estoque.query.filter_by(produto_id=item.produto_id).first()
-                item.estoque_disponivel = estoque.quantidade if estoque else 0
+                saldo = disponibilidade.get(item.produto_id)
+                item.estoque_disponivel = (
+                    saldo['disponivel'] + reserva_propria.get(item.produto_id, 0) if saldo else 0
+                )
                 
                 # Calcular quantidade máxima que pode ser coletada
                 item.quantidade_maxima_coleta = min(item.quantidade_pendente, item.estoque_disponivel)
@@ -139,6 +233,9 @@ class ColetaService:
             return None
 
     @staticmethod
+    @retry_on_stale_data(resultado_conflito=(
+        False, "O pedido ou o estoque foi alterado por outra operação. Tente novamente.", None
+    ))
     def processar_coleta(
         pedido_id: int,
         responsavel_coleta_id: int,
@@ -152,6 +249,13 @@ class ColetaService:
         """
         Processa uma nova coleta (funcionalidade unificada)
         
+        Os locks seguem sempre a mesma ordem (pedido, itens por ID, estoques por
+        produto_id) e cada grupo é travado numa única query com IN, então coletas
+        simultâneas com produtos em comum esperam umas pelas outras em vez de
+        entrar em deadlock. Onde o banco ignora FOR UPDATE (SQLite), a coluna de
+        versão de Pedido e Estoque detecta a escrita concorrente e a coleta é
+        refeita com os dados atualizados.
+        
         Args:
             pedido_id: ID do pedido
             responsavel_coleta_id: ID do usuário responsável pela coleta
@@ -173,6 +277,15 @@ class ColetaService:
             if not itens_coleta:
                 return False, "Selecione pelo menos um item para coleta", None
             
+            # Consolidar quantidades por item (ignorando zeradas)
+            quantidades_por_item = {}
+            for item_data in itens_coleta:
+                quantidade = item_data.get('quantidade', 0)
+                if quantidade <= 0:
+                    continue
+                item_id = item_data.get('item_id')
+                quantidades_por_item[item_id] = quantidades_por_item.get(item_id, 0) + quantidade
+            
             # Buscar pedido com lock para evitar race conditions
             pedido = db.session.query(Pedido).filter(
                 Pedido.id == pedido_id
@@ -181,57 +294,70 @@ class ColetaService:
             if not pedido or pedido.status not in [StatusPedido.PAGAMENTO_APROVADO, StatusPedido.COLETA_PARCIAL]:
                 return False, "Pedido não encontrado ou não disponível para coleta", None
             
-            # Validar itens e quantidades
-            for item_data in itens_coleta:
-                item_id = item_data.get('item_id')
-                quantidade = item_data.get('quantidade', 0)
-                
-                if quantidade <= 0:
-                    continue
-                
-                # Buscar item do pedido com lock
-                item_pedido = db.session.query(ItemPedido).filter(
-                    ItemPedido.id == item_id,
-                    ItemPedido.pedido_id == pedido_id
-                ).with_for_update().first()
-                
-                if not item_pedido:
+            # Travar todos os itens da coleta numa única query, em ordem de ID
+            itens_pedido = {}
+            if quantidades_por_item:
+                itens_pedido = {
+                    item.id: item
+                    for item in db.session.query(ItemPedido).filter(
+                        ItemPedido.id.in_(list(quantidades_por_item)),
+                        ItemPedido.pedido_id == pedido_id
+                    ).order_by(ItemPedido.id).with_for_update().all()
+                }
+            
+            for item_id in quantidades_por_item:
+                if item_id not in itens_pedido:
                     return False, f"Item {item_id} não encontrado no pedido", None
-                
-                # Calcular quantidade já coletada
-                total_coletado_item = db.session.query(
-                    func.coalesce(func.sum(ItemColetado.quantidade_coletada), 0)
-                ).join(Coleta).filter(
-                    Coleta.pedido_id == pedido.id,
-                    ItemColetado.item_pedido_id == item_pedido.id
-                ).scalar()
-                
-                quantidade_pendente = item_pedido.quantidade - total_coletado_item
+            
+            quantidades_por_produto = {}
+            for item_id, quantidade in quantidades_por_item.items():
+                produto_id = itens_pedido[item_id].produto_id
+                quantidades_por_produto[produto_id] = quantidades_por_produto.get(produto_id, 0) + quantidade
+            
+            # Travar os estoques envolvidos numa única query, em ordem de produto
+            estoques = {}
+            if quantidades_por_produto:
+                estoques = {
+                    estoque.produto_id: estoque
+                    for estoque in db.session.query(Estoque).options(
+                        db.lazyload(Estoque.reserva)
+                    ).filter(
+                        Estoque.produto_id.in_(list(quantidades_por_produto))
+                    ).order_by(Estoque.produto_id).with_for_update().all()
+                }
+            
+            # Pendente de cada item lido do contador das linhas travadas
+            for item_id, quantidade in quantidades_por_item.items():
+                item_pedido = itens_pedido[item_id]
+                quantidade_pendente = item_pedido.quantidade_pendente
                 
                 # Validar se não excede o pendente
                 if quantidade > quantidade_pendente:
                     return False, f"Quantidade {quantidade} excede o pendente {quantidade_pendente} para {item_pedido.produto.nome}", None
-                
-                # Validar estoque com lock
-                estoque = db.session.query(Estoque).filter_by(
-                    produto_id=item_pedido.produto_id
-                ).with_for_update().first()
-                
+            
+            for produto_id, quantidade in quantidades_por_produto.items():
+                estoque = estoques.get(produto_id)
                 if estoque and quantidade > estoque.quantidade:
-                    return False, f"Quantidade {quantidade} excede o estoque disponível {estoque.quantidade} para {item_pedido.produto.nome}", None
+                    return False, f"Quantidade {quantidade} excede o estoque disponível {estoque.quantidade} para {estoque.produto.nome}", None
+            
+            # Pendente do pedido inteiro por produto (status e reserva própria)
+            pendente_pedido = ReservaEstoqueService.pendente_por_produto(pedido.id)
+            
+            # Não consumir estoque reservado para outros pedidos
+            reserva_ativa = ReservaEstoqueService.pedido_reserva_estoque(pedido)
+            reserva_propria = pendente_pedido if reserva_ativa else {}
+            disponibilidade = ReservaEstoqueService.disponibilidade(quantidades_por_produto.keys())
+            for produto_id, quantidade in quantidades_por_produto.items():
+                saldo = disponibilidade.get(produto_id)
+                if not saldo:
+                    continue
+                livre = saldo['disponivel'] + reserva_propria.get(produto_id, 0)
+                if quantidade > livre:
+                    return False, f"Quantidade {quantidade} excede o estoque disponível {max(livre, 0)} (descontadas as reservas de outros pedidos)", None
             
             # Determinar status da coleta
-            total_pendente_geral = 0
-            for item_pedido in pedido.itens:
-                total_coletado_item = db.session.query(
-                    func.coalesce(func.sum(ItemColetado.quantidade_coletada), 0)
-                ).join(Coleta).filter(
-                    Coleta.pedido_id == pedido.id,
-                    ItemColetado.item_pedido_id == item_pedido.id
-                ).scalar()
-                total_pendente_geral += item_pedido.quantidade - total_coletado_item
-
-            total_coletado_nesta_vez = sum(item_data.get('quantidade', 0) for item_data in itens_coleta)
+            total_pendente_geral = sum(pendente_pedido.values())
+            total_coletado_nesta_vez = sum(quantidades_por_item.values())
             
             if total_coletado_nesta_vez >= total_pendente_geral:
                 status_coleta = StatusColeta.TOTALMENTE_COLETADO
@@ -254,27 +380,28 @@ class ColetaService:
             
             db.session.add(nova_coleta)
             db.session.flush()  # Para obter o ID da coleta
-        
-            # Criar registros de itens coletados e dar baixa no estoque
-            for item_data in itens_coleta:
-                quantidade = item_data.get('quantidade', 0)
-                if quantidade > 0:
-                    item_coletado = ItemColetado(
-                        coleta_id=nova_coleta.id,
-                        item_pedido_id=item_data['item_id'],
-                        quantidade_coletada=quantidade
-                    )
-                    db.session.add(item_coletado)
-                    
-                    # Dar baixa no estoque
-                    ColetaService._registrar_movimentacao_estoque(
-                        item_data['item_id'],
-                        quantidade,
-                        nome_retirada
-                    )
-            
-            # Atualizar status do pedido
+            
+            # Registrar itens coletados e movimentações de saída em lote
+            itens_coletados, movimentacoes = ColetaService._montar_registros_coleta(
+                nova_coleta.id, quantidades_por_item, itens_pedido, estoques, nome_retirada
+            )
+            if itens_coletados:
+                db.session.execute(insert(ItemColetado), itens_coletados)
+            if movimentacoes:
+                db.session.execute(insert(MovimentacaoEstoque), movimentacoes)
+            
+            # Contador persistido de coletado por item, na mesma transação
+            for item_id, quantidade in quantidades_por_item.items():
+                itens_pedido[item_id].quantidade_coletada += quantidade
+            
+            # A quantidade coletada deixa de estar reservada
+            if reserva_ativa:
+                ReservaEstoqueService.consumir_coleta(quantidades_por_produto)
+            
+            # Atualizar status do pedido (sempre incrementa a versão, mesmo sem
+            # mudança de status, para que coletas concorrentes do mesmo pedido conflitem)
             pedido.status = status_pedido
+            flag_modified(pedido, 'status')
             
             # Commit da transação
             db.session.commit()
@@ -283,65 +410,120 @@ class ColetaService:
             
             return True, f"Coleta registrada com sucesso. Status: {status_coleta.value}", nova_coleta
             
+        except StaleDataError:
+            # Conflito de versão: retry_on_stale_data refaz a coleta
+            raise
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Erro ao processar coleta: {str(e)}")
             return False, f"Erro ao processar coleta: {str(e)}", None
 
     @staticmethod
-    def _registrar_movimentacao_estoque(item_pedido_id: int, quantidade: int, responsavel: str):
+    def _montar_registros_coleta(
+        coleta_id: int,
+        quantidades_por_item: Dict[int, int],
+        itens_pedido: Dict[int, ItemPedido],
+        estoques: Dict[int, Estoque],
+        responsavel: str
+    ) -> Tuple[List[Dict], List[Dict]]:
         """
-        Registra movimentação de estoque para uma coleta
+        Monta os registros de itens coletados e de movimentação de estoque
+        e dá baixa nos estoques já travados
         
         Args:
-            item_pedido_id: ID do item do pedido
-            quantidade: Quantidade coletada
-            responsavel: Nome do responsável
+            coleta_id: ID da coleta
+            quantidades_por_item: {item_pedido_id: quantidade coletada}
+            itens_pedido: Itens do pedido travados, por ID
+            estoques: Estoques travados, por produto_id
+            responsavel: Nome do responsável pela retirada
+        
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (itens_coletados, movimentacoes) prontos para INSERT em lote
         """
-        try:
-            # Buscar item do pedido com lock
-            item_pedido = db.session.query(ItemPedido).options(
-                db.joinedload(ItemPedido.produto)
-            ).filter(ItemPedido.id == item_pedido_id).with_for_update().first()
-            
-            if not item_pedido:
-                return
-            
-            produto_id = item_pedido.produto_id
-            
-            # Buscar estoque atual com lock
-            estoque = db.session.query(Estoque).filter_by(
-                produto_id=produto_id
-            ).with_for_update().first()
-            
+        itens_coletados = []
+        movimentacoes = []
+        for item_id in sorted(quantidades_por_item):
+            quantidade = quantidades_por_item[item_id]
+            itens_coletados.append({
+                'coleta_id': coleta_id,
+                'item_pedido_id': item_id,
+                'quantidade_coletada': quantidade
+            })
+            
+            estoque = estoques.get(itens_pedido[item_id].produto_id)
             if not estoque:
-                return
+                continue
             
-            # Calcular novas quantidades
             quantidade_anterior = estoque.quantidade
-            quantidade_atual = quantidade_anterior - quantidade
-            
-            # Criar movimentação
-            movimentacao = MovimentacaoEstoque(
-                produto_id=produto_id,
-                tipo_movimentacao="Saída",
-                quantidade_anterior=quantidade_anterior,
-                quantidade_movimentada=-quantidade,  # Negativo para saída
-                quantidade_atual=quantidade_atual,
-                motivo=f"Saída por coleta - Responsável: {responsavel}",
-                responsavel=responsavel,
-                observacoes=f"Coleta do item {item_pedido_id}"
-            )
-            
-            db.session.add(movimentacao)
-            
-            # Atualizar estoque
-            estoque.quantidade = quantidade_atual
-            
-            current_app.logger.info(f"Movimentação de estoque registrada: {item_pedido.produto.nome} - Saída: {quantidade}")
-            
-        except Exception as e:
-            current_app.logger.error(f"Erro ao registrar movimentação de estoque: {str(e)}")
+            estoque.quantidade = quantidade_anterior - quantidade
+            movimentacoes.append({
+                'produto_id': estoque.produto_id,
+                'tipo_movimentacao': "Saída",
+                'quantidade_anterior': quantidade_anterior,
+                'quantidade_movimentada': -quantidade,  # Negativo para saída
+                'quantidade_atual': estoque.quantidade,
+                'motivo': f"Saída por coleta - Responsável: {responsavel}",
+                'responsavel': responsavel,
+                'observacoes': f"Coleta do item {item_id}"
+            })
+        
+        return itens_coletados, movimentacoes
+
+    @staticmethod
+    def dados_recibos(coleta_ids: List[int] = None, data_inicio: datetime = None,
+                      data_fim: datetime = None, limite: int = None) -> List[Dict]:
+        """
+        Monta os dados de recibo de várias coletas (reimpressão em lote)
+        
+        Coletas, itens, produtos e clientes são carregados com selectinload,
+        num número fixo de queries.
+        
+        Args:
+            coleta_ids: IDs das coletas (tem prioridade sobre o período)
+            data_inicio: Início do período (inclusive)
+            data_fim: Fim do período (exclusive)
+            limite: Quantidade máxima de coletas
+        
+        Returns:
+            List[Dict]: Dados no formato de ReceiptService.montar_elementos, em ordem de data
+        """
+        query = Coleta.query.options(
+            db.selectinload(Coleta.pedido).selectinload(Pedido.cliente),
+            db.selectinload(Coleta.itens_coletados)
+              .selectinload(ItemColetado.item_pedido)
+              .selectinload(ItemPedido.produto)
+        )
+        if coleta_ids:
+            query = query.filter(Coleta.id.in_(coleta_ids))
+        else:
+            if data_inicio:
+                query = query.filter(Coleta.data_coleta >= data_inicio)
+            if data_fim:
+                query = query.filter(Coleta.data_coleta < data_fim)
+        query = query.order_by(Coleta.data_coleta, Coleta.id)
+        if limite:
+            query = query.limit(limite)
+        
+        return [
+            {
+                'pedido_id': coleta.pedido_id,
+                'cliente_nome': coleta.pedido.cliente.nome if coleta.pedido and coleta.pedido.cliente else 'N/A',
+                'data_coleta': coleta.data_coleta.strftime('%d/%m/%Y %H:%M') if coleta.data_coleta else None,
+                'status': coleta.status.value if coleta.status else None,
+                'nome_retirada': coleta.nome_retirada,
+                'documento_retirada': coleta.documento_retirada,
+                'nome_conferente': coleta.nome_conferente,
+                'cpf_conferente': coleta.cpf_conferente,
+                'itens_coleta': [
+                    {
+                        'produto_nome': item.item_pedido.produto.nome,
+                        'quantidade': item.quantidade_coletada
+                    }
+                    for item in coleta.itens_coletados
+                ]
+            }
+            for coleta in query.all()
+        ]
 
     @staticmethod
     def buscar_historico_coletas(pedido_id: int) -> Optional[Dict]:
@@ -370,30 +552,69 @@ class ColetaService:
             return None
 
     @staticmethod
-    def listar_pedidos_coletados() -> List[Dict]:
+    def listar_pedidos_coletados(page: int = 1, per_page: int = None) -> Dict:
         """
-        Lista pedidos que já foram coletados (funcionalidade do logística)
+        Lista pedidos que já tiveram coleta (funcionalidade do logística), paginada
+        
+        Args:
+            page: Página (começa em 1)
+            per_page: Pedidos por página
         
         Returns:
-            List[Dict]: Lista de pedidos coletados
+            Dict: pedidos (tuplas pedido, qtd_total, qtd_coletada, total_venda),
+            metadados de paginação e resumo de todos os pedidos coletados
         """
+        per_page = per_page or ColetaService.POR_PAGINA
+        resultado = paginacao(1, per_page, 0)
+        resultado.update({
+            'pedidos': [],
+            'resumo': {'total_pedidos': 0, 'qtd_total': 0, 'qtd_coletada': 0, 'valor_total': 0.0}
+        })
+        
         try:
-            pedidos = Pedido.query.join(Coleta).distinct().all()
-            pedidos_info = []
-
-            for pedido in pedidos:
-                # Soma da quantidade total do pedido
-                qtd_total = sum(item.quantidade for item in pedido.itens)
-                # Soma da quantidade coletada
-                qtd_coletada = db.session.query(db.func.sum(ItemColetado.quantidade_coletada))\
-                    .join(ItemPedido)\
-                    .filter(ItemPedido.pedido_id == pedido.id).scalar() or 0
-                # Soma do valor total do pedido
-                total_venda = sum([item.valor_total_venda for item in pedido.itens])
-                pedidos_info.append((pedido, qtd_total, qtd_coletada, total_venda))
-
-            return pedidos_info
+            itens, _ = ColetaService._subqueries_totais()
+            
+            # Pedidos com alguma quantidade coletada
+            query = db.session.query(
+                Pedido,
+                itens.c.total_itens,
+                itens.c.total_coletado,
+                itens.c.total_venda
+            ).join(
+                itens, itens.c.pedido_id == Pedido.id
+            ).filter(itens.c.total_coletado > 0)
+            
+            qtd_pedidos, qtd_total, qtd_coletada, valor_total = db.session.query(
+                func.count(Pedido.id),
+                func.coalesce(func.sum(itens.c.total_itens), 0),
+                func.coalesce(func.sum(itens.c.total_coletado), 0),
+                func.coalesce(func.sum(itens.c.total_venda), 0)
+            ).select_from(Pedido).join(
+                itens, itens.c.pedido_id == Pedido.id
+            ).filter(itens.c.total_coletado > 0).one()
+            
+            resultado.update(paginacao(page, per_page, qtd_pedidos))
+            resultado['resumo'] = {
+                'total_pedidos': qtd_pedidos,
+                'qtd_total': int(qtd_total),
+                'qtd_coletada': int(qtd_coletada),
+                'valor_total': float(valor_total)
+            }
+            
+            linhas = query.options(
+                db.joinedload(Pedido.cliente)
+            ).order_by(
+                Pedido.data.desc(), Pedido.id.desc()
+            ).offset(
+                (resultado['page'] - 1) * per_page
+            ).limit(per_page).all()
+            
+            resultado['pedidos'] = [
+                (pedido, int(qtd_total or 0), int(qtd_coletada or 0), total_venda)
+                for pedido, qtd_total, qtd_coletada, total_venda in linhas
+            ]
+            return resultado
             
         except Exception as e:
             current_app.logger.error(f"Erro ao listar pedidos coletados: {str(e)}")
-            return []
+            return resultado
@@ -288,6 +288,47 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
     return decorator
 
 
+def retry_on_stale_data(max_retries: int = 3, resultado_conflito: Any = None):
+    """
+    Decorador para repetir uma operação transacional quando o controle de
+    concorrência otimista (version_id_col) detecta que outra transação
+    alterou as mesmas linhas
+    
+    A função decorada deve deixar o StaleDataError propagar; a sessão é
+    revertida antes de cada nova tentativa, então os dados são relidos.
+    
+    Args:
+        max_retries: Número máximo de novas tentativas
+        resultado_conflito: Valor retornado se todas as tentativas falharem
+        
+    Returns:
+        Decorador que repete a operação em caso de conflito de versão
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            from sqlalchemy.orm.exc import StaleDataError
+            from .models import db
+            
+            for attempt in range(max_retries + 1):
+                try:
+                    return func(*args, **kwargs)
+                except StaleDataError as e:
+                    db.session.rollback()
+                    current_app.logger.warning(
+                        f"Conflito de concorrência em {func.__name__} "
+                        f"(tentativa {attempt + 1} de {max_retries + 1}): {str(e)}"
+                    )
+            
+            current_app.logger.error(
+                f"Conflito de concorrência persistente em {func.__name__} após {max_retries + 1} tentativas"
+            )
+            return resultado_conflito
+            
+        return wrapper
+    return decorator
+
+
 def performance_monitor(threshold_seconds: float = 1.0):
     """
     Decorador para monitorar performance de funções
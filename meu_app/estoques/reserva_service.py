@@ -0,0 +1,172 @@
+"""
+Serviço de reserva de estoque
+Mantém, por produto, a quantidade comprometida com pedidos confirmados
+pelo comercial e ainda não coletados.
+
+Os contadores são atualizados com UPDATE relativo (quantidade = quantidade + delta)
+dentro da transação de quem chama, então confirmação, edição, exclusão e coleta
+nunca fazem leitura-seguida-de-escrita do contador.
+"""
+from typing import Dict, Iterable, Optional
+
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+
+from ..models import (
+    db, Estoque, ItemPedido, Pedido, ReservaEstoque, StatusPedido
+)
+
+
+class ReservaEstoqueService:
+    """Serviço para os contadores de reserva de estoque"""
+
+    @staticmethod
+    def pedido_reserva_estoque(pedido: Pedido) -> bool:
+        """Indica se o pedido mantém reserva (confirmado e não cancelado)"""
+        return bool(pedido.confirmado_comercial) and pedido.status != StatusPedido.CANCELADO
+
+    @staticmethod
+    def pendente_por_produto(pedido_id: int) -> Dict[int, int]:
+        """
+        Calcula a quantidade ainda não coletada de cada produto de um pedido
+
+        Args:
+            pedido_id: ID do pedido
+
+        Returns:
+            Dict[int, int]: {produto_id: quantidade_pendente}
+        """
+        linhas = db.session.query(
+            ItemPedido.produto_id,
+            func.sum(ItemPedido.quantidade_pendente)
+        ).filter(
+            ItemPedido.pedido_id == pedido_id
+        ).group_by(ItemPedido.produto_id).all()
+
+        return {produto_id: int(pendente or 0) for produto_id, pendente in linhas if pendente}
+
+    @staticmethod
+    def aplicar_deltas(deltas: Dict[int, int]) -> None:
+        """
+        Soma os deltas aos contadores de reserva (sem commit)
+
+        Os produtos são atualizados em ordem de ID para que transações
+        concorrentes travem as linhas sempre na mesma ordem.
+
+        Args:
+            deltas: {produto_id: variação da quantidade reservada}
+        """
+        for produto_id in sorted(deltas):
+            delta = deltas[produto_id]
+            if not delta:
+                continue
+
+            atualizados = ReservaEstoque.query.filter_by(produto_id=produto_id).update(
+                {ReservaEstoque.quantidade_reservada: ReservaEstoque.quantidade_reservada + delta},
+                synchronize_session=False
+            )
+            if atualizados:
+                continue
+
+            # Primeira reserva do produto: criar o contador (outra transação pode
+            # ter criado ao mesmo tempo, nesse caso repete o UPDATE relativo)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ReservaEstoque(
+                        produto_id=produto_id,
+                        quantidade_reservada=max(delta, 0)
+                    ))
+            except IntegrityError:
+                ReservaEstoque.query.filter_by(produto_id=produto_id).update(
+                    {ReservaEstoque.quantidade_reservada: ReservaEstoque.quantidade_reservada + delta},
+                    synchronize_session=False
+                )
+
+    @staticmethod
+    def reservar_pedido(pedido_id: int) -> Dict[int, int]:
+        """Reserva o pendente do pedido (usado na confirmação comercial)"""
+        pendente = ReservaEstoqueService.pendente_por_produto(pedido_id)
+        ReservaEstoqueService.aplicar_deltas(pendente)
+        return pendente
+
+    @staticmethod
+    def liberar_pedido(pedido_id: int) -> Dict[int, int]:
+        """Libera a reserva do pendente do pedido (edição, exclusão, cancelamento)"""
+        pendente = ReservaEstoqueService.pendente_por_produto(pedido_id)
+        ReservaEstoqueService.aplicar_deltas({p: -q for p, q in pendente.items()})
+        return pendente
+
+    @staticmethod
+    def consumir_coleta(quantidades_por_produto: Dict[int, int]) -> None:
+        """Baixa da reserva as quantidades que saíram fisicamente numa coleta"""
+        ReservaEstoqueService.aplicar_deltas({p: -q for p, q in quantidades_por_produto.items()})
+
+    @staticmethod
+    def disponibilidade(produto_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Lê estoque, reservado e disponível de vários produtos numa única query
+
+        Args:
+            produto_ids: IDs dos produtos (None = todos com estoque)
+
+        Returns:
+            Dict[int, Dict[str, int]]: {produto_id: {'estoque', 'reservado', 'disponivel'}}
+        """
+        query = db.session.query(
+            Estoque.produto_id,
+            Estoque.quantidade,
+            func.coalesce(ReservaEstoque.quantidade_reservada, 0)
+        ).outerjoin(
+            ReservaEstoque, ReservaEstoque.produto_id == Estoque.produto_id
+        )
+        if produto_ids is not None:
+            produto_ids = list(produto_ids)
+            if not produto_ids:
+                return {}
+            query = query.filter(Estoque.produto_id.in_(produto_ids))
+
+        return {
+            produto_id: {
+                'estoque': quantidade,
+                'reservado': reservado,
+                'disponivel': quantidade - reservado
+            }
+            for produto_id, quantidade, reservado in query.all()
+        }
+
+    @staticmethod
+    def recalcular() -> int:
+        """
+        Reconstrói todos os contadores a partir dos pedidos confirmados
+
+        Usado para carga inicial e reparo; faz commit.
+
+        Returns:
+            int: Quantidade de produtos com reserva
+        """
+        try:
+            linhas = db.session.query(
+                ItemPedido.produto_id,
+                func.sum(ItemPedido.quantidade_pendente)
+            ).join(
+                Pedido, Pedido.id == ItemPedido.pedido_id
+            ).filter(
+                Pedido.confirmado_comercial.is_(True),
+                or_(Pedido.status.is_(None), Pedido.status != StatusPedido.CANCELADO)
+            ).group_by(ItemPedido.produto_id).all()
+
+            ReservaEstoque.query.delete(synchronize_session=False)
+            reservas = [
+                ReservaEstoque(produto_id=produto_id, quantidade_reservada=max(int(pendente or 0), 0))
+                for produto_id, pendente in linhas
+            ]
+            db.session.add_all(reservas)
+            db.session.commit()
+
+            current_app.logger.info(f"Reservas de estoque recalculadas: {len(reservas)} produtos")
+            return len(reservas)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro ao recalcular reservas de estoque: {str(e)}")
+            raise
@@ -1,4 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify, Response, stream_with_context
+import csv
+import io
+from datetime import datetime
 
 estoques_bp = Blueprint('estoques', __name__, url_prefix='/estoques')
 from .services import EstoqueService
@@ -148,7 +151,7 @@ def excluir_estoque(id):
 @login_obrigatorio
 @permissao_necessaria('acesso_estoques')
 def historico_movimentacao(produto_id):
-    """Exibe o histórico de movimentação de um produto"""
+    """Exibe o histórico de movimentação de um produto (paginado por cursor)"""
     try:
         # Buscar produto
         produto = Produto.query.get(produto_id)
@@ -156,23 +159,100 @@ def historico_movimentacao(produto_id):
             flash('Produto não encontrado', 'error')
             return redirect(url_for('estoques.listar_estoques'))
         
-        # Buscar histórico de movimentação
-        movimentacoes = EstoqueService.buscar_historico_movimentacao(produto_id)
+        data_inicio = request.args.get('data_inicio', '').strip() or None
+        data_fim = request.args.get('data_fim', '').strip() or None
+        cursor = request.args.get('cursor') or None
+        per_page = request.args.get('per_page', EstoqueService.HISTORICO_POR_PAGINA, type=int)
+        if per_page not in [50, 100, 200]:
+            per_page = EstoqueService.HISTORICO_POR_PAGINA
         
-        # Calcular total no backend (Python)
-        total = sum(mov.quantidade_movimentada for mov in movimentacoes)
+        try:
+            pagina = EstoqueService.buscar_historico_movimentacao(
+                produto_id,
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                cursor=cursor,
+                per_page=per_page
+            )
+        except ValueError:
+            flash('Formato de data inválido. Use AAAA-MM-DD.', 'error')
+            return redirect(url_for('estoques.historico_movimentacao', produto_id=produto_id))
         
         current_app.logger.info(f"Histórico de movimentação acessado para produto {produto.nome} por {session.get('usuario_nome', 'N/A')}")
         
         return render_template('historico_movimentacao.html', 
                              produto=produto, 
-                             movimentacoes=movimentacoes,
-                             total=total)
+                             movimentacoes=pagina['movimentacoes'],
+                             pagina=pagina,
+                             total=pagina['total_acumulado'],
+                             data_inicio=data_inicio,
+                             data_fim=data_fim)
     except Exception as e:
         current_app.logger.error(f"Erro ao buscar histórico de movimentação: {str(e)}")
         flash(f"Erro ao carregar histórico: {str(e)}", 'error')
         return redirect(url_for('estoques.listar_estoques'))
 
+@estoques_bp.route('/historico/<int:produto_id>/exportar')
+@login_obrigatorio
+@permissao_necessaria('acesso_estoques')
+def exportar_historico_movimentacao(produto_id):
+    """Exporta o histórico de movimentação de um produto em CSV (streaming)"""
+    produto = Produto.query.get(produto_id)
+    if not produto:
+        flash('Produto não encontrado', 'error')
+        return redirect(url_for('estoques.listar_estoques'))
+    
+    data_inicio = request.args.get('data_inicio', '').strip() or None
+    data_fim = request.args.get('data_fim', '').strip() or None
+    
+    try:
+        # Validar o período antes de iniciar o streaming
+        for data in (data_inicio, data_fim):
+            if data:
+                datetime.strptime(data, '%Y-%m-%d')
+    except ValueError:
+        flash('Formato de data inválido. Use AAAA-MM-DD.', 'error')
+        return redirect(url_for('estoques.historico_movimentacao', produto_id=produto_id))
+    
+    def gerar_linhas():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        
+        def linha(valores):
+            writer.writerow(valores)
+            conteudo = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return conteudo
+        
+        yield linha(['ID', 'Data/Hora', 'Tipo', 'Quantidade Anterior', 'Quantidade Movimentada',
+                     'Quantidade Atual', 'Total Acumulado', 'Motivo', 'Responsável', 'Observações'])
+        
+        acumulado = 0
+        for mov in EstoqueService.iterar_historico_movimentacao(produto_id, data_inicio, data_fim):
+            acumulado += mov.quantidade_movimentada
+            yield linha([
+                mov.id,
+                mov.data_movimentacao.strftime('%Y-%m-%d %H:%M:%S') if mov.data_movimentacao else '',
+                mov.tipo_movimentacao,
+                mov.quantidade_anterior,
+                mov.quantidade_movimentada,
+                mov.quantidade_atual,
+                acumulado,
+                mov.motivo,
+                mov.responsavel,
+                mov.observacoes or ''
+            ])
+    
+    current_app.logger.info(f"Exportação do histórico do produto {produto.nome} solicitada por {session.get('usuario_nome', 'N/A')}")
+    
+    nome_arquivo = f"historico_movimentacao_{produto_id}.csv"
+    return Response(
+        stream_with_context(gerar_linhas()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+    )
+
 @estoques_bp.route('/estoque_atual/<int:produto_id>')
 @login_obrigatorio
 @permissao_necessaria('acesso_estoques')
@@ -185,6 +265,8 @@ def estoque_atual(produto_id):
             return jsonify({
                 'estoque': {
                     'quantidade': estoque.quantidade,
+                    'quantidade_reservada': estoque.quantidade_reservada,
+                    'quantidade_disponivel': estoque.quantidade_disponivel,
                     'conferente': estoque.conferente,
                     'status': estoque.status,
                     'data_modificacao': estoque.data_modificacao.strftime('%d/%m/%Y %H:%M') if estoque.data_modificacao else None
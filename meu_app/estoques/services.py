@@ -3,10 +3,13 @@ Serviços para o módulo de estoques
 Contém toda a lógica de negócio separada das rotas
 """
 from ..models import db, Estoque, Produto, LogAtividade, MovimentacaoEstoque
+from ..error_handlers import retry_on_stale_data
 from flask import current_app, session
-from typing import Dict, List, Tuple, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Dict, Iterator, List, Tuple, Optional
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class EstoqueService:
     """Serviço para operações relacionadas a estoques"""
@@ -99,6 +102,9 @@ class EstoqueService:
             return False, f"Erro ao criar estoque: {str(e)}", None
     
     @staticmethod
+    @retry_on_stale_data(resultado_conflito=(
+        False, "O estoque foi alterado por outra operação. Tente novamente.", None
+    ))
     def editar_estoque(estoque_id: int, quantidade: int, data_entrada: str, status: str = None, observacoes: str = '') -> Tuple[bool, str, Optional[Estoque]]:
         """
         Edita um registro de estoque
@@ -171,6 +177,9 @@ class EstoqueService:
             
             return True, "Estoque editado com sucesso", estoque
             
+        except StaleDataError:
+            # Conflito de versão: retry_on_stale_data refaz a operação
+            raise
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Erro ao editar estoque: {str(e)}")
@@ -246,6 +255,9 @@ class EstoqueService:
             return None
 
     @staticmethod
+    @retry_on_stale_data(resultado_conflito=(
+        False, "O estoque foi alterado por outra operação. Tente novamente.", None
+    ))
     def atualizar_estoque(produto_id: int, quantidade: int, data_entrada: str, 
                          conferente: str = None, status: str = None, observacoes: str = '') -> Tuple[bool, str, Optional[Estoque]]:
         """
@@ -324,6 +336,9 @@ class EstoqueService:
             
             return True, f"Estoque atualizado com sucesso! Adicionado: {quantidade}, Total: {nova_quantidade}", estoque
             
+        except StaleDataError:
+            # Conflito de versão: retry_on_stale_data refaz a operação
+            raise
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"Erro ao atualizar estoque: {str(e)}")
@@ -364,23 +379,180 @@ class EstoqueService:
             # Não falhar se a movimentação não puder ser registrada
             pass
 
+    # Tamanho padrão de página do histórico e do lote usado na exportação CSV
+    HISTORICO_POR_PAGINA = 50
+    HISTORICO_LOTE_EXPORTACAO = 1000
+
+    @staticmethod
+    def _codificar_cursor(movimentacao: MovimentacaoEstoque, acumulado: int) -> str:
+        """
+        Gera o cursor (data_movimentacao|id|acumulado) da última linha de uma página
+
+        O total acumulado até essa linha segue no cursor para que a próxima página
+        não precise somar todo o histórico anterior.
+        """
+        return f"{movimentacao.data_movimentacao.isoformat()}|{movimentacao.id}|{acumulado}"
+
+    @staticmethod
+    def _decodificar_cursor(cursor: str) -> Optional[Tuple[datetime, int, int]]:
+        """
+        Converte um cursor 'data_iso|id|acumulado' de volta para a tupla de keyset
+
+        Returns:
+            Optional[Tuple[datetime, int, int]]: (data_movimentacao, id, total acumulado)
+            ou None se inválido
+        """
+        try:
+            data_str, id_str, acumulado_str = cursor.rsplit('|', 2)
+            return datetime.fromisoformat(data_str), int(id_str), int(acumulado_str)
+        except (ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def _filtrar_historico(produto_id: int, data_inicio: str = None, data_fim: str = None):
+        """
+        Monta a query base do histórico com os filtros de período
+
+        Args:
+            produto_id: ID do produto
+            data_inicio: Data inicial (YYYY-MM-DD), inclusiva
+            data_fim: Data final (YYYY-MM-DD), inclusiva
+
+        Raises:
+            ValueError: se alguma data estiver fora do formato YYYY-MM-DD
+        """
+        filtros = [MovimentacaoEstoque.produto_id == produto_id]
+        if data_inicio:
+            filtros.append(MovimentacaoEstoque.data_movimentacao >= datetime.strptime(data_inicio, "%Y-%m-%d"))
+        if data_fim:
+            fim = datetime.strptime(data_fim, "%Y-%m-%d") + timedelta(days=1)
+            filtros.append(MovimentacaoEstoque.data_movimentacao < fim)
+        return filtros
+
+    @staticmethod
+    def _apos_cursor(data_cursor: datetime, id_cursor: int):
+        """Condição de keyset (data_movimentacao, id) > (data_cursor, id_cursor)"""
+        return or_(
+            MovimentacaoEstoque.data_movimentacao > data_cursor,
+            and_(
+                MovimentacaoEstoque.data_movimentacao == data_cursor,
+                MovimentacaoEstoque.id > id_cursor
+            )
+        )
+
     @staticmethod
-    def buscar_historico_movimentacao(produto_id: int) -> List[MovimentacaoEstoque]:
+    def buscar_historico_movimentacao(produto_id: int, data_inicio: str = None, data_fim: str = None,
+                                      cursor: str = None, per_page: int = None) -> Dict:
         """
-        Busca o histórico de movimentação de um produto
+        Busca uma página do histórico de movimentação de um produto
+        
+        Usa paginação por keyset sobre (produto_id, data_movimentacao, id), servida
+        pelo índice ix_movimentacao_estoque_produto_data_id, de modo que o custo de
+        cada página não depende do tamanho do histórico.
         
         Args:
             produto_id: ID do produto
+            data_inicio: Data inicial do filtro (YYYY-MM-DD)
+            data_fim: Data final do filtro (YYYY-MM-DD)
+            cursor: Cursor retornado pela página anterior (None = primeira página)
+            per_page: Registros por página
             
         Returns:
-            List[MovimentacaoEstoque]: Lista de movimentações ordenadas por data (mais antigas primeiro)
+            Dict: movimentacoes (mais antigas primeiro, cada uma com total_acumulado),
+            total_pagina, saldo_anterior, total_acumulado, proximo_cursor e has_next
         """
+        per_page = per_page or EstoqueService.HISTORICO_POR_PAGINA
+        resultado = {
+            'movimentacoes': [],
+            'total_pagina': 0,
+            'saldo_anterior': 0,
+            'total_acumulado': 0,
+            'cursor': cursor,
+            'proximo_cursor': None,
+            'has_next': False,
+            'per_page': per_page
+        }
+        
         try:
-            return MovimentacaoEstoque.query.filter_by(produto_id=produto_id)\
-                .order_by(MovimentacaoEstoque.data_movimentacao.asc()).all()
+            filtros = EstoqueService._filtrar_historico(produto_id, data_inicio, data_fim)
+            
+            saldo_anterior = 0
+            if cursor:
+                posicao = EstoqueService._decodificar_cursor(cursor)
+                if posicao:
+                    # O cursor traz o total acumulado das páginas anteriores (mesmo período)
+                    data_cursor, id_cursor, saldo_anterior = posicao
+                    filtros.append(EstoqueService._apos_cursor(data_cursor, id_cursor))
+            
+            # Buscar uma linha a mais para saber se existe próxima página
+            movimentacoes = MovimentacaoEstoque.query.filter(*filtros)\
+                .order_by(MovimentacaoEstoque.data_movimentacao.asc(), MovimentacaoEstoque.id.asc())\
+                .limit(per_page + 1).all()
+            
+            has_next = len(movimentacoes) > per_page
+            movimentacoes = movimentacoes[:per_page]
+            
+            acumulado = saldo_anterior
+            for mov in movimentacoes:
+                acumulado += mov.quantidade_movimentada
+                mov.total_acumulado = acumulado
+            
+            resultado.update({
+                'movimentacoes': movimentacoes,
+                'total_pagina': acumulado - saldo_anterior,
+                'saldo_anterior': saldo_anterior,
+                'total_acumulado': acumulado,
+                'proximo_cursor': EstoqueService._codificar_cursor(movimentacoes[-1], acumulado) if has_next else None,
+                'has_next': has_next
+            })
+            return resultado
+        except ValueError:
+            raise
         except Exception as e:
             current_app.logger.error(f"Erro ao buscar histórico de movimentação: {str(e)}")
-            return []
+            return resultado
+
+    @staticmethod
+    def iterar_historico_movimentacao(produto_id: int, data_inicio: str = None, data_fim: str = None,
+                                      lote: int = None) -> Iterator[MovimentacaoEstoque]:
+        """
+        Percorre todo o histórico de um produto em lotes por keyset
+        
+        Usado pela exportação CSV em streaming: nunca mantém mais que um lote
+        em memória, independente do tamanho do histórico.
+        
+        Args:
+            produto_id: ID do produto
+            data_inicio: Data inicial do filtro (YYYY-MM-DD)
+            data_fim: Data final do filtro (YYYY-MM-DD)
+            lote: Quantidade de linhas buscadas por consulta
+            
+        Yields:
+            MovimentacaoEstoque: movimentações em ordem cronológica
+        """
+        lote = lote or EstoqueService.HISTORICO_LOTE_EXPORTACAO
+        filtros = EstoqueService._filtrar_historico(produto_id, data_inicio, data_fim)
+        posicao = None
+        
+        while True:
+            query = MovimentacaoEstoque.query.filter(*filtros)
+            if posicao:
+                query = query.filter(EstoqueService._apos_cursor(*posicao))
+            movimentacoes = query.order_by(
+                MovimentacaoEstoque.data_movimentacao.asc(), MovimentacaoEstoque.id.asc()
+            ).limit(lote).all()
+            
+            if not movimentacoes:
+                return
+            
+            for mov in movimentacoes:
+                yield mov
+            
+            if len(movimentacoes) < lote:
+                return
+            
+            ultima = movimentacoes[-1]
+            posicao = (ultima.data_movimentacao, ultima.id)
 
     @staticmethod
     def _registrar_atividade(tipo_atividade: str, titulo: str, descricao: str, modulo: str, dados_extras: Dict = None) -> None:
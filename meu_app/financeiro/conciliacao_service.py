@@ -0,0 +1,386 @@
+"""
+Conciliação bancária
+Importa extratos OFX/CSV e casa cada lançamento de crédito com um Pagamento,
+usando os campos já extraídos dos comprovantes (id_transacao, data_comprovante,
+chave_pix_recebedor).
+
+O casamento usa dicionários indexados em memória: primeiro por ID da transação,
+depois por (valor em centavos, data) percorrendo só a janela de tolerância,
+sem comparar cada lançamento com cada pagamento.
+"""
+import csv
+import io
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from ..models import db, Pagamento
+from .config import FinanceiroConfig
+from .exceptions import ArquivoInvalidoError
+
+
+# Identificador fim-a-fim do PIX (E + ISPB + data/hora + sequencial)
+PADRAO_E2E = re.compile(r'\bE\d{8}\d{12}[A-Za-z0-9]{11}\b')
+
+# Cabeçalhos aceitos no CSV (normalizados: minúsculas, sem acento)
+COLUNAS_CSV = {
+    'data': ('data', 'data lancamento', 'data_lancamento', 'dt', 'date'),
+    'valor': ('valor', 'valor (r$)', 'montante', 'amount', 'value'),
+    'id_transacao': ('id_transacao', 'id transacao', 'identificador', 'id', 'fitid', 'documento', 'transaction_id'),
+    'descricao': ('descricao', 'historico', 'lancamento', 'memo', 'description'),
+    'chave_pix': ('chave_pix', 'chave pix', 'pix'),
+}
+
+# Tamanho dos lotes de IN (...) na busca por ID de transação
+LOTE_IDS = 500
+
+
+def _normalizar(texto: str) -> str:
+    nfkd = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in nfkd if not unicodedata.combining(c)).strip().lower()
+
+
+class ConciliacaoService:
+    """Serviço de importação de extratos e conciliação com pagamentos"""
+
+    # ------------------------------------------------------------------
+    # Leitura de extratos
+    # ------------------------------------------------------------------
+    @staticmethod
+    def ler_extrato(conteudo: bytes, nome_arquivo: str = '') -> List[Dict]:
+        """
+        Lê um extrato OFX ou CSV
+
+        Args:
+            conteudo: Bytes do arquivo
+            nome_arquivo: Nome original (usado para detectar o formato)
+
+        Returns:
+            List[Dict]: Lançamentos com linha, data, valor, id_transacao,
+            descricao, chave_pix e ids (ID + identificadores PIX da descrição)
+
+        Raises:
+            ArquivoInvalidoError: Formato não reconhecido ou sem lançamentos
+        """
+        texto = ConciliacaoService._decodificar(conteudo)
+        if nome_arquivo.lower().endswith('.ofx') or '<OFX>' in texto.upper():
+            lancamentos = ConciliacaoService._ler_ofx(texto)
+        elif nome_arquivo.lower().endswith('.csv') or not nome_arquivo:
+            lancamentos = ConciliacaoService._ler_csv(texto)
+        else:
+            raise ArquivoInvalidoError("Formato de extrato não suportado. Envie um arquivo OFX ou CSV.")
+
+        if not lancamentos:
+            raise ArquivoInvalidoError("Nenhum lançamento encontrado no extrato.")
+        return lancamentos
+
+    @staticmethod
+    def _decodificar(conteudo: bytes) -> str:
+        for encoding in ('utf-8-sig', 'cp1252'):
+            try:
+                return conteudo.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        return conteudo.decode('latin-1')
+
+    @staticmethod
+    def _lancamento(linha: int, data: Optional[date], valor: Optional[Decimal], id_transacao: str = '',
+                    descricao: str = '', chave_pix: str = '') -> Dict:
+        id_transacao = (id_transacao or '').strip() or None
+        descricao = (descricao or '').strip()
+        ids = [id_transacao] if id_transacao else []
+        ids.extend(e2e for e2e in PADRAO_E2E.findall(descricao) if e2e not in ids)
+        return {
+            'linha': linha,
+            'data': data,
+            'valor': valor,
+            'id_transacao': id_transacao,
+            'descricao': descricao,
+            'chave_pix': (chave_pix or '').strip().lower() or None,
+            'ids': ids
+        }
+
+    @staticmethod
+    def _ler_ofx(texto: str) -> List[Dict]:
+        """Lê blocos STMTTRN de OFX 1.x (SGML) ou 2.x (XML)"""
+        lancamentos = []
+        blocos = re.findall(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', texto,
+                            flags=re.IGNORECASE | re.DOTALL)
+        for numero, bloco in enumerate(blocos, start=1):
+            campos = {
+                tag.upper(): valor.strip()
+                for tag, valor in re.findall(r'<(\w+)>([^<\r\n]*)', bloco)
+            }
+            descricao = ' '.join(filter(None, [campos.get('NAME'), campos.get('MEMO')]))
+            lancamentos.append(ConciliacaoService._lancamento(
+                numero,
+                ConciliacaoService._parse_data(campos.get('DTPOSTED', '')[:8]),
+                ConciliacaoService._parse_valor(campos.get('TRNAMT', '')),
+                campos.get('FITID', ''),
+                descricao
+            ))
+        return lancamentos
+
+    @staticmethod
+    def _ler_csv(texto: str) -> List[Dict]:
+        """Lê CSV com cabeçalho (separador ; ou , detectado automaticamente)"""
+        try:
+            delimitador = csv.Sniffer().sniff(texto[:4096], delimiters=';,\t').delimiter
+        except csv.Error:
+            delimitador = ';'
+        leitor = csv.reader(io.StringIO(texto), delimiter=delimitador)
+
+        cabecalho = next(leitor, None)
+        if not cabecalho:
+            return []
+        indices = {}
+        for posicao, nome in enumerate(cabecalho):
+            nome = _normalizar(nome)
+            for campo, aliases in COLUNAS_CSV.items():
+                if campo not in indices and nome in aliases:
+                    indices[campo] = posicao
+        if 'data' not in indices or 'valor' not in indices:
+            raise ArquivoInvalidoError("CSV sem as colunas obrigatórias 'data' e 'valor'.")
+
+        def coluna(registro, campo):
+            posicao = indices.get(campo)
+            return registro[posicao] if posicao is not None and posicao < len(registro) else ''
+
+        lancamentos = []
+        for numero, registro in enumerate(leitor, start=2):
+            if not any(celula.strip() for celula in registro):
+                continue
+            lancamentos.append(ConciliacaoService._lancamento(
+                numero,
+                ConciliacaoService._parse_data(coluna(registro, 'data')),
+                ConciliacaoService._parse_valor(coluna(registro, 'valor')),
+                coluna(registro, 'id_transacao'),
+                coluna(registro, 'descricao'),
+                coluna(registro, 'chave_pix')
+            ))
+        return lancamentos
+
+    @staticmethod
+    def _parse_data(valor: str) -> Optional[date]:
+        valor = (valor or '').strip()
+        for fmt in ('%d/%m/%Y', '%Y-%m-%d', '%Y%m%d', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y'):
+            try:
+                return datetime.strptime(valor, fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def _parse_valor(valor: str) -> Optional[Decimal]:
+        """Aceita 1.234,56 / 1,234.56 / 1234.56 / -1234,56 / R$ 1.234,56"""
+        valor = re.sub(r'[^\d,.\-+]', '', valor or '')
+        if not valor:
+            return None
+        if ',' in valor and valor.rfind(',') > valor.rfind('.'):
+            valor = valor.replace('.', '').replace(',', '.')
+        else:
+            valor = valor.replace(',', '')
+        try:
+            return Decimal(valor).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            return None
+
+    # ------------------------------------------------------------------
+    # Conciliação
+    # ------------------------------------------------------------------
+    @staticmethod
+    def conciliar(lancamentos: List[Dict], tolerancia_dias: Optional[int] = None) -> Dict:
+        """
+        Concilia lançamentos de crédito do extrato com pagamentos registrados
+
+        1. ID da transação (FITID/identificador ou E2E PIX na descrição) igual
+           ao id_transacao do pagamento;
+        2. Mesmo valor e data do comprovante dentro de ±tolerancia_dias; se o
+           lançamento trouxer chave PIX, ela precisa bater com a do pagamento.
+
+        Cada pagamento é usado no máximo uma vez. Lançamentos com mais de um
+        candidato ficam como ambíguos para conferência manual.
+
+        Args:
+            lancamentos: Saída de ler_extrato
+            tolerancia_dias: Janela de datas (padrão da configuração), limitada
+                a 0..CONCILIACAO_TOLERANCIA_MAXIMA_DIAS
+
+        Returns:
+            Dict: conciliados, nao_conciliados, ambiguos, ignorados e resumo
+        """
+        if tolerancia_dias is None:
+            tolerancia_dias = FinanceiroConfig.get_conciliacao_tolerancia_dias()
+        tolerancia_dias = max(0, min(tolerancia_dias, FinanceiroConfig.get_conciliacao_tolerancia_maxima_dias()))
+
+        creditos, ignorados = [], []
+        for lancamento in lancamentos:
+            credito = lancamento['valor'] is not None and lancamento['valor'] > 0 and lancamento['data']
+            (creditos if credito else ignorados).append(lancamento)
+
+        por_id, por_valor_data = ConciliacaoService._indexar_pagamentos(creditos, tolerancia_dias)
+
+        usados = set()
+        conciliados, nao_conciliados, ambiguos = [], [], []
+        pendentes = []
+
+        # 1ª passada: ID exato
+        for lancamento in creditos:
+            pagamento = next(
+                (por_id[i] for i in lancamento['ids'] if i in por_id and por_id[i]['id'] not in usados),
+                None
+            )
+            if pagamento:
+                usados.add(pagamento['id'])
+                conciliados.append(ConciliacaoService._resultado(lancamento, 'id_transacao', pagamento))
+            else:
+                pendentes.append(lancamento)
+
+        # 2ª passada: valor + data (± tolerância) + chave PIX
+        for lancamento in pendentes:
+            centavos = int(lancamento['valor'] * 100)
+            candidatos = []
+            for deslocamento in range(-tolerancia_dias, tolerancia_dias + 1):
+                chave = (centavos, lancamento['data'] + timedelta(days=deslocamento))
+                for pagamento in por_valor_data.get(chave, ()):
+                    if pagamento['id'] in usados:
+                        continue
+                    if lancamento['chave_pix'] and pagamento['chave_pix'] and lancamento['chave_pix'] != pagamento['chave_pix']:
+                        continue
+                    candidatos.append(pagamento)
+
+            if len(candidatos) == 1:
+                usados.add(candidatos[0]['id'])
+                conciliados.append(ConciliacaoService._resultado(lancamento, 'valor_data', candidatos[0]))
+            elif candidatos:
+                resultado = ConciliacaoService._resultado(lancamento)
+                resultado['candidatos'] = [ConciliacaoService._serializar_pagamento(p) for p in candidatos]
+                ambiguos.append(resultado)
+            else:
+                nao_conciliados.append(ConciliacaoService._resultado(lancamento))
+
+        resumo = {
+            'total_lancamentos': len(lancamentos),
+            'conciliados': len(conciliados),
+            'nao_conciliados': len(nao_conciliados),
+            'ambiguos': len(ambiguos),
+            'ignorados': len(ignorados),
+            'valor_conciliado': round(sum(c['valor'] for c in conciliados), 2)
+        }
+        current_app.logger.info(
+            f"Conciliação bancária: {resumo['conciliados']} conciliados, {resumo['nao_conciliados']} sem par, "
+            f"{resumo['ambiguos']} ambíguos de {resumo['total_lancamentos']} lançamentos"
+        )
+
+        return {
+            'conciliados': conciliados,
+            'nao_conciliados': nao_conciliados,
+            'ambiguos': ambiguos,
+            'ignorados': [ConciliacaoService._resultado(lancamento) for lancamento in ignorados],
+            'resumo': resumo
+        }
+
+    @staticmethod
+    def conciliar_arquivo(conteudo: bytes, nome_arquivo: str,
+                          tolerancia_dias: Optional[int] = None) -> Tuple[bool, str, Optional[Dict]]:
+        """
+        Lê o extrato e concilia
+
+        Returns:
+            Tuple[bool, str, Optional[Dict]]: (sucesso, mensagem, resultado)
+        """
+        try:
+            lancamentos = ConciliacaoService.ler_extrato(conteudo, nome_arquivo)
+            resultado = ConciliacaoService.conciliar(lancamentos, tolerancia_dias)
+            resumo = resultado['resumo']
+            mensagem = (f"{resumo['conciliados']} lançamentos conciliados, {resumo['nao_conciliados']} sem pagamento "
+                        f"correspondente e {resumo['ambiguos']} ambíguos.")
+            return True, mensagem, resultado
+        except ArquivoInvalidoError as e:
+            return False, str(e), None
+        except Exception as e:
+            current_app.logger.error(f"Erro na conciliação bancária: {str(e)}")
+            return False, "Erro interno ao conciliar extrato.", None
+
+    @staticmethod
+    def _indexar_pagamentos(creditos: List[Dict], tolerancia_dias: int) -> Tuple[Dict, Dict]:
+        """
+        Carrega só os pagamentos que podem casar e monta os índices
+
+        Returns:
+            Tuple[Dict, Dict]: ({id_transacao: pagamento}, {(centavos, data): [pagamentos]})
+        """
+        por_id, por_valor_data = {}, defaultdict(list)
+        if not creditos:
+            return por_id, por_valor_data
+
+        vistos = set()
+        colunas = (Pagamento.id, Pagamento.pedido_id, Pagamento.valor, Pagamento.id_transacao,
+                   Pagamento.data_comprovante, Pagamento.data_pagamento, Pagamento.chave_pix_recebedor)
+
+        def registrar(linhas: Iterable):
+            for pagamento_id, pedido_id, valor, id_transacao, data_comprovante, data_pagamento, chave_pix in linhas:
+                data_ref = data_comprovante or (data_pagamento.date() if data_pagamento else None)
+                pagamento = {
+                    'id': pagamento_id,
+                    'pedido_id': pedido_id,
+                    'valor': Decimal(str(valor)),
+                    'id_transacao': id_transacao,
+                    'data': data_ref,
+                    'chave_pix': (chave_pix or '').strip().lower() or None
+                }
+                if id_transacao:
+                    por_id[id_transacao] = pagamento
+                if data_ref is not None and (pagamento_id, data_ref) not in vistos:
+                    vistos.add((pagamento_id, data_ref))
+                    por_valor_data[(int(pagamento['valor'] * 100), data_ref)].append(pagamento)
+
+        ids = sorted({i for lancamento in creditos for i in lancamento['ids']})
+        for inicio in range(0, len(ids), LOTE_IDS):
+            registrar(db.session.query(*colunas).filter(
+                Pagamento.id_transacao.in_(ids[inicio:inicio + LOTE_IDS])
+            ).all())
+
+        datas = [lancamento['data'] for lancamento in creditos]
+        data_inicio = min(datas) - timedelta(days=tolerancia_dias)
+        data_fim = max(datas) + timedelta(days=tolerancia_dias)
+        registrar(db.session.query(*colunas).filter(or_(
+            Pagamento.data_comprovante.between(data_inicio, data_fim),
+            and_(
+                Pagamento.data_comprovante.is_(None),
+                Pagamento.data_pagamento >= datetime.combine(data_inicio, datetime.min.time()),
+                Pagamento.data_pagamento < datetime.combine(data_fim + timedelta(days=1), datetime.min.time())
+            )
+        )).all())
+
+        return por_id, por_valor_data
+
+    @staticmethod
+    def _serializar_pagamento(pagamento: Dict) -> Dict:
+        return {
+            'pagamento_id': pagamento['id'],
+            'pedido_id': pagamento['pedido_id'],
+            'valor': float(pagamento['valor']),
+            'data': pagamento['data'].isoformat() if pagamento['data'] else None,
+            'id_transacao': pagamento['id_transacao']
+        }
+
+    @staticmethod
+    def _resultado(lancamento: Dict, criterio: Optional[str] = None, pagamento: Optional[Dict] = None) -> Dict:
+        resultado = {
+            'linha': lancamento['linha'],
+            'data': lancamento['data'].isoformat() if lancamento['data'] else None,
+            'valor': float(lancamento['valor']) if lancamento['valor'] is not None else None,
+            'id_transacao': lancamento['id_transacao'],
+            'descricao': lancamento['descricao']
+        }
+        if pagamento:
+            resultado['criterio'] = criterio
+            resultado['pagamento'] = ConciliacaoService._serializar_pagamento(pagamento)
+        return resultado
@@ -11,18 +11,56 @@ class FinanceiroConfig:
     # Configurações de upload de recibos
     UPLOAD_RECIBOS_DIR = 'uploads/recibos_pagamento'
     UPLOAD_TEMP_DIR = 'uploads/temp_recibos'
+    UPLOAD_MINIATURAS_DIR = 'uploads/miniaturas_recibos'
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.pdf', '.doc', '.docx'}
     
+    # Galeria de comprovantes: clientes por página e maior lado da miniatura (px)
+    COMPROVANTES_POR_PAGINA = 20
+    MINIATURA_TAMANHO = 320
+    
     # Configurações de OCR - Google Vision
     OCR_CACHE_ENABLED = True
-    OCR_CACHE_DIR = 'uploads/temp_recibos/.ocr_cache'
+    OCR_CACHE_DIR = 'uploads/.ocr_cache'
+    OCR_CACHE_MAX_MB = 200
+    OCR_CACHE_MAX_ENTRADAS = 20000
+    OCR_CACHE_REDIS_TTL = 30 * 24 * 3600  # 30 dias
+    
+    # Comprovantes quase idênticos: distância de Hamming máxima entre dHashes (0 a 64; < 0 desliga)
+    OCR_PHASH_DISTANCIA_MAXIMA = 6
     OCR_OPERATION_TIMEOUT = 120
     OCR_MAX_PDF_SIZE = 10 * 1024 * 1024  # 10MB
+    # OCR em lote: imagens por chamada batch_annotate_images (máximo do Vision: 16)
+    OCR_BATCH_SIZE = 16
+    OCR_BATCH_MAX_BYTES = 8 * 1024 * 1024  # payload por chamada
+    OCR_LOTE_MAX_ARQUIVOS = 50  # arquivos por upload múltiplo
+    # PDFs com camada de texto (gerados pelo app do banco) são lidos localmente, sem Vision
+    OCR_PDF_TEXTO_MINIMO = 30  # caracteres alfanuméricos para considerar o texto utilizável
+    OCR_PDF_TEXTO_PAGINAS = 3
+    # Pré-processamento das imagens antes do Vision (EXIF, redução, tons de cinza, JPEG)
+    OCR_PREPROCESSAMENTO = True
+    OCR_IMAGEM_LADO_MAXIMO = 1600  # px; o Vision recomenda ao menos 1024x768 para texto
+    OCR_IMAGEM_QUALIDADE = 85
+    OCR_PREPROCESSAMENTO_THREADS = 4
+    # Resultado do OCR assíncrono do formulário: espera máxima (s) de cada consulta com ?espera=;
+    # curta porque prende um worker síncrono do gunicorn (sem ?espera= a consulta não espera)
+    OCR_LONG_POLL_SEGUNDOS = 2
+    # Modelos de extração por banco/app (um JSON por layout); None = layouts_recibo/ do módulo
+    OCR_LAYOUTS_DIR = None
+    
+    # Motores de OCR: nomes em ordem de failover (vision, tesseract, falso)
+    OCR_BACKEND = 'vision'
+    OCR_BACKEND_ROTAS = {}  # endpoint -> cadeia, ex.: {'leitura_notas.index': 'vision,tesseract'}
+    OCR_TESSERACT_IDIOMA = 'por'
+    OCR_TESSERACT_PROCESSOS = 2
+    OCR_TESSERACT_DPI = 300  # renderização de PDFs digitalizados
+    OCR_FALSO_LATENCIA_MS = 0
+    OCR_FALSO_INICIALIZACAO_MS = 0  # simula credenciais/canal do cliente, uma vez por processo
     
     # Configurações de quota OCR
     OCR_ENFORCE_LIMIT = True
     OCR_MONTHLY_LIMIT = 1000
+    OCR_QUOTA_SINCRONIZAR_SEGUNDOS = 60  # contador do Redis -> tabela OcrQuota
     
     # Configurações Google Vision
     GOOGLE_VISION_CREDENTIALS_PATH = '/Users/ericobrandao/keys/gvision-credentials.json'
@@ -32,6 +70,14 @@ class FinanceiroConfig:
     GOOGLE_VISION_OUTPUT_BUCKET = 'sap-ocr-output'
     GOOGLE_VISION_OUTPUT_PREFIX = 'financeiro/ocr/output'
     
+    # Conciliação bancária: janela (em dias) entre lançamento e data do comprovante
+    CONCILIACAO_TOLERANCIA_DIAS = 2
+    CONCILIACAO_TOLERANCIA_MAXIMA_DIAS = 30
+    
+    # Registro de pagamentos em lote: pagamentos por commit (0 = tudo numa transação)
+    PAGAMENTO_LOTE_TAMANHO = 0
+    PAGAMENTO_LOTE_MAXIMO = 1000
+    
     # Configurações de validação
     PIX_REQUIRES_RECEIPT = False
     MIN_PAYMENT_VALUE = 0.01
@@ -52,7 +98,7 @@ class FinanceiroConfig:
         Obtém o diretório de upload baseado no tipo
         
         Args:
-            upload_type: Tipo de upload ('recibos' ou 'temp')
+            upload_type: Tipo de upload ('recibos', 'temp', 'miniaturas' ou 'ocr_cache')
             
         Returns:
             str: Caminho completo do diretório
@@ -62,6 +108,10 @@ class FinanceiroConfig:
             upload_dir = os.path.join(base_dir, '..', cls.UPLOAD_RECIBOS_DIR)
         elif upload_type == 'temp':
             upload_dir = os.path.join(base_dir, '..', cls.UPLOAD_TEMP_DIR)
+        elif upload_type == 'miniaturas':
+            upload_dir = os.path.join(base_dir, '..', cls.UPLOAD_MINIATURAS_DIR)
+        elif upload_type == 'ocr_cache':
+            upload_dir = os.path.join(base_dir, '..', cls.OCR_CACHE_DIR)
         else:
             raise ValueError(f"Tipo de upload inválido: {upload_type}")
         
@@ -79,11 +129,36 @@ class FinanceiroConfig:
         """Retorna as extensões permitidas"""
         return cls.ALLOWED_EXTENSIONS
     
+    @classmethod
+    def get_miniatura_tamanho(cls) -> int:
+        """Retorna o maior lado (px) das miniaturas de comprovantes"""
+        return int(os.getenv('FINANCEIRO_MINIATURA_TAMANHO', cls.MINIATURA_TAMANHO))
+    
     @classmethod
     def get_max_pdf_size(cls) -> int:
         """Retorna o tamanho máximo do PDF aceito antes do envio ao Vision"""
         return int(os.getenv('FINANCEIRO_MAX_PDF_SIZE', cls.OCR_MAX_PDF_SIZE))
     
+    @classmethod
+    def get_conciliacao_tolerancia_dias(cls) -> int:
+        """Retorna a tolerância de datas usada na conciliação bancária"""
+        return int(os.getenv('FINANCEIRO_CONCILIACAO_TOLERANCIA_DIAS', cls.CONCILIACAO_TOLERANCIA_DIAS))
+    
+    @classmethod
+    def get_conciliacao_tolerancia_maxima_dias(cls) -> int:
+        """Retorna a maior tolerância de datas aceita na conciliação (cada dia é uma busca por lançamento)"""
+        return int(os.getenv('FINANCEIRO_CONCILIACAO_TOLERANCIA_MAXIMA_DIAS', cls.CONCILIACAO_TOLERANCIA_MAXIMA_DIAS))
+    
+    @classmethod
+    def get_pagamento_lote_tamanho(cls) -> int:
+        """Retorna quantos pagamentos do lote vão em cada commit (0 = todos)"""
+        return int(os.getenv('FINANCEIRO_PAGAMENTO_LOTE_TAMANHO', cls.PAGAMENTO_LOTE_TAMANHO))
+    
+    @classmethod
+    def get_pagamento_lote_maximo(cls) -> int:
+        """Retorna o máximo de pagamentos aceitos numa requisição em lote"""
+        return int(os.getenv('FINANCEIRO_PAGAMENTO_LOTE_MAXIMO', cls.PAGAMENTO_LOTE_MAXIMO))
+    
     @classmethod
     def is_pix_payment_requiring_receipt(cls) -> bool:
         """Verifica se pagamentos PIX requerem comprovante"""
@@ -99,11 +174,140 @@ class FinanceiroConfig:
         """Retorna o limite mensal de OCR"""
         return cls.OCR_MONTHLY_LIMIT
     
+    @classmethod
+    def get_ocr_quota_sincronizar_segundos(cls) -> float:
+        """Retorna o intervalo de gravação em OcrQuota do contador de quota mantido no Redis"""
+        return float(os.getenv('FINANCEIRO_OCR_QUOTA_SINCRONIZAR_SEGUNDOS', cls.OCR_QUOTA_SINCRONIZAR_SEGUNDOS))
+    
     @classmethod
     def get_ocr_operation_timeout(cls) -> int:
         """Retorna timeout máximo (segundos) para operação assíncrona do Vision"""
         return int(os.getenv('FINANCEIRO_OCR_TIMEOUT', cls.OCR_OPERATION_TIMEOUT))
     
+    @classmethod
+    def get_ocr_batch_size(cls) -> int:
+        """Retorna quantas imagens vão em cada chamada em lote ao Vision (1 a 16)"""
+        return max(1, min(16, int(os.getenv('FINANCEIRO_OCR_BATCH_SIZE', cls.OCR_BATCH_SIZE))))
+    
+    @classmethod
+    def get_ocr_batch_max_bytes(cls) -> int:
+        """Retorna o tamanho máximo (bytes) das imagens somadas numa chamada em lote"""
+        return int(os.getenv('FINANCEIRO_OCR_BATCH_MAX_BYTES', cls.OCR_BATCH_MAX_BYTES))
+    
+    @classmethod
+    def get_ocr_lote_max_arquivos(cls) -> int:
+        """Retorna o máximo de arquivos aceitos num upload múltiplo para OCR"""
+        return int(os.getenv('FINANCEIRO_OCR_LOTE_MAX_ARQUIVOS', cls.OCR_LOTE_MAX_ARQUIVOS))
+    
+    @classmethod
+    def get_ocr_pdf_texto_minimo(cls) -> int:
+        """Retorna o mínimo de caracteres alfanuméricos para usar a camada de texto do PDF"""
+        return int(os.getenv('FINANCEIRO_OCR_PDF_TEXTO_MINIMO', cls.OCR_PDF_TEXTO_MINIMO))
+    
+    @classmethod
+    def get_ocr_pdf_texto_paginas(cls) -> int:
+        """Retorna quantas páginas do PDF são lidas na extração local de texto"""
+        return int(os.getenv('FINANCEIRO_OCR_PDF_TEXTO_PAGINAS', cls.OCR_PDF_TEXTO_PAGINAS))
+    
+    @classmethod
+    def ocr_preprocessamento_habilitado(cls) -> bool:
+        """Verifica se as imagens são pré-processadas antes do envio ao Vision"""
+        return os.getenv('FINANCEIRO_OCR_PREPROCESSAMENTO', str(cls.OCR_PREPROCESSAMENTO)).lower() in ('1', 'true', 'sim')
+    
+    @classmethod
+    def get_ocr_imagem_lado_maximo(cls) -> int:
+        """Retorna o maior lado (px) das imagens enviadas ao Vision"""
+        return int(os.getenv('FINANCEIRO_OCR_IMAGEM_LADO_MAXIMO', cls.OCR_IMAGEM_LADO_MAXIMO))
+    
+    @classmethod
+    def get_ocr_imagem_qualidade(cls) -> int:
+        """Retorna a qualidade do JPEG enviado ao Vision"""
+        return int(os.getenv('FINANCEIRO_OCR_IMAGEM_QUALIDADE', cls.OCR_IMAGEM_QUALIDADE))
+    
+    @classmethod
+    def get_ocr_preprocessamento_threads(cls) -> int:
+        """Retorna quantas imagens são pré-processadas em paralelo"""
+        return int(os.getenv('FINANCEIRO_OCR_PREPROCESSAMENTO_THREADS', cls.OCR_PREPROCESSAMENTO_THREADS))
+    
+    @classmethod
+    def get_ocr_long_poll_segundos(cls) -> float:
+        """Retorna a espera máxima (segundos) de cada consulta ao resultado do OCR assíncrono"""
+        return float(os.getenv('FINANCEIRO_OCR_LONG_POLL_SEGUNDOS', cls.OCR_LONG_POLL_SEGUNDOS))
+    
+    @classmethod
+    def get_ocr_backend(cls, rota: str = None) -> str:
+        """Retorna a cadeia de motores de OCR da rota (endpoint), nomes separados por vírgula"""
+        rotas = cls.get_ocr_backend_rotas()
+        if rota in rotas:
+            return rotas[rota]
+        return os.getenv('FINANCEIRO_OCR_BACKEND', cls.OCR_BACKEND)
+    
+    @classmethod
+    def get_ocr_backend_rotas(cls) -> dict:
+        """
+        Retorna as cadeias de motores de OCR por endpoint
+        
+        FINANCEIRO_OCR_BACKEND_ROTAS sobrepõe OCR_BACKEND_ROTAS no formato
+        'endpoint=motores;endpoint=motores'; rotas sem entrada usam FINANCEIRO_OCR_BACKEND.
+        """
+        rotas = dict(cls.OCR_BACKEND_ROTAS)
+        for item in os.getenv('FINANCEIRO_OCR_BACKEND_ROTAS', '').split(';'):
+            if '=' in item:
+                endpoint, cadeia = item.split('=', 1)
+                rotas[endpoint.strip()] = cadeia.strip()
+        return rotas
+    
+    @classmethod
+    def get_ocr_tesseract_idioma(cls) -> str:
+        """Retorna os idiomas do Tesseract (ex.: 'por', 'por+eng')"""
+        return os.getenv('FINANCEIRO_OCR_TESSERACT_IDIOMA', cls.OCR_TESSERACT_IDIOMA)
+    
+    @classmethod
+    def get_ocr_tesseract_processos(cls) -> int:
+        """Retorna o tamanho do pool de processos do Tesseract"""
+        return int(os.getenv('FINANCEIRO_OCR_TESSERACT_PROCESSOS', cls.OCR_TESSERACT_PROCESSOS))
+    
+    @classmethod
+    def get_ocr_tesseract_dpi(cls) -> int:
+        """Retorna a resolução de renderização de PDFs digitalizados para o Tesseract"""
+        return int(os.getenv('FINANCEIRO_OCR_TESSERACT_DPI', cls.OCR_TESSERACT_DPI))
+    
+    @classmethod
+    def get_ocr_falso_latencia(cls) -> float:
+        """Retorna a latência simulada por chamada do motor de OCR falso, em segundos"""
+        return int(os.getenv('FINANCEIRO_OCR_FALSO_LATENCIA_MS', cls.OCR_FALSO_LATENCIA_MS)) / 1000
+    
+    @classmethod
+    def get_ocr_falso_inicializacao(cls) -> float:
+        """Retorna o custo simulado de inicializar o cliente do motor de OCR falso, em segundos"""
+        return int(os.getenv('FINANCEIRO_OCR_FALSO_INICIALIZACAO_MS', cls.OCR_FALSO_INICIALIZACAO_MS)) / 1000
+    
+    @classmethod
+    def get_ocr_cache_max_bytes(cls) -> int:
+        """Retorna o tamanho máximo (bytes) do cache de OCR em disco"""
+        return int(os.getenv('FINANCEIRO_OCR_CACHE_MAX_MB', cls.OCR_CACHE_MAX_MB)) * 1024 * 1024
+    
+    @classmethod
+    def get_ocr_cache_max_entradas(cls) -> int:
+        """Retorna o número máximo de resultados no cache de OCR em disco"""
+        return int(os.getenv('FINANCEIRO_OCR_CACHE_MAX_ENTRADAS', cls.OCR_CACHE_MAX_ENTRADAS))
+    
+    @classmethod
+    def get_ocr_cache_redis_ttl(cls) -> int:
+        """Retorna o TTL (segundos) dos resultados de OCR no Redis"""
+        return int(os.getenv('FINANCEIRO_OCR_CACHE_REDIS_TTL', cls.OCR_CACHE_REDIS_TTL))
+    
+    @classmethod
+    def get_ocr_phash_distancia_maxima(cls) -> int:
+        """Retorna a distância máxima entre hashes perceptuais para considerar o comprovante repetido"""
+        return int(os.getenv('FINANCEIRO_OCR_PHASH_DISTANCIA', cls.OCR_PHASH_DISTANCIA_MAXIMA))
+    
+    @classmethod
+    def get_ocr_layouts_dir(cls) -> str:
+        """Retorna o diretório com os modelos de extração de comprovantes por banco"""
+        diretorio = os.getenv('FINANCEIRO_OCR_LAYOUTS_DIR', cls.OCR_LAYOUTS_DIR)
+        return diretorio or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts_recibo')
+    
     @classmethod
     def validar_recebedor_habilitado(cls) -> bool:
         """Verifica se validação de recebedor está habilitada"""
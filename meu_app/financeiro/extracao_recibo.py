@@ -0,0 +1,416 @@
+"""
+Extração dos campos de comprovantes a partir do texto reconhecido pelo OCR
+
+O texto é normalizado uma única vez (sem acentos, maiúsculo, linhas aparadas e
+sem linhas vazias) e percorrido por uma única expressão compilada na importação,
+cujas alternativas nomeadas são os tokens do comprovante: rótulos seguidos de
+valor, ID ou data, chaves PIX, documentos, datas e números soltos. Cada token
+alimenta o campo correspondente durante a mesma varredura; ao final, cada campo
+é resolvido por prioridade:
+
+- valor: linhas com "VALOR TOTAL"/"TOTAL DA NOTA"... (e vizinhas) > valor da
+  transação/transferido/líquido > maior valor rotulado > maior número do texto
+- ID: rótulos explícitos, na ordem de _PRIORIDADE_ID > UUID > ID PIX fim a fim
+  (E/D + dígitos, o mais longo) > código após TRANSACAO/PIX... > código longo
+- data: data do pagamento/transação > "DATA:" > primeira data > data por extenso
+- dados bancários: primeiro banco, agência, conta e nome rotulados; chave PIX e
+  CNPJ preferindo os da empresa
+"""
+import re
+import unicodedata
+from bisect import bisect_right
+from typing import Dict, List, Optional, Union
+
+# Chave PIX e CNPJ da empresa (Grupo Sertão), preferidos quando há vários no texto
+PIX_EMPRESA = 'pix@gruposertao.com'
+CNPJ_EMPRESA = '30080209000416'
+
+_COMBINANTES = re.compile('[\u0300-\u036f]')
+_NAO_DIGITOS = re.compile(r'\D')
+
+_DECIMAL = r'\d+(?:[., ]\d{3})*[.,]\d{2}(?!\d)'
+_MILHAR = r'\d{1,3}(?:[. ]\d{3})+(?![,\d])'
+_DATA = r'\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}(?!\d)'
+_DATA_EXTENSO = r'\d{1,2}\s+DE\s+[A-Z]+\s+DE\s+\d{4}'
+_UUID = r'[A-F0-9]{8}-[A-F0-9]{4}-[A-F0-9]{4}-[A-F0-9]{4}-[A-F0-9]{12}'
+_CPF = r'\d{3}\.\d{3}\.\d{3}-\d{2}'
+_CNPJ = r'(?<!\d)\d{2}\.?\d{3}\.?\d{3}[/\-]?\d{3,4}[/\-]?\d{2}(?!\d)'
+_E2E = r'\b[ED]\d{25,40}\b'
+# Códigos não podem ser o início de um e-mail
+_NAO_EMAIL = r'(?![A-Z0-9._%+-]*@)'
+_SEP = r'\s*[:\-]?\s*'
+
+_ROTULOS_ID = (
+    r'NUMERO\s+DA\s+TRANSACAO|NUMERO\s+TRANSACAO|ID\s+DA\s+TRANSACAO|ID\s+TRANSACAO|IDENTIFICACAO'
+    r'|CODIGO\s+DA\s+TRANSACAO|CODIGO\s+TRANSACAO|ID\s+PAGAMENTO|PAGAMENTO\s+ID|ID\s+PIX'
+    r'|CODIGO\s+DA\s+OPERACAO|COD\.\s+OPERACAO|NUMERO\s+DA\s+OPERACAO|N\.\s+OPERACAO|OPERACAO'
+    r'|N\.\s+DOCUMENTO|NUMERO\s+DOCUMENTO|DOCUMENTO|NOSSO\s+NUMERO|NOSSO\s+NUM'
+    r'|PROTOCOLO|AUTENTICACAO|COMPROVACAO|COMPROVANTE'
+)
+_BANCOS = (
+    r'\b(?:BANCO\s+DO\s+BRASIL|BB|CAIXA\s+ECONOMICA|ITAU|BRADESCO|SANTANDER|NUBANK|INTER|SICOOB|SICREDI)\b'
+)
+_PALAVRAS_TOTAL = (
+    r'VALOR\s+TOTAL|TOTAL\s+DA\s+NOTA|VALOR\s+DA\s+NOTA|TOTAL\s+NF|TOTAL\s+R\$|TOTAL\s+GERAL'
+)
+
+# Alternativas na ordem de preferência quando duas começam na mesma posição. Exceto
+# o telefone (+55...), todo token começa no início de uma palavra, o que descarta
+# de uma vez as demais posições do texto; depois, os tokens que começam por letra
+# e os que começam por dígito ficam em ramos separados
+_TOKENS = re.compile(
+    rf"""
+    (?P<telefone>\+55\s?\d{{2}}\s?\d{{4,5}}[/\-]?\d{{4}})
+    |\b(?:
+        (?P<email>(?<![.%+-])[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{{2,}})
+        |(?P<uuid>{_UUID})
+        |(?P<e2e>{_E2E})
+        |(?P<codigo>[A-Z0-9]{{20,50}}\b)
+        |(?=[A-Z])(?:
+            (?P<dados>DADOS\s+DA\s+TRANSACAO)
+            |(?P<total>{_PALAVRAS_TOTAL})
+            |(?P<valor_rotulado>(?P<rotulo_valor>(?:VALOR|TOTAL)(?:\s+[A-Z]+){{0,2}}|TRANSFERIDO|PAGOU?)
+                {_SEP}R?\$?\s*(?P<valor>(?P<valor_decimal>{_DECIMAL})|{_MILHAR}))
+            |(?P<data_rotulada>(?P<rotulo_data>DATA(?:\s+D[AOE]\s+[A-Z]+)?){_SEP}
+                (?P<data_valor>{_DATA}|(?P<data_valor_extenso>{_DATA_EXTENSO})))
+            |(?P<id_rotulado>(?P<rotulo_id>{_ROTULOS_ID}){_SEP}(?P<id>{_UUID}|[A-Z0-9]{{8,50}}{_NAO_EMAIL}))
+            |(?P<id_contexto>(?:TRANSACAO|PAGAMENTO|PIX|TRANSFERENCIA){_SEP}
+                (?P<codigo_contexto>[A-Z0-9]{{15,50}}{_NAO_EMAIL}))
+            |(?P<nome_rotulado>(?:PARA|RECEBEDOR|FAVORECIDO|BENEFICIARIO|DESTINATARIO|DESTINO)
+                {_SEP}(?:NOME{_SEP})?(?P<nome>[A-Z][A-Z &]{{3,50}}))
+            |(?P<banco>{_BANCOS})
+            |(?P<banco_generico>BANCO[ ]+[A-Z ]+)
+            |(?P<agencia>(?:AGENCIA|AG\b\.?){_SEP}(?P<num_agencia>\d{{4,5}}))
+            |(?P<conta>(?:CONTA(?:\s+CORRENTE|\s+POUPANCA)?|CC\b){_SEP}
+                (?P<num_conta>\d{{1,3}}(?:\.\d{{3}})+|\d{{5,15}}))
+        )
+        |(?=\d)(?:
+            (?P<data>{_DATA})
+            |(?P<data_extenso>{_DATA_EXTENSO})
+            |(?P<cpf>{_CPF})
+            |(?P<cnpj>{_CNPJ})
+            |(?P<agencia_antes>(?P<num_agencia_antes>\d{{4,5}})[ ]*(?:AGENCIA|AG\b))
+            |(?P<conta_antes>(?P<num_conta_antes>\d{{5,15}})[ ]*(?:CONTA|CC\b))
+            |(?P<numero>(?P<decimal>{_DECIMAL})|(?P<milhar>{_MILHAR})|\d{{5,}})
+        )
+    )""",
+    re.VERBOSE
+)
+
+# Números de uma linha próxima de "VALOR TOTAL": datas e documentos não contam
+_NUMEROS_LINHA = re.compile(
+    rf'{_DATA}|{_CPF}|{_CNPJ}|(?P<decimal>{_DECIMAL})|(?P<milhar>{_MILHAR})|(?P<simples>\d{{5,}})'
+)
+_E2E_COMPLETO = re.compile(_E2E)
+_BANCO_NOMEADO = re.compile(_BANCOS)
+
+_PRIORIDADE_VALOR = {
+    'VALOR DA TRANSACAO': 0,
+    'VALOR TRANSFERIDO': 1, 'VALOR DO PAGAMENTO': 1, 'VALOR DO PIX': 1,
+    'VALOR LIQUIDO': 2, 'TOTAL LIQUIDO': 2,
+}
+_PRIORIDADE_ID = {
+    'NUMERO DA TRANSACAO': 0, 'NUMERO TRANSACAO': 0,
+    'ID DA TRANSACAO': 1, 'ID TRANSACAO': 1, 'IDENTIFICACAO': 1,
+    'CODIGO DA TRANSACAO': 2, 'CODIGO TRANSACAO': 2,
+    'ID PAGAMENTO': 3, 'PAGAMENTO ID': 3, 'ID PIX': 3,
+    'CODIGO DA OPERACAO': 4, 'COD. OPERACAO': 4, 'OPERACAO': 4,
+    'NUMERO DA OPERACAO': 5, 'N. OPERACAO': 5,
+    'N. DOCUMENTO': 6, 'NUMERO DOCUMENTO': 6, 'DOCUMENTO': 6,
+    'NOSSO NUMERO': 7, 'NOSSO NUM': 7,
+    'PROTOCOLO': 8, 'AUTENTICACAO': 8,
+    'COMPROVACAO': 9, 'COMPROVANTE': 9,
+}
+_PRIORIDADE_UUID = len(set(_PRIORIDADE_ID.values()))
+_PRIORIDADE_DATA = {
+    'DATA DA TRANSACAO': 0, 'DATA DO PAGAMENTO': 0, 'DATA DA TRANSFERENCIA': 0,
+    'DATA': 1,
+}
+_PRIORIDADE_DATA_SOLTA = 2
+_PRIORIDADE_DATA_EXTENSO = 3
+# Distância máxima entre "DADOS DA TRANSACAO" e o "VALOR" que a segue
+_JANELA_DADOS = 100
+# Valores abaixo disso (tarifas, centavos) só valem se não houver outro
+_VALOR_MINIMO = 5.0
+
+
+def converter_valor(valor: str) -> float:
+    """Converte string de valor monetário (1.234,56 ou 1,234.56) para float"""
+    valor = valor.replace(' ', '')
+    valor = valor.replace('O', '0').replace('o', '0')
+    if '.' in valor and ',' in valor:
+        if valor.rfind('.') > valor.rfind(','):
+            # Formato americano: 1,234.56
+            return float(valor.replace(',', ''))
+        # Formato brasileiro: 1.234,56
+        return float(valor.replace('.', '').replace(',', '.'))
+    # Apenas vírgula ou ponto
+    return float(valor.replace(',', '.'))
+
+
+def _converter_milhar(valor: str) -> float:
+    """Valor sem centavos com separador de milhar (25.000)"""
+    return float(valor.replace('.', '').replace(' ', ''))
+
+
+def normalizar(texto: str) -> str:
+    """Texto sem acentos e em maiúsculas (mantém o comprimento de letras acentuadas)"""
+    if not texto.isascii():
+        texto = _COMBINANTES.sub('', unicodedata.normalize('NFKD', texto))
+    return texto.upper()
+
+
+def _rotulo(texto: str) -> str:
+    return ' '.join(texto.split())
+
+
+class TextoRecibo:
+    """Texto do comprovante normalizado uma vez, com o início de cada linha"""
+
+    __slots__ = ('original', 'texto', 'linhas', 'inicios')
+
+    def __init__(self, texto: str):
+        linhas = []
+        for linha in texto.replace('\u00a0', ' ').replace('\t', ' ').splitlines():
+            linha = linha.strip()
+            if linha:
+                linhas.append(linha)
+        self.original = '\n'.join(linhas)
+        self.texto = normalizar(self.original)
+        self.linhas = self.texto.split('\n')
+        self.inicios = []
+        posicao = 0
+        for linha in self.linhas:
+            self.inicios.append(posicao)
+            posicao += len(linha) + 1
+
+    def linha_de(self, posicao: int) -> int:
+        """Índice da linha que contém a posição do texto normalizado"""
+        return bisect_right(self.inicios, posicao) - 1
+
+    def trecho_original(self, inicio: int, fim: int) -> Optional[str]:
+        """Trecho com a grafia original, quando a normalização preservou as posições"""
+        if len(self.original) != len(self.texto):
+            return None
+        return self.original[inicio:fim]
+
+
+def _valores_da_linha(linha: str) -> List[float]:
+    # Corrige trocas comuns do OCR (O por 0, L por 1) antes de ler os números
+    linha = linha.replace('O', '0').replace('L', '1')
+    valores = []
+    for m in _NUMEROS_LINHA.finditer(linha):
+        if m.group('decimal'):
+            valores.append(converter_valor(m.group('decimal')))
+        elif m.group('milhar'):
+            valores.append(_converter_milhar(m.group('milhar')))
+        elif m.group('simples'):
+            valores.append(float(m.group('simples')))
+    return valores
+
+
+def _maior_valor(valores: List[float]) -> Optional[float]:
+    valores = [v for v in valores if v > 0]
+    if not valores:
+        return None
+    relevantes = [v for v in valores if v >= _VALOR_MINIMO]
+    return max(relevantes or valores)
+
+
+class ExtratorRecibo:
+    """Extrai valor, ID da transação, data e dados bancários numa única varredura"""
+
+    @staticmethod
+    def extrair(texto: Union[str, TextoRecibo]) -> Dict:
+        """
+        Extrai os campos do comprovante
+
+        Args:
+            texto: Texto reconhecido pelo OCR (ou já normalizado em TextoRecibo)
+
+        Returns:
+            Dict: amount, transaction_id, date e bank_info (mesmas chaves de
+            VisionOcrService._find_bank_info_in_text)
+        """
+        recibo = texto if isinstance(texto, TextoRecibo) else TextoRecibo(texto or '')
+
+        linhas_total = set()
+        valor_prioritario, prioridade_valor = None, len(_PRIORIDADE_VALOR)
+        valores_rotulados: List[float] = []
+        valores_soltos: List[float] = []
+        fim_dados = None
+
+        id_rotulado, prioridade_id = None, _PRIORIDADE_UUID + 1
+        ids_e2e: List[str] = []
+        id_contexto = None
+        id_generico = None
+
+        data, prioridade_data = None, _PRIORIDADE_DATA_EXTENSO + 1
+
+        banco, prioridade_banco = None, 2
+        agencia, prioridade_agencia = None, 2
+        conta, prioridade_conta = None, 2
+        nome = None
+        emails: List[str] = []
+        telefones: List[str] = []
+        uuids: List[str] = []
+        cnpj = None
+
+        for m in _TOKENS.finditer(recibo.texto):
+            tipo = m.lastgroup
+
+            if tipo == 'numero':
+                if m.group('decimal'):
+                    valores_soltos.append(converter_valor(m.group('decimal')))
+                elif m.group('milhar'):
+                    valores_soltos.append(_converter_milhar(m.group('milhar')))
+                else:
+                    valores_soltos.append(float(m.group()))
+
+            elif tipo == 'valor_rotulado':
+                rotulo = _rotulo(m.group('rotulo_valor'))
+                if m.group('valor_decimal'):
+                    valor = converter_valor(m.group('valor_decimal'))
+                else:
+                    valor = _converter_milhar(m.group('valor'))
+                prioridade = _PRIORIDADE_VALOR.get(rotulo)
+                if fim_dados is not None and rotulo.startswith('VALOR') and m.start() - fim_dados <= _JANELA_DADOS:
+                    prioridade = 0
+                if prioridade is not None:
+                    if prioridade < prioridade_valor:
+                        valor_prioritario, prioridade_valor = valor, prioridade
+                else:
+                    valores_rotulados.append(valor)
+
+            elif tipo == 'total':
+                linha = recibo.linha_de(m.start())
+                linhas_total.update((linha - 1, linha, linha + 1))
+
+            elif tipo == 'dados':
+                fim_dados = m.end()
+
+            elif tipo == 'id_rotulado':
+                candidato = m.group('id')
+                prioridade = _PRIORIDADE_ID[_rotulo(m.group('rotulo_id'))]
+                if prioridade == _PRIORIDADE_ID['COMPROVANTE'] and len(candidato) < 15:
+                    continue
+                if '-' in candidato:
+                    uuids.append(recibo.trecho_original(m.start('id'), m.end('id')) or candidato.lower())
+                # Palavras após o rótulo ("DOCUMENTO AUXILIAR...") não são IDs
+                if prioridade < prioridade_id and any(c.isdigit() for c in candidato):
+                    id_rotulado, prioridade_id = candidato, prioridade
+
+            elif tipo == 'uuid':
+                uuids.append(recibo.trecho_original(m.start(), m.end()) or m.group().lower())
+                if _PRIORIDADE_UUID < prioridade_id:
+                    id_rotulado, prioridade_id = m.group(), _PRIORIDADE_UUID
+
+            elif tipo == 'e2e':
+                ids_e2e.append(m.group())
+
+            elif tipo == 'id_contexto':
+                candidato = m.group('codigo_contexto')
+                if _E2E_COMPLETO.fullmatch(candidato):
+                    ids_e2e.append(candidato)
+                elif id_contexto is None:
+                    id_contexto = candidato
+
+            elif tipo == 'codigo':
+                if m.group().isdigit():
+                    valores_soltos.append(float(m.group()))
+                elif id_generico is None:
+                    id_generico = m.group()
+
+            elif tipo in ('data_rotulada', 'data', 'data_extenso'):
+                if tipo == 'data_rotulada':
+                    prioridade = _PRIORIDADE_DATA.get(_rotulo(m.group('rotulo_data')), _PRIORIDADE_DATA_SOLTA)
+                    if prioridade == _PRIORIDADE_DATA_SOLTA and m.group('data_valor_extenso'):
+                        prioridade = _PRIORIDADE_DATA_EXTENSO
+                    valor_data = m.group('data_valor')
+                else:
+                    prioridade = _PRIORIDADE_DATA_SOLTA if tipo == 'data' else _PRIORIDADE_DATA_EXTENSO
+                    valor_data = m.group()
+                if prioridade < prioridade_data:
+                    data, prioridade_data = valor_data, prioridade
+
+            elif tipo == 'email':
+                emails.append(recibo.trecho_original(m.start(), m.end()) or m.group().lower())
+
+            elif tipo == 'telefone':
+                telefones.append(m.group())
+
+            elif tipo == 'cnpj':
+                if cnpj is None and _NAO_DIGITOS.sub('', m.group()) == CNPJ_EMPRESA:
+                    cnpj = m.group()
+
+            elif tipo == 'nome_rotulado':
+                if nome is None:
+                    nome = ' '.join(m.group('nome').split())
+                nomeado = _BANCO_NOMEADO.search(m.group('nome'))
+                if nomeado and prioridade_banco > 0:
+                    banco, prioridade_banco = _rotulo(nomeado.group()), 0
+
+            elif tipo in ('banco', 'banco_generico'):
+                nomeado = m if tipo == 'banco' else _BANCO_NOMEADO.search(m.group())
+                prioridade = 0 if nomeado else 1
+                if prioridade < prioridade_banco:
+                    banco = _rotulo((nomeado or m).group())
+                    prioridade_banco = prioridade
+
+            elif tipo in ('agencia', 'agencia_antes'):
+                prioridade = 0 if tipo == 'agencia' else 1
+                if prioridade < prioridade_agencia:
+                    agencia = m.group('num_agencia' if prioridade == 0 else 'num_agencia_antes')
+                    prioridade_agencia = prioridade
+
+            elif tipo in ('conta', 'conta_antes'):
+                prioridade = 0 if tipo == 'conta' else 1
+                if prioridade < prioridade_conta:
+                    conta = m.group('num_conta' if prioridade == 0 else 'num_conta_antes').replace('.', '')
+                    prioridade_conta = prioridade
+
+        # Valor
+        amount = None
+        if linhas_total:
+            valores = []
+            for indice in sorted(linhas_total):
+                if 0 <= indice < len(recibo.linhas):
+                    valores.extend(_valores_da_linha(recibo.linhas[indice]))
+            relevantes = [v for v in valores if v >= _VALOR_MINIMO]
+            if relevantes:
+                amount = max(relevantes)
+        if amount is None:
+            if valor_prioritario is not None:
+                amount = valor_prioritario
+            elif valores_rotulados:
+                amount = max(valores_rotulados)
+            else:
+                amount = _maior_valor(valores_soltos)
+
+        # ID da transação
+        transaction_id = id_rotulado
+        if transaction_id is None and ids_e2e:
+            transaction_id = max(ids_e2e, key=len)
+        if transaction_id is None:
+            transaction_id = id_contexto or id_generico
+
+        # Chave PIX: a da empresa, se aparecer; senão a primeira encontrada
+        chaves = emails + telefones + uuids
+        chave_pix = next((c for c in chaves if c.lower().strip() == PIX_EMPRESA), None)
+        if chave_pix is None and chaves:
+            chave_pix = chaves[0]
+
+        return {
+            'amount': amount,
+            'transaction_id': transaction_id,
+            'date': data,
+            'bank_info': {
+                'banco_emitente': banco,
+                'agencia_recebedor': agencia,
+                'conta_recebedor': conta,
+                'chave_pix_recebedor': chave_pix,
+                'nome_recebedor': nome if nome and len(nome) >= 3 else None,
+                'cnpj_recebedor': _NAO_DIGITOS.sub('', cnpj) if cnpj else None,
+                'cpf_cnpj_recebedor': cnpj,
+            }
+        }
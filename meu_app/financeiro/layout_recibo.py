@@ -0,0 +1,309 @@
+"""
+Classificação do layout do comprovante (banco/app emissor) e extração por modelo
+
+Cada layout é um arquivo JSON em FinanceiroConfig.get_ocr_layouts_dir(); para
+aceitar um novo banco basta acrescentar um arquivo, sem mudar código:
+
+    {
+      "layout": "nubank",
+      "nome": "Nubank",
+      "ancoras": ["NU PAGAMENTOS", {"texto": "COMPROVANTE DE TRANSFERENCIA", "ate_linha": 2}],
+      "ancoras_minimas": 2,
+      "banco_emitente": "NUBANK",
+      "campos": {
+        "amount": {"rotulo": "VALOR", "tipo": "valor"},
+        "nome_recebedor": {"secao": "DESTINO", "rotulo": "NOME", "tipo": "nome"}
+      }
+    }
+
+O classificador procura as âncoras de todos os layouts numa única varredura do
+texto normalizado (âncoras com "ate_linha" só contam nas primeiras linhas) e
+escolhe o layout com mais âncoras, desde que atinja "ancoras_minimas".
+
+Cada campo é lido logo após o rótulo, na mesma linha ou nas "linhas" seguintes
+(padrão 1), a partir da seção indicada em "secao". Tipos: valor, data, id,
+autenticacao, digitos, nome, documento (preenche cpf_cnpj_recebedor e
+cnpj_recebedor) e chave. Valor, ID e data, e os campos do modelo que não forem
+encontrados, são completados pela extração genérica (ExtratorRecibo).
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .extracao_recibo import (
+    ExtratorRecibo, TextoRecibo, converter_valor, normalizar,
+    _CNPJ, _CPF, _DATA, _DECIMAL, _MILHAR, _NAO_DIGITOS, _UUID
+)
+
+
+_MESES = {
+    'JAN': 1, 'JANEIRO': 1, 'FEV': 2, 'FEVEREIRO': 2, 'MAR': 3, 'MARCO': 3,
+    'ABR': 4, 'ABRIL': 4, 'MAI': 5, 'MAIO': 5, 'JUN': 6, 'JUNHO': 6,
+    'JUL': 7, 'JULHO': 7, 'AGO': 8, 'AGOSTO': 8, 'SET': 9, 'SETEMBRO': 9,
+    'OUT': 10, 'OUTUBRO': 10, 'NOV': 11, 'NOVEMBRO': 11, 'DEZ': 12, 'DEZEMBRO': 12,
+}
+_NOMES_MESES = '|'.join(sorted(_MESES, key=len, reverse=True))
+
+_TIPOS = {
+    'valor': re.compile(rf'R?\$?\s*(?:(?P<decimal>{_DECIMAL})|(?P<milhar>{_MILHAR}))'),
+    'data': re.compile(
+        rf'(?P<numerica>{_DATA})'
+        rf'|(?P<dia>\d{{1,2}})\s+(?:DE\s+)?(?P<mes>{_NOMES_MESES})\.?\s+(?:DE\s+)?(?P<ano>\d{{4}})'
+    ),
+    'id': re.compile(rf'{_UUID}|[A-Z0-9]{{8,50}}'),
+    'autenticacao': re.compile(r'[A-Z0-9]{1,8}(?:\.[A-Z0-9]{1,8}){2,}|[A-Z0-9]{8,50}'),
+    'digitos': re.compile(r'\d{1,3}(?:\.\d{3})+|\d+'),
+    'nome': re.compile(r'[A-Z][A-Z0-9 &.\-]*[A-Z0-9.]'),
+    'documento': re.compile(rf'{_CNPJ}|{_CPF}'),
+    'chave': re.compile(
+        rf'[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{{2,}}|\+55\s?\d{{2}}\s?\d{{4,5}}[/\-]?\d{{4}}|{_UUID}'
+    ),
+}
+_PARTES_DATA = re.compile(r'(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{2,4})')
+
+_CAMPOS_BANCARIOS = (
+    'banco_emitente', 'agencia_recebedor', 'conta_recebedor', 'chave_pix_recebedor',
+    'nome_recebedor', 'cnpj_recebedor', 'cpf_cnpj_recebedor'
+)
+_CAMPOS = ('amount', 'transaction_id', 'date') + _CAMPOS_BANCARIOS
+
+
+def _expressao(textos) -> str:
+    """Alternativas de rótulo/âncora: sem acentos, maiúsculas e espaços flexíveis"""
+    if isinstance(textos, str):
+        textos = [textos]
+    return '|'.join(r'\s*'.join(re.escape(parte) for parte in normalizar(texto).split()) for texto in textos)
+
+
+def _data(m: re.Match) -> str:
+    if m.group('numerica'):
+        dia, mes, ano = _PARTES_DATA.match(m.group('numerica')).groups()
+        ano = f"20{ano}" if len(ano) == 2 else ano
+        return f"{int(dia):02d}/{int(mes):02d}/{ano}"
+    return f"{int(m.group('dia')):02d}/{_MESES[m.group('mes')]:02d}/{m.group('ano')}"
+
+
+class CampoLayout:
+    """Regra de leitura de um campo: rótulo, seção, tipo e linhas após o rótulo"""
+
+    def __init__(self, nome: str, regra: Dict):
+        self.nome = nome
+        self.tipo = regra['tipo']
+        self.valor = _TIPOS[self.tipo]
+        self.rotulo = re.compile(rf"\b(?:{_expressao(regra['rotulo'])})") if regra.get('rotulo') else None
+        self.secao = re.compile(rf"\b(?:{_expressao(regra['secao'])})\b") if regra.get('secao') else None
+        self.linhas = int(regra.get('linhas', 1))
+
+    def ler(self, recibo: TextoRecibo, secoes: Dict) -> Optional[Tuple[object, Optional[str]]]:
+        """
+        Lê o campo no texto
+
+        Returns:
+            Optional[tuple]: (valor, trecho original) ou None se não encontrado
+        """
+        inicio = 0
+        if self.secao is not None:
+            inicio = secoes.get(self.secao)
+            if inicio is None:
+                encontrada = self.secao.search(recibo.texto)
+                inicio = secoes[self.secao] = encontrada.end() if encontrada else -1
+            if inicio < 0:
+                return None
+
+        if self.rotulo is None:
+            trechos = [(inicio, len(recibo.texto))]
+        else:
+            rotulo = self.rotulo.search(recibo.texto, inicio)
+            if rotulo is None:
+                return None
+            linha = recibo.linha_de(rotulo.start())
+            ultima = min(linha + self.linhas, len(recibo.linhas) - 1)
+            trechos = [(rotulo.end(), recibo.inicios[linha] + len(recibo.linhas[linha]))]
+            trechos += [(recibo.inicios[i], recibo.inicios[i] + len(recibo.linhas[i]))
+                        for i in range(linha + 1, ultima + 1)]
+
+        for pos, fim in trechos:
+            m = self.valor.search(recibo.texto, pos, fim)
+            while m is not None and self.tipo in ('id', 'autenticacao') and not any(c.isdigit() for c in m.group()):
+                m = self.valor.search(recibo.texto, m.end(), fim)
+            if m is not None:
+                return self._converter(m), recibo.trecho_original(m.start(), m.end())
+        return None
+
+    def _converter(self, m: re.Match):
+        if self.tipo == 'valor':
+            if m.group('decimal'):
+                return converter_valor(m.group('decimal'))
+            return float(m.group('milhar').replace('.', '').replace(' ', ''))
+        if self.tipo == 'data':
+            return _data(m)
+        if self.tipo == 'digitos':
+            return m.group().replace('.', '')
+        if self.tipo == 'nome':
+            return ' '.join(m.group().split())
+        return m.group()
+
+
+class LayoutRecibo:
+    """Layout de comprovante de um banco/app, carregado de um arquivo JSON"""
+
+    def __init__(self, dados: Dict):
+        self.layout = dados['layout']
+        self.nome = dados.get('nome', self.layout)
+        self.ancoras = [a if isinstance(a, dict) else {'texto': a} for a in dados['ancoras']]
+        self.ancoras_minimas = int(dados.get('ancoras_minimas', 1))
+        self.banco_emitente = dados.get('banco_emitente')
+        self.campos = []
+        for nome, regra in dados.get('campos', {}).items():
+            if nome not in _CAMPOS or nome == 'cnpj_recebedor':
+                raise ValueError(f"Campo desconhecido no layout '{self.layout}': {nome}")
+            if regra.get('tipo') not in _TIPOS:
+                raise ValueError(f"Tipo inválido no layout '{self.layout}', campo {nome}: {regra.get('tipo')}")
+            self.campos.append(CampoLayout(nome, regra))
+
+    @classmethod
+    def carregar(cls, caminho: str) -> 'LayoutRecibo':
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return cls(json.load(arquivo))
+
+    def extrair(self, recibo: TextoRecibo) -> Dict:
+        """
+        Extrai os campos do modelo
+
+        Returns:
+            Dict: Campos no formato de ExtratorRecibo.extrair; os que o modelo não
+            encontrou (ou não define) ficam None
+        """
+        valores = dict.fromkeys(_CAMPOS)
+        valores['banco_emitente'] = self.banco_emitente
+        secoes: Dict = {}
+        for campo in self.campos:
+            lido = campo.ler(recibo, secoes)
+            if lido is None:
+                continue
+            valor, original = lido
+            if campo.tipo == 'chave':
+                valor = original or valor.lower()
+            valores[campo.nome] = valor
+            if campo.tipo == 'documento':
+                valores['cnpj_recebedor'] = _NAO_DIGITOS.sub('', valor)
+        return {
+            'amount': valores['amount'],
+            'transaction_id': valores['transaction_id'],
+            'date': valores['date'],
+            'bank_info': {campo: valores[campo] for campo in _CAMPOS_BANCARIOS}
+        }
+
+    def faltantes(self, campos: Dict) -> List[str]:
+        """Campos do modelo (e valor, ID e data) que não foram encontrados"""
+        nomes = {'amount', 'transaction_id', 'date'} | {c.nome for c in self.campos}
+        if 'cpf_cnpj_recebedor' in nomes:
+            nomes.add('cnpj_recebedor')
+        return [nome for nome in _CAMPOS if nome in nomes and
+                (campos['bank_info'] if nome in _CAMPOS_BANCARIOS else campos)[nome] is None]
+
+
+class ClassificadorLayout:
+    """Identifica o layout do comprovante pelas âncoras, numa única varredura"""
+
+    def __init__(self, layouts: List[LayoutRecibo]):
+        self.layouts = layouts
+        # Mesma âncora em vários layouts vira uma alternativa só; as mais longas
+        # primeiro, para não serem encobertas por outra que comece na mesma posição
+        por_expressao: Dict[str, List[Tuple[int, Optional[int]]]] = {}
+        for indice, layout in enumerate(layouts):
+            for ancora in layout.ancoras:
+                por_expressao.setdefault(_expressao(ancora['texto']), []).append((indice, ancora.get('ate_linha')))
+        # Agrupadas pela primeira letra: cada posição só tenta as âncoras que podem começar ali
+        por_letra: Dict[str, List[str]] = {}
+        for expressao in sorted(por_expressao, key=len, reverse=True):
+            por_letra.setdefault(expressao.lstrip('\\')[:1], []).append(expressao)
+        self._ancoras = [por_expressao[e] for letra in sorted(por_letra) for e in por_letra[letra]]
+        grupos = '|'.join(
+            f"(?={re.escape(letra)})(?:{'|'.join(f'({e})' for e in por_letra[letra])})" for letra in sorted(por_letra)
+        )
+        self._expressao = re.compile(rf'\b(?:{grupos})\b') if grupos else None
+
+    def classificar(self, recibo: TextoRecibo) -> Optional[LayoutRecibo]:
+        """
+        Layout com mais âncoras encontradas (respeitando ancoras_minimas)
+
+        Returns:
+            Optional[LayoutRecibo]: None se nenhum layout for reconhecido
+        """
+        if self._expressao is None:
+            return None
+        encontradas = set()
+        for m in self._expressao.finditer(recibo.texto):
+            linha = None
+            for indice, ate_linha in self._ancoras[m.lastindex - 1]:
+                if ate_linha is not None:
+                    if linha is None:
+                        linha = recibo.linha_de(m.start())
+                    if linha >= ate_linha:
+                        continue
+                encontradas.add((indice, m.lastindex))
+
+        pontos = [0] * len(self.layouts)
+        for indice, _ in encontradas:
+            pontos[indice] += 1
+        melhor = None
+        for indice, layout in enumerate(self.layouts):
+            if pontos[indice] >= layout.ancoras_minimas and (melhor is None or pontos[indice] > pontos[melhor]):
+                melhor = indice
+        return self.layouts[melhor] if melhor is not None else None
+
+
+# Um classificador por diretório de layouts neste processo
+_classificadores: Dict[str, ClassificadorLayout] = {}
+
+
+def get_classificador() -> ClassificadorLayout:
+    """
+    Classificador com os layouts do diretório configurado, carregados uma vez por
+    processo (arquivos inválidos são ignorados com aviso)
+    """
+    from .config import FinanceiroConfig
+
+    diretorio = FinanceiroConfig.get_ocr_layouts_dir()
+    classificador = _classificadores.get(diretorio)
+    if classificador is None:
+        layouts = []
+        try:
+            nomes = sorted(n for n in os.listdir(diretorio) if n.endswith('.json'))
+        except OSError:
+            nomes = []
+        for nome in nomes:
+            try:
+                layouts.append(LayoutRecibo.carregar(os.path.join(diretorio, nome)))
+            except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+                print(f"Layout de comprovante ignorado ({nome}): {e}")
+        classificador = _classificadores[diretorio] = ClassificadorLayout(layouts)
+    return classificador
+
+
+def extrair_campos(texto: str) -> Dict:
+    """
+    Campos do comprovante: pelo modelo do banco/app, se o layout for reconhecido,
+    com a extração genérica completando o que o modelo não encontrar
+
+    Returns:
+        Dict: amount, transaction_id, date, bank_info e layout (None se genérico)
+    """
+    recibo = TextoRecibo(texto or '')
+    layout = get_classificador().classificar(recibo)
+    if layout is None:
+        return dict(ExtratorRecibo.extrair(recibo), layout=None)
+
+    campos = layout.extrair(recibo)
+    faltantes = layout.faltantes(campos)
+    if faltantes:
+        generico = ExtratorRecibo.extrair(recibo)
+        for campo in faltantes:
+            if campo in _CAMPOS_BANCARIOS:
+                campos['bank_info'][campo] = generico['bank_info'][campo]
+            else:
+                campos[campo] = generico[campo]
+    campos['layout'] = layout.layout
+    return campos
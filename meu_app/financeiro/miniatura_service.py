@@ -0,0 +1,198 @@
+"""
+Miniaturas dos comprovantes de pagamento
+Geradas uma única vez por conteúdo (chave = recibo_sha256) e guardadas em disco;
+a geração roda em job de fundo para a galeria não esperar pelo Pillow.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+try:
+    import fitz  # PyMuPDF: renderiza a primeira página de PDFs
+except ImportError:
+    fitz = None
+
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+# Miniaturas já enviadas para geração por este processo: {destino: instante do envio}.
+# Evita enfileirar de novo a cada acesso; depois do prazo, uma falha pode ser retentada.
+_pendentes = {}
+_pendentes_lock = threading.Lock()
+PRAZO_PENDENTE = 300
+
+
+class MiniaturaService:
+    """Serviço de miniaturas de comprovantes"""
+
+    @staticmethod
+    def chave(recibo_sha256: Optional[str], caminho_recibo: str) -> str:
+        """Chave da miniatura: hash do conteúdo ou, em recibos antigos sem hash, do nome do arquivo"""
+        if recibo_sha256:
+            return recibo_sha256
+        return 'n' + hashlib.sha256(caminho_recibo.encode('utf-8')).hexdigest()[:63]
+
+    @staticmethod
+    def caminho_miniatura(diretorio: str, chave: str) -> str:
+        """Caminho da miniatura (subpastas pelos 2 primeiros caracteres da chave)"""
+        return os.path.join(diretorio, chave[:2], f"{chave}.jpg")
+
+    @staticmethod
+    def gerar_miniatura(origem: str, destino: str, tamanho: int = 320) -> bool:
+        """
+        Gera a miniatura JPEG de uma imagem ou da primeira página de um PDF
+
+        Sem PyMuPDF instalado, PDFs recebem uma miniatura genérica.
+
+        Args:
+            origem: Caminho do comprovante
+            destino: Caminho da miniatura
+            tamanho: Maior lado da miniatura em pixels
+
+        Returns:
+            bool: True se a miniatura existe ao final
+        """
+        if os.path.exists(destino):
+            return True
+        if not os.path.exists(origem):
+            return False
+
+        extensao = os.path.splitext(origem)[1].lower()
+        if extensao in EXTENSOES_IMAGEM:
+            with Image.open(origem) as imagem:
+                imagem.draft('RGB', (tamanho, tamanho))  # JPEG: decodifica já reduzido
+                miniatura = imagem.convert('RGB')
+                miniatura.thumbnail((tamanho, tamanho))
+        elif extensao == '.pdf':
+            miniatura = MiniaturaService._miniatura_pdf(origem, tamanho)
+        else:
+            miniatura = MiniaturaService._miniatura_generica(extensao.lstrip('.').upper() or 'ARQ', tamanho)
+
+        # Gravação atômica: quem lê nunca vê um JPEG pela metade
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        miniatura.save(temporario, 'JPEG', quality=80, optimize=True)
+        os.replace(temporario, destino)
+        return True
+
+    @staticmethod
+    def _miniatura_pdf(origem: str, tamanho: int) -> Image.Image:
+        if fitz is None:
+            return MiniaturaService._miniatura_generica('PDF', tamanho)
+        try:
+            with fitz.open(origem) as documento:
+                pagina = documento[0]
+                escala = tamanho / max(pagina.rect.width, pagina.rect.height)
+                pixmap = pagina.get_pixmap(matrix=fitz.Matrix(escala, escala), alpha=False)
+                return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        except Exception:
+            # PDF sem página legível: miniatura genérica, como sem PyMuPDF
+            return MiniaturaService._miniatura_generica('PDF', tamanho)
+
+    @staticmethod
+    def _miniatura_generica(rotulo: str, tamanho: int) -> Image.Image:
+        imagem = Image.new('RGB', (int(tamanho * 0.75), tamanho), '#f8f9fa')
+        desenho = ImageDraw.Draw(imagem)
+        desenho.rectangle([8, 8, imagem.width - 9, imagem.height - 9], outline='#adb5bd', width=3)
+        desenho.text((imagem.width // 2, imagem.height // 2), rotulo, fill='#495057', anchor='mm',
+                     font_size=max(tamanho // 8, 10))
+        return imagem
+
+    @staticmethod
+    def caminhos(caminho_recibo: str, recibo_sha256: Optional[str]) -> Tuple[Optional[str], str]:
+        """
+        Caminhos (comprovante, miniatura) de um pagamento, no contexto do app
+
+        Returns:
+            Tuple[Optional[str], str]: origem (None se o nome sair da pasta de recibos) e destino
+        """
+        from werkzeug.security import safe_join
+        from .config import FinanceiroConfig
+
+        origem = safe_join(FinanceiroConfig.get_upload_directory('recibos'), caminho_recibo)
+        destino = MiniaturaService.caminho_miniatura(
+            FinanceiroConfig.get_upload_directory('miniaturas'),
+            MiniaturaService.chave(recibo_sha256, caminho_recibo)
+        )
+        return origem, destino
+
+    @staticmethod
+    def preparar_galeria(clientes: List[Dict]) -> Optional[str]:
+        """
+        Marca em cada comprovante da página se a miniatura já existe e agenda as que faltam
+
+        Args:
+            clientes: Saída de FinanceiroService.listar_comprovantes_por_cliente
+
+        Returns:
+            Optional[str]: ID do job de geração, se algum foi criado
+        """
+        faltantes = []
+        for cliente in clientes:
+            for comprovante in cliente['comprovantes']:
+                origem, destino = MiniaturaService.caminhos(comprovante['caminho_recibo'],
+                                                            comprovante.get('recibo_sha256'))
+                comprovante['miniatura_pronta'] = os.path.exists(destino)
+                if not comprovante['miniatura_pronta'] and origem:
+                    faltantes.append((origem, destino))
+        return MiniaturaService.agendar(faltantes) if faltantes else None
+
+    @staticmethod
+    def gerar_lote(itens: Iterable[Tuple[str, str]], tamanho: int = 320) -> Dict[str, int]:
+        """
+        Gera várias miniaturas (usado pela task de fundo; não acessa o banco)
+
+        Args:
+            itens: Pares (origem, destino)
+            tamanho: Maior lado em pixels
+
+        Returns:
+            Dict[str, int]: contagem de geradas e falhas
+        """
+        geradas, falhas = 0, 0
+        for origem, destino in itens:
+            try:
+                if MiniaturaService.gerar_miniatura(origem, destino, tamanho):
+                    geradas += 1
+                else:
+                    falhas += 1
+            except Exception:
+                falhas += 1
+        return {'geradas': geradas, 'falhas': falhas}
+
+    @staticmethod
+    def agendar(itens: List[Tuple[str, str]]) -> Optional[str]:
+        """
+        Envia para o job de fundo as miniaturas que ainda não existem nem estão na fila
+
+        Args:
+            itens: Pares (origem, destino)
+
+        Returns:
+            Optional[str]: ID do job, ou None se nada foi enfileirado
+        """
+        from flask import current_app
+        from ..queue import enqueue_miniaturas_job
+        from .config import FinanceiroConfig
+
+        agora = time.monotonic()
+        with _pendentes_lock:
+            for destino in [d for d, instante in _pendentes.items() if agora - instante >= PRAZO_PENDENTE]:
+                del _pendentes[destino]
+            novos = [(origem, destino) for origem, destino in itens
+                     if destino not in _pendentes and not os.path.exists(destino)]
+            _pendentes.update((destino, agora) for _, destino in novos)
+        if not novos:
+            return None
+
+        job_id = enqueue_miniaturas_job(novos, FinanceiroConfig.get_miniatura_tamanho())
+        if job_id is None:
+            with _pendentes_lock:
+                for _, destino in novos:
+                    _pendentes.pop(destino, None)
+            current_app.logger.warning(f"Não foi possível agendar {len(novos)} miniaturas de comprovantes")
+        return job_id
@@ -0,0 +1,472 @@
+"""
+Motores de OCR intercambiáveis
+
+Três motores com a mesma interface:
+- VisionOcrBackend: Google Vision (rede, credenciais, conta na quota mensal)
+- TesseractOcrBackend: Tesseract local, num pool de processos (sem rede nem quota)
+- FakeOcrBackend: determinístico, para testes, benchmarks e testes de carga offline
+
+CadeiaOcrBackend combina motores em ordem de failover: os arquivos em que um
+motor falha seguem para o próximo. A cadeia de cada rota vem da configuração
+(FinanceiroConfig.get_ocr_backend), pelo endpoint da requisição atual.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+from . import texto_pdf
+from .config import FinanceiroConfig
+from .exceptions import OcrProcessingError
+from .texto_pdf import TextoPdf
+from .vision_service import VisionOcrService
+
+
+class OcrBackend:
+    """Interface dos motores de OCR"""
+
+    nome = 'base'
+    # Capacidades
+    usa_quota = False  # chamada paga, reservada na quota mensal
+    suporta_pdf = False  # PDF digitalizado (sem camada de texto)
+    suporta_lote = False  # várias imagens por chamada
+    local = True  # roda sem rede
+
+    def disponivel(self) -> bool:
+        """Se o motor pode ser usado neste processo (dependências instaladas)"""
+        return True
+
+    def aquecer(self) -> None:
+        """Prepara clientes, conexões e processos antes do primeiro uso (workers de vida longa)"""
+
+    def capacidades(self) -> Dict:
+        return {
+            'nome': self.nome,
+            'usa_quota': self.usa_quota,
+            'suporta_pdf': self.suporta_pdf,
+            'suporta_lote': self.suporta_lote,
+            'local': self.local,
+            'disponivel': self.disponivel(),
+        }
+
+    def extract_text(self, file_path: str) -> str:
+        """
+        Texto reconhecido no arquivo (PDF ou imagem)
+
+        Raises:
+            OcrProcessingError: Se o motor não conseguir ler o arquivo
+        """
+        raise NotImplementedError
+
+    def extract_texts_batch(self, file_paths: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """(texto, erro) de cada arquivo, na mesma ordem"""
+        resultados = []
+        for file_path in file_paths:
+            try:
+                resultados.append((self.extract_text(file_path), None))
+            except OcrProcessingError as e:
+                resultados.append(("", str(e)))
+        return resultados
+
+    def process_receipt(self, file_path: str) -> Dict:
+        """
+        Dados do comprovante no formato de VisionOcrService.process_receipt, com o
+        motor usado e se a leitura foi cobrada ('cobrado')
+        """
+        try:
+            texto = self.extract_text(file_path)
+        except OcrProcessingError as e:
+            return self._resultado_erro(str(e))
+        except Exception as e:
+            return self._resultado_erro(f'Erro inesperado no OCR ({self.nome}): {str(e)}')
+        return self._resultado(texto)
+
+    def process_receipts_batch(self, file_paths: List[str]) -> List[Dict]:
+        """Um resultado por arquivo, na mesma ordem, no formato de process_receipt"""
+        return [self._resultado_erro(erro) if erro else self._resultado(texto)
+                for texto, erro in self.extract_texts_batch(file_paths)]
+
+    def _resultado(self, texto: str) -> Dict:
+        # O motor respondeu: a requisição é cobrada mesmo sem texto ou sem dados reconhecidos
+        try:
+            resultado = VisionOcrService.parse_text(texto)
+        except Exception as e:
+            resultado = VisionOcrService._resultado_erro(f'Erro inesperado no OCR ({self.nome}): {str(e)}')
+        return dict(resultado, motor=self.nome, cobrado=self.usa_quota)
+
+    def _resultado_erro(self, mensagem: str) -> Dict:
+        return dict(VisionOcrService._resultado_erro(mensagem), motor=self.nome)
+
+
+class VisionOcrBackend(OcrBackend):
+    """Google Vision (ver VisionOcrService)"""
+
+    nome = 'vision'
+    usa_quota = True
+    suporta_pdf = True
+    suporta_lote = True
+    local = False
+
+    def aquecer(self) -> None:
+        VisionOcrService.aquecer()
+
+    def extract_text(self, file_path: str) -> str:
+        return VisionOcrService.extract_text(file_path)
+
+    def extract_texts_batch(self, file_paths: List[str]) -> List[Tuple[str, Optional[str]]]:
+        return VisionOcrService.extract_texts_batch(file_paths)
+
+
+# Processos do Tesseract (spawn: os filhos não herdam conexões do app)
+_pool_tesseract = None
+_pool_tesseract_lock = threading.Lock()
+
+
+def _get_pool_tesseract() -> ProcessPoolExecutor:
+    global _pool_tesseract
+
+    with _pool_tesseract_lock:
+        if _pool_tesseract is None:
+            _pool_tesseract = ProcessPoolExecutor(
+                max_workers=FinanceiroConfig.get_ocr_tesseract_processos(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool_tesseract
+
+
+def _tesseract_arquivo(file_path: str, idioma: str, dpi: int, timeout: float) -> Tuple[str, Optional[str]]:
+    """
+    Roda no processo do pool: (texto, erro) de um arquivo
+
+    O pytesseract mata o tesseract que passar do prazo; sem isso um processo
+    travado ocuparia o worker do pool para sempre (cancel() não o interrompe).
+    """
+    prazo = time.monotonic() + timeout
+
+    def restante() -> float:
+        segundos = prazo - time.monotonic()
+        if segundos <= 0:
+            raise RuntimeError("Tesseract process timeout")
+        return segundos
+
+    try:
+        if os.path.splitext(file_path)[1].lower() == '.pdf':
+            texto = TextoPdf.extrair(file_path)
+            if texto is not None:
+                return texto, None
+            if texto_pdf.fitz is None:
+                return "", "PDF digitalizado requer o PyMuPDF para o Tesseract"
+            textos = []
+            with texto_pdf.fitz.open(file_path) as documento:
+                for indice in range(min(documento.page_count, FinanceiroConfig.get_ocr_pdf_texto_paginas())):
+                    pixmap = documento[indice].get_pixmap(dpi=dpi, colorspace=texto_pdf.fitz.csGRAY)
+                    pagina = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+                    textos.append(pytesseract.image_to_string(pagina, lang=idioma, timeout=restante()))
+            return '\n'.join(textos), None
+
+        with Image.open(file_path) as imagem:
+            imagem = ImageOps.exif_transpose(imagem).convert('L')
+        return pytesseract.image_to_string(imagem, lang=idioma, timeout=restante()), None
+    except Exception as e:
+        return "", f"Falha na extração de texto com Tesseract: {str(e)}"
+
+
+def _tesseract_versao() -> str:
+    """Roda no processo do pool: sobe o processo e confere o executável"""
+    return str(pytesseract.get_tesseract_version())
+
+
+class TesseractOcrBackend(OcrBackend):
+    """Tesseract local (pytesseract), em processos separados: o OCR é CPU-bound"""
+
+    nome = 'tesseract'
+    suporta_lote = True
+
+    @property
+    def suporta_pdf(self) -> bool:
+        return texto_pdf.fitz is not None
+
+    def disponivel(self) -> bool:
+        return pytesseract is not None and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+    def aquecer(self) -> None:
+        if self.disponivel():
+            pool = _get_pool_tesseract()
+            for futuro in [pool.submit(_tesseract_versao) for _ in range(FinanceiroConfig.get_ocr_tesseract_processos())]:
+                futuro.result()
+
+    def _verificar(self):
+        if not self.disponivel():
+            raise OcrProcessingError("Tesseract não instalado (pytesseract e o executável tesseract)")
+
+    def extract_text(self, file_path: str) -> str:
+        self._verificar()
+        timeout = FinanceiroConfig.get_ocr_operation_timeout()
+        futuro = _get_pool_tesseract().submit(_tesseract_arquivo, file_path,
+                                              FinanceiroConfig.get_ocr_tesseract_idioma(),
+                                              FinanceiroConfig.get_ocr_tesseract_dpi(), timeout)
+        try:
+            texto, erro = futuro.result(timeout=timeout)
+        except FuturoTimeoutError:
+            # Até o 3.10 é outra classe que o TimeoutError embutido
+            futuro.cancel()
+            raise OcrProcessingError("Tesseract excedeu o tempo limite do OCR")
+        if erro:
+            raise OcrProcessingError(erro)
+        return texto
+
+    def extract_texts_batch(self, file_paths: List[str]) -> List[Tuple[str, Optional[str]]]:
+        try:
+            self._verificar()
+        except OcrProcessingError as e:
+            return [("", str(e))] * len(file_paths)
+        return list(_get_pool_tesseract().map(_tesseract_arquivo, file_paths,
+                                              repeat(FinanceiroConfig.get_ocr_tesseract_idioma()),
+                                              repeat(FinanceiroConfig.get_ocr_tesseract_dpi()),
+                                              repeat(FinanceiroConfig.get_ocr_operation_timeout())))
+
+
+class FakeOcrBackend(OcrBackend):
+    """
+    Motor determinístico, sem rede nem quota
+
+    Arquivo de texto UTF-8 é devolvido como está ('ERRO' simula uma falha do
+    motor); os demais viram um comprovante PIX sintético derivado do SHA-256
+    do conteúdo. A latência simula o tempo de resposta de cada chamada e a
+    inicialização, o custo do cliente (credenciais, canal gRPC) que o Vision
+    paga uma vez por processo.
+    """
+
+    nome = 'falso'
+    suporta_pdf = True
+    suporta_lote = True
+
+    # Como os clientes do Vision: um por processo
+    _conectado = False
+
+    def __init__(self, latencia: Optional[float] = None):
+        self.latencia = FinanceiroConfig.get_ocr_falso_latencia() if latencia is None else latencia
+
+    @staticmethod
+    def texto(conteudo: bytes) -> str:
+        """Texto que o motor falso reconhece para o conteúdo"""
+        try:
+            texto = conteudo.decode('utf-8')
+            if '\x00' not in texto:
+                if texto.strip() == 'ERRO':
+                    raise OcrProcessingError("Falha simulada pelo motor de OCR falso")
+                return texto
+        except UnicodeDecodeError:
+            pass
+
+        digest = hashlib.sha256(conteudo).hexdigest()
+        numero = int(digest[:12], 16)
+        dia, mes, hora, minuto = numero % 28 + 1, numero // 28 % 12 + 1, numero % 24, numero % 60
+        centavos = numero % 500000 + 100
+        return '\n'.join([
+            'Comprovante de transferência',
+            'Pix enviado',
+            f"Valor R$ {f'{centavos // 100:,}'.replace(',', '.')},{centavos % 100:02d}",
+            f'Data {dia:02d}/{mes:02d}/2025 {hora:02d}:{minuto:02d}',
+            f'ID da transação: E{numero % 10 ** 8:08d}2025{mes:02d}{dia:02d}{hora:02d}{minuto:02d}'
+            f'{digest[12:23].upper()}',
+        ])
+
+    def aquecer(self) -> None:
+        self._conectar()
+
+    @classmethod
+    def _conectar(cls):
+        if not cls._conectado:
+            inicializacao = FinanceiroConfig.get_ocr_falso_inicializacao()
+            if inicializacao:
+                time.sleep(inicializacao)
+            cls._conectado = True
+
+    def _esperar(self):
+        self._conectar()
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _ler(self, file_path: str) -> str:
+        try:
+            with open(file_path, 'rb') as arquivo:
+                return self.texto(arquivo.read())
+        except OSError as e:
+            raise OcrProcessingError(f"Falha ao ler arquivo: {e}")
+
+    def extract_text(self, file_path: str) -> str:
+        self._esperar()
+        return self._ler(file_path)
+
+    def extract_texts_batch(self, file_paths: List[str]) -> List[Tuple[str, Optional[str]]]:
+        resultados = []
+        tamanho_lote = FinanceiroConfig.get_ocr_batch_size()
+        for indice, file_path in enumerate(file_paths):
+            # Uma chamada (e uma latência) por lote, como no Vision
+            if indice % tamanho_lote == 0:
+                self._esperar()
+            try:
+                resultados.append((self._ler(file_path), None))
+            except OcrProcessingError as e:
+                resultados.append(("", str(e)))
+        return resultados
+
+
+class CadeiaOcrBackend(OcrBackend):
+    """Motores em ordem de failover: o que um deles não ler segue para o próximo"""
+
+    def __init__(self, motores: List[OcrBackend]):
+        self.motores = motores
+        self.nome = ','.join(motor.nome for motor in motores)
+
+    @property
+    def usa_quota(self) -> bool:
+        return any(motor.usa_quota for motor in self.motores)
+
+    @property
+    def suporta_pdf(self) -> bool:
+        return any(motor.suporta_pdf for motor in self.motores)
+
+    @property
+    def suporta_lote(self) -> bool:
+        return any(motor.suporta_lote for motor in self.motores)
+
+    @property
+    def local(self) -> bool:
+        return all(motor.local for motor in self.motores)
+
+    def disponivel(self) -> bool:
+        return any(motor.disponivel() for motor in self.motores)
+
+    def aquecer(self) -> None:
+        for motor in self.motores:
+            motor.aquecer()
+
+    def _ativos(self) -> List[OcrBackend]:
+        ativos = [motor for motor in self.motores if motor.disponivel()]
+        if not ativos:
+            raise OcrProcessingError(f"Nenhum motor de OCR disponível ({self.nome})")
+        return ativos
+
+    def extract_text(self, file_path: str) -> str:
+        erros = []
+        for motor in self._ativos():
+            try:
+                return motor.extract_text(file_path)
+            except OcrProcessingError as e:
+                print(f"OCR com {motor.nome} falhou, tentando o próximo motor: {e}")
+                erros.append(f"{motor.nome}: {e}")
+        raise OcrProcessingError('; '.join(erros))
+
+    def process_receipt(self, file_path: str) -> Dict:
+        return self.process_receipts_batch([file_path])[0]
+
+    def process_receipts_batch(self, file_paths: List[str]) -> List[Dict]:
+        try:
+            ativos = self._ativos()
+        except OcrProcessingError as e:
+            return [self._resultado_erro(str(e)) for _ in file_paths]
+
+        resultados: List[Optional[Dict]] = [None] * len(file_paths)
+        # Uma leitura cobrada continua cobrada se o arquivo seguir para o próximo motor
+        cobrados = [False] * len(file_paths)
+        pendentes = list(range(len(file_paths)))
+        for motor in ativos:
+            if not pendentes:
+                break
+            if len(pendentes) == 1:
+                parciais = [motor.process_receipt(file_paths[pendentes[0]])]
+            else:
+                parciais = motor.process_receipts_batch([file_paths[indice] for indice in pendentes])
+            restantes = []
+            for indice, resultado in zip(pendentes, parciais):
+                cobrados[indice] = cobrados[indice] or bool(resultado.get('cobrado'))
+                resultados[indice] = dict(resultado, cobrado=cobrados[indice])
+                if resultado.get('error'):
+                    restantes.append(indice)
+            if restantes and motor is not ativos[-1]:
+                print(f"OCR com {motor.nome} falhou em {len(restantes)} arquivo(s), tentando o próximo motor")
+            pendentes = restantes
+        return resultados
+
+
+MOTORES = {
+    VisionOcrBackend.nome: VisionOcrBackend,
+    TesseractOcrBackend.nome: TesseractOcrBackend,
+    FakeOcrBackend.nome: FakeOcrBackend,
+}
+
+# Uma instância por cadeia neste processo (o pool do Tesseract é compartilhado)
+_backends: Dict[str, OcrBackend] = {}
+
+
+def get_ocr_backend(cadeia: Optional[str] = None, rota: Optional[str] = None) -> OcrBackend:
+    """
+    Motor de OCR configurado
+
+    Args:
+        cadeia: Nomes dos motores separados por vírgula, em ordem de failover
+            (padrão: configuração da rota)
+        rota: Endpoint cuja configuração usar (padrão: o da requisição atual)
+
+    Returns:
+        OcrBackend: O motor, ou uma CadeiaOcrBackend se houver mais de um
+    """
+    if cadeia is None:
+        if rota is None:
+            from flask import has_request_context, request
+            rota = request.endpoint if has_request_context() else None
+        cadeia = FinanceiroConfig.get_ocr_backend(rota)
+
+    backend = _backends.get(cadeia)
+    if backend is not None:
+        return backend
+
+    motores = []
+    for nome in cadeia.split(','):
+        nome = nome.strip().lower()
+        if nome not in MOTORES:
+            print(f"Motor de OCR desconhecido ignorado: {nome!r}")
+            continue
+        motores.append(MOTORES[nome]())
+    if not motores:
+        motores = [VisionOcrBackend()]
+
+    backend = _backends[cadeia] = motores[0] if len(motores) == 1 else CadeiaOcrBackend(motores)
+    return backend
+
+
+def aquecer_motores():
+    """Aquece os motores de todas as cadeias configuradas (padrão e por rota)"""
+    cadeias = {FinanceiroConfig.get_ocr_backend(), *FinanceiroConfig.get_ocr_backend_rotas().values()}
+    for cadeia in sorted(cadeias):
+        get_ocr_backend(cadeia).aquecer()
+
+
+def unidades_cobradas(resultados: List[Dict]) -> int:
+    """
+    Resultados cuja requisição um motor pago atendeu, leiam ou não o comprovante
+
+    Só a falha da própria requisição (exceção ou erro da imagem na resposta)
+    deixa de ser cobrada; texto vazio ou ilegível conta na quota.
+    """
+    return sum(1 for resultado in resultados if resultado.get('cobrado'))
+
+
+def cacheavel(resultado: Dict) -> bool:
+    """Se o resultado pode ir para o cache de OCR (o do motor falso não descreve o arquivo real)"""
+    return not resultado.get('error') and resultado.get('motor') != FakeOcrBackend.nome
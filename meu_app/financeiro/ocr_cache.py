@@ -0,0 +1,258 @@
+"""
+Cache de resultados de OCR endereçado pelo conteúdo (SHA-256 do comprovante)
+
+Dois backends com a mesma interface:
+- DiskOcrCache: JSON em disco, em subpastas pelos 2 primeiros caracteres do hash,
+  com despejo LRU (mtime renovado a cada leitura) por tamanho total e quantidade
+- RedisOcrCache: compartilhado entre workers e servidores, com TTL
+
+CamadasOcrCache combina os dois: lê do disco local, depois do Redis (e aquece o
+disco), e grava em ambos.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+try:
+    from ..obs.metrics import track_ocr_cache
+except ImportError:
+    # Fallback se métricas não estiverem disponíveis
+    def track_ocr_cache(backend: str, result: str, quantidade: int = 1):
+        pass
+
+
+class OcrResultCache:
+    """Interface dos backends de cache de OCR"""
+
+    nome = 'base'
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        """Retorna o resultado guardado para o hash, ou None"""
+        raise NotImplementedError
+
+    def set(self, sha256: str, resultado: Dict) -> None:
+        """Guarda o resultado do OCR para o hash"""
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> None:
+        """Remove o resultado do hash, se existir"""
+        raise NotImplementedError
+
+
+class DiskOcrCache(OcrResultCache):
+    """Cache em disco, particionado e com despejo LRU por tamanho/quantidade"""
+
+    nome = 'disco'
+
+    # Uma varredura de despejo a cada N gravações deste processo
+    VARREDURA_A_CADA = 100
+    # Após a varredura, o cache fica em 90% dos limites
+    FOLGA = 0.9
+
+    def __init__(self, diretorio: str, max_bytes: int, max_entradas: int):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        self._gravacoes = 0
+
+    def caminho(self, sha256: str) -> str:
+        return os.path.join(self.diretorio, sha256[:2], f"{sha256}.json")
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        caminho = self.caminho(sha256)
+        legado = os.path.join(self.diretorio, f"{sha256}.json")
+        try:
+            if not os.path.exists(caminho) and os.path.exists(legado):
+                # Formato antigo (um arquivo por hash na raiz): move para a subpasta
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                os.replace(legado, caminho)
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                resultado = json.load(arquivo)
+            os.utime(caminho)  # LRU: leitura renova a entrada
+        except FileNotFoundError:
+            track_ocr_cache(self.nome, 'miss')
+            return None
+        except (OSError, ValueError):
+            # Entrada corrompida ou ilegível: descarta
+            self.delete(sha256)
+            track_ocr_cache(self.nome, 'error')
+            return None
+        track_ocr_cache(self.nome, 'hit')
+        return resultado
+
+    def set(self, sha256: str, resultado: Dict) -> None:
+        caminho = self.caminho(sha256)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Gravação atômica: leitores concorrentes nunca veem JSON pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+        track_ocr_cache(self.nome, 'set')
+
+        # Instância nova não varre na primeira gravação: só depois de N gravações
+        self._gravacoes += 1
+        if self._gravacoes >= self.VARREDURA_A_CADA:
+            self._gravacoes = 0
+            self.despejar()
+
+    def delete(self, sha256: str) -> None:
+        try:
+            os.remove(self.caminho(sha256))
+        except OSError:
+            pass
+
+    def _entradas(self) -> List[tuple]:
+        entradas = []
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                if not nome.endswith('.json'):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                entradas.append((info.st_mtime, info.st_size, caminho))
+        return entradas
+
+    def despejar(self) -> int:
+        """
+        Remove as entradas menos usadas até ficar abaixo dos limites
+
+        Returns:
+            int: Quantidade de entradas removidas
+        """
+        entradas = self._entradas()
+        total_bytes = sum(tamanho for _, tamanho, _ in entradas)
+        if total_bytes <= self.max_bytes and len(entradas) <= self.max_entradas:
+            return 0
+
+        alvo_bytes = int(self.max_bytes * self.FOLGA)
+        alvo_entradas = int(self.max_entradas * self.FOLGA)
+        restantes = len(entradas)
+        removidas = 0
+        for _, tamanho, caminho in sorted(entradas):
+            if total_bytes <= alvo_bytes and restantes <= alvo_entradas:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total_bytes -= tamanho
+            restantes -= 1
+            removidas += 1
+
+        if removidas:
+            track_ocr_cache(self.nome, 'evicted', removidas)
+        return removidas
+
+
+class RedisOcrCache(OcrResultCache):
+    """Cache no Redis, compartilhado por todos os workers e servidores"""
+
+    nome = 'redis'
+    PREFIXO = 'ocr:resultado:'
+
+    def __init__(self, conexao, ttl: int):
+        self.conexao = conexao
+        self.ttl = ttl
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        try:
+            valor = self.conexao.get(f"{self.PREFIXO}{sha256}")
+        except Exception:
+            track_ocr_cache(self.nome, 'error')
+            return None
+        if valor is None:
+            track_ocr_cache(self.nome, 'miss')
+            return None
+        try:
+            resultado = json.loads(valor)
+        except ValueError:
+            self.delete(sha256)
+            track_ocr_cache(self.nome, 'error')
+            return None
+        track_ocr_cache(self.nome, 'hit')
+        return resultado
+
+    def set(self, sha256: str, resultado: Dict) -> None:
+        try:
+            self.conexao.set(f"{self.PREFIXO}{sha256}", json.dumps(resultado, ensure_ascii=False), ex=self.ttl)
+            track_ocr_cache(self.nome, 'set')
+        except Exception:
+            track_ocr_cache(self.nome, 'error')
+
+    def delete(self, sha256: str) -> None:
+        try:
+            self.conexao.delete(f"{self.PREFIXO}{sha256}")
+        except Exception:
+            pass
+
+
+class CamadasOcrCache(OcrResultCache):
+    """Combina backends do mais rápido (local) para o mais amplo (compartilhado)"""
+
+    nome = 'camadas'
+
+    def __init__(self, camadas: List[OcrResultCache]):
+        self.camadas = camadas
+
+    def get(self, sha256: str) -> Optional[Dict]:
+        for posicao, camada in enumerate(self.camadas):
+            resultado = camada.get(sha256)
+            if resultado is not None:
+                # Aquece as camadas mais rápidas que não tinham a entrada
+                for anterior in self.camadas[:posicao]:
+                    anterior.set(sha256, resultado)
+                return resultado
+        return None
+
+    def set(self, sha256: str, resultado: Dict) -> None:
+        for camada in self.camadas:
+            camada.set(sha256, resultado)
+
+    def delete(self, sha256: str) -> None:
+        for camada in self.camadas:
+            camada.delete(sha256)
+
+
+# Uma instância de disco por diretório neste processo, para o contador de
+# gravações (e portanto a frequência das varreduras) valer entre requisições
+# e entre os jobs de OCR de um worker
+_discos: Dict[str, DiskOcrCache] = {}
+
+
+def get_disk_cache(diretorio: str, max_bytes: int, max_entradas: int) -> DiskOcrCache:
+    """Cache em disco do diretório, compartilhado neste processo (app e jobs de OCR)"""
+    disco = _discos.get(diretorio)
+    if disco is None:
+        disco = _discos[diretorio] = DiskOcrCache(diretorio, max_bytes, max_entradas)
+    return disco
+
+
+def get_ocr_cache() -> Optional[OcrResultCache]:
+    """
+    Cache de OCR configurado para o app atual: disco e, se a conexão RQ
+    estiver ativa, Redis
+
+    Returns:
+        Optional[OcrResultCache]: None se o cache de OCR estiver desabilitado
+    """
+    from .config import FinanceiroConfig
+    from ..queue import get_redis
+
+    if not FinanceiroConfig.OCR_CACHE_ENABLED:
+        return None
+
+    disco = get_disk_cache(
+        FinanceiroConfig.get_upload_directory('ocr_cache'),
+        FinanceiroConfig.get_ocr_cache_max_bytes(),
+        FinanceiroConfig.get_ocr_cache_max_entradas()
+    )
+
+    camadas: List[OcrResultCache] = [disco]
+    conexao = get_redis()
+    if conexao is not None:
+        camadas.append(RedisOcrCache(conexao, FinanceiroConfig.get_ocr_cache_redis_ttl()))
+    return camadas[0] if len(camadas) == 1 else CamadasOcrCache(camadas)
@@ -1,160 +1,265 @@
 """
-Serviço de OCR simplificado - APENAS Google Vision.
+Serviço de OCR: cache, quota e o motor de OCR configurado para a rota.
 """
-import os
-import json
-import hashlib
-from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from .config import FinanceiroConfig
+from .ocr_backends import cacheavel, get_ocr_backend, unidades_cobradas
+from .ocr_cache import get_ocr_cache
+from .phash_service import ReciboSimilarService
+from .quota_ocr import QuotaOcrService
+from .upload_utils import calculate_file_hash
 from .exceptions import OcrProcessingError
 from .vision_service import VisionOcrService
-from .. import db
-from ..models import OcrQuota
 
 class OcrService:
-    """Serviço de OCR usando APENAS Google Vision API"""
+    """Serviço de OCR sobre os motores de ocr_backends (Google Vision por padrão)"""
 
     @classmethod
-    def _check_quota(cls) -> bool:
+    def resultado_em_cache(cls, sha256: str):
         """
-        Verifica se ainda há quota disponível para OCR no mês atual.
+        Resultado de OCR já obtido para o arquivo com este SHA-256 (sem chamar o Vision).
         Returns:
-            bool: True se há quota disponível, False se atingiu o limite
+            dict | None: Resultado sem erro guardado no cache, se houver
         """
-        if not FinanceiroConfig.is_ocr_limit_enforced():
-            return True
-        
         try:
-            now = datetime.now()
-            ano = now.year
-            mes = now.month
-            
-            # Buscar quota do mês atual
-            quota = OcrQuota.query.filter_by(ano=ano, mes=mes).first()
-            
-            if quota is None:
-                # Criar nova quota para o mês
-                quota = OcrQuota(ano=ano, mes=mes, contador=0)
-                db.session.add(quota)
-                db.session.commit()
-            
-            # Verificar se atingiu o limite
-            limite = FinanceiroConfig.get_ocr_monthly_limit()
-            if quota.contador >= limite:
-                return False
-            
-            return True
-            
-        except Exception as e:
-            print(f"Erro ao verificar quota OCR: {e}")
-            # Em caso de erro, permitir o processamento
-            return True
-    
+            cache = get_ocr_cache()
+            resultado = cache.get(sha256) if cache is not None else None
+        except Exception:
+            return None
+        return resultado if resultado and not resultado.get('error') else None
+
     @classmethod
-    def _increment_quota(cls):
+    def _buscar_similar(cls, file_path: str):
         """
-        Incrementa o contador de quota para o mês atual.
+        Pagamento com comprovante perceptualmente parecido (ver ReciboSimilarService).
+        Returns:
+            dict | None: pagamento_id, pedido_id e distancia do pagamento encontrado
         """
-        if not FinanceiroConfig.is_ocr_limit_enforced():
-            return
-        
+        distancia_maxima = FinanceiroConfig.get_ocr_phash_distancia_maxima()
+        if distancia_maxima < 0:
+            return None
         try:
-            now = datetime.now()
-            ano = now.year
-            mes = now.month
-            
-            # Buscar ou criar quota do mês atual
-            quota = OcrQuota.query.filter_by(ano=ano, mes=mes).first()
-            
-            if quota is None:
-                quota = OcrQuota(ano=ano, mes=mes, contador=1)
-                db.session.add(quota)
-            else:
-                quota.contador += 1
-            
-            db.session.commit()
-            print(f"Quota OCR atualizada: {quota.contador}/{FinanceiroConfig.get_ocr_monthly_limit()}")
-            
+            phash = ReciboSimilarService.calcular(file_path)
+            return ReciboSimilarService.buscar_similar(phash, distancia_maxima) if phash else None
         except Exception as e:
-            print(f"Erro ao incrementar quota OCR: {e}")
+            print(f"Erro ao buscar comprovante similar: {e}")
+            return None
+
+    @staticmethod
+    def _duplicata(similar: Dict) -> Dict:
+        return {chave: similar[chave] for chave in ('pagamento_id', 'pedido_id', 'distancia')}
+
+    @staticmethod
+    def _resultado_sem_quota() -> Dict:
+        return VisionOcrService._resultado_erro(
+            f'Limite mensal de OCR atingido ({FinanceiroConfig.get_ocr_monthly_limit()} chamadas). Tente novamente no próximo mês.'
+        )
 
     @classmethod
-    def process_receipt(cls, file_path: str) -> dict:
+    def _consultar_sem_ocr(cls, file_path: str) -> Tuple[Optional[str], object, Optional[Dict], Optional[Dict]]:
         """
-        Processa um arquivo de recibo usando APENAS Google Vision.
-        Retorna um dicionário com todos os dados encontrados.
+        Etapas anteriores à chamada ao Vision: cache exato, PDF com camada de texto
+        (lido localmente, sem gastar quota) e busca de comprovante quase idêntico (só sinalização).
+        Returns:
+            tuple: (sha256, cache, similar, resultado); resultado vem preenchido
+            quando não é preciso chamar o Vision
         """
+        # Cache endereçado pelo SHA-256 do arquivo, calculado em blocos
+        sha256 = None
         try:
-            # Cache por SHA-256 do arquivo
-            cache_dir = os.path.join(FinanceiroConfig.get_upload_directory('temp'), '..', '.ocr_cache')
+            sha256 = calculate_file_hash(file_path)
+        except Exception:
+            sha256 = None
+
+        cache = None
+        if sha256:
+            try:
+                cache = get_ocr_cache()
+            except Exception:
+                cache = None
+
+        # Verificar cache primeiro (não conta na quota)
+        if cache is not None:
+            cached_result = cache.get(sha256)
+            if cached_result is not None:
+                # Evitar perpetuar respostas com erro genérico que podem ser transitórias
+                if cached_result.get('error'):
+                    cache.delete(sha256)
+                else:
+                    return sha256, cache, None, cached_result
+
+        # PDF gerado pelo app do banco: o texto exato já está no arquivo e vem
+        # antes de qualquer comparação com outros comprovantes
+        local = VisionOcrService.process_pdf_text(file_path)
+
+        # Comprovante parecido com o de um pagamento já registrado: só sinaliza a
+        # possível duplicata; o arquivo novo é lido mesmo assim, porque comprovantes
+        # do mesmo banco com outro valor e outro ID ficam a poucos bits de distância
+        similar = cls._buscar_similar(file_path)
+
+        if local is not None:
+            return sha256, cache, similar, cls._finalizar(sha256, cache, similar, local)
+
+        return sha256, cache, similar, None
+
+    @classmethod
+    def _finalizar(cls, sha256: Optional[str], cache, similar: Optional[Dict], result: Dict) -> Dict:
+        """Grava no cache o resultado do OCR (erros não são guardados) e anexa a possível duplicata"""
+        if cache is not None and cacheavel(result):
             try:
-                os.makedirs(cache_dir, exist_ok=True)
+                cache.set(sha256, result)
             except Exception:
                 pass
+        if similar:
+            result = dict(result, duplicata_provavel=cls._duplicata(similar))
+        return result
 
-            sha256 = None
+    @classmethod
+    def process_receipt(cls, file_path: str) -> dict:
+        """
+        Processa um arquivo de recibo com o motor de OCR da rota.
+        Retorna um dicionário com todos os dados encontrados.
+        """
+        try:
+            sha256, cache, similar, previo = cls._consultar_sem_ocr(file_path)
+            if previo is not None:
+                return previo
+
+            # Reservar a quota antes de processar (só conta em cache miss e em motor pago)
+            backend = get_ocr_backend()
+            reservadas = 1 if backend.usa_quota else 0
+            periodo = QuotaOcrService.periodo()
+            if not QuotaOcrService.reservar(reservadas, periodo):
+                return cls._resultado_sem_quota()
+
+            # Falha (ou leitura por um motor sem quota) devolve a unidade reservada
             try:
-                with open(file_path, 'rb') as f:
-                    file_bytes = f.read()
-                sha256 = hashlib.sha256(file_bytes).hexdigest()
+                result = backend.process_receipt(file_path)
             except Exception:
-                sha256 = None
-
-            cache_path = os.path.join(cache_dir, f"{sha256}.json") if sha256 else None
-
-            # Verificar cache primeiro (não conta na quota)
-            if FinanceiroConfig.OCR_CACHE_ENABLED and sha256 and os.path.exists(cache_path):
-                try:
-                    with open(cache_path, 'r', encoding='utf-8') as cf:
-                        cached_result = json.load(cf)
-                    # Evitar perpetuar respostas com erro genérico que podem ser transitórias
-                    if cached_result.get('error'):
-                        os.remove(cache_path)
-                    else:
-                        return cached_result
-                except Exception:
-                    pass
-
-            # Verificar quota antes de processar (só conta em cache miss)
-            if not cls._check_quota():
-                return {
-                    'amount': None, 
-                    'transaction_id': None,
-                    'date': None,
-                    'bank_info': {},
-                    'error': f'Limite mensal de OCR atingido ({FinanceiroConfig.get_ocr_monthly_limit()} chamadas). Tente novamente no próximo mês.'
-                }
-
-            # Usar APENAS Google Vision
-            result = VisionOcrService.process_receipt(file_path)
-
-            # Gravar cache
-            if FinanceiroConfig.OCR_CACHE_ENABLED and sha256 and cache_path:
-                try:
-                    with open(cache_path, 'w', encoding='utf-8') as cf:
-                        json.dump(result, cf, ensure_ascii=False)
-                except Exception:
-                    pass
-
-            # Incrementar quota após processamento bem-sucedido
-            cls._increment_quota()
-
-            return result
+                QuotaOcrService.devolver(reservadas, periodo)
+                raise
+            QuotaOcrService.devolver(reservadas - unidades_cobradas([result]), periodo)
+
+            return cls._finalizar(sha256, cache, similar, result)
             
         except OcrProcessingError as e:
-            return {
-                'amount': None, 
-                'transaction_id': None,
-                'date': None,
-                'bank_info': {},
-                'error': str(e)
-            }
+            return VisionOcrService._resultado_erro(str(e))
         except Exception as e:
-            return {
-                'amount': None, 
-                'transaction_id': None,
-                'date': None,
-                'bank_info': {},
-                'error': f'Erro inesperado no OCR: {str(e)}'
-            }
+            return VisionOcrService._resultado_erro(f'Erro inesperado no OCR: {str(e)}')
+
+    @classmethod
+    def _separar_pendentes(cls, file_paths: List[str]) -> Tuple[List[Optional[Dict]], List[tuple]]:
+        """Resultados já disponíveis (cache/PDF com texto) e (índice, sha256, cache, similar) dos que exigem OCR"""
+        resultados: List[Optional[Dict]] = [None] * len(file_paths)
+        pendentes = []
+        for indice, file_path in enumerate(file_paths):
+            try:
+                sha256, cache, similar, previo = cls._consultar_sem_ocr(file_path)
+            except Exception as e:
+                resultados[indice] = VisionOcrService._resultado_erro(f'Erro inesperado no OCR: {str(e)}')
+                continue
+            if previo is not None:
+                resultados[indice] = previo
+            else:
+                pendentes.append((indice, sha256, cache, similar))
+        return resultados, pendentes
+
+    @classmethod
+    def process_receipts(cls, file_paths: List[str]) -> List[Dict]:
+        """
+        Processa vários recibos: arquivos em cache (ou PDFs com camada de texto) não
+        vão ao OCR; os demais seguem em chamadas em lote.
+        Retorna um dicionário por arquivo, na mesma ordem, no formato de process_receipt.
+        """
+        resultados, pendentes = cls._separar_pendentes(file_paths)
+        if not pendentes:
+            return resultados
+
+        backend = get_ocr_backend()
+        reservadas = len(pendentes) if backend.usa_quota else 0
+        periodo = QuotaOcrService.periodo()
+        if not QuotaOcrService.reservar(reservadas, periodo):
+            for indice, *_ in pendentes:
+                resultados[indice] = cls._resultado_sem_quota()
+            return resultados
+
+        try:
+            extraidos = backend.process_receipts_batch([file_paths[indice] for indice, *_ in pendentes])
+        except Exception:
+            QuotaOcrService.devolver(reservadas, periodo)
+            raise
+        QuotaOcrService.devolver(reservadas - unidades_cobradas(extraidos), periodo)
+
+        for (indice, sha256, cache, similar), result in zip(pendentes, extraidos):
+            resultados[indice] = cls._finalizar(sha256, cache, similar, result)
+        return resultados
+
+    @staticmethod
+    def _resultado_ocupado() -> Dict:
+        return VisionOcrService._resultado_erro('Fila de OCR ocupada no momento. Tente novamente em instantes.')
+
+    @classmethod
+    def agendar_receipts(cls, file_paths: List[str]) -> Tuple[List[Optional[Dict]], Optional[str]]:
+        """
+        Versão assíncrona de process_receipts: responde na hora os arquivos em cache e
+        envia os demais num único job de OCR (fila RQ ou, sem Redis, pool de threads
+        local), que grava os resultados no cache em disco e remove os arquivos ao terminar.
+        Se o job não puder ser criado, os pendentes voltam com erro, sem OCR síncrono.
+        Returns:
+            tuple: (resultados, job_id); resultados tem None nas posições enviadas ao job
+        """
+        from ..queue import enqueue_ocr_lote_job
+
+        resultados, pendentes = cls._separar_pendentes(file_paths)
+        if not pendentes:
+            return resultados, None
+
+        # A quota é reservada no envio; o job devolve as unidades dos arquivos que falharem
+        backend = get_ocr_backend()
+        reservadas = len(pendentes) if backend.usa_quota else 0
+        periodo = QuotaOcrService.periodo()
+        if not QuotaOcrService.reservar(reservadas, periodo):
+            for indice, *_ in pendentes:
+                resultados[indice] = cls._resultado_sem_quota()
+            return resultados, None
+
+        job_id = enqueue_ocr_lote_job(
+            [file_paths[indice] for indice, *_ in pendentes],
+            FinanceiroConfig.get_upload_directory('ocr_cache') if FinanceiroConfig.OCR_CACHE_ENABLED else None,
+            [cls._duplicata(similar) if similar else None for *_, similar in pendentes],
+            periodo if reservadas else None,
+            backend.nome
+        )
+        if job_id is None:
+            QuotaOcrService.devolver(reservadas, periodo)
+            for indice, *_ in pendentes:
+                resultados[indice] = cls._resultado_ocupado()
+            return resultados, None
+
+        return resultados, job_id
+
+    @classmethod
+    def agendar_receipt(cls, file_path: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Versão assíncrona de process_receipt (ver agendar_receipts).
+        Returns:
+            tuple: (resultado, job_id); resultado é None quando o arquivo foi enviado ao job
+        """
+        resultados, job_id = cls.agendar_receipts([file_path])
+        return resultados[0], job_id
+
+    @classmethod
+    def resultado_do_job(cls, status: Dict) -> Optional[Dict]:
+        """
+        Resultado de OCR do primeiro arquivo de um job de agendar_receipt(s).
+        Returns:
+            dict | None: None enquanto o job não terminou
+        """
+        if status.get('status') == 'finished':
+            resultado = status.get('result') or {}
+            if resultado.get('success'):
+                return resultado['data']['resultados'][0]
+            return VisionOcrService._resultado_erro(resultado.get('error') or 'Erro inesperado no OCR')
+        if status.get('status') in ('failed', 'stopped', 'canceled'):
+            return VisionOcrService._resultado_erro(f"Erro inesperado no OCR: {status.get('error')}")
+        return None
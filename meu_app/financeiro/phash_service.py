@@ -0,0 +1,121 @@
+"""
+Detecção de comprovantes quase idênticos por hash perceptual (dHash)
+
+O mesmo comprovante fotografado de novo, recapturado em tela ou reexportado
+tem outro SHA-256, mas o dHash de 64 bits da imagem reduzida em tons de cinza
+muda poucos bits. Os hashes ficam em Pagamento.recibo_phash.
+
+Comprovantes diferentes do mesmo banco (mesmo layout, outro valor e outro ID)
+também ficam a poucos bits: a busca serve só para sinalizar a possível
+duplicata, nunca para substituir a leitura do arquivo.
+"""
+from typing import Dict, Optional
+
+from PIL import Image
+
+try:
+    import fitz  # PyMuPDF: renderiza a primeira página de PDFs
+except ImportError:
+    fitz = None
+
+from ..models import Pagamento
+
+
+# Lado da imagem reduzida: (LARGURA + 1) x LARGURA pixels -> LARGURA² bits
+LARGURA = 8
+
+
+def contar_bits(valor: int) -> int:
+    """Bits 1 de um inteiro não negativo (int.bit_count só existe a partir do Python 3.10)"""
+    return bin(valor).count('1')
+
+
+class ReciboSimilarService:
+    """Hash perceptual de comprovantes e busca do pagamento mais parecido"""
+
+    @staticmethod
+    def _imagem(file_path: str) -> Optional[Image.Image]:
+        if file_path.lower().endswith('.pdf'):
+            if fitz is None:
+                return None
+            with fitz.open(file_path) as documento:
+                pagina = documento[0]
+                escala = 256 / max(pagina.rect.width, pagina.rect.height)
+                pixmap = pagina.get_pixmap(matrix=fitz.Matrix(escala, escala), alpha=False,
+                                           colorspace=fitz.csGRAY)
+                return Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+        with Image.open(file_path) as imagem:
+            imagem.draft('L', (256, 256))  # JPEG: decodifica já reduzido
+            return imagem.convert('L')
+
+    @staticmethod
+    def calcular(file_path: str) -> Optional[str]:
+        """
+        Calcula o dHash do comprovante
+
+        Cada bit indica se um pixel é mais claro que o vizinho à direita na
+        imagem reduzida para 9x8 em tons de cinza.
+
+        Args:
+            file_path: Caminho da imagem ou PDF
+
+        Returns:
+            Optional[str]: Hash em 16 dígitos hexadecimais, ou None se o arquivo
+            não puder ser renderizado (ex.: PDF sem PyMuPDF instalado)
+        """
+        try:
+            imagem = ReciboSimilarService._imagem(file_path)
+        except Exception:
+            return None
+        if imagem is None:
+            return None
+
+        pixels = imagem.resize((LARGURA + 1, LARGURA), Image.Resampling.LANCZOS).tobytes()
+        bits = 0
+        for linha in range(LARGURA):
+            inicio = linha * (LARGURA + 1)
+            for coluna in range(LARGURA):
+                bits = (bits << 1) | (pixels[inicio + coluna] > pixels[inicio + coluna + 1])
+        return f"{bits:0{LARGURA * LARGURA // 4}x}"
+
+    @staticmethod
+    def distancia(phash_a: str, phash_b: str) -> int:
+        """Distância de Hamming entre dois hashes hexadecimais"""
+        return contar_bits(int(phash_a, 16) ^ int(phash_b, 16))
+
+    @staticmethod
+    def buscar_similar(phash: str, distancia_maxima: int) -> Optional[Dict]:
+        """
+        Busca o pagamento com o comprovante mais parecido
+
+        Lê só (id, pedido_id, recibo_phash) dos pagamentos com hash e compara em
+        memória; hashes gravados fora do formato hexadecimal são ignorados.
+
+        Args:
+            phash: Hash do comprovante recebido
+            distancia_maxima: Maior distância de Hamming aceita como duplicata
+
+        Returns:
+            Optional[Dict]: pagamento_id, pedido_id e distancia
+        """
+        alvo = int(phash, 16)
+        melhor, melhor_distancia = None, distancia_maxima + 1
+        for pagamento_id, pedido_id, outro in Pagamento.query.with_entities(
+            Pagamento.id, Pagamento.pedido_id, Pagamento.recibo_phash
+        ).filter(Pagamento.recibo_phash.isnot(None)):
+            try:
+                distancia = contar_bits(alvo ^ int(outro, 16))
+            except ValueError:
+                continue
+            if distancia < melhor_distancia:
+                melhor, melhor_distancia = (pagamento_id, pedido_id), distancia
+                if distancia == 0:
+                    break
+
+        if melhor is None:
+            return None
+        return {
+            'pagamento_id': melhor[0],
+            'pedido_id': melhor[1],
+            'distancia': melhor_distancia
+        }
@@ -0,0 +1,102 @@
+"""
+Pré-processamento local das imagens de comprovantes antes do envio ao Vision
+
+Fotos de celular chegam com vários megapixels que não melhoram o OCR: a imagem
+é girada conforme o EXIF, reduzida até o maior lado configurado, convertida
+para tons de cinza e recodificada em JPEG, só em memória. O arquivo original
+não muda, então o cache de OCR continua endereçado pelo SHA-256 dele.
+"""
+import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+from .config import FinanceiroConfig
+
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+
+# Pillow libera o GIL ao decodificar, redimensionar e codificar: threads bastam
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FinanceiroConfig.get_ocr_preprocessamento_threads(),
+                                       thread_name_prefix='ocr-imagem')
+        return _pool
+
+
+class PreprocessadorImagem:
+    """Prepara imagens de comprovantes para o OCR"""
+
+    @staticmethod
+    def preparar(file_path: str, lado_maximo: Optional[int] = None, qualidade: Optional[int] = None) -> Optional[bytes]:
+        """
+        Imagem pronta para o Vision: orientação do EXIF aplicada, maior lado limitado,
+        tons de cinza e JPEG
+
+        Args:
+            file_path: Caminho da imagem
+            lado_maximo: Maior lado em pixels (padrão: configuração)
+            qualidade: Qualidade do JPEG (padrão: configuração)
+
+        Returns:
+            Optional[bytes]: JPEG gerado, ou None se o arquivo não for uma imagem
+            legível ou se o resultado não ficar menor que o original
+        """
+        if os.path.splitext(file_path)[1].lower() not in EXTENSOES_IMAGEM:
+            return None
+        lado_maximo = lado_maximo or FinanceiroConfig.get_ocr_imagem_lado_maximo()
+        qualidade = qualidade or FinanceiroConfig.get_ocr_imagem_qualidade()
+
+        try:
+            tamanho_original = os.path.getsize(file_path)
+            with Image.open(file_path) as imagem:
+                # JPEG: decodifica já reduzido, sem o maior lado ficar abaixo do pedido
+                escala = lado_maximo / max(imagem.size)
+                if escala < 1:
+                    imagem.draft('L', (math.ceil(imagem.width * escala), math.ceil(imagem.height * escala)))
+                imagem = ImageOps.exif_transpose(imagem).convert('L')
+            imagem.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+
+            saida = io.BytesIO()
+            imagem.save(saida, 'JPEG', quality=qualidade)
+        except Exception as e:
+            print(f"Pré-processamento ignorado ({os.path.basename(file_path)}): {e}")
+            return None
+
+        conteudo = saida.getvalue()
+        return conteudo if len(conteudo) < tamanho_original else None
+
+    @staticmethod
+    def conteudo(file_path: str) -> bytes:
+        """Bytes a enviar ao Vision: a imagem pré-processada ou, se não valer a pena, o arquivo original"""
+        if FinanceiroConfig.ocr_preprocessamento_habilitado():
+            preparado = PreprocessadorImagem.preparar(file_path)
+            if preparado is not None:
+                return preparado
+        with open(file_path, 'rb') as arquivo:
+            return arquivo.read()
+
+    @staticmethod
+    def preparar_lote(file_paths: List[str]) -> List[Optional[bytes]]:
+        """
+        Pré-processa várias imagens em paralelo no pool de threads
+
+        Returns:
+            List[Optional[bytes]]: Um item por arquivo, na mesma ordem (None = enviar o original)
+        """
+        if not file_paths or not FinanceiroConfig.ocr_preprocessamento_habilitado():
+            return [None] * len(file_paths)
+        if len(file_paths) == 1:
+            return [PreprocessadorImagem.preparar(file_paths[0])]
+        return list(_get_pool().map(PreprocessadorImagem.preparar, file_paths))
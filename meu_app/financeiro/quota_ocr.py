@@ -0,0 +1,174 @@
+"""
+Quota mensal de OCR com reserva atômica
+
+A unidade é reservada antes da chamada ao Vision e devolvida se ela falhar.
+Com Redis, o contador do mês é uma chave incrementada por um script Lua
+(INCRBY e, se passar do limite, DECRBY na mesma operação), sem ir ao banco a
+cada OCR; a tabela OcrQuota é atualizada periodicamente para os relatórios.
+Sem Redis, a reserva é um único UPDATE condicional na linha do mês.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from .config import FinanceiroConfig
+from .repositories import OcrQuotaRepository
+
+
+_PREFIXO_CHAVE = 'ocr:quota:'
+_CHAVE_TTL = 62 * 24 * 3600  # o mês corrente e o anterior, para a última sincronização
+
+# Soma ARGV[1] e desfaz se passar do limite ARGV[2]; retorna o total ou -1 (recusado)
+_SCRIPT_RESERVAR = """
+local total = redis.call('INCRBY', KEYS[1], ARGV[1])
+if total > tonumber(ARGV[2]) then
+    redis.call('DECRBY', KEYS[1], ARGV[1])
+    return -1
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return total
+"""
+
+# Desconta ARGV[1] sem deixar o contador negativo
+_SCRIPT_DEVOLVER = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local novo = redis.call('DECRBY', KEYS[1], ARGV[1])
+if novo < 0 then
+    novo = redis.call('INCRBY', KEYS[1], -novo)
+end
+return novo
+"""
+
+# Chaves do Redis já iniciadas com o contador do banco neste processo
+_chaves_iniciadas = set()
+_ultima_sincronizacao = {}
+_lock = threading.Lock()
+
+
+class QuotaOcrService:
+    """Reserva, devolução e sincronização da quota mensal de OCR"""
+
+    @staticmethod
+    def periodo(agora: Optional[datetime] = None) -> Tuple[int, int]:
+        """(ano, mês) da quota; guarde-o na reserva para devolver no mesmo mês"""
+        agora = agora or datetime.now()
+        return agora.year, agora.month
+
+    @staticmethod
+    def chave(periodo: Tuple[int, int]) -> str:
+        ano, mes = periodo
+        return f'{_PREFIXO_CHAVE}{ano:04d}-{mes:02d}'
+
+    @staticmethod
+    def _redis():
+        from ..queue import get_redis
+        return get_redis()
+
+    @classmethod
+    def reservar(cls, quantidade: int = 1, periodo: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Reserva unidades da quota do mês antes da chamada ao Vision.
+
+        Returns:
+            bool: False se a reserva passaria do limite mensal (nada é reservado)
+        """
+        if not FinanceiroConfig.is_ocr_limit_enforced() or quantidade <= 0:
+            return True
+        periodo = periodo or cls.periodo()
+        limite = FinanceiroConfig.get_ocr_monthly_limit()
+
+        try:
+            conexao = cls._redis()
+            if conexao is None:
+                return OcrQuotaRepository().reservar(*periodo, quantidade, limite)
+
+            chave = cls.chave(periodo)
+            cls._iniciar_chave(conexao, chave, periodo)
+            total = conexao.eval(_SCRIPT_RESERVAR, 1, chave, quantidade, limite, _CHAVE_TTL)
+            cls._sincronizar_se_preciso(periodo)
+            return int(total) >= 0
+        except Exception as e:
+            print(f"Erro ao reservar quota OCR: {e}")
+            # Em caso de erro, permitir o processamento
+            return True
+
+    @classmethod
+    def devolver(cls, quantidade: int = 1, periodo: Optional[Tuple[int, int]] = None, conexao=None):
+        """
+        Devolve unidades reservadas cuja chamada ao Vision falhou.
+
+        Args:
+            quantidade: Unidades a devolver
+            periodo: (ano, mês) da reserva
+            conexao: Conexão Redis a usar (no worker RQ, a do job); padrão: a do app
+        """
+        if not FinanceiroConfig.is_ocr_limit_enforced() or quantidade <= 0:
+            return
+        periodo = periodo or cls.periodo()
+
+        try:
+            conexao = conexao if conexao is not None else cls._redis()
+            if conexao is None:
+                OcrQuotaRepository().devolver(*periodo, quantidade)
+            else:
+                conexao.eval(_SCRIPT_DEVOLVER, 1, cls.chave(periodo), quantidade)
+        except Exception as e:
+            print(f"Erro ao devolver quota OCR: {e}")
+
+    @classmethod
+    def consumo(cls, periodo: Optional[Tuple[int, int]] = None) -> int:
+        """Unidades usadas no mês, pelo contador em vigor (Redis ou banco)"""
+        periodo = periodo or cls.periodo()
+        conexao = cls._redis()
+        if conexao is not None:
+            valor = conexao.get(cls.chave(periodo))
+            if valor is not None:
+                return int(valor)
+        return OcrQuotaRepository().obter_contador_mensal(*periodo)
+
+    @classmethod
+    def sincronizar(cls, periodo: Optional[Tuple[int, int]] = None) -> Optional[int]:
+        """
+        Grava em OcrQuota o contador do Redis, para os relatórios.
+
+        Returns:
+            Optional[int]: Contador gravado, ou None sem Redis (o banco já é o contador)
+        """
+        periodo = periodo or cls.periodo()
+        conexao = cls._redis()
+        if conexao is None:
+            return None
+        valor = conexao.get(cls.chave(periodo))
+        if valor is None:
+            return None
+        OcrQuotaRepository().definir_contador(*periodo, int(valor))
+        with _lock:
+            _ultima_sincronizacao[periodo] = time.monotonic()
+        return int(valor)
+
+    @classmethod
+    def _iniciar_chave(cls, conexao, chave: str, periodo: Tuple[int, int]):
+        """Na primeira reserva do mês neste processo, parte do contador do banco (se a chave ainda não existe)"""
+        if chave in _chaves_iniciadas:
+            return
+        contador = OcrQuotaRepository().obter_contador_mensal(*periodo)
+        conexao.set(chave, contador, nx=True, ex=_CHAVE_TTL)
+        with _lock:
+            _chaves_iniciadas.add(chave)
+            _ultima_sincronizacao.setdefault(periodo, time.monotonic())
+
+    @classmethod
+    def _sincronizar_se_preciso(cls, periodo: Tuple[int, int]):
+        intervalo = FinanceiroConfig.get_ocr_quota_sincronizar_segundos()
+        with _lock:
+            if time.monotonic() - _ultima_sincronizacao.get(periodo, 0) < intervalo:
+                return
+            # Marca antes de sincronizar: as outras threads não repetem a gravação
+            _ultima_sincronizacao[periodo] = time.monotonic()
+        try:
+            cls.sincronizar(periodo)
+        except Exception as e:
+            print(f"Erro ao sincronizar quota OCR: {e}")
@@ -5,7 +5,8 @@ Implementa o padrão Repository para acesso a dados financeiros.
 """
 
 from typing import List, Optional
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import datetime
 from ..models import db, Pagamento, OcrQuota
 
@@ -150,6 +151,66 @@ class OcrQuotaRepository:
             print(f"Erro ao incrementar contador OCR: {str(e)}")
             return False
     
+    def reservar(self, ano: int, mes: int, quantidade: int, limite: int) -> bool:
+        """
+        Soma quantidade ao contador do mês numa única instrução, só se o total
+        não passar do limite; processos concorrentes não ultrapassam o limite.
+        
+        Returns:
+            True se reservado, False se o limite seria ultrapassado
+        """
+        soma = OcrQuota.contador + quantidade
+        if self._atualizar(ano, mes, soma, soma <= limite):
+            return True
+        if quantidade > limite:
+            return False
+        # Primeiro uso no mês; se outro processo criou a linha antes, tenta a soma de novo
+        if self._criar_periodo(ano, mes, quantidade):
+            return True
+        return self._atualizar(ano, mes, soma, soma <= limite)
+    
+    def devolver(self, ano: int, mes: int, quantidade: int) -> bool:
+        """Desconta quantidade do contador do mês, sem deixá-lo negativo."""
+        return self._atualizar(ano, mes, OcrQuota.contador - quantidade, OcrQuota.contador >= quantidade)
+    
+    def definir_contador(self, ano: int, mes: int, contador: int) -> bool:
+        """Grava o contador do mês (sincronização a partir de um contador externo)."""
+        return (self._atualizar(ano, mes, contador)
+                or self._criar_periodo(ano, mes, contador)
+                or self._atualizar(ano, mes, contador))
+    
+    def _atualizar(self, ano: int, mes: int, contador, condicao=None) -> bool:
+        """UPDATE atômico da linha do mês (contador pode ser uma expressão sobre o atual), se a condição valer."""
+        filtros = [OcrQuota.ano == ano, OcrQuota.mes == mes]
+        if condicao is not None:
+            filtros.append(condicao)
+        try:
+            resultado = self.db.session.execute(
+                update(OcrQuota)
+                .where(*filtros)
+                .values(contador=contador, data_atualizacao=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            self.db.session.commit()
+            return resultado.rowcount > 0
+        except SQLAlchemyError:
+            self.db.session.rollback()
+            raise
+    
+    def _criar_periodo(self, ano: int, mes: int, contador: int) -> bool:
+        """
+        Cria a linha do mês; False se ela já existe (uq_ocr_quota_ano_mes),
+        inclusive quando outro processo a criou ao mesmo tempo.
+        """
+        try:
+            with self.db.session.begin_nested():
+                self.db.session.add(OcrQuota(ano=ano, mes=mes, contador=contador))
+            self.db.session.commit()
+            return True
+        except IntegrityError:
+            self.db.session.rollback()
+            return False
+    
     def obter_contador_mensal(self, ano: int, mes: int) -> int:
         """
         Obtém contador atual do mês.
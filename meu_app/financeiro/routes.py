@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, session, jsonify, send_from_directory, send_file, abort, Response
 import os
+import json
 
 financeiro_bp = Blueprint('financeiro', __name__, url_prefix='/financeiro')
 from .services import FinanceiroService
@@ -8,6 +9,10 @@ from ..decorators import login_obrigatorio, permissao_necessaria, admin_necessar
 from app.auth.rbac import requires_financeiro
 from ..upload_security import FileUploadValidator
 from .ocr_service import OcrService
+from .conciliacao_service import ConciliacaoService
+from .miniatura_service import MiniaturaService
+from .phash_service import ReciboSimilarService
+from ..models import Pagamento
 from .config import FinanceiroConfig
 from .exceptions import (
     FinanceiroValidationError, 
@@ -30,16 +35,18 @@ def listar_financeiro():
         tipo = request.args.get('filtro', 'pendentes')
         mes = request.args.get('mes', '')
         ano = request.args.get('ano', '')
+        page = request.args.get('page', 1, type=int)
         
-        pedidos = FinanceiroService.listar_pedidos_financeiro(tipo, mes, ano)
+        resultado = FinanceiroService.listar_pedidos_financeiro(tipo, mes, ano, page=page)
         
         current_app.logger.info(f"Financeiro acessado por {session.get('usuario_nome', 'N/A')}")
         
-        return render_template('financeiro.html', pedidos=pedidos, filtro=tipo, mes=mes, ano=ano)
+        return render_template('financeiro.html', pedidos=resultado['pedidos'], paginacao=resultado,
+                               filtro=tipo, mes=mes, ano=ano)
     except Exception as e:
         current_app.logger.error(f"Erro ao listar financeiro: {str(e)}")
         flash(f"Erro ao carregar dados financeiros: {str(e)}", 'error')
-        return render_template('financeiro.html', pedidos=[], filtro='pendentes')
+        return render_template('financeiro.html', pedidos=[], paginacao=None, filtro='pendentes')
 
 @financeiro_bp.route('/exportar', methods=['GET'])
 @login_obrigatorio
@@ -59,6 +66,22 @@ def exportar_financeiro():
         current_app.logger.error(f"Erro ao exportar financeiro: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@financeiro_bp.route('/aging', methods=['GET'])
+@login_obrigatorio
+@requires_financeiro
+@permissao_necessaria('acesso_financeiro')
+def aging_recebiveis():
+    """Aging dos saldos em aberto por cliente"""
+    data_referencia = request.args.get('data', '') or None
+    rotulos = {chave: rotulo for chave, rotulo, _ in FinanceiroService.FAIXAS_AGING}
+    rotulos['acima_60'] = 'Acima de 60 dias'
+    
+    relatorio = FinanceiroService.relatorio_aging(data_referencia)
+    
+    current_app.logger.info(f"Aging de recebíveis acessado por {session.get('usuario_nome', 'N/A')}")
+    
+    return render_template('aging_recebiveis.html', relatorio=relatorio, rotulos=rotulos)
+
 @financeiro_bp.route('/pagamento/<int:pedido_id>', methods=['GET', 'POST'])
 @login_obrigatorio
 @permissao_necessaria('acesso_financeiro')
@@ -117,11 +140,15 @@ def registrar_pagamento(pedido_id):
                 recibo.save(file_path)
                 caminho_recibo = secure_name # Salva apenas o nome do arquivo
 
-                # Anexar metadados na sessão (usaremos ao chamar o serviço)
+                # Anexar metadados na sessão (usaremos ao chamar o serviço);
+                # hash perceptual e OCR já feito alimentam a busca de comprovantes repetidos
+                ocr = OcrService.resultado_em_cache(sha256)
                 request.recibo_meta = {
                     'recibo_mime': metadata.get('mime_type') if metadata else None,
                     'recibo_tamanho': tamanho,
-                    'recibo_sha256': sha256
+                    'recibo_sha256': sha256,
+                    'recibo_phash': ReciboSimilarService.calcular(file_path),
+                    'ocr_json': json.dumps(ocr, ensure_ascii=False) if ocr else None
                 }
             except Exception as e:
                 flash(f"Erro ao salvar o arquivo de recibo: {str(e)}", 'error')
@@ -145,6 +172,8 @@ def registrar_pagamento(pedido_id):
                 recibo_mime=(getattr(request, 'recibo_meta', {}) or {}).get('recibo_mime'),
                 recibo_tamanho=(getattr(request, 'recibo_meta', {}) or {}).get('recibo_tamanho'),
                 recibo_sha256=(getattr(request, 'recibo_meta', {}) or {}).get('recibo_sha256'),
+                recibo_phash=(getattr(request, 'recibo_meta', {}) or {}).get('recibo_phash'),
+                ocr_json=(getattr(request, 'recibo_meta', {}) or {}).get('ocr_json'),
                 id_transacao=id_transacao,
                 # NOVOS DADOS EXTRAÍDOS DO COMPROVANTE
                 data_comprovante=data_comprovante if data_comprovante else None,
@@ -197,10 +226,67 @@ def ver_recibo(filename):
     directory = FinanceiroConfig.get_upload_directory('recibos')
     return send_from_directory(directory, filename, as_attachment=False)
 
+def _resposta_ocr(ocr_results):
+    """Dados do OCR no formato esperado pelo formulário de pagamento"""
+    response_data = {
+        'valor_encontrado': ocr_results.get('amount'),
+        'id_transacao_encontrado': ocr_results.get('transaction_id'),
+        # NOVOS DADOS EXTRAÍDOS
+        'data_encontrada': ocr_results.get('date'),
+        'banco_emitente': ocr_results.get('bank_info', {}).get('banco_emitente'),
+        'agencia_recebedor': ocr_results.get('bank_info', {}).get('agencia_recebedor'),
+        'conta_recebedor': ocr_results.get('bank_info', {}).get('conta_recebedor'),
+        'chave_pix_recebedor': ocr_results.get('bank_info', {}).get('chave_pix_recebedor'),
+        # NOVO: Dados do recebedor (validação)
+        'nome_recebedor': ocr_results.get('bank_info', {}).get('nome_recebedor'),
+        'cnpj_recebedor': ocr_results.get('bank_info', {}).get('cnpj_recebedor'),
+        'validacao_recebedor': ocr_results.get('validacao_recebedor'),  # NOVO
+        'duplicata_provavel': ocr_results.get('duplicata_provavel'),
+        'ocr_status': 'success'  # Indicar que OCR funcionou
+    }
+
+    # Se OCR retornou erro, marcar como falha mas não bloquear
+    if ocr_results.get('error'):
+        response_data['ocr_status'] = 'failed'
+        response_data['ocr_error'] = ocr_results.get('error')
+        response_data['ocr_message'] = 'OCR indisponível - digite os dados manualmente'
+    else:
+        response_data['ocr_message'] = 'Dados extraídos automaticamente!'
+
+    return response_data
+
+
+def _resposta_ocr_indisponivel():
+    return {
+        'valor_encontrado': None,
+        'id_transacao_encontrado': None,
+        'data_encontrada': None,
+        'banco_emitente': None,
+        'agencia_recebedor': None,
+        'conta_recebedor': None,
+        'chave_pix_recebedor': None,
+        'ocr_status': 'failed',
+        'ocr_message': 'OCR temporariamente indisponível - digite os dados manualmente'
+    }
+
+def _resposta_ocr_na_fila(job_id):
+    return {
+        'ocr_status': 'queued',
+        'ocr_message': 'Conferindo comprovante...',
+        'job_id': job_id,
+        'resultado_url': url_for('financeiro.resultado_recibo_ocr', job_id=job_id)
+    }
+
 @financeiro_bp.route('/processar-recibo-ocr', methods=['POST'])
 @login_obrigatorio
 def processar_recibo_ocr():
-    """Processa o upload de um recibo com OCR para encontrar valor e ID da transação."""
+    """
+    Processa o upload de um recibo com OCR para encontrar valor e ID da transação.
+    
+    Arquivos em cache respondem na hora; os demais vão para um job de OCR (fila
+    RQ ou pool de threads local) e a resposta 202 traz a resultado_url, consultada
+    pelo navegador em intervalos até o resultado sair.
+    """
     if 'recibo' not in request.files:
         return jsonify({'error': 'Nenhum arquivo de recibo enviado'}), 400
 
@@ -220,65 +306,128 @@ def processar_recibo_ocr():
     secure_name = FileUploadValidator.generate_secure_filename(recibo.filename, 'temp_recibo_ocr')
     upload_dir = FinanceiroConfig.get_upload_directory('temp')
     file_path = os.path.join(upload_dir, secure_name)
+    job_id = None
 
     try:
         recibo.save(file_path)
 
         # CORREÇÃO: OCR opcional e não bloqueante
         try:
-            # Tentar processar com OCR
-            ocr_results = OcrService.process_receipt(file_path)
-            
-            # Preparar dados para o frontend
-            response_data = {
-                'valor_encontrado': ocr_results.get('amount'),
-                'id_transacao_encontrado': ocr_results.get('transaction_id'),
-                # NOVOS DADOS EXTRAÍDOS
-                'data_encontrada': ocr_results.get('date'),
-                'banco_emitente': ocr_results.get('bank_info', {}).get('banco_emitente'),
-                'agencia_recebedor': ocr_results.get('bank_info', {}).get('agencia_recebedor'),
-                'conta_recebedor': ocr_results.get('bank_info', {}).get('conta_recebedor'),
-                'chave_pix_recebedor': ocr_results.get('bank_info', {}).get('chave_pix_recebedor'),
-                # NOVO: Dados do recebedor (validação)
-                'nome_recebedor': ocr_results.get('bank_info', {}).get('nome_recebedor'),
-                'cnpj_recebedor': ocr_results.get('bank_info', {}).get('cnpj_recebedor'),
-                'validacao_recebedor': ocr_results.get('validacao_recebedor'),  # NOVO
-                'ocr_status': 'success'  # Indicar que OCR funcionou
-            }
-
-            # Se OCR retornou erro, marcar como falha mas não bloquear
-            if ocr_results.get('error'):
-                response_data['ocr_status'] = 'failed'
-                response_data['ocr_error'] = ocr_results.get('error')
-                response_data['ocr_message'] = 'OCR indisponível - digite os dados manualmente'
-            else:
-                response_data['ocr_message'] = 'Dados extraídos automaticamente!'
-                
+            ocr_results, job_id = OcrService.agendar_receipt(file_path)
         except Exception as ocr_error:
             # Se OCR falhar completamente, retornar resposta vazia mas não erro
             current_app.logger.warning(f"OCR falhou, mas sistema continua funcionando: {str(ocr_error)}")
-            response_data = {
-                'valor_encontrado': None,
-                'id_transacao_encontrado': None,
-                'data_encontrada': None,
-                'banco_emitente': None,
-                'agencia_recebedor': None,
-                'conta_recebedor': None,
-                'chave_pix_recebedor': None,
-                'ocr_status': 'failed',
-                'ocr_message': 'OCR temporariamente indisponível - digite os dados manualmente'
-            }
-
-        return jsonify(response_data)
+            return jsonify(_resposta_ocr_indisponivel())
+
+        if job_id:
+            return jsonify(_resposta_ocr_na_fila(job_id)), 202
+        return jsonify(_resposta_ocr(ocr_results))
 
     except Exception as e:
         current_app.logger.error(f"Erro no processamento OCR: {str(e)}")
         return jsonify({'error': 'Erro interno ao processar o arquivo.'}), 500
     finally:
-        # Limpar o arquivo temporário
-        if os.path.exists(file_path):
+        # Limpar o arquivo temporário (o enviado ao job é removido pelo próprio job)
+        if not job_id and os.path.exists(file_path):
             os.remove(file_path)
 
+@financeiro_bp.route('/processar-recibo-ocr/<job_id>', methods=['GET'])
+@login_obrigatorio
+def resultado_recibo_ocr(job_id):
+    """
+    Resultado do OCR enviado por processar_recibo_ocr.
+    
+    Responde na hora, ou espera até ?espera= segundos (limitado por FinanceiroConfig)
+    o job terminar: 200 com os dados do comprovante, 202 se ainda na fila ou 404 se
+    o job não existe.
+    """
+    from ..queue import aguardar_job
+
+    maximo = FinanceiroConfig.get_ocr_long_poll_segundos()
+    espera = max(0.0, min(request.args.get('espera', 0.0, type=float), maximo))
+    status = aguardar_job(job_id, espera)
+
+    ocr_results = OcrService.resultado_do_job(status)
+    if ocr_results is not None:
+        return jsonify(_resposta_ocr(ocr_results))
+    if status.get('status') in ('queued', 'started', 'deferred', 'scheduled'):
+        return jsonify(_resposta_ocr_na_fila(job_id)), 202
+    if status.get('status') == 'unavailable':
+        return jsonify(_resposta_ocr_indisponivel())
+    return jsonify({'error': 'Job de OCR não encontrado'}), 404
+
+@financeiro_bp.route('/processar-recibos-ocr', methods=['POST'])
+@login_obrigatorio
+@permissao_necessaria('acesso_financeiro')
+def processar_recibos_ocr():
+    """
+    OCR de vários recibos num único upload (campo 'recibos').
+    
+    Arquivos já processados saem do cache; os demais vão ao Vision em chamadas
+    em lote. Com ?assincrono=1, os pendentes seguem num job (fila RQ ou pool de
+    threads local) e a resposta traz o job_id (status em /jobs/<job_id>).
+    """
+    recibos = [r for r in request.files.getlist('recibos') if r and r.filename]
+    if not recibos:
+        return jsonify({'error': 'Nenhum arquivo de recibo enviado'}), 400
+    
+    maximo = FinanceiroConfig.get_ocr_lote_max_arquivos()
+    if len(recibos) > maximo:
+        return jsonify({'error': f'Envie no máximo {maximo} arquivos por vez'}), 400
+    
+    upload_dir = FinanceiroConfig.get_upload_directory('temp')
+    arquivos, erros = [], {}
+    for indice, recibo in enumerate(recibos):
+        is_valid, error_msg, _ = FileUploadValidator.validate_file(recibo, 'document')
+        if not is_valid:
+            is_valid, error_msg, _ = FileUploadValidator.validate_file(recibo, 'image')
+        if not is_valid:
+            erros[indice] = f"Arquivo inválido: {error_msg}"
+            continue
+        file_path = os.path.join(upload_dir, FileUploadValidator.generate_secure_filename(recibo.filename, 'temp_recibo_ocr'))
+        recibo.save(file_path)
+        arquivos.append((indice, file_path))
+    
+    caminhos = [file_path for _, file_path in arquivos]
+    enviados_ao_job = set()
+    job_id = None
+    try:
+        if request.args.get('assincrono') == '1':
+            ocr_results, job_id = OcrService.agendar_receipts(caminhos)
+            if job_id:
+                enviados_ao_job = {caminho for caminho, resultado in zip(caminhos, ocr_results) if resultado is None}
+        else:
+            ocr_results = OcrService.process_receipts(caminhos)
+    except Exception as e:
+        current_app.logger.error(f"Erro no OCR em lote: {str(e)}")
+        ocr_results = [{'error': 'OCR temporariamente indisponível'} for _ in caminhos]
+    finally:
+        # Os arquivos enviados ao job são removidos pelo próprio job
+        for file_path in caminhos:
+            if file_path not in enviados_ao_job and os.path.exists(file_path):
+                os.remove(file_path)
+    
+    resultados = []
+    por_indice = dict(zip((indice for indice, _ in arquivos), ocr_results))
+    for indice, recibo in enumerate(recibos):
+        item = {'arquivo': recibo.filename}
+        if indice in erros:
+            item['error'] = erros[indice]
+        elif por_indice[indice] is None:
+            item['ocr_status'] = 'queued'
+        else:
+            item.update(_resposta_ocr(por_indice[indice]))
+        resultados.append(item)
+    
+    current_app.logger.info(f"OCR em lote: {len(recibos)} arquivos por {session.get('usuario_nome', 'N/A')}")
+    
+    resposta = {'resultados': resultados}
+    if job_id:
+        resposta['job_id'] = job_id
+        resposta['status_url'] = url_for('jobs.get_job_status', job_id=job_id)
+        return jsonify(resposta), 202
+    return jsonify(resposta)
+
 @financeiro_bp.route('/comprovantes', methods=['GET'])
 @login_obrigatorio
 @permissao_necessaria('acesso_financeiro')
@@ -287,14 +436,19 @@ def listar_comprovantes():
     try:
         mes = request.args.get('mes', '')
         ano = request.args.get('ano', '')
+        page = request.args.get('page', 1, type=int)
         
-        dados = FinanceiroService.listar_comprovantes_por_cliente(mes, ano)
+        dados = FinanceiroService.listar_comprovantes_por_cliente(mes, ano, page=page)
+        
+        # Miniaturas que faltam nesta página são geradas em segundo plano
+        MiniaturaService.preparar_galeria(dados['clientes'])
         
         current_app.logger.info(f"Comprovantes acessados por {session.get('usuario_nome', 'N/A')}")
         
         return render_template('comprovantes_pagamento.html', 
                              clientes=dados['clientes'],
                              total_comprovantes=dados['total_comprovantes'],
+                             paginacao=dados,
                              mes=mes, 
                              ano=ano)
     except Exception as e:
@@ -302,4 +456,83 @@ def listar_comprovantes():
         flash(f"Erro ao carregar comprovantes: {str(e)}", 'error')
         return render_template('comprovantes_pagamento.html', 
                              clientes=[], 
-                             total_comprovantes=0)
+                             total_comprovantes=0,
+                             paginacao=None)
+
+@financeiro_bp.route('/comprovantes/<int:pagamento_id>/miniatura')
+@login_obrigatorio
+@permissao_necessaria('acesso_financeiro')
+def miniatura_comprovante(pagamento_id):
+    """Serve a miniatura de um comprovante (202 enquanto o job de fundo não a gerou)"""
+    pagamento = Pagamento.query.get_or_404(pagamento_id)
+    if not pagamento.caminho_recibo:
+        abort(404)
+    
+    origem, destino = MiniaturaService.caminhos(pagamento.caminho_recibo, pagamento.recibo_sha256)
+    if os.path.exists(destino):
+        # A chave é o hash do conteúdo: a miniatura nunca muda
+        return send_file(destino, mimetype='image/jpeg', max_age=30 * 24 * 3600)
+    
+    if origem:
+        MiniaturaService.agendar([(origem, destino)])
+    resposta = Response(status=202)
+    resposta.headers['Retry-After'] = '2'
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
+@financeiro_bp.route('/conciliacao', methods=['POST'])
+@login_obrigatorio
+@permissao_necessaria('acesso_financeiro')
+def conciliar_extrato():
+    """Importa um extrato OFX/CSV e concilia os lançamentos com os pagamentos"""
+    if 'extrato' not in request.files:
+        return jsonify({'success': False, 'message': 'Nenhum extrato enviado'}), 400
+
+    extrato = request.files['extrato']
+    if extrato.filename == '':
+        return jsonify({'success': False, 'message': 'Nenhum arquivo selecionado'}), 400
+
+    conteudo = extrato.read(FinanceiroConfig.get_max_file_size() + 1)
+    if len(conteudo) > FinanceiroConfig.get_max_file_size():
+        return jsonify({'success': False, 'message': 'Extrato excede o tamanho máximo permitido'}), 400
+
+    # Cada dia da janela é uma busca por lançamento: fora de 0..máximo é recusado
+    tolerancia = request.form.get('tolerancia_dias', '').strip() or None
+    if tolerancia is not None:
+        maxima = FinanceiroConfig.get_conciliacao_tolerancia_maxima_dias()
+        tolerancia = int(tolerancia) if tolerancia.isdigit() else -1
+        if not 0 <= tolerancia <= maxima:
+            return jsonify({'success': False, 'message': f'tolerancia_dias deve ser um inteiro de 0 a {maxima}'}), 400
+    sucesso, mensagem, resultado = ConciliacaoService.conciliar_arquivo(conteudo, extrato.filename, tolerancia)
+
+    current_app.logger.info(f"Conciliação bancária ({extrato.filename}) por {session.get('usuario_nome', 'N/A')}: {mensagem}")
+
+    if not sucesso:
+        return jsonify({'success': False, 'message': mensagem}), 400
+    return jsonify({'success': True, 'message': mensagem, 'data': resultado})
+
+@financeiro_bp.route('/pagamentos/lote', methods=['POST'])
+@login_obrigatorio
+@permissao_necessaria('acesso_financeiro')
+def registrar_pagamentos_lote():
+    """Registra vários pagamentos numa requisição (JSON: {"pagamentos": [...], "tamanho_lote": n})"""
+    dados = request.get_json(silent=True) or {}
+    pagamentos = dados.get('pagamentos')
+    if not isinstance(pagamentos, list) or not pagamentos:
+        return jsonify({'success': False, 'message': 'Nenhum pagamento enviado'}), 400
+    if not all(isinstance(pagamento, dict) for pagamento in pagamentos):
+        return jsonify({'success': False, 'message': 'Formato de pagamento inválido'}), 400
+
+    maximo = FinanceiroConfig.get_pagamento_lote_maximo()
+    if len(pagamentos) > maximo:
+        return jsonify({'success': False, 'message': f'Máximo de {maximo} pagamentos por lote'}), 400
+
+    tamanho_lote = dados.get('tamanho_lote')
+    if tamanho_lote is not None and not isinstance(tamanho_lote, int):
+        return jsonify({'success': False, 'message': 'tamanho_lote deve ser um número inteiro'}), 400
+
+    sucesso, mensagem, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos, tamanho_lote)
+
+    current_app.logger.info(f"Lote de pagamentos por {session.get('usuario_nome', 'N/A')}: {mensagem}")
+
+    return jsonify({'success': sucesso, 'message': mensagem, 'data': resultados})
@@ -2,14 +2,19 @@
 Serviços para o módulo de financeiro
 Contém toda a lógica de negócio separada das rotas
 """
-from ..models import db, Pedido, Pagamento, StatusPedido
+from ..models import db, Cliente, ItemPedido, Pedido, Pagamento, StatusPedido
 from flask import current_app
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, case, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 import calendar
+import math
 from decimal import Decimal
 from .config import FinanceiroConfig
+from ..cache import cached_with_invalidation, invalidate_cache
+from ..paginacao import paginacao
 from .exceptions import (
     FinanceiroValidationError, 
     PagamentoDuplicadoError, 
@@ -21,6 +26,16 @@ from .exceptions import (
 class FinanceiroService:
     """Serviço para operações relacionadas ao financeiro"""
     
+    # Paginação padrão da listagem financeira
+    POR_PAGINA = 50
+    
+    # Faixas do aging de recebíveis: (chave, rótulo, idade máxima em dias); acima disso, 'acima_60'
+    FAIXAS_AGING = [
+        ('ate_7', '0–7 dias', 7),
+        ('de_8_a_30', '8–30 dias', 30),
+        ('de_31_a_60', '31–60 dias', 60),
+    ]
+    
     @staticmethod
     def _get_date_range(mes: str, ano: str) -> Tuple[Optional[datetime], Optional[datetime]]:
         """
@@ -65,71 +80,330 @@ class FinanceiroService:
         return None, None
     
     @staticmethod
-    def listar_pedidos_financeiro(tipo_filtro: str = 'pendentes', mes: str = '', ano: str = '') -> List[Dict]:
+    def _query_totais_financeiro(tipo_filtro: str, mes: str = '', ano: str = ''):
         """
-        Lista pedidos para análise financeira
+        Monta a query de pedidos confirmados com totais e status de pagamento no SQL
+        
+        Totais de itens e de pagamentos vêm de subqueries agrupadas por pedido;
+        o status (Pago/Parcial/Pendente/Sem Valor) é uma expressão CASE com as
+        mesmas regras de Pedido.obter_status_pagamento.
+        
+        Args:
+            tipo_filtro: Tipo de filtro (pendentes, pagos, todos)
+            mes: Mês para filtrar
+            ano: Ano para filtrar
+            
+        Returns:
+            Tuple: (query, total_pedido, total_pago, status) ou None para filtro desconhecido
+        """
+        itens = db.session.query(
+            ItemPedido.pedido_id.label('pedido_id'),
+            func.sum(ItemPedido.valor_total_venda).label('total_pedido')
+        ).group_by(ItemPedido.pedido_id).subquery()
+        
+        pagamentos = db.session.query(
+            Pagamento.pedido_id.label('pedido_id'),
+            func.sum(Pagamento.valor).label('total_pago')
+        ).group_by(Pagamento.pedido_id).subquery()
+        
+        total_pedido = func.coalesce(itens.c.total_pedido, 0)
+        total_pago = func.coalesce(pagamentos.c.total_pago, 0)
+        pago = and_(total_pedido > 0, total_pago >= total_pedido)
+        pendente = and_(total_pedido > 0, total_pago < total_pedido)
+        status = case(
+            (pago, 'Pago'),
+            (and_(pendente, total_pago > 0), 'Parcial'),
+            (pendente, 'Pendente'),
+            else_='Sem Valor'
+        )
+        
+        # IMPORTANTE: O módulo financeiro só deve mostrar pedidos confirmados pelo comercial
+        query = db.session.query(Pedido).outerjoin(
+            itens, itens.c.pedido_id == Pedido.id
+        ).outerjoin(
+            pagamentos, pagamentos.c.pedido_id == Pedido.id
+        ).filter(Pedido.confirmado_comercial == True)
+        
+        # Aplicar filtros de data usando função helper
+        data_inicio, data_fim = FinanceiroService._get_date_range(mes, ano)
+        if data_inicio and data_fim:
+            query = query.filter(Pedido.data >= data_inicio, Pedido.data <= data_fim)
+        
+        # Aplicar filtro de tipo
+        if tipo_filtro == 'pendentes':
+            query = query.filter(pendente)
+        elif tipo_filtro == 'pagos':
+            query = query.filter(pago)
+        elif tipo_filtro != 'todos':
+            return None
+        
+        return query, total_pedido, total_pago, status
+    
+    @staticmethod
+    def _resumo_financeiro(query, total_pedido, total_pago) -> Dict:
+        """Totais de todos os pedidos do filtro numa única query agregada"""
+        filtrados = query.with_entities(
+            Pedido.id.label('pedido_id'),
+            total_pedido.label('total_pedido'),
+            total_pago.label('total_pago')
+        ).subquery()
+        saldo = filtrados.c.total_pedido - filtrados.c.total_pago
+        
+        qtd_pedidos, total_receita, total_recebido, total_pendente = db.session.query(
+            func.count(filtrados.c.pedido_id),
+            func.coalesce(func.sum(filtrados.c.total_pedido), 0),
+            func.coalesce(func.sum(filtrados.c.total_pago), 0),
+            func.coalesce(func.sum(case((saldo > 0, saldo), else_=0)), 0)
+        ).one()
+        
+        return {
+            'total_pedidos': qtd_pedidos,
+            'total_receita': float(total_receita),
+            'total_recebido': float(total_recebido),
+            'total_pendente': float(total_pendente)
+        }
+    
+    @staticmethod
+    def listar_pedidos_financeiro(tipo_filtro: str = 'pendentes', mes: str = '', ano: str = '',
+                                  page: int = 1, per_page: int = None) -> Dict:
+        """
+        Lista pedidos para análise financeira, paginada
         
         Args:
             tipo_filtro: Tipo de filtro (pendentes, pagos, etc.)
             mes: Mês para filtrar
             ano: Ano para filtrar
+            page: Página (começa em 1)
+            per_page: Pedidos por página
             
         Returns:
-            List[Dict]: Lista de pedidos com informações financeiras
+            Dict: pedidos (lista de dicts com informações financeiras), metadados
+            de paginação e resumo do filtro inteiro
         """
+        per_page = per_page or FinanceiroService.POR_PAGINA
+        resultado = paginacao(1, per_page, 0)
+        resultado.update({
+            'pedidos': [],
+            'resumo': {'total_pedidos': 0, 'total_receita': 0.0, 'total_recebido': 0.0, 'total_pendente': 0.0}
+        })
+        
         try:
-            # IMPORTANTE: O módulo financeiro só deve mostrar pedidos confirmados pelo comercial
-            pedidos_query = Pedido.query.filter(Pedido.confirmado_comercial == True)
+            montagem = FinanceiroService._query_totais_financeiro(tipo_filtro, mes, ano)
+            if montagem is None:
+                return resultado
+            query, total_pedido, total_pago, status = montagem
+            
+            resultado['resumo'] = FinanceiroService._resumo_financeiro(query, total_pedido, total_pago)
+            resultado.update(paginacao(page, per_page, resultado['resumo']['total_pedidos']))
+            
+            # Só a página atual é carregada, com cliente e histórico de pagamentos
+            linhas = query.add_columns(total_pedido, total_pago, status).options(
+                joinedload(Pedido.cliente),
+                selectinload(Pedido.pagamentos)
+            ).order_by(
+                Pedido.data.desc(), Pedido.id.desc()
+            ).offset(
+                (resultado['page'] - 1) * per_page
+            ).limit(per_page).all()
+            
+            for pedido, valor_pedido, valor_pago, status_pagamento in linhas:
+                valor_pedido = float(valor_pedido or 0)
+                valor_pago = float(valor_pago or 0)
+                resultado['pedidos'].append({
+                    'pedido': pedido,
+                    'total_pedido': valor_pedido,
+                    'total_pago': valor_pago,
+                    'saldo': valor_pedido - valor_pago,
+                    'status': status_pagamento
+                })
             
-            # Aplicar filtros de data usando função helper
-            data_inicio, data_fim = FinanceiroService._get_date_range(mes, ano)
-            if data_inicio and data_fim:
-                pedidos_query = pedidos_query.filter(Pedido.data >= data_inicio, Pedido.data <= data_fim)
+            return resultado
             
-            # Otimização: Carregar relacionamentos de uma vez para evitar N+1 queries
-            pedidos = pedidos_query.options(
-                joinedload(Pedido.itens),
-                joinedload(Pedido.pagamentos)
-            ).order_by(Pedido.data.desc()).all()
+        except Exception as e:
+            current_app.logger.error(f"Erro ao listar pedidos financeiro: {str(e)}")
+            return resultado
+    
+    @staticmethod
+    @cached_with_invalidation(
+        timeout=600,  # 10 minutos
+        key_prefix='financeiro_aging',
+        invalidate_on=['pagamento.aprovado', 'pedido.criado', 'pedido.atualizado', 'pedido.cancelado']
+    )
+    def relatorio_aging(data_referencia: Optional[str] = None) -> Dict:
+        """
+        Aging dos saldos em aberto por cliente (0–7, 8–30, 31–60 e 60+ dias)
+        
+        O saldo de cada pedido vem das mesmas subqueries agrupadas da listagem;
+        a faixa é um CASE sobre Pedido.data e a soma por cliente sai numa única
+        query agrupada. Pedidos cancelados ficam de fora.
+        
+        Cache: 10 minutos
+        Invalidação: pagamentos e pedidos criados/atualizados/cancelados
+        
+        Args:
+            data_referencia: Data base (AAAA-MM-DD); padrão é hoje
             
-            resultado = []
-
-            for pedido in pedidos:
-                # Usar método centralizado do modelo
-                totais = pedido.calcular_totais()
-                status = pedido.obter_status_pagamento()
-                
-                # Aplicar filtro de tipo
-                if tipo_filtro == 'pendentes' and (status == 'Pendente' or status == 'Parcial'):
-                    resultado.append({
-                        'pedido': pedido,
-                        'total_pedido': totais['total_pedido'],
-                        'total_pago': totais['total_pago'],
-                        'saldo': totais['saldo'],
-                        'status': status
-                    })
-                elif tipo_filtro == 'pagos' and status == 'Pago':
-                    resultado.append({
-                        'pedido': pedido,
-                        'total_pedido': totais['total_pedido'],
-                        'total_pago': totais['total_pago'],
-                        'saldo': totais['saldo'],
-                        'status': status
-                    })
-                elif tipo_filtro == 'todos':
-                    resultado.append({
-                        'pedido': pedido,
-                        'total_pedido': totais['total_pedido'],
-                        'total_pago': totais['total_pago'],
-                        'saldo': totais['saldo'],
-                        'status': status
-                    })
+        Returns:
+            Dict: data_referencia, faixas, clientes (saldo por faixa) e totais
+        """
+        faixas = [chave for chave, _, _ in FinanceiroService.FAIXAS_AGING] + ['acima_60']
+        resultado = {
+            'data_referencia': None,
+            'faixas': faixas,
+            'clientes': [],
+            'totais': dict.fromkeys(faixas + ['total'], 0.0)
+        }
+        
+        try:
+            referencia = datetime.strptime(data_referencia, '%Y-%m-%d').date() if data_referencia else datetime.now().date()
+            resultado['data_referencia'] = referencia.isoformat()
+            
+            query, total_pedido, total_pago, _ = FinanceiroService._query_totais_financeiro('pendentes')
+            saldo = total_pedido - total_pago
+            
+            # Limite inferior (início do dia) de cada faixa: idade <= dias  <=>  data >= referência - dias
+            colunas = []
+            anteriores = []
+            for chave, _, dias in FinanceiroService.FAIXAS_AGING:
+                limite = datetime.combine(referencia - timedelta(days=dias), datetime.min.time())
+                condicao = and_(Pedido.data >= limite, *[~c for c in anteriores])
+                colunas.append(func.coalesce(func.sum(case((condicao, saldo), else_=0)), 0).label(chave))
+                anteriores.append(Pedido.data >= limite)
+            colunas.append(func.coalesce(func.sum(case((or_(*anteriores), 0), else_=saldo)), 0).label('acima_60'))
+            
+            linhas = query.join(
+                Cliente, Cliente.id == Pedido.cliente_id
+            ).filter(
+                or_(Pedido.status.is_(None), Pedido.status != StatusPedido.CANCELADO)
+            ).with_entities(
+                Cliente.id, Cliente.nome, func.count(Pedido.id), *colunas,
+                func.sum(saldo).label('total')
+            ).group_by(Cliente.id, Cliente.nome).order_by(func.sum(saldo).desc(), Cliente.nome).all()
+            
+            for cliente_id, nome, qtd_pedidos, *valores in linhas:
+                linha = {'cliente_id': cliente_id, 'cliente': nome, 'pedidos': qtd_pedidos}
+                for chave, valor in zip(faixas + ['total'], valores):
+                    linha[chave] = float(valor or 0)
+                    resultado['totais'][chave] += linha[chave]
+                resultado['clientes'].append(linha)
             
             return resultado
             
         except Exception as e:
-            current_app.logger.error(f"Erro ao listar pedidos financeiro: {str(e)}")
-            return []
+            current_app.logger.error(f"Erro ao gerar aging de recebíveis: {str(e)}")
+            return resultado
+    
+    @staticmethod
+    def _totais_pedido(pedido_id: int) -> Tuple[Decimal, Decimal]:
+        """
+        Soma itens e pagamentos de um pedido num único SELECT
+        
+        Args:
+            pedido_id: ID do pedido
+            
+        Returns:
+            Tuple[Decimal, Decimal]: (total_pedido, total_pago)
+        """
+        total_pedido = db.session.query(
+            func.coalesce(func.sum(ItemPedido.valor_total_venda), 0)
+        ).filter(ItemPedido.pedido_id == pedido_id).scalar_subquery()
+        total_pago = db.session.query(
+            func.coalesce(func.sum(Pagamento.valor), 0)
+        ).filter(Pagamento.pedido_id == pedido_id).scalar_subquery()
+        
+        valor_pedido, valor_pago = db.session.query(total_pedido, total_pago).one()
+        return Decimal(str(valor_pedido or 0)), Decimal(str(valor_pago or 0))
+    
+    @staticmethod
+    def _mensagem_pagamento_duplicado(id_transacao: Optional[str], recibo_sha256: Optional[str]) -> Optional[str]:
+        """
+        Monta a mensagem de duplicidade após violação de constraint UNIQUE
+        
+        Returns:
+            Optional[str]: Mensagem, ou None se o conflito não for de duplicidade
+        """
+        if id_transacao:
+            existente = Pagamento.query.filter_by(id_transacao=id_transacao).first()
+            if existente:
+                return FinanceiroService._texto_duplicado(existente, id_transacao=id_transacao)
+        if recibo_sha256:
+            existente = Pagamento.query.filter_by(recibo_sha256=recibo_sha256).first()
+            if existente:
+                return FinanceiroService._texto_duplicado(existente)
+        return None
+    
+    @staticmethod
+    def _texto_duplicado(existente: Pagamento, id_transacao: Optional[str] = None) -> str:
+        data = existente.data_pagamento.strftime('%d/%m/%Y') if existente.data_pagamento else '-'
+        if id_transacao:
+            return (f"Este recibo (ID: {id_transacao}) já foi utilizado no pagamento do pedido "
+                    f"#{existente.pedido_id} em {data}.")
+        return f"Este comprovante já foi utilizado no pagamento do pedido #{existente.pedido_id} em {data}."
+    
+    @staticmethod
+    def _validar_pagamento(valor: float, forma_pagamento: str, caminho_recibo: Optional[str]) -> None:
+        """Validações de um pagamento que não dependem do banco (levanta exceções do módulo)"""
+        if not math.isfinite(valor):
+            raise ValorInvalidoError(f"Valor inválido: {valor}")
+        if valor <= 0:
+            raise ValorInvalidoError(f"Valor deve ser maior que zero. Valor fornecido: {valor}")
+        
+        if not forma_pagamento or not forma_pagamento.strip():
+            raise FinanceiroValidationError("Forma de pagamento é obrigatória")
+
+        # Validação para PIX: comprovante é obrigatório (usando configuração)
+        if FinanceiroConfig.is_pix_payment_requiring_receipt() and 'pix' in forma_pagamento.lower() and not caminho_recibo:
+            raise ComprovanteObrigatorioError("Para pagamentos com PIX, o envio do comprovante é obrigatório.")
+    
+    @staticmethod
+    def _texto(valor) -> Optional[str]:
+        """Campo de texto vindo de JSON (número também é aceito), sem espaços nas pontas; None se vazio"""
+        if valor is None:
+            return None
+        return str(valor).strip() or None
+    
+    @staticmethod
+    def _parse_data_comprovante(data_comprovante: Optional[str]):
+        """Converte a data do comprovante (dd/mm/aaaa, dd-mm-aaaa, dd.mm.aaaa ou ISO)"""
+        if not data_comprovante:
+            return None
+        # Tentar diferentes formatos de data
+        for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d']:
+            try:
+                return datetime.strptime(data_comprovante, fmt).date()
+            except (TypeError, ValueError):
+                continue
+        current_app.logger.warning(f"Data do comprovante em formato não reconhecido: '{data_comprovante}'")
+        return None
+    
+    @staticmethod
+    def _valores_pagamento(pedido_id, valor, forma_pagamento, observacoes=None, caminho_recibo=None,
+                           id_transacao=None, recibo_mime=None, recibo_tamanho=None, recibo_sha256=None,
+                           data_comprovante=None, banco_emitente=None, agencia_recebedor=None,
+                           conta_recebedor=None, chave_pix_recebedor=None, recibo_phash=None,
+                           ocr_json=None) -> Dict:
+        """Colunas de um novo Pagamento, já normalizadas"""
+        return {
+            'pedido_id': pedido_id,
+            # Converter valor para Decimal para consistência com o banco
+            'valor': Decimal(str(valor)),
+            'metodo_pagamento': forma_pagamento.strip(),
+            'observacoes': observacoes.strip() if observacoes else None,
+            'caminho_recibo': caminho_recibo,
+            'id_transacao': id_transacao,
+            'recibo_mime': recibo_mime,
+            'recibo_tamanho': recibo_tamanho,
+            'recibo_sha256': recibo_sha256,
+            # NOVOS CAMPOS - dados extraídos do comprovante
+            'data_comprovante': FinanceiroService._parse_data_comprovante(data_comprovante),
+            'banco_emitente': banco_emitente.strip() if banco_emitente else None,
+            'agencia_recebedor': agencia_recebedor.strip() if agencia_recebedor else None,
+            'conta_recebedor': conta_recebedor.strip() if conta_recebedor else None,
+            'chave_pix_recebedor': chave_pix_recebedor.strip() if chave_pix_recebedor else None,
+            # Índice de comprovantes quase idênticos (ReciboSimilarService)
+            'recibo_phash': recibo_phash,
+            'ocr_json': ocr_json
+        }
     
     @staticmethod
     def registrar_pagamento(
@@ -147,7 +421,9 @@ class FinanceiroService:
         banco_emitente: Optional[str] = None,
         agencia_recebedor: Optional[str] = None,
         conta_recebedor: Optional[str] = None,
-        chave_pix_recebedor: Optional[str] = None
+        chave_pix_recebedor: Optional[str] = None,
+        recibo_phash: Optional[str] = None,
+        ocr_json: Optional[str] = None
     ) -> Tuple[bool, str, Optional[Pagamento]]:
         """
         Registra um pagamento com dados completos extraídos do comprovante.
@@ -157,86 +433,48 @@ class FinanceiroService:
             if not pedido_id:
                 raise FinanceiroValidationError("Pedido é obrigatório")
             
-            pedido = Pedido.query.get(pedido_id)
+            # Trava só a linha do pedido: pagamentos simultâneos do mesmo pedido
+            # são serializados e cada um enxerga a soma atualizada
+            pedido = db.session.query(Pedido).filter(
+                Pedido.id == pedido_id
+            ).with_for_update().first()
             if not pedido:
                 raise PedidoNaoEncontradoError(f"Pedido {pedido_id} não encontrado")
             
-            if valor <= 0:
-                raise ValorInvalidoError(f"Valor deve ser maior que zero. Valor fornecido: {valor}")
-            
-            if not forma_pagamento or not forma_pagamento.strip():
-                raise FinanceiroValidationError("Forma de pagamento é obrigatória")
+            FinanceiroService._validar_pagamento(valor, forma_pagamento, caminho_recibo)
 
-            # Validação para PIX: comprovante é obrigatório (usando configuração)
-            if FinanceiroConfig.is_pix_payment_requiring_receipt() and 'pix' in forma_pagamento.lower() and not caminho_recibo:
-                raise ComprovanteObrigatorioError("Para pagamentos com PIX, o envio do comprovante é obrigatório.")
+            # Duplicidade pelo ID da transação fica a cargo da constraint UNIQUE (ver flush abaixo)
+            id_transacao_limpo = id_transacao.strip() if id_transacao and id_transacao.strip() else None
 
-            # VERIFICAÇÃO DE DUPLICIDADE PELO ID DA TRANSAÇÃO
-            if id_transacao and id_transacao.strip():
-                id_transacao_limpo = id_transacao.strip()
-                pagamento_existente = Pagamento.query.filter_by(id_transacao=id_transacao_limpo).first()
-                if pagamento_existente:
-                    mensagem_erro = f"Este recibo (ID: {id_transacao_limpo}) já foi utilizado no pagamento do pedido #{pagamento_existente.pedido_id} em {pagamento_existente.data_pagamento.strftime('%d/%m/%Y')}."
-                    current_app.logger.warning(mensagem_erro)
-                    raise PagamentoDuplicadoError(mensagem_erro)
-            else:
-                id_transacao_limpo = None
-
-            # Converter valor para Decimal para consistência com o banco
-            valor_decimal = Decimal(str(valor))
-            
-            # Processar data do comprovante se fornecida
-            data_comprovante_parsed = None
-            if data_comprovante:
-                try:
-                    # Tentar diferentes formatos de data
-                    for fmt in ['%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y-%m-%d']:
-                        try:
-                            data_comprovante_parsed = datetime.strptime(data_comprovante, fmt).date()
-                            break
-                        except ValueError:
-                            continue
-                except Exception as e:
-                    current_app.logger.warning(f"Erro ao processar data do comprovante '{data_comprovante}': {e}")
-            
             # Criar pagamento com todos os dados
-            novo_pagamento = Pagamento(
-                pedido_id=pedido_id,
-                valor=valor_decimal,
-                metodo_pagamento=forma_pagamento.strip(),
-                observacoes=observacoes.strip() if observacoes else None,
-                caminho_recibo=caminho_recibo,
-                id_transacao=id_transacao_limpo,
-                recibo_mime=recibo_mime,
-                recibo_tamanho=recibo_tamanho,
-                recibo_sha256=recibo_sha256,
-                # NOVOS CAMPOS - dados extraídos do comprovante
-                data_comprovante=data_comprovante_parsed,
-                banco_emitente=banco_emitente.strip() if banco_emitente else None,
-                agencia_recebedor=agencia_recebedor.strip() if agencia_recebedor else None,
-                conta_recebedor=conta_recebedor.strip() if conta_recebedor else None,
-                chave_pix_recebedor=chave_pix_recebedor.strip() if chave_pix_recebedor else None
-            )
-            
-            db.session.add(novo_pagamento)
-            db.session.flush() # Garante que o novo pagamento esteja na sessão para o cálculo abaixo
-
-            # CORREÇÃO CRÍTICA: Forçar atualização da coleção pagamentos
-            # Após flush(), a coleção self.pagamentos não é automaticamente atualizada
-            db.session.refresh(pedido)  # Força reload do objeto pedido do banco
+            novo_pagamento = Pagamento(**FinanceiroService._valores_pagamento(
+                pedido_id, valor, forma_pagamento, observacoes, caminho_recibo, id_transacao_limpo,
+                recibo_mime, recibo_tamanho, recibo_sha256, data_comprovante,
+                banco_emitente, agencia_recebedor, conta_recebedor, chave_pix_recebedor,
+                recibo_phash, ocr_json
+            ))
+            
+            # INSERT num savepoint: conflito de id_transacao/recibo_sha256 vira
+            # PagamentoDuplicadoError sem consulta prévia no caminho feliz
+            try:
+                with db.session.begin_nested():
+                    db.session.add(novo_pagamento)
+            except IntegrityError:
+                mensagem_erro = FinanceiroService._mensagem_pagamento_duplicado(id_transacao_limpo, recibo_sha256)
+                if not mensagem_erro:
+                    raise
+                current_app.logger.warning(mensagem_erro)
+                raise PagamentoDuplicadoError(mensagem_erro)
 
-            # Usar método centralizado do modelo - CORRIGINDO O ERRO DE TIPO
-            totais = pedido.calcular_totais()
-
-            # CORREÇÃO: Converter para Decimal antes da comparação
-            total_pago_decimal = Decimal(str(totais['total_pago']))
-            total_pedido_decimal = Decimal(str(totais['total_pedido']))
+            # Totais numa única query agregada, sem carregar itens e pagamentos do pedido
+            total_pedido_decimal, total_pago_decimal = FinanceiroService._totais_pedido(pedido_id)
             
             # O status do pedido é atualizado para pago se o valor total for atingido
             if total_pago_decimal >= total_pedido_decimal:
                 pedido.status = StatusPedido.PAGAMENTO_APROVADO
 
             db.session.commit()
+            invalidate_cache('pagamento.aprovado')
 
             current_app.logger.info(f"Pagamento registrado: Pedido #{pedido_id} - R$ {valor:.2f} - ID Transação: {id_transacao_limpo}")
             current_app.logger.info(f"Dados extraídos - Banco: {banco_emitente}, Agência: {agencia_recebedor}, Conta: {conta_recebedor}")
@@ -253,11 +491,183 @@ class FinanceiroService:
             current_app.logger.error(f"Erro inesperado ao registrar pagamento: {str(e)}")
             return False, f"Erro interno ao registrar pagamento. Tente novamente.", None
     
+    @staticmethod
+    def registrar_pagamentos_lote(pagamentos: List[Dict], tamanho_lote: Optional[int] = None
+                                  ) -> Tuple[bool, str, List[Dict]]:
+        """
+        Registra vários pagamentos de uma vez (ex.: PIX de um mesmo acerto bancário)
+        
+        Cada item tem os mesmos campos de registrar_pagamento (pedido_id, valor,
+        forma_pagamento, observacoes, id_transacao, recibo_sha256, data_comprovante...).
+        Todos são validados numa passada; pedidos e duplicidades são checados
+        com um IN por coluna; o INSERT é em massa e o status dos pedidos
+        quitados é atualizado num único UPDATE agrupado.
+        
+        Linhas inválidas são recusadas e não impedem as demais.
+        
+        Args:
+            pagamentos: Lista de dicts com os dados de cada pagamento
+            tamanho_lote: Pagamentos por commit (None = configuração; 0 = tudo numa transação)
+            
+        Returns:
+            Tuple[bool, str, List[Dict]]: (sucesso, mensagem, resultado por linha
+            com indice, sucesso, mensagem e pagamento_id)
+        """
+        if tamanho_lote is None:
+            tamanho_lote = FinanceiroConfig.get_pagamento_lote_tamanho()
+        resultados = [
+            {'indice': indice, 'sucesso': False, 'mensagem': '', 'pagamento_id': None}
+            for indice in range(len(pagamentos))
+        ]
+        
+        # 1. Validação sem banco + duplicidade dentro do próprio lote
+        validos = []
+        vistos_transacao, vistos_sha256 = {}, {}
+        for indice, dados in enumerate(pagamentos):
+            try:
+                try:
+                    pedido_id = int(dados.get('pedido_id') or 0)
+                except (TypeError, ValueError):
+                    pedido_id = 0
+                if not pedido_id:
+                    raise FinanceiroValidationError("Pedido é obrigatório")
+                try:
+                    valor = float(dados.get('valor'))
+                except (TypeError, ValueError):
+                    raise ValorInvalidoError(f"Valor inválido: {dados.get('valor')}")
+                # JSON pode trazer números nos campos de texto
+                texto = {campo: FinanceiroService._texto(dados.get(campo)) for campo in (
+                    'forma_pagamento', 'observacoes', 'caminho_recibo', 'id_transacao', 'recibo_mime',
+                    'recibo_sha256', 'data_comprovante', 'banco_emitente', 'agencia_recebedor',
+                    'conta_recebedor', 'chave_pix_recebedor'
+                )}
+                forma_pagamento = texto['forma_pagamento'] or ''
+                FinanceiroService._validar_pagamento(valor, forma_pagamento, texto['caminho_recibo'])
+                
+                id_transacao = texto['id_transacao']
+                recibo_sha256 = texto['recibo_sha256']
+                if id_transacao in vistos_transacao:
+                    raise PagamentoDuplicadoError(
+                        f"ID de transação {id_transacao} repetido no lote (linha {vistos_transacao[id_transacao]})."
+                    )
+                if recibo_sha256 in vistos_sha256:
+                    raise PagamentoDuplicadoError(f"Comprovante repetido no lote (linha {vistos_sha256[recibo_sha256]}).")
+                if id_transacao:
+                    vistos_transacao[id_transacao] = indice
+                if recibo_sha256:
+                    vistos_sha256[recibo_sha256] = indice
+                
+                validos.append((indice, FinanceiroService._valores_pagamento(
+                    pedido_id, valor, forma_pagamento, texto['observacoes'], texto['caminho_recibo'],
+                    id_transacao, texto['recibo_mime'], dados.get('recibo_tamanho'), recibo_sha256,
+                    texto['data_comprovante'], texto['banco_emitente'], texto['agencia_recebedor'],
+                    texto['conta_recebedor'], texto['chave_pix_recebedor']
+                    # recibo_phash e ocr_json não vêm do cliente: só o upload (registrar_pagamento) os calcula
+                )))
+            except (FinanceiroValidationError, PagamentoDuplicadoError) as e:
+                resultados[indice]['mensagem'] = str(e)
+        
+        try:
+            # 2. Pedidos existentes e duplicidade contra o banco: um IN por coluna
+            if validos:
+                pedidos_existentes = {
+                    pedido_id for (pedido_id,) in db.session.query(Pedido.id).filter(
+                        Pedido.id.in_({valores['pedido_id'] for _, valores in validos})
+                    )
+                }
+                por_transacao = {
+                    p.id_transacao: p for p in Pagamento.query.filter(Pagamento.id_transacao.in_(list(vistos_transacao)))
+                } if vistos_transacao else {}
+                por_sha256 = {
+                    p.recibo_sha256: p for p in Pagamento.query.filter(Pagamento.recibo_sha256.in_(list(vistos_sha256)))
+                } if vistos_sha256 else {}
+                
+                aprovados = []
+                for indice, valores in validos:
+                    if valores['pedido_id'] not in pedidos_existentes:
+                        resultados[indice]['mensagem'] = f"Pedido {valores['pedido_id']} não encontrado"
+                    elif valores['id_transacao'] in por_transacao:
+                        resultados[indice]['mensagem'] = FinanceiroService._texto_duplicado(
+                            por_transacao[valores['id_transacao']], id_transacao=valores['id_transacao']
+                        )
+                    elif valores['recibo_sha256'] in por_sha256:
+                        resultados[indice]['mensagem'] = FinanceiroService._texto_duplicado(por_sha256[valores['recibo_sha256']])
+                    else:
+                        aprovados.append((indice, valores))
+                validos = aprovados
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Erro ao validar lote de pagamentos: {str(e)}")
+            return False, "Erro interno ao validar lote de pagamentos.", resultados
+        
+        # 3. INSERT em massa + status dos pedidos, por lote de commit
+        tamanho = tamanho_lote if tamanho_lote and tamanho_lote > 0 else max(len(validos), 1)
+        for inicio in range(0, len(validos), tamanho):
+            lote = validos[inicio:inicio + tamanho]
+            pedido_ids = sorted({valores['pedido_id'] for _, valores in lote})
+            try:
+                # Mesma ordem de trava para lotes concorrentes
+                db.session.query(Pedido.id).filter(
+                    Pedido.id.in_(pedido_ids)
+                ).order_by(Pedido.id).with_for_update().all()
+                
+                ids = db.session.scalars(
+                    insert(Pagamento).returning(Pagamento.id, sort_by_parameter_order=True),
+                    [valores for _, valores in lote]
+                ).all()
+                FinanceiroService._aprovar_pedidos_quitados(pedido_ids)
+                db.session.commit()
+                
+                for (indice, _), pagamento_id in zip(lote, ids):
+                    resultados[indice].update(sucesso=True, mensagem="Pagamento registrado com sucesso",
+                                              pagamento_id=pagamento_id)
+            except IntegrityError as e:
+                db.session.rollback()
+                current_app.logger.warning(f"Conflito de duplicidade no lote de pagamentos: {str(e)}")
+                for indice, _ in lote:
+                    resultados[indice]['mensagem'] = "Pagamento duplicado registrado por outra operação. Reenvie o lote."
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Erro ao registrar lote de pagamentos: {str(e)}")
+                for indice, _ in lote:
+                    resultados[indice]['mensagem'] = "Erro interno ao registrar pagamento. Tente novamente."
+        
+        registrados = sum(1 for r in resultados if r['sucesso'])
+        if registrados:
+            invalidate_cache('pagamento.aprovado')
+        current_app.logger.info(f"Lote de pagamentos: {registrados} de {len(pagamentos)} registrados")
+        return registrados > 0, f"{registrados} de {len(pagamentos)} pagamentos registrados", resultados
+    
+    @staticmethod
+    def _aprovar_pedidos_quitados(pedido_ids: List[int]) -> int:
+        """
+        Marca como Pagamento Aprovado, num único UPDATE, os pedidos pendentes
+        cuja soma de pagamentos alcançou o total dos itens (sem commit)
+        """
+        total_pedido = select(
+            func.coalesce(func.sum(ItemPedido.valor_total_venda), 0)
+        ).where(ItemPedido.pedido_id == Pedido.id).scalar_subquery()
+        total_pago = select(
+            func.coalesce(func.sum(Pagamento.valor), 0)
+        ).where(Pagamento.pedido_id == Pedido.id).scalar_subquery()
+        
+        return db.session.query(Pedido).filter(
+            Pedido.id.in_(pedido_ids),
+            or_(Pedido.status.is_(None), Pedido.status == StatusPedido.PENDENTE),
+            total_pago >= total_pedido
+        ).update({
+            Pedido.status: StatusPedido.PAGAMENTO_APROVADO,
+            Pedido.versao: Pedido.versao + 1
+        }, synchronize_session=False)
+    
     @staticmethod
     def exportar_dados_financeiro(mes: str = '', ano: str = '') -> Dict:
         """
         Exporta dados financeiros
         
+        Lê apenas colunas (sem carregar itens e pagamentos de cada pedido) e
+        calcula os totais com a mesma query agregada da listagem.
+        
         Args:
             mes: Mês para filtrar
             ano: Ano para filtrar
@@ -266,17 +676,34 @@ class FinanceiroService:
             Dict: Dados financeiros para exportação
         """
         try:
-            pedidos = FinanceiroService.listar_pedidos_financeiro('todos', mes, ano)
-            
-            total_receita = sum(p['total_pedido'] for p in pedidos)
-            total_recebido = sum(p['total_pago'] for p in pedidos)
-            total_pendente = sum(max(0, p['saldo']) for p in pedidos)
+            query, total_pedido, total_pago, status = FinanceiroService._query_totais_financeiro('todos', mes, ano)
+            resumo = FinanceiroService._resumo_financeiro(query, total_pedido, total_pago)
+            
+            linhas = query.join(
+                Cliente, Cliente.id == Pedido.cliente_id
+            ).with_entities(
+                Pedido.id, Cliente.nome, Pedido.data, total_pedido, total_pago, status
+            ).order_by(Pedido.data.desc(), Pedido.id.desc()).all()
+            
+            pedidos = []
+            for pedido_id, cliente_nome, data, valor_pedido, valor_pago, status_pagamento in linhas:
+                valor_pedido = float(valor_pedido or 0)
+                valor_pago = float(valor_pago or 0)
+                pedidos.append({
+                    'pedido_id': pedido_id,
+                    'cliente': cliente_nome,
+                    'data': data.strftime('%d/%m/%Y %H:%M') if data else None,
+                    'total_pedido': valor_pedido,
+                    'total_pago': valor_pago,
+                    'saldo': valor_pedido - valor_pago,
+                    'status': status_pagamento
+                })
             
             return {
                 'pedidos': pedidos,
-                'total_receita': total_receita,
-                'total_recebido': total_recebido,
-                'total_pendente': total_pendente,
+                'total_receita': resumo['total_receita'],
+                'total_recebido': resumo['total_recebido'],
+                'total_pendente': resumo['total_pendente'],
                 'mes': mes,
                 'ano': ano
             }
@@ -293,58 +720,90 @@ class FinanceiroService:
             }
     
     @staticmethod
-    def listar_comprovantes_por_cliente(mes: str = '', ano: str = '') -> Dict:
+    def listar_comprovantes_por_cliente(mes: str = '', ano: str = '', page: int = 1,
+                                        per_page: int = None) -> Dict:
         """
-        Lista todos os comprovantes de pagamento organizados por cliente
+        Lista os comprovantes de pagamento organizados por cliente, paginada por cliente
+        
+        Contagens e a lista de clientes saem de uma query agrupada; só os
+        pagamentos dos clientes da página são carregados.
         
         Args:
             mes: Mês para filtrar
             ano: Ano para filtrar
+            page: Página de clientes (começa em 1)
+            per_page: Clientes por página
             
         Returns:
-            Dict: Dicionário com clientes e seus comprovantes
+            Dict: clientes (com seus comprovantes), total_comprovantes, mes, ano
+            e metadados de paginação
         """
+        per_page = per_page or FinanceiroConfig.COMPROVANTES_POR_PAGINA
+        resultado = {
+            'clientes': [],
+            'total_comprovantes': 0,
+            'mes': mes,
+            'ano': ano
+        }
+        resultado.update(paginacao(1, per_page, 0))
+        
         try:
-            from ..models import Pagamento, Cliente
-            
             # Aplicar filtros de data
             data_inicio, data_fim = FinanceiroService._get_date_range(mes, ano)
             
-            # Query base para pagamentos com comprovantes
-            query = Pagamento.query.filter(Pagamento.caminho_recibo.isnot(None))
-            
+            filtros = [Pagamento.caminho_recibo.isnot(None)]
             if data_inicio and data_fim:
-                query = query.filter(Pagamento.data_pagamento >= data_inicio, 
-                                   Pagamento.data_pagamento <= data_fim)
+                filtros.extend([Pagamento.data_pagamento >= data_inicio,
+                                Pagamento.data_pagamento <= data_fim])
+            
+            # Clientes com comprovante no período e quantidade de cada um
+            por_cliente = db.session.query(
+                Cliente.id.label('cliente_id'),
+                Cliente.nome.label('nome'),
+                func.count(Pagamento.id).label('quantidade')
+            ).join(
+                Pedido, Pedido.cliente_id == Cliente.id
+            ).join(
+                Pagamento, Pagamento.pedido_id == Pedido.id
+            ).filter(*filtros).group_by(Cliente.id, Cliente.nome).subquery()
+            
+            total_clientes, total_comprovantes = db.session.query(
+                func.count(por_cliente.c.cliente_id),
+                func.coalesce(func.sum(por_cliente.c.quantidade), 0)
+            ).one()
+            resultado['total_comprovantes'] = int(total_comprovantes)
+            resultado.update(paginacao(page, per_page, total_clientes))
             
-            # Carregar relacionamentos necessários
-            pagamentos = query.options(
-                joinedload(Pagamento.pedido).joinedload(Pedido.cliente)
-            ).order_by(Pagamento.data_pagamento.desc()).all()
+            # Ordenar clientes por nome
+            clientes_pagina = db.session.query(
+                por_cliente.c.cliente_id, por_cliente.c.nome
+            ).order_by(
+                por_cliente.c.nome, por_cliente.c.cliente_id
+            ).offset((resultado['page'] - 1) * per_page).limit(per_page).all()
+            if not clientes_pagina:
+                return resultado
+            
+            comprovantes_por_cliente = {
+                cliente_id: {'cliente': {'id': cliente_id, 'nome': nome}, 'comprovantes': []}
+                for cliente_id, nome in clientes_pagina
+            }
             
-            # Organizar por cliente
-            comprovantes_por_cliente = {}
+            pagamentos = db.session.query(Pagamento, Pedido.cliente_id).join(
+                Pedido, Pedido.id == Pagamento.pedido_id
+            ).filter(
+                Pedido.cliente_id.in_(list(comprovantes_por_cliente)), *filtros
+            ).order_by(Pagamento.data_pagamento.desc(), Pagamento.id.desc()).all()
             
-            for pagamento in pagamentos:
-                cliente_id = pagamento.pedido.cliente.id
-                cliente_nome = pagamento.pedido.cliente.nome
-                
-                if cliente_id not in comprovantes_por_cliente:
-                    comprovantes_por_cliente[cliente_id] = {
-                        'cliente': {
-                            'id': cliente_id,
-                            'nome': cliente_nome
-                        },
-                        'comprovantes': []
-                    }
-                
+            for pagamento, cliente_id in pagamentos:
                 comprovantes_por_cliente[cliente_id]['comprovantes'].append({
                     'pagamento': pagamento,
-                    'pedido_id': pagamento.pedido.id,
+                    'pagamento_id': pagamento.id,
+                    'pedido_id': pagamento.pedido_id,
                     'data_pagamento': pagamento.data_pagamento,
                     'valor': pagamento.valor,
                     'metodo_pagamento': pagamento.metodo_pagamento,
                     'caminho_recibo': pagamento.caminho_recibo,
+                    'recibo_sha256': pagamento.recibo_sha256,
                     'id_transacao': pagamento.id_transacao,
                     'observacoes': pagamento.observacoes,
                     # NOVOS CAMPOS - dados extraídos
@@ -355,24 +814,9 @@ class FinanceiroService:
                     'chave_pix_recebedor': pagamento.chave_pix_recebedor
                 })
             
-            # Ordenar clientes por nome
-            clientes_ordenados = sorted(
-                comprovantes_por_cliente.values(), 
-                key=lambda x: x['cliente']['nome']
-            )
-            
-            return {
-                'clientes': clientes_ordenados,
-                'total_comprovantes': sum(len(cliente['comprovantes']) for cliente in clientes_ordenados),
-                'mes': mes,
-                'ano': ano
-            }
+            resultado['clientes'] = [comprovantes_por_cliente[cliente_id] for cliente_id, _ in clientes_pagina]
+            return resultado
             
         except Exception as e:
             current_app.logger.error(f"Erro ao listar comprovantes por cliente: {str(e)}")
-            return {
-                'clientes': [],
-                'total_comprovantes': 0,
-                'mes': mes,
-                'ano': ano
-            }
\ No newline at end of file
+            return resultado
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+Leitura local da camada de texto de comprovantes em PDF
+
+PDFs gerados pelos apps dos bancos já trazem o texto; só os digitalizados
+(imagem dentro do PDF) precisam do Vision, que exige envio ao GCS, operação
+assíncrona, download do resultado e limpeza dos blobs.
+"""
+import os
+from typing import Optional
+
+try:
+    import fitz  # PyMuPDF: lê a camada de texto do PDF
+except ImportError:
+    fitz = None
+
+from .config import FinanceiroConfig
+
+
+class TextoPdf:
+    """Extração da camada de texto de PDFs"""
+
+    @staticmethod
+    def utilizavel(texto: str) -> bool:
+        """
+        Se o texto serve para a extração de campos: caracteres suficientes e poucos
+        glifos sem mapeamento para Unicode (fontes sem ToUnicode saem como '�')
+        """
+        alfanumericos = sum(c.isalnum() for c in texto)
+        if alfanumericos < FinanceiroConfig.get_ocr_pdf_texto_minimo():
+            return False
+        return texto.count('�') <= alfanumericos * 0.05 and any(c.isdigit() for c in texto)
+
+    @staticmethod
+    def extrair(file_path: str) -> Optional[str]:
+        """
+        Texto das primeiras páginas do PDF, em ordem de leitura
+
+        Returns:
+            Optional[str]: Texto utilizável, ou None se o PDF for digitalizado,
+            protegido, ilegível ou se o PyMuPDF não estiver instalado
+        """
+        if fitz is None or os.path.splitext(file_path)[1].lower() != '.pdf':
+            return None
+        try:
+            with fitz.open(file_path) as documento:
+                if documento.needs_pass:
+                    return None
+                paginas = min(documento.page_count, FinanceiroConfig.get_ocr_pdf_texto_paginas())
+                texto = '\n'.join(documento[indice].get_text('text', sort=True) for indice in range(paginas))
+        except Exception as e:
+            print(f"Camada de texto do PDF ignorada ({os.path.basename(file_path)}): {e}")
+            return None
+        return texto if TextoPdf.utilizavel(texto) else None
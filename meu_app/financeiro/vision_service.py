@@ -11,6 +11,10 @@ from google.cloud import vision, storage
 from google.api_core.exceptions import NotFound
 from .config import FinanceiroConfig
 from .exceptions import OcrProcessingError
+from .extracao_recibo import ExtratorRecibo, converter_valor
+from .layout_recibo import extrair_campos
+from .preprocessamento_ocr import PreprocessadorImagem
+from .texto_pdf import TextoPdf
 
 
 class VisionOcrService:
@@ -65,6 +69,23 @@ class VisionOcrService:
                 raise OcrProcessingError(f"Falha ao inicializar Storage: {str(e)}")
         return cls._storage_client
     
+    @classmethod
+    def aquecer(cls) -> bool:
+        """
+        Inicializa os clientes do Vision e do Storage (credenciais e canal gRPC) antes
+        do primeiro job, para um processo de vida longa reaproveitá-los em todos
+        
+        Returns:
+            bool: False se as credenciais não estiverem configuradas
+        """
+        try:
+            cls._get_client()
+            cls._get_storage_client()
+            return True
+        except OcrProcessingError as e:
+            print(f"Clientes do Google Vision não aquecidos: {e}")
+            return False
+    
     @classmethod
     def is_initialized(cls) -> bool:
         """Verifica se o Google Vision foi inicializado"""
@@ -146,10 +167,8 @@ class VisionOcrService:
                 print(f"Erro ao ler resultado OCR ({blob.name}): {exc}")
                 continue
         
-        combined = "\n".join(texts).strip()
-        if not combined:
-            raise OcrProcessingError("Vision processou o PDF mas não encontrou texto")
-        return combined
+        # Sem texto a leitura foi feita (e cobrada); parse_text trata o texto vazio
+        return "\n".join(texts).strip()
     
     @classmethod
     def _cleanup_gcs_resources(cls, input_uri: str, output_uri: str):
@@ -180,15 +199,42 @@ class VisionOcrService:
         except Exception as exc:
             print(f"Falha ao limpar resultados OCR no GCS: {exc}")
     
+    @staticmethod
+    def _response_error(response) -> Optional[str]:
+        """Mensagem de erro de uma resposta do Vision (None se não houve erro)"""
+        error_info = getattr(response, 'error', None)
+        if not (error_info and getattr(error_info, 'code', 0)):
+            return None
+        if getattr(error_info, 'message', None):
+            return error_info.message
+        if getattr(error_info, 'code', None):
+            return f"Code: {error_info.code}"
+        if str(error_info).strip():
+            return str(error_info)
+        return "Erro desconhecido do Google Vision"
+    
+    @staticmethod
+    def _response_text(response) -> str:
+        """Texto reconhecido numa resposta do Vision"""
+        texts = [text.description for text in response.text_annotations]
+        return '\n'.join(texts) if texts else ""
+    
     @classmethod
     def _extract_text_from_file(cls, file_path: str) -> str:
         """
         Usa o Google Vision para extrair texto de PDFs (via GCS) ou imagens locais.
+        PDFs com camada de texto são lidos localmente, sem Vision nem GCS.
         """
+        file_ext = os.path.splitext(file_path)[1].lower()
+        is_pdf = file_ext == '.pdf'
+        if is_pdf:
+            text = TextoPdf.extrair(file_path)
+            if text is not None:
+                print("📄 PDF com camada de texto: lido localmente, sem Vision")
+                return text
+        
         try:
             client = cls._get_client()
-            file_ext = os.path.splitext(file_path)[1].lower()
-            is_pdf = file_ext == '.pdf'
             
             if is_pdf:
                 input_uri = cls._upload_pdf_to_gcs(file_path)
@@ -219,34 +265,19 @@ class VisionOcrService:
                 
                 return text
             
-            with open(file_path, 'rb') as image_file:
-                content = image_file.read()
-            
-            image = vision.Image(content=content)
+            # Imagem reduzida em memória; o arquivo (e o SHA-256 do cache) não muda
+            image = vision.Image(content=PreprocessadorImagem.conteudo(file_path))
             detection_type = FinanceiroConfig.get_detection_type()
             if detection_type == 'DOCUMENT_TEXT_DETECTION':
                 response = client.document_text_detection(image=image)
             else:
                 response = client.text_detection(image=image)
             
-            error_info = getattr(response, 'error', None)
-            if error_info and getattr(error_info, 'code', 0):
-                error_msg = None
-                if getattr(error_info, 'message', None):
-                    error_msg = error_info.message
-                elif getattr(error_info, 'code', None):
-                    error_msg = f"Code: {error_info.code}"
-                elif str(error_info).strip():
-                    error_msg = str(error_info)
-                else:
-                    error_msg = "Erro desconhecido do Google Vision"
+            error_msg = cls._response_error(response)
+            if error_msg:
                 raise OcrProcessingError(f"Erro do Google Vision: {error_msg}")
             
-            texts = []
-            for text in response.text_annotations:
-                texts.append(text.description)
-            
-            return '\n'.join(texts) if texts else ""
+            return cls._response_text(response)
             
         except OcrProcessingError:
             raise
@@ -267,398 +298,122 @@ class VisionOcrService:
         """
         return cls._extract_text_from_file(file_path)
     
-    @staticmethod
-    def _find_amount_in_text(text: str) -> Optional[float]:
-        """
-        Encontra o valor monetário mais provável em uma string de texto,
-        dando prioridade a palavras-chave específicas e valores maiores.
-        
-        Estratégia:
-        1. Busca valores após palavras-chave prioritárias (Valor:, Total:, etc)
-        2. Se não encontrar, busca TODOS valores e retorna o MAIOR (principal)
-        3. Ignora valores muito pequenos (< R$ 5,00) se houver valores maiores
+    @classmethod
+    def extract_texts_batch(cls, file_paths: List[str], batch_size: Optional[int] = None) -> List[Tuple[str, Optional[str]]]:
         """
-        import unicodedata
+        Extrai o texto de vários arquivos agrupando as imagens em chamadas batch_annotate_images.
         
-        # Normalizar acentos
-        def remove_accents(s):
-            return ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+        As imagens são pré-processadas em paralelo (ver PreprocessadorImagem) e cada
+        chamada leva até batch_size delas (limitado também pelo tamanho total do
+        payload); PDFs seguem pelo fluxo assíncrono via GCS, um a um.
         
-        text_normalized = remove_accents(text).upper().replace('\u00A0', ' ').replace('\t', ' ')
+        Args:
+            file_paths: Caminhos dos arquivos, na ordem desejada
+            batch_size: Imagens por requisição (padrão: configuração)
         
-        # Padrão 1: MÁXIMA PRIORIDADE - Palavras-chave específicas de transação
-        # IMPORTANTE: \d+ para aceitar qualquer quantidade de dígitos (não limitar a 3)
-        max_priority_patterns = [
-            r'(?:VALOR\s+DA\s+TRANSACAO|DADOS\s+DA\s+TRANSACAO[\s\S]{0,100}VALOR)\s*[:\-]?\s*R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})',
-            r'(?:VALOR\s+TRANSFERIDO|VALOR\s+DO\s+PAGAMENTO|VALOR\s+DO\s+PIX)\s*[:\-]?\s*R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})',
-            r'(?:VALOR\s+LIQUIDO|TOTAL\s+LIQUIDO)\s*[:\-]?\s*R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})',
-        ]
+        Returns:
+            List[Tuple[str, Optional[str]]]: (texto, erro) de cada arquivo, na mesma ordem
+        """
+        resultados: List[Tuple[str, Optional[str]]] = [("", None)] * len(file_paths)
+        batch_size = batch_size or FinanceiroConfig.get_ocr_batch_size()
+        max_bytes = FinanceiroConfig.get_ocr_batch_max_bytes()
         
-        lines = [line.strip() for line in text_normalized.splitlines() if line.strip()]
-
-        def extract_numbers(fragment: str) -> list[float]:
-            numeros = []
-            fragment_clean = fragment.replace('O', '0').replace('º', '0').replace('L', '1')
-
-            decimal_pattern = r'R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})'
-            for match in re.findall(decimal_pattern, fragment_clean):
+        imagens = []
+        for indice, file_path in enumerate(file_paths):
+            if os.path.splitext(file_path)[1].lower() == '.pdf':
                 try:
-                    valor = VisionOcrService._parse_currency_value(match)
-                    if valor > 0:
-                        numeros.append(valor)
-                except (ValueError, TypeError):
-                    continue
-
-            inteiro_pattern = r'R?\$?\s*(\d{1,3}(?:[.\s]\d{3})+)(?![,\d])'
-            for match in re.findall(inteiro_pattern, fragment_clean):
-                try:
-                    valor = float(match.replace('.', '').replace(' ', ''))
-                    if valor > 0:
-                        numeros.append(valor)
-                except (ValueError, TypeError):
-                    continue
-
-            plain_pattern = r'R?\$?\s*(\d{5,})'
-            for match in re.findall(plain_pattern, fragment_clean):
-                try:
-                    valor = float(match)
-                    if valor > 0:
-                        numeros.append(valor)
-                except (ValueError, TypeError):
-                    continue
-
-            return numeros
-
-        keywords = [
-            'VALOR TOTAL',
-            'TOTAL DA NOTA',
-            'VALOR DA NOTA',
-            'TOTAL NF',
-            'TOTAL R$',
-            'TOTAL GERAL'
-        ]
-
-        valores_prioritarios = []
-        for idx, line in enumerate(lines):
-            snippet = line
-            if idx + 1 < len(lines):
-                snippet = f"{snippet} {lines[idx + 1]}"
-            if any(keyword in snippet for keyword in keywords):
-                valores_prioritarios.extend(extract_numbers(snippet))
-
-        if valores_prioritarios:
-            valores_prioritarios = [v for v in valores_prioritarios if v >= 5.0]
-            if valores_prioritarios:
-                return max(valores_prioritarios)
-
-        for pattern in max_priority_patterns:
-            matches = re.findall(pattern, text_normalized, re.IGNORECASE)
-            if matches:
-                value_str = matches[0]
-                try:
-                    return VisionOcrService._parse_currency_value(value_str)
-                except (ValueError, TypeError):
-                    continue
-
-        high_priority_patterns = [
-            r'(?:VALOR|TOTAL)\s*[:\-]?\s*R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})',
-            r'(?:TRANSFERIDO|PAGO)\s*[:\-]?\s*R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})',
-        ]
-
-        high_priority_values = []
-        for pattern in high_priority_patterns:
-            matches = re.findall(pattern, text_normalized, re.IGNORECASE)
-            for match in matches:
-                try:
-                    valor = VisionOcrService._parse_currency_value(match)
-                    high_priority_values.append(valor)
-                except (ValueError, TypeError):
-                    continue
-
-        if high_priority_values:
-            return max(high_priority_values)
-
-        all_values = []
-        for match in re.findall(r'R?\$?\s*(\d+(?:[.,\s]\d{3})*[.,]\d{2})', text_normalized):
-            try:
-                valor = VisionOcrService._parse_currency_value(match)
-                if valor > 0:
-                    all_values.append(valor)
-            except (ValueError, TypeError):
+                    resultados[indice] = (cls._extract_text_from_file(file_path), None)
+                except OcrProcessingError as e:
+                    resultados[indice] = ("", str(e))
                 continue
-
-        for match in re.findall(r'R?\$?\s*(\d{1,3}(?:[.\s]\d{3})+)(?![,\d])', text_normalized):
+            imagens.append((indice, file_path))
+        
+        preparadas = PreprocessadorImagem.preparar_lote([file_path for _, file_path in imagens])
+        
+        # Agrupar por quantidade e por tamanho do payload (originais lidos só no envio de cada lote)
+        lotes, lote, tamanho_lote = [], [], 0
+        for (indice, file_path), conteudo in zip(imagens, preparadas):
             try:
-                valor = float(match.replace('.', '').replace(' ', ''))
-                if valor > 0:
-                    all_values.append(valor)
-            except (ValueError, TypeError):
+                tamanho = len(conteudo) if conteudo is not None else os.path.getsize(file_path)
+            except OSError as e:
+                resultados[indice] = ("", f"Falha ao ler arquivo: {e}")
                 continue
-
-        for match in re.findall(r'R?\$?\s*(\d{5,})', text_normalized):
+            if lote and (len(lote) >= batch_size or tamanho_lote + tamanho > max_bytes):
+                lotes.append(lote)
+                lote, tamanho_lote = [], 0
+            lote.append((indice, file_path, conteudo))
+            tamanho_lote += tamanho
+        if lote:
+            lotes.append(lote)
+        
+        if not lotes:
+            return resultados
+        
+        try:
+            client = cls._get_client()
+        except OcrProcessingError as e:
+            for lote in lotes:
+                for indice, *_ in lote:
+                    resultados[indice] = ("", str(e))
+            return resultados
+        
+        feature = vision.Feature(type=vision.Feature.Type[FinanceiroConfig.get_detection_type()])
+        for lote in lotes:
             try:
-                valor = float(match)
-                if valor > 0:
-                    all_values.append(valor)
-            except (ValueError, TypeError):
+                requests = []
+                for _, file_path, conteudo in lote:
+                    if conteudo is None:
+                        with open(file_path, 'rb') as image_file:
+                            conteudo = image_file.read()
+                    requests.append(vision.AnnotateImageRequest(
+                        image=vision.Image(content=conteudo), features=[feature]
+                    ))
+                response = client.batch_annotate_images(requests=requests)
+                respostas = list(response.responses)
+                if len(respostas) != len(lote):
+                    raise OcrProcessingError(f"Vision retornou {len(respostas)} respostas para {len(lote)} imagens")
+            except Exception as e:
+                print(f"Erro no OCR em lote com Google Vision: {e}")
+                for indice, *_ in lote:
+                    resultados[indice] = ("", f"Falha na extração de texto: {str(e)}")
                 continue
-
-        if not all_values:
-            return None
-
-        max_valor = max(all_values)
-        if max_valor >= 5.00:
-            candidatos = [v for v in all_values if v >= 5.00]
-            if candidatos:
-                return max(candidatos)
-
-        return max_valor
+            
+            for (indice, *_), resposta in zip(lote, respostas):
+                error_msg = cls._response_error(resposta)
+                if error_msg:
+                    resultados[indice] = ("", f"Erro do Google Vision: {error_msg}")
+                else:
+                    resultados[indice] = (cls._response_text(resposta), None)
+        
+        return resultados
+    
+    @staticmethod
+    def _find_amount_in_text(text: str) -> Optional[float]:
+        """Valor monetário mais provável do comprovante (ver ExtratorRecibo)"""
+        return ExtratorRecibo.extrair(text)['amount']
 
     @staticmethod
     def _parse_currency_value(value_str: str) -> float:
         """Converte string de valor monetário para float"""
-        value_str = value_str.replace(' ', '')
-        value_str = value_str.replace('O', '0').replace('o', '0')
-        if '.' in value_str and ',' in value_str:
-            if value_str.rfind('.') > value_str.rfind(','):
-                # Formato americano: 1,234.56
-                cleaned_value = value_str.replace(',', '')
-            else:
-                # Formato brasileiro: 1.234,56
-                cleaned_value = value_str.replace('.', '').replace(',', '.')
-        else:
-            # Apenas vírgula ou ponto
-            cleaned_value = value_str.replace(',', '.')
-        
-        return float(cleaned_value)
+        return converter_valor(value_str)
 
     @staticmethod
     def _find_transaction_id_in_text(text: str) -> Optional[str]:
-        """
-        Encontra um ID de transação em uma string de texto.
-        Suporta múltiplos padrões de bancos brasileiros.
-        """
-        import unicodedata
-        
-        # Normalizar texto removendo acentos para facilitar regex
-        def remove_accents(input_str):
-            nfkd = unicodedata.normalize('NFKD', input_str)
-            return ''.join([c for c in nfkd if not unicodedata.combining(c)])
-        
-        text_normalized = remove_accents(text).upper()
-        
-        # Padrão 1: Labels explícitos (prioridade alta)
-        # IMPORTANTE: Aceitar IDs numéricos OU alfanuméricos (mínimo 8 chars)
-        explicit_patterns = [
-            # Mercado Pago e similares - "Número da transação" (numérico OU alfanumérico)
-            r'(?:NUMERO\s+DA\s+TRANSACAO|NUMERO\s+TRANSACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            
-            # PIX - Diversos formatos
-            r'(?:ID\s+DA\s+TRANSACAO|ID\s+TRANSACAO|IDENTIFICACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:CODIGO\s+DA\s+TRANSACAO|CODIGO\s+TRANSACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            
-            # Termos comuns
-            r'(?:ID\s+PAGAMENTO|PAGAMENTO\s+ID|ID\s+PIX)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:CODIGO\s+DA\s+OPERACAO|COD\.\s+OPERACAO|OPERACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:NUMERO\s+DA\s+OPERACAO|N\.\s+OPERACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:N\.\s+DOCUMENTO|NUMERO\s+DOCUMENTO|DOCUMENTO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:NOSSO\s+NUMERO|NOSSO\s+NUM)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:PROTOCOLO|AUTENTICACAO)\s*[:\-]?\s*([a-zA-Z0-9]{8,50})',
-            r'(?:COMPROVACAO|COMPROVANTE)\s*[:\-]?\s*([a-zA-Z0-9]{15,50})',
-            
-            # Nubank/Inter (UUID-like)
-            r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})',
-        ]
-        
-        for pattern in explicit_patterns:
-            matches = re.findall(pattern, text_normalized, re.IGNORECASE)
-            if matches:
-                candidate = matches[0].strip()
-                # Validar que não é data ou valor monetário
-                if not re.match(r'^\d{1,2}[/\-\.]\d{1,2}', candidate):
-                    # Validar tamanho mínimo razoável (8+ chars)
-                    if len(candidate) >= 8:
-                        return candidate
-        
-        # Padrão 2: IDs PIX padrão brasileiro (começam com E ou D)
-        # Formato: E00000000202510021939023026977590 (32+ caracteres)
-        pix_pattern = r'\b([ED][0-9]{25,40})\b'
-        matches = re.findall(pix_pattern, text_normalized)
-        if matches:
-            # Retornar o mais longo (geralmente mais completo)
-            return max(matches, key=len)
-        
-        # Padrão 3: Sequências alfanuméricas longas (15-50 chars)
-        # Após palavras-chave relacionadas a transação
-        context_pattern = r'(?:TRANSACAO|PAGAMENTO|PIX|TRANSFERENCIA)\s*[:\-]?\s*([A-Z0-9]{15,50})'
-        matches = re.findall(context_pattern, text_normalized)
-        if matches:
-            return matches[0].strip()
-        
-        # Padrão 4: Busca genérica por códigos longos
-        # Evitar datas (com /) e valores (com , ou R$)
-        generic_pattern = r'\b([A-Z0-9]{20,50})\b'
-        matches = re.findall(generic_pattern, text_normalized)
-        if matches:
-            # Filtrar candidatos válidos
-            for candidate in matches:
-                # Não pode ser só números (pode ser CPF, telefone, etc)
-                if not candidate.isdigit():
-                    # Não pode ter padrão de data
-                    if not re.search(r'\d{2}[/\-\.]\d{2}', candidate):
-                        return candidate
-
-        return None
+        """ID da transação do comprovante (ver ExtratorRecibo)"""
+        return ExtratorRecibo.extrair(text)['transaction_id']
 
     @staticmethod
     def _find_date_in_text(text: str) -> Optional[str]:
-        """
-        Encontra data no texto do comprovante.
-        """
-        text = text.upper()
-        
-        # Padrões de data brasileira
-        date_patterns = [
-            r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
-            r'(?:DATA\s+DA\s+TRANSACAO|DATA\s+DO\s+PAGAMENTO|DATA)\s*[:\-]?\s*(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{2,4})',
-            r'(\d{1,2}\s+DE\s+\w+\s+DE\s+\d{4})'  # "15 de janeiro de 2024"
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                return matches[0]
-        
-        return None
+        """Data do comprovante (ver ExtratorRecibo)"""
+        return ExtratorRecibo.extrair(text)['date']
 
     @staticmethod
     def _find_bank_info_in_text(text: str) -> Dict[str, Optional[str]]:
         """
-        Encontra informações bancárias no texto.
+        Informações bancárias do comprovante (ver ExtratorRecibo).
         Inclui dados do RECEBEDOR (para validação) e dados do PAGADOR.
         """
-        text_upper = text.upper()
-        
-        result = {
-            'banco_emitente': None,
-            'agencia_recebedor': None,
-            'conta_recebedor': None,
-            'chave_pix_recebedor': None,
-            'nome_recebedor': None,      # NOVO: Nome de quem recebeu
-            'cnpj_recebedor': None,       # NOVO: CNPJ de quem recebeu
-            'cpf_cnpj_recebedor': None    # NOVO: CPF ou CNPJ formatado
-        }
-        
-        # Padrões para banco emitente
-        bank_patterns = [
-            r'(?:BANCO\s+DO\s+BRASIL|BB|CAIXA\s+ECONOMICA|ITAU|BRADESCO|SANTANDER|NUBANK|INTER|SICOOB|SICREDI)',
-            r'(?:BANCO\s+)[A-Z\s]+(?=\s|$)'
-        ]
-        
-        for pattern in bank_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                result['banco_emitente'] = matches[0].strip()
-                break
-        
-        # Padrões para agência
-        agency_patterns = [
-            r'(?:AGENCIA|AG\.?)\s*[:\-]?\s*(\d{4,5})',
-            r'(\d{4,5})\s*(?:AGENCIA|AG\.?)'
-        ]
-        
-        for pattern in agency_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                result['agencia_recebedor'] = matches[0]
-                break
-        
-        # Padrões para conta
-        account_patterns = [
-            r'(?:CONTA|CC)\s*[:\-]?\s*(\d{5,15})',
-            r'(\d{5,15})\s*(?:CONTA|CC)'
-        ]
-        
-        for pattern in account_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                result['conta_recebedor'] = matches[0]
-                break
-        
-        # Padrões para chave PIX (busca abrangente)
-        # Busca TODAS as chaves PIX e filtra a da empresa
-        pix_empresa = 'pix@gruposertao.com'
-        
-        pix_patterns = [
-            r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})',  # Qualquer email
-            r'(\+55\s?\d{2}\s?\d{4,5}[\/\-]?\d{4})',  # Telefone
-            r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})',  # Chave aleatória
-        ]
-        
-        chaves_encontradas = []
-        for pattern in pix_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            chaves_encontradas.extend(matches)
-        
-        # Verificar se alguma chave encontrada é da empresa
-        for chave in chaves_encontradas:
-            chave_lower = chave.lower().strip()
-            pix_empresa_lower = pix_empresa.lower()
-            
-            if chave_lower == pix_empresa_lower:
-                result['chave_pix_recebedor'] = chave
-                break
-        
-        # Se não encontrou a chave da empresa, pegar a primeira chave encontrada (pode ser útil)
-        if not result['chave_pix_recebedor'] and chaves_encontradas:
-            result['chave_pix_recebedor'] = chaves_encontradas[0]
-        
-        # NOVO: Extrair CNPJ do recebedor (busca abrangente)
-        # Busca TODOS os CNPJs no texto e filtra o da empresa
-        cnpj_empresa = '30080209000416'  # Grupo Sertão
-        
-        # Padrões para encontrar QUALQUER CNPJ no texto
-        cnpj_patterns = [
-            r'(\d{2}\.?\d{3}\.?\d{3}[\/\-]?\d{3,4}[\/\-]?\d{2})',  # Com formatação
-            r'(\d{14})',  # 14 dígitos seguidos
-        ]
-        
-        cnpjs_encontrados = []
-        for pattern in cnpj_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                cnpj_limpo = re.sub(r'[^\d]', '', match)
-                if len(cnpj_limpo) == 14:
-                    cnpjs_encontrados.append({
-                        'original': match,
-                        'limpo': cnpj_limpo
-                    })
-        
-        # Verificar se algum CNPJ encontrado é da empresa
-        for cnpj_data in cnpjs_encontrados:
-            if cnpj_data['limpo'] == cnpj_empresa:
-                result['cnpj_recebedor'] = cnpj_data['limpo']
-                result['cpf_cnpj_recebedor'] = cnpj_data['original']
-                break
-        
-        # NOVO: Extrair nome do recebedor
-        # Procurar após palavras-chave "Para:", "Recebedor:", "Favorecido:", "Beneficiário:"
-        nome_patterns = [
-            r'(?:PARA|RECEBEDOR|FAVORECIDO|BENEFICIARIO)\s*[:\-]?\s*([A-Z][A-Z\s&]{3,50})',
-            r'(?:DESTINATARIO|DESTINO)\s*[:\-]?\s*([A-Z][A-Z\s&]{3,50})',
-        ]
-        
-        for pattern in nome_patterns:
-            matches = re.findall(pattern, text_upper, re.IGNORECASE)
-            if matches:
-                nome = matches[0].strip()
-                # Limpar espaços extras
-                nome = ' '.join(nome.split())
-                if len(nome) >= 3:  # Nome mínimo razoável
-                    result['nome_recebedor'] = nome
-                    break
-        
-        return result
+        return ExtratorRecibo.extrair(text)['bank_info']
     
     @staticmethod
     def _validar_recebedor(bank_info: Dict, recebedor_esperado: Dict) -> Dict:
@@ -723,50 +478,77 @@ class VisionOcrService:
         """
         try:
             text = cls._extract_text_from_file(file_path)
-            if not text:
-                return {
-                    'amount': None, 
-                    'transaction_id': None,
-                    'date': None,
-                    'bank_info': {},
-                    'error': 'Não foi possível extrair texto do documento.'
-                }
-
-            # Extrair todos os dados
-            amount = cls._find_amount_in_text(text)
-            transaction_id = cls._find_transaction_id_in_text(text)
-            date = cls._find_date_in_text(text)
-            bank_info = cls._find_bank_info_in_text(text)
-            
-            # NOVO: Validar recebedor (se configurado)
-            from .config import FinanceiroConfig
-            validacao_recebedor = None
-            
-            if FinanceiroConfig.validar_recebedor_habilitado():
-                recebedor_esperado = FinanceiroConfig.get_recebedor_esperado()
-                validacao_recebedor = cls._validar_recebedor(bank_info, recebedor_esperado)
-
-            return {
-                'amount': amount,
-                'transaction_id': transaction_id,
-                'date': date,
-                'bank_info': bank_info,
-                'validacao_recebedor': validacao_recebedor  # NOVO campo
-            }
+            return cls.parse_text(text)
             
         except OcrProcessingError as e:
-            return {
-                'amount': None, 
-                'transaction_id': None,
-                'date': None,
-                'bank_info': {},
-                'error': str(e)
-            }
+            return cls._resultado_erro(str(e))
         except Exception as e:
-            return {
-                'amount': None, 
-                'transaction_id': None,
-                'date': None,
-                'bank_info': {},
-                'error': f'Erro inesperado no Google Vision: {str(e)}'
-            }
+            return cls._resultado_erro(f'Erro inesperado no Google Vision: {str(e)}')
+    
+    @classmethod
+    def process_pdf_text(cls, file_path: str) -> Optional[Dict]:
+        """
+        Processa um PDF pela camada de texto, sem chamar o Vision.
+        Returns:
+            dict | None: Dados no formato de process_receipt, ou None se o arquivo
+            não for um PDF com texto utilizável (digitalizado, imagem etc.)
+        """
+        text = TextoPdf.extrair(file_path)
+        if text is None:
+            return None
+        return dict(cls.parse_text(text), fonte='pdf_texto')
+    
+    @classmethod
+    def process_receipts_batch(cls, file_paths: List[str], batch_size: Optional[int] = None) -> List[Dict]:
+        """
+        Processa vários recibos com chamadas em lote ao Google Vision.
+        Retorna um dicionário por arquivo, na mesma ordem, no formato de process_receipt.
+        """
+        resultados = []
+        for text, erro in cls.extract_texts_batch(file_paths, batch_size):
+            if erro:
+                resultados.append(cls._resultado_erro(erro))
+                continue
+            try:
+                resultados.append(cls.parse_text(text))
+            except Exception as e:
+                resultados.append(cls._resultado_erro(f'Erro inesperado no Google Vision: {str(e)}'))
+        return resultados
+    
+    @staticmethod
+    def _resultado_erro(mensagem: str) -> Dict:
+        return {
+            'amount': None, 
+            'transaction_id': None,
+            'date': None,
+            'bank_info': {},
+            'error': mensagem
+        }
+    
+    @classmethod
+    def parse_text(cls, text: str) -> Dict:
+        """
+        Extrai valor, ID da transação, data e dados bancários do texto reconhecido.
+        """
+        if not text:
+            return cls._resultado_erro('Não foi possível extrair texto do documento.')
+
+        # Modelo do banco/app emissor, se reconhecido; senão a extração genérica
+        campos = extrair_campos(text)
+        bank_info = campos['bank_info']
+        
+        # NOVO: Validar recebedor (se configurado)
+        validacao_recebedor = None
+        
+        if FinanceiroConfig.validar_recebedor_habilitado():
+            recebedor_esperado = FinanceiroConfig.get_recebedor_esperado()
+            validacao_recebedor = cls._validar_recebedor(bank_info, recebedor_esperado)
+
+        return {
+            'amount': campos['amount'],
+            'transaction_id': campos['transaction_id'],
+            'date': campos['date'],
+            'bank_info': bank_info,
+            'layout': campos['layout'],
+            'validacao_recebedor': validacao_recebedor  # NOVO campo
+        }
@@ -4,13 +4,13 @@ from typing import Dict, Optional
 
 from flask import current_app
 
-from ..financeiro.vision_service import VisionOcrService
+from ..financeiro.ocr_backends import get_ocr_backend
 from ..financeiro.exceptions import OcrProcessingError
 from ..upload_security import FileUploadValidator
 
 
 class NotaFiscalReaderService:
-    """Serviço simples para leitura de DANFE usando Google Vision."""
+    """Serviço simples para leitura de DANFE com o motor de OCR da rota (Google Vision por padrão)."""
 
     @staticmethod
     def _parse_currency(value: str) -> Optional[float]:
@@ -172,7 +172,7 @@ class NotaFiscalReaderService:
             }
 
         try:
-            texto = VisionOcrService.extract_text(caminho)
+            texto = get_ocr_backend().extract_text(caminho)
             resumo = NotaFiscalReaderService._extract_summary(texto or '')
             itens = NotaFiscalReaderService._extract_itens(texto or '')
             valor_total_itens = sum(item['valor_total'] for item in itens if item.get('valor_total'))
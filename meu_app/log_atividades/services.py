@@ -15,6 +15,7 @@ import json
 from datetime import datetime, timedelta
 from sqlalchemy import desc, and_, or_, func
 from ..exceptions import DatabaseError, ValidationError, handle_database_error
+from ..paginacao import paginacao
 from .repositories import LogAtividadeRepository
 
 
@@ -158,9 +159,8 @@ class LogAtividadesService:
             total_registros = query.count()
             
             # Calcular paginação
-            total_paginas = (total_registros + per_page - 1) // per_page
-            page = max(1, min(page, total_paginas)) if total_paginas > 0 else 1
-            offset = (page - 1) * per_page
+            pagina = paginacao(page, per_page, total_registros)
+            offset = (pagina['page'] - 1) * per_page
             
             # Ordenar por data mais recente e aplicar paginação com eager loading
             atividades = query.options(
@@ -169,12 +169,8 @@ class LogAtividadesService:
             
             return {
                 'atividades': atividades,
-                'page': page,
-                'per_page': per_page,
                 'total_registros': total_registros,
-                'total_paginas': total_paginas,
-                'has_prev': page > 1,
-                'has_next': page < total_paginas
+                **pagina
             }
             
         except ValidationError:
@@ -2,6 +2,7 @@ from datetime import datetime
 import enum
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Enum as EnumType
+from sqlalchemy.ext.hybrid import hybrid_property
 
 from . import db
 
@@ -56,9 +57,13 @@ class Pedido(db.Model):
     confirmado_comercial = db.Column(db.Boolean, default=False)  # Novo campo
     confirmado_por = db.Column(db.String(100))  # Novo campo
     data_confirmacao = db.Column(db.DateTime)  # Novo campo
+    # Controle de concorrência otimista (UPDATE ... WHERE versao = ?)
+    versao = db.Column(db.Integer, nullable=False, server_default='1')
     cliente = db.relationship('Cliente', backref=db.backref('pedidos', lazy=True))
     itens = db.relationship('ItemPedido', backref='pedido', lazy=True)
     
+    __mapper_args__ = {'version_id_col': versao}
+    
     def calcular_totais(self):
         """
         Calcula totais do pedido de forma centralizada
@@ -109,7 +114,19 @@ class ItemPedido(db.Model):
     valor_total_venda = db.Column(db.Numeric(10, 2), nullable=False)
     valor_total_compra = db.Column(db.Numeric(10, 2), nullable=False)
     lucro_bruto = db.Column(db.Numeric(10, 2), nullable=False)
+    # Total já coletado do item, mantido por ColetaService.processar_coleta
+    # (reparo: ColetaService.recalcular_quantidades_coletadas / flask recalcular-coletado)
+    quantidade_coletada = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Controle de concorrência otimista (UPDATE ... WHERE versao = ?)
+    versao = db.Column(db.Integer, nullable=False, server_default='1')
     produto = db.relationship('Produto')
+    
+    __mapper_args__ = {'version_id_col': versao}
+    
+    @hybrid_property
+    def quantidade_pendente(self):
+        """Quantidade ainda não coletada (também utilizável em filtros SQL)"""
+        return self.quantidade - self.quantidade_coletada
 
 class Pagamento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -124,6 +141,7 @@ class Pagamento(db.Model):
     recibo_mime = db.Column(db.String(50), nullable=True)
     recibo_tamanho = db.Column(db.Integer, nullable=True)
     recibo_sha256 = db.Column(db.String(64), unique=True, nullable=True)
+    recibo_phash = db.Column(db.String(16), nullable=True)  # dHash de 64 bits (comprovantes quase idênticos)
     
     # NOVOS CAMPOS - Dados extraídos do comprovante via OCR
     data_comprovante = db.Column(db.Date, nullable=True)  # Data extraída do comprovante
@@ -321,14 +339,52 @@ class Estoque(db.Model):
     data_entrada = db.Column(db.DateTime, default=datetime.utcnow)
     data_modificacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(50), nullable=False, default='Contagem')
+    # Controle de concorrência otimista (UPDATE ... WHERE versao = ?)
+    versao = db.Column(db.Integer, nullable=False, server_default='1')
     
     # Relacionamento com produto
     produto = db.relationship('Produto', backref=db.backref('estoque', lazy=True, uselist=False))
     
+    # Reserva do produto (contador mantido por ReservaEstoqueService)
+    reserva = db.relationship(
+        'ReservaEstoque',
+        primaryjoin='foreign(ReservaEstoque.produto_id) == Estoque.produto_id',
+        uselist=False,
+        viewonly=True,
+        lazy='joined'
+    )
+    
+    @property
+    def quantidade_reservada(self):
+        """Quantidade reservada para pedidos confirmados ainda não coletados"""
+        return self.reserva.quantidade_reservada if self.reserva else 0
+    
+    @property
+    def quantidade_disponivel(self):
+        """Quantidade disponível para venda (em estoque − reservado)"""
+        return self.quantidade - self.quantidade_reservada
+    
+    __mapper_args__ = {'version_id_col': versao}
+    
     def __repr__(self):
         return f'<Estoque {self.produto.nome}: {self.quantidade}>'
 
 
+class ReservaEstoque(db.Model):
+    """Contador de quantidade reservada por produto para pedidos confirmados"""
+    __tablename__ = 'reserva_estoque'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False, unique=True)
+    quantidade_reservada = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    produto = db.relationship('Produto', backref=db.backref('reserva', lazy=True, uselist=False))
+    
+    def __repr__(self):
+        return f'<ReservaEstoque produto={self.produto_id}: {self.quantidade_reservada}>'
+
+
 class MovimentacaoEstoque(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
@@ -344,6 +400,11 @@ class MovimentacaoEstoque(db.Model):
     # Relacionamento com produto
     produto = db.relationship('Produto', backref=db.backref('movimentacoes', lazy=True))
     
+    # Índice composto para o histórico paginado por keyset (produto, data, id)
+    __table_args__ = (
+        db.Index('ix_movimentacao_estoque_produto_data_id', 'produto_id', 'data_movimentacao', 'id'),
+    )
+    
     def __repr__(self):
         return f'<MovimentacaoEstoque {self.produto.nome}: {self.tipo_movimentacao} {self.quantidade_movimentada}>'
 
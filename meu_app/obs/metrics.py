@@ -11,6 +11,7 @@ Métricas Coletadas:
 - business_operations_total: Operações de negócio (pedidos, pagamentos, etc)
 - database_queries_total: Total de queries executadas
 - cache_operations_total: Operações de cache (hit/miss)
+- ocr_cache_operations_total: Cache de resultados de OCR por backend (hit/miss/set/evicted)
 
 Endpoint:
     GET /metrics - Exporta métricas no formato Prometheus
@@ -101,6 +102,12 @@ cache_operations_total = Counter(
     ['operation', 'result']  # operation: get/set/delete, result: hit/miss/success
 )
 
+ocr_cache_operations_total = Counter(
+    'ocr_cache_operations_total',
+    'Operações do cache de resultados de OCR',
+    ['backend', 'result']  # backend: disco/redis, result: hit/miss/set/evicted/error
+)
+
 # ===========================
 # MÉTRICAS DE APLICAÇÃO
 # ===========================
@@ -313,6 +320,25 @@ def track_cache_operation(operation: str, result: str):
     ).inc()
 
 
+def track_ocr_cache(backend: str, result: str, quantidade: int = 1):
+    """
+    Registra uma operação do cache de resultados de OCR.
+    
+    Args:
+        backend: Backend do cache (disco, redis)
+        result: Resultado (hit, miss, set, evicted, error)
+        quantidade: Número de entradas afetadas (ex.: despejo em lote)
+        
+    Exemplo:
+        >>> track_ocr_cache('disco', 'hit')
+        >>> track_ocr_cache('disco', 'evicted', 12)
+    """
+    ocr_cache_operations_total.labels(
+        backend=backend,
+        result=result
+    ).inc(quantidade)
+
+
 def export_metrics():
     """
     Exporta métricas no formato Prometheus.
@@ -0,0 +1,29 @@
+"""
+Metadados de paginação por página/OFFSET, no formato usado pelas listagens
+(log de atividades, coletas, financeiro)
+"""
+from typing import Dict
+
+
+def paginacao(page: int, per_page: int, total: int) -> Dict:
+    """
+    Monta os metadados de uma página, com a página limitada ao intervalo válido
+
+    Args:
+        page: Página pedida (1 = primeira)
+        per_page: Registros por página
+        total: Total de registros da listagem
+
+    Returns:
+        Dict: page, per_page, total, total_paginas, has_prev e has_next
+    """
+    total_paginas = (total + per_page - 1) // per_page
+    page = max(1, min(page, total_paginas)) if total_paginas > 0 else 1
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'total_paginas': total_paginas,
+        'has_prev': page > 1,
+        'has_next': page < total_paginas
+    }
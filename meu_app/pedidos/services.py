@@ -2,7 +2,9 @@
 Serviços para o módulo de pedidos
 Contém toda a lógica de negócio complexa separada das rotas
 """
-from ..models import db, Pedido, ItemPedido, Cliente, Produto, Coleta, ItemColetado, LogAtividade, Usuario
+from ..models import db, Pedido, ItemPedido, Cliente, Produto, Coleta, ItemColetado, LogAtividade, Usuario, StatusPedido
+from ..estoques.reserva_service import ReservaEstoqueService
+from ..cache import invalidate_cache
 from flask import current_app, session
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
@@ -85,6 +87,7 @@ class PedidoService:
                 return False, "Nenhum item válido foi adicionado ao pedido", None
             
             db.session.commit()
+            invalidate_cache('pedido.criado')
             
             # Registrar atividade
             total_pedido = sum(i.valor_total_venda for i in pedido.itens)
@@ -136,6 +139,11 @@ class PedidoService:
             if pedido.cliente_id != cliente_id:
                 pedido.cliente_id = cliente_id
             
+            # Pedido confirmado: liberar a reserva dos itens antigos e reservar os novos
+            reserva_ativa = ReservaEstoqueService.pedido_reserva_estoque(pedido)
+            if reserva_ativa:
+                ReservaEstoqueService.liberar_pedido(pedido.id)
+            
             # Remover itens existentes
             for item in pedido.itens:
                 db.session.delete(item)
@@ -180,7 +188,12 @@ class PedidoService:
                 db.session.rollback()
                 return False, "Nenhum item válido foi adicionado ao pedido", None
             
+            if reserva_ativa:
+                db.session.flush()
+                ReservaEstoqueService.reservar_pedido(pedido.id)
+            
             db.session.commit()
+            invalidate_cache('pedido.atualizado')
             
             # Registrar atividade
             total_pedido = sum(i.valor_total_venda for i in pedido.itens)
@@ -228,6 +241,10 @@ class PedidoService:
                 dados_extras={"pedido_id": pedido.id, "cliente_id": pedido.cliente_id, "total": total_pedido}
             )
             
+            # Devolver ao disponível o que ainda estava reservado para o pedido
+            if ReservaEstoqueService.pedido_reserva_estoque(pedido):
+                ReservaEstoqueService.liberar_pedido(pedido.id)
+            
             # Excluir itens do pedido
             for item in pedido.itens:
                 db.session.delete(item)
@@ -247,6 +264,7 @@ class PedidoService:
             # Excluir pedido
             db.session.delete(pedido)
             db.session.commit()
+            invalidate_cache('pedido.cancelado')
             
             current_app.logger.info(f"Pedido excluído: #{pedido_id} - Cliente: {cliente.nome if cliente else 'N/A'}")
             
@@ -281,11 +299,17 @@ class PedidoService:
                 return False, "Pedido não encontrado"
             
             # Confirmar pedido
+            ja_confirmado = ReservaEstoqueService.pedido_reserva_estoque(pedido)
             pedido.confirmado_comercial = True
             pedido.confirmado_por = session.get('usuario_nome', 'Usuário')
             pedido.data_confirmacao = datetime.utcnow()
             
+            # Reservar o estoque do pedido na mesma transação da confirmação
+            if not ja_confirmado and pedido.status != StatusPedido.CANCELADO:
+                ReservaEstoqueService.reservar_pedido(pedido.id)
+            
             db.session.commit()
+            invalidate_cache('pedido.atualizado')
             
             # Registrar atividade
             PedidoService._registrar_atividade(
@@ -452,45 +476,41 @@ class PedidoService:
     @staticmethod
     def calcular_necessidade_compra() -> List[Dict]:
         """
-        Calcula a necessidade de compra baseada nos pedidos liberados pelo comercial
+        Calcula a necessidade de compra baseada nas reservas dos pedidos liberados pelo comercial
         
         Returns:
             List[Dict]: Lista com produtos e necessidade de compra
         """
         try:
-            from sqlalchemy import func
-            from ..models import Estoque
+            from ..models import Estoque, ReservaEstoque
             
-            # Buscar todos os pedidos confirmados pelo comercial
-            pedidos_liberados = db.session.query(
+            # O reservado já é o pendente dos pedidos confirmados (sem o que foi coletado)
+            reservas = db.session.query(
                 Produto.id,
                 Produto.nome,
-                func.sum(ItemPedido.quantidade).label('quantidade_pedida')
-            ).join(
-                ItemPedido, ItemPedido.produto_id == Produto.id
+                ReservaEstoque.quantidade_reservada,
+                Estoque.quantidade
             ).join(
-                Pedido, Pedido.id == ItemPedido.pedido_id
+                ReservaEstoque, ReservaEstoque.produto_id == Produto.id
+            ).outerjoin(
+                Estoque, Estoque.produto_id == Produto.id
             ).filter(
-                Pedido.confirmado_comercial == True
-            ).group_by(
-                Produto.id, Produto.nome
+                ReservaEstoque.quantidade_reservada > 0
             ).all()
             
             resultado = []
             
-            for produto_id, produto_nome, quantidade_pedida in pedidos_liberados:
-                # Buscar estoque atual
-                estoque = Estoque.query.filter_by(produto_id=produto_id).first()
-                quantidade_estoque = estoque.quantidade if estoque else 0
+            for produto_id, produto_nome, quantidade_reservada, quantidade_estoque in reservas:
+                quantidade_estoque = quantidade_estoque or 0
                 
                 # Calcular necessidade
-                saldo = quantidade_estoque - int(quantidade_pedida)
+                saldo = quantidade_estoque - int(quantidade_reservada)
                 necessidade_compra = abs(saldo) if saldo < 0 else 0
                 
                 resultado.append({
                     'produto_id': produto_id,
                     'produto_nome': produto_nome,
-                    'quantidade_pedida': int(quantidade_pedida),
+                    'quantidade_pedida': int(quantidade_reservada),
                     'quantidade_estoque': quantidade_estoque,
                     'saldo': saldo,
                     'necessidade_compra': necessidade_compra,
@@ -704,6 +724,7 @@ class PedidoService:
                         db.session.add(item)
                     pedidos_criados += 1
                 db.session.commit()
+                invalidate_cache('pedido.criado')
                 
                 if pedidos_criados > 0:
                     PedidoService._registrar_atividade(
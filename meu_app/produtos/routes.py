@@ -6,6 +6,7 @@ from .services import ProdutoService, ImportacaoService, ExportacaoService, Impo
 from functools import wraps
 from ..decorators import login_obrigatorio, permissao_necessaria
 from ..upload_security import validate_excel_upload, validate_csv_upload
+from ..estoques.reserva_service import ReservaEstoqueService
 
 def registrar_atividade(tipo_atividade, titulo, descricao, modulo, dados_extras=None):
     """Função para registrar atividades (será implementada posteriormente)"""
@@ -292,10 +293,18 @@ def api_produtos():
     # Limitar a um número razoável de resultados para não sobrecarregar
     produtos = produtos_query.limit(50).all()
     
+    # Disponível (estoque − reservado) de todos os produtos numa única query
+    disponibilidade = ReservaEstoqueService.disponibilidade(produto.id for produto in produtos)
+    
     # Formatar para o padrão que o Select2 espera (id, text)
-    results = [
-        {'id': produto.id, 'text': f"{produto.nome} ({produto.codigo_interno or 'N/A'})"}
-        for produto in produtos
-    ]
+    results = []
+    for produto in produtos:
+        saldo = disponibilidade.get(produto.id)
+        disponivel = saldo['disponivel'] if saldo else 0
+        results.append({
+            'id': produto.id,
+            'text': f"{produto.nome} ({produto.codigo_interno or 'N/A'}) - Disp.: {disponivel}",
+            'disponivel': disponivel
+        })
     
     return jsonify({'results': results})
@@ -3,20 +3,55 @@ Sistema de filas assíncronas com RQ (Redis Queue)
 Fase 7 - Processamento assíncrono de OCR e uploads
 """
 
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
 from redis import Redis
 from rq import Queue
 from flask import current_app
 
+logger = logging.getLogger(__name__)
+
 # Redis connection (singleton)
 redis_conn = None
 ocr_queue = None
+recibos_queue = None
+
+# Fallback sem Redis: pool de processos local para jobs CPU-bound (ReportLab)
+_process_pool = None
+_process_pool_lock = threading.Lock()
+# Jobs locais em execução neste processo (o Future sai daqui ao terminar)
+_local_jobs = {}
+
+# Fallback sem Redis para OCR (espera a rede, não a CPU): threads e fila limitadas
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+_ocr_local_pendentes = 0
+_RESULTADO_LOCAL_TTL = 3600  # mesmo result_ttl dos jobs de OCR no RQ
+_RECIBOS_LOTE_TTL = 86400  # mesmo result_ttl dos lotes de recibos no RQ
+
+# Status dos jobs locais em instance/jobs/<job_id>.json: com `gunicorn -w N`, a
+# consulta do resultado cai em qualquer processo, não só no que criou o job
+_JOB_ID_VALIDO = re.compile(r'[A-Za-z0-9_-]{1,64}')
+_LIMPEZA_JOBS_INTERVALO = 300
+_ultima_limpeza_jobs = 0.0
+
+# Status de job ainda não terminado (RQ e pool local)
+_STATUS_PENDENTES = ('queued', 'started', 'deferred', 'scheduled')
 
 
 def init_queue(app):
     """
     Inicializa a conexão Redis e a fila RQ
     """
-    global redis_conn, ocr_queue
+    global redis_conn, ocr_queue, recibos_queue
     
     redis_url = app.config.get('REDIS_URL', 'redis://localhost:6379/0')
     
@@ -27,14 +62,18 @@ def init_queue(app):
         # Criar fila para OCR (com timeout de 5 minutos)
         ocr_queue = Queue('ocr', connection=redis_conn, default_timeout=300)
         
+        # Fila para geração de recibos em lote (ReportLab, CPU-bound)
+        recibos_queue = Queue('recibos', connection=redis_conn, default_timeout=600)
+        
         app.logger.info(f"✅ RQ inicializado: {redis_url}")
         app.logger.info(f"✅ Fila 'ocr' criada com sucesso")
         
     except Exception as e:
         app.logger.warning(f"⚠️ Redis não disponível: {e}")
-        app.logger.warning("⚠️ Processamento OCR será SÍNCRONO")
+        app.logger.warning("⚠️ OCR assíncrono usará o pool de threads local")
         redis_conn = None
         ocr_queue = None
+        recibos_queue = None
 
 
 def get_queue():
@@ -47,7 +86,7 @@ def get_redis():
     return redis_conn
 
 
-def enqueue_ocr_job(file_path: str, pedido_id: int, pagamento_id: int = None):
+def enqueue_ocr_job(file_path: str, pedido_id: int, pagamento_id: int = None, motores: str = None):
     """
     Enfileira um job de OCR para processamento assíncrono
     
@@ -55,6 +94,7 @@ def enqueue_ocr_job(file_path: str, pedido_id: int, pagamento_id: int = None):
         file_path: Caminho do arquivo a processar
         pedido_id: ID do pedido associado
         pagamento_id: ID do pagamento (opcional)
+        motores: Cadeia de motores de OCR (padrão: a da rota atual)
     
     Returns:
         Job ID ou None se fila indisponível
@@ -65,12 +105,14 @@ def enqueue_ocr_job(file_path: str, pedido_id: int, pagamento_id: int = None):
     
     try:
         from .tasks import process_ocr_task
+        from meu_app.financeiro.ocr_backends import get_ocr_backend
         
         job = ocr_queue.enqueue(
             process_ocr_task,
             file_path,
             pedido_id,
             pagamento_id,
+            motores or get_ocr_backend().nome,
             job_timeout=300,  # 5 minutos
             result_ttl=3600,  # Resultado expira em 1 hora
             failure_ttl=86400  # Falhas expiram em 24h
@@ -84,6 +126,312 @@ def enqueue_ocr_job(file_path: str, pedido_id: int, pagamento_id: int = None):
         return None
 
 
+def enqueue_ocr_lote_job(file_paths: list, cache_dir: str = None, duplicatas: list = None,
+                         quota_periodo: tuple = None, motores: str = None):
+    """
+    Enfileira o OCR de vários comprovantes num único job (chamadas em lote ao Vision)
+    
+    Usa a fila 'ocr' do RQ quando o Redis está disponível; senão envia para o
+    pool de threads local, sem ocupar o processo web durante a chamada ao Vision.
+    
+    Args:
+        file_paths: Caminhos dos arquivos (removidos pelo job ao terminar)
+        cache_dir: Diretório do cache de OCR em disco onde gravar os resultados (opcional)
+        duplicatas: Possível duplicata de cada arquivo, anexada ao resultado (opcional)
+        quota_periodo: (ano, mês) da quota reservada; o job devolve as unidades que falharem
+        motores: Cadeia de motores de OCR (padrão: a da rota atual)
+    
+    Returns:
+        Job ID ou None se não foi possível enfileirar (inclusive com o pool local cheio)
+    """
+    from .tasks import process_ocr_lote_task
+    
+    try:
+        from meu_app.financeiro.config import FinanceiroConfig
+        from meu_app.financeiro.ocr_backends import get_ocr_backend
+        
+        args = (
+            file_paths,
+            cache_dir,
+            FinanceiroConfig.get_ocr_cache_max_bytes(),
+            FinanceiroConfig.get_ocr_cache_max_entradas(),
+            duplicatas,
+            quota_periodo,
+            motores or get_ocr_backend().nome
+        )
+        
+        if ocr_queue is not None:
+            job = ocr_queue.enqueue(
+                process_ocr_lote_task,
+                *args,
+                job_timeout=600,  # 10 minutos
+                result_ttl=3600,  # Resultado expira em 1 hora
+                failure_ttl=86400  # Falhas expiram em 24h
+            )
+            current_app.logger.info(f"✅ Job OCR em lote enfileirado: {job.id} ({len(file_paths)} arquivos)")
+            return job.id
+        
+        job_id = f"ocr-{uuid.uuid4().hex}"
+        if not _submeter_ocr_local(job_id, process_ocr_lote_task, *args):
+            current_app.logger.warning("⚠️ Pool de OCR local cheio, job recusado")
+            return None
+        current_app.logger.info(f"✅ Job OCR enviado ao pool local: {job_id} ({len(file_paths)} arquivos)")
+        return job_id
+        
+    except Exception as e:
+        current_app.logger.error(f"❌ Erro ao enfileirar OCR em lote: {e}")
+        return None
+
+
+def _submeter_ocr_local(job_id: str, funcao, *args) -> bool:
+    """
+    Envia um job de OCR ao pool de threads local
+    
+    Returns:
+        bool: False se já há OCR_THREADS_FILA jobs aguardando ou em execução
+    """
+    global _thread_pool, _ocr_local_pendentes
+    
+    app = current_app._get_current_object()
+    threads = app.config.get('OCR_THREADS', 4)
+    maximo = app.config.get('OCR_THREADS_FILA', 16)
+    diretorio = _diretorio_jobs_locais()
+    with _thread_pool_lock:
+        if _ocr_local_pendentes >= maximo:
+            return False
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ocr')
+        _ocr_local_pendentes += 1
+        _gravar_job_local(diretorio, job_id, {'status': 'queued'}, _RESULTADO_LOCAL_TTL)
+        future = _thread_pool.submit(_executar_no_app, app, funcao, *args)
+        _local_jobs[job_id] = future
+    future.add_done_callback(lambda _: _ocr_local_concluido())
+    future.add_done_callback(lambda concluido: _concluir_job_local(diretorio, job_id, concluido, _RESULTADO_LOCAL_TTL))
+    return True
+
+
+def _executar_no_app(app, funcao, *args):
+    """Executa o job na thread com o contexto do app (sem Redis, a quota fica no banco)"""
+    with app.app_context():
+        return funcao(*args)
+
+
+def _ocr_local_concluido():
+    global _ocr_local_pendentes
+    
+    with _thread_pool_lock:
+        _ocr_local_pendentes -= 1
+
+
+def _diretorio_jobs_locais() -> str:
+    """Diretório dos status de jobs locais (limpa os expirados a cada poucos minutos)"""
+    global _ultima_limpeza_jobs
+    
+    diretorio = os.path.join(current_app.instance_path, 'jobs')
+    os.makedirs(diretorio, exist_ok=True)
+    agora = time.monotonic()
+    if agora - _ultima_limpeza_jobs >= _LIMPEZA_JOBS_INTERVALO:
+        _ultima_limpeza_jobs = agora
+        _limpar_jobs_locais(diretorio)
+    return diretorio
+
+
+def _limpar_jobs_locais(diretorio: str):
+    """Remove os status de jobs locais com o TTL vencido"""
+    for entrada in os.scandir(diretorio):
+        if entrada.name.endswith('.json'):
+            _ler_job_local(diretorio, entrada.name[:-len('.json')])
+
+
+def _gravar_job_local(diretorio: str, job_id: str, status: dict, ttl: int):
+    """Grava o status do job (substituição atômica: leitores nunca veem o arquivo pela metade)"""
+    caminho = os.path.join(diretorio, f'{job_id}.json')
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dict(status, job_id=job_id, expira=time.time() + ttl), arquivo, ensure_ascii=False, default=str)
+    os.replace(temporario, caminho)
+
+
+def _ler_job_local(diretorio: str, job_id: str):
+    """Status gravado de um job local (None se não existe ou expirou; o expirado é removido)"""
+    if not _JOB_ID_VALIDO.fullmatch(job_id):
+        return None
+    caminho = os.path.join(diretorio, f'{job_id}.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            status = json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+    if status.pop('expira', 0) <= time.time():
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        return None
+    return status
+
+
+def _concluir_job_local(diretorio: str, job_id: str, future, ttl: int):
+    """Grava o resultado do job para todos os processos e libera o Future deste"""
+    try:
+        if future.exception() is not None:
+            status = {'status': 'failed', 'error': str(future.exception())}
+        else:
+            status = {'status': 'finished', 'result': future.result()}
+        _gravar_job_local(diretorio, job_id, status, ttl)
+    except Exception:
+        logger.exception("Erro ao gravar resultado do job local %s", job_id)
+    finally:
+        _local_jobs.pop(job_id, None)
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Pool de processos local (spawn: os filhos não herdam conexões do app)"""
+    global _process_pool
+    
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _process_pool
+
+
+def enqueue_lote_recibos_job(job_id: str, coletas_data: list, destino: str, download_url: str):
+    """
+    Enfileira a geração de um PDF com vários recibos de coleta
+    
+    Usa a fila 'recibos' do RQ quando o Redis está disponível; senão envia
+    para o pool de processos local, sem ocupar o processo web. O job remove
+    os PDFs de lotes mais antigos que RECIBOS_LOTE_RETENCAO_HORAS.
+    
+    Args:
+        job_id: ID do job (também nome do PDF gerado)
+        coletas_data: Dados dos recibos (dicionários simples)
+        destino: Caminho absoluto do PDF a gerar
+        download_url: URL de download devolvida no resultado do job
+    
+    Returns:
+        Job ID ou None se não foi possível enfileirar
+    """
+    from .tasks import gerar_lote_recibos_task
+    
+    try:
+        args = (coletas_data, destino, download_url, current_app.config.get('RECIBOS_LOTE_RETENCAO_HORAS', 24))
+        
+        if recibos_queue is not None:
+            job = recibos_queue.enqueue(
+                gerar_lote_recibos_task,
+                *args,
+                job_id=job_id,
+                job_timeout=600,  # 10 minutos
+                result_ttl=_RECIBOS_LOTE_TTL,
+                failure_ttl=86400
+            )
+            current_app.logger.info(f"✅ Job de recibos em lote enfileirado: {job.id}")
+            return job.id
+        
+        # Status em arquivo, como os jobs de OCR locais: visível a todos os processos web
+        pool = _get_process_pool(current_app.config.get('RECIBOS_LOTE_PROCESSOS', 2))
+        diretorio = _diretorio_jobs_locais()
+        _gravar_job_local(diretorio, job_id, {'status': 'queued'}, _RECIBOS_LOTE_TTL)
+        future = pool.submit(gerar_lote_recibos_task, *args)
+        _local_jobs[job_id] = future
+        future.add_done_callback(lambda concluido: _concluir_job_local(diretorio, job_id, concluido, _RECIBOS_LOTE_TTL))
+        current_app.logger.info(f"✅ Job de recibos em lote enviado ao pool local: {job_id}")
+        return job_id
+        
+    except Exception as e:
+        current_app.logger.error(f"❌ Erro ao enfileirar recibos em lote: {e}")
+        return None
+
+
+def enqueue_miniaturas_job(itens: list, tamanho: int = 320):
+    """
+    Enfileira a geração de miniaturas de comprovantes
+    
+    Usa a fila 'recibos' do RQ quando o Redis está disponível; senão envia
+    para o pool de processos local.
+    
+    Args:
+        itens: Pares (caminho do comprovante, caminho da miniatura)
+        tamanho: Maior lado da miniatura em pixels
+    
+    Returns:
+        Job ID ou None se não foi possível enfileirar
+    """
+    from .tasks import gerar_miniaturas_task
+    
+    try:
+        if recibos_queue is not None:
+            job = recibos_queue.enqueue(
+                gerar_miniaturas_task,
+                itens,
+                tamanho,
+                job_timeout=300,  # 5 minutos
+                result_ttl=600,
+                failure_ttl=86400
+            )
+            current_app.logger.info(f"✅ Job de miniaturas enfileirado: {job.id} ({len(itens)} arquivos)")
+            return job.id
+        
+        job_id = f"miniaturas-{uuid.uuid4().hex}"
+        pool = _get_process_pool(current_app.config.get('RECIBOS_LOTE_PROCESSOS', 2))
+        future = pool.submit(gerar_miniaturas_task, itens, tamanho)
+        _local_jobs[job_id] = future
+        # Ninguém consulta o status destes jobs: liberar a referência ao terminar
+        future.add_done_callback(lambda _: _local_jobs.pop(job_id, None))
+        current_app.logger.info(f"✅ Job de miniaturas enviado ao pool local: {job_id} ({len(itens)} arquivos)")
+        return job_id
+        
+    except Exception as e:
+        current_app.logger.error(f"❌ Erro ao enfileirar miniaturas: {e}")
+        return None
+
+
+def _get_local_job_status(job_id: str):
+    """Status de um job do pool local, deste ou de outro processo (None se não existe)"""
+    future = _local_jobs.get(job_id)
+    if future is None:
+        return _ler_job_local(_diretorio_jobs_locais(), job_id)
+    
+    response = {'job_id': job_id}
+    if not future.done():
+        response['status'] = 'started' if future.running() else 'queued'
+    elif future.exception() is not None:
+        response['status'] = 'failed'
+        response['error'] = str(future.exception())
+    else:
+        response['status'] = 'finished'
+        response['result'] = future.result()
+    return response
+
+
+def aguardar_job(job_id: str, timeout: float):
+    """
+    Long-poll: espera até `timeout` segundos o job terminar
+    
+    Returns:
+        dict no formato de get_job_status (status ainda queued/started se o tempo acabar)
+    """
+    future = _local_jobs.get(job_id)
+    if future is not None:
+        wait([future], timeout=timeout)
+        return get_job_status(job_id)
+    
+    # Job no RQ ou no pool de outro processo: consulta com intervalo crescente, sem passar do prazo
+    limite = time.monotonic() + timeout
+    intervalo = 0.1
+    while True:
+        status = get_job_status(job_id)
+        restante = limite - time.monotonic()
+        if status.get('status') not in _STATUS_PENDENTES or restante <= 0:
+            return status
+        time.sleep(min(intervalo, restante))
+        intervalo = min(intervalo * 2, 1.0)
+
+
 def get_job_status(job_id: str):
     """
     Retorna o status de um job
@@ -91,6 +439,10 @@ def get_job_status(job_id: str):
     Returns:
         dict com status, progress, result ou error
     """
+    local_status = _get_local_job_status(job_id)
+    if local_status is not None:
+        return local_status
+    
     if redis_conn is None or ocr_queue is None:
         return {
             'status': 'unavailable',
@@ -3,10 +3,11 @@ Tasks assíncronas para processamento em background
 """
 
 import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 
-def process_ocr_task(file_path: str, pedido_id: int, pagamento_id: Optional[int] = None) -> Dict:
+def process_ocr_task(file_path: str, pedido_id: int, pagamento_id: Optional[int] = None,
+                     motores: Optional[str] = None) -> Dict:
     """
     Task assíncrona para processar OCR de comprovante
     
@@ -14,11 +15,12 @@ def process_ocr_task(file_path: str, pedido_id: int, pagamento_id: Optional[int]
         file_path: Caminho do arquivo PDF/imagem
         pedido_id: ID do pedido
         pagamento_id: ID do pagamento (opcional)
+        motores: Cadeia de motores de OCR da rota que enfileirou (padrão: configuração)
     
     Returns:
         Dict com resultado do OCR
     """
-    from meu_app.financeiro.vision_service import VisionOcrService
+    from meu_app.financeiro.ocr_backends import get_ocr_backend
     from rq import get_current_job
     
     job = get_current_job()
@@ -41,7 +43,7 @@ def process_ocr_task(file_path: str, pedido_id: int, pagamento_id: Optional[int]
             job.save_meta()
         
         # Processar OCR
-        result = VisionOcrService.process_receipt(file_path)
+        result = get_ocr_backend(motores).process_receipt(file_path)
         
         # Atualizar progresso
         if job:
@@ -79,3 +81,197 @@ def process_ocr_task(file_path: str, pedido_id: int, pagamento_id: Optional[int]
             'pedido_id': pedido_id,
             'pagamento_id': pagamento_id
         }
+
+
+def process_ocr_lote_task(file_paths: List[str], cache_dir: Optional[str] = None,
+                          cache_max_bytes: int = 0, cache_max_entradas: int = 0,
+                          duplicatas: Optional[List[Optional[Dict]]] = None,
+                          quota_periodo: Optional[Tuple[int, int]] = None,
+                          motores: Optional[str] = None) -> Dict:
+    """
+    Task assíncrona para o OCR de vários comprovantes em chamadas em lote ao Vision
+    
+    Roda no worker RQ (sem contexto do app) ou numa thread do pool local:
+    grava os resultados direto no cache de OCR em disco (se informado), devolve
+    a quota reservada dos arquivos que falharem e remove os arquivos
+    temporários ao terminar.
+    
+    Args:
+        file_paths: Caminhos dos arquivos
+        cache_dir: Diretório do cache de OCR em disco (opcional)
+        cache_max_bytes: Limite de tamanho do cache em disco
+        cache_max_entradas: Limite de entradas do cache em disco
+        duplicatas: Possível duplicata de cada arquivo (não vai para o cache)
+        quota_periodo: (ano, mês) da quota reservada no envio (opcional)
+        motores: Cadeia de motores de OCR da rota que enfileirou (padrão: configuração)
+    
+    Returns:
+        Dict com um resultado por arquivo, na mesma ordem
+    """
+    from meu_app.financeiro.ocr_backends import cacheavel, get_ocr_backend, unidades_cobradas
+    from meu_app.financeiro.ocr_cache import get_disk_cache
+    from meu_app.financeiro.quota_ocr import QuotaOcrService
+    from meu_app.financeiro.upload_utils import calculate_file_hash
+    from rq import get_current_job
+    
+    job = get_current_job()
+    # No worker RQ, o contador da quota está no Redis do próprio job
+    conexao_quota = job.connection if job else None
+    resultados = None
+    
+    try:
+        if job:
+            job.meta['progress'] = 10
+            job.meta['stage'] = f'Processando OCR de {len(file_paths)} arquivos'
+            job.save_meta()
+        
+        hashes = []
+        for file_path in file_paths:
+            try:
+                hashes.append(calculate_file_hash(file_path))
+            except OSError:
+                hashes.append(None)
+        
+        resultados = get_ocr_backend(motores).process_receipts_batch(file_paths)
+        
+        if quota_periodo:
+            QuotaOcrService.devolver(len(file_paths) - unidades_cobradas(resultados),
+                                     tuple(quota_periodo), conexao_quota)
+        
+        if cache_dir:
+            cache = get_disk_cache(cache_dir, cache_max_bytes, cache_max_entradas)
+            for sha256, resultado in zip(hashes, resultados):
+                if sha256 and cacheavel(resultado):
+                    try:
+                        cache.set(sha256, resultado)
+                    except OSError:
+                        pass
+        
+        if duplicatas:
+            resultados = [dict(resultado, duplicata_provavel=duplicata) if duplicata else resultado
+                          for resultado, duplicata in zip(resultados, duplicatas)]
+        
+        if job:
+            job.meta['progress'] = 100
+            job.meta['stage'] = 'Concluído'
+            job.save_meta()
+        
+        return {
+            'success': True,
+            'data': {'resultados': resultados}
+        }
+        
+    except Exception as e:
+        error_msg = f"Erro no processamento OCR em lote: {str(e)}"
+        
+        # Só devolve tudo se o Vision não chegou a responder
+        if quota_periodo and resultados is None:
+            QuotaOcrService.devolver(len(file_paths), tuple(quota_periodo), conexao_quota)
+        
+        if job:
+            job.meta['error'] = error_msg
+            job.save_meta()
+        
+        return {
+            'success': False,
+            'error': error_msg
+        }
+    finally:
+        for file_path in file_paths:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+def gerar_lote_recibos_task(coletas_data: List[Dict], destino: str, download_url: str,
+                            retencao_horas: Optional[float] = None) -> Dict:
+    """
+    Task assíncrona para gerar um PDF com vários recibos de coleta
+    
+    Roda no worker RQ ou num processo do pool local; recebe apenas dados
+    simples e não acessa o banco.
+    
+    Args:
+        coletas_data: Dados dos recibos (um por página)
+        destino: Caminho absoluto do PDF a gerar
+        download_url: URL de download do PDF
+        retencao_horas: Remove do diretório de destino os lotes mais antigos (opcional)
+    
+    Returns:
+        Dict com resultado da geração
+    """
+    from meu_app.coletas.receipt_service import ReceiptService
+    
+    job = None
+    try:
+        from rq import get_current_job
+        job = get_current_job()
+    except Exception:
+        job = None
+    
+    try:
+        if job:
+            job.meta['progress'] = 10
+            job.meta['stage'] = f'Gerando {len(coletas_data)} recibos'
+            job.save_meta()
+        
+        pdf = ReceiptService.renderizar_recibos(coletas_data)
+        
+        # Gravação atômica: o download só enxerga o PDF completo
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(pdf)
+        os.replace(temporario, destino)
+        
+        if retencao_horas is not None:
+            ReceiptService.limpar_lotes_antigos(os.path.dirname(destino), retencao_horas)
+        
+        if job:
+            job.meta['progress'] = 100
+            job.meta['stage'] = 'Concluído'
+            job.save_meta()
+        
+        return {
+            'success': True,
+            'data': {
+                'total_recibos': len(coletas_data),
+                'tamanho': len(pdf),
+                'download_url': download_url
+            }
+        }
+        
+    except Exception as e:
+        error_msg = f"Erro na geração de recibos em lote: {str(e)}"
+        
+        if job:
+            job.meta['error'] = error_msg
+            job.save_meta()
+        
+        return {
+            'success': False,
+            'error': error_msg
+        }
+
+
+def gerar_miniaturas_task(itens: List, tamanho: int = 320) -> Dict:
+    """
+    Task assíncrona para gerar miniaturas de comprovantes de pagamento
+    
+    Recebe apenas caminhos (origem, destino) e não acessa o banco.
+    
+    Args:
+        itens: Pares (caminho do comprovante, caminho da miniatura)
+        tamanho: Maior lado da miniatura em pixels
+    
+    Returns:
+        Dict com resultado da geração
+    """
+    from meu_app.financeiro.miniatura_service import MiniaturaService
+    
+    try:
+        resultado = MiniaturaService.gerar_lote([tuple(item) for item in itens], tamanho)
+        return {'success': True, 'data': resultado}
+    except Exception as e:
+        return {'success': False, 'error': f"Erro na geração de miniaturas: {str(e)}"}
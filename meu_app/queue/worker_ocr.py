@@ -0,0 +1,87 @@
+"""
+Worker de OCR de vida longa
+
+O Worker padrão do RQ faz um fork por job: o filho nasce sem os clientes do
+Vision e do Storage (o processo pai nunca executa jobs) e paga credenciais e
+canal gRPC a cada comprovante. Aqui cada processo do pool (pré-criado, spawn)
+cria o app e o contexto uma vez, aquece os motores de OCR e executa os jobs
+no próprio processo (SimpleWorker), reaproveitando os clientes entre jobs.
+"""
+import multiprocessing
+import os
+import signal
+from multiprocessing.connection import wait
+from typing import Sequence
+
+from redis import Redis
+from rq import Queue, SimpleWorker
+
+
+def executar_worker_ocr(redis_url: str, filas: Sequence[str] = ('ocr',), burst: bool = False) -> bool:
+    """
+    Roda um worker de OCR neste processo até ser parado (ou, em burst, até as filas esvaziarem)
+
+    Returns:
+        bool: True se algum job foi executado
+    """
+    from meu_app import create_app
+    from meu_app.financeiro.ocr_backends import aquecer_motores
+
+    app = create_app()
+    with app.app_context():
+        aquecer_motores()
+        conexao = Redis.from_url(redis_url)
+        worker = SimpleWorker([Queue(fila, connection=conexao) for fila in filas], connection=conexao)
+        print(f"✅ Worker OCR {worker.name} pronto (pid {os.getpid()})")
+        return worker.work(burst=burst)
+
+
+def iniciar_pool_ocr(redis_url: str, concorrencia: int, filas: Sequence[str] = ('ocr',), burst: bool = False) -> int:
+    """
+    Mantém `concorrencia` processos de executar_worker_ocr, reiniciando os que
+    morrerem com erro; SIGINT/SIGTERM param todos ao fim do job em andamento
+
+    Returns:
+        int: Código de saída (0 se todos os processos terminaram normalmente)
+    """
+    contexto = multiprocessing.get_context('spawn')
+    processos = {}
+    parando = []
+    codigo = 0
+
+    def iniciar(indice: int):
+        processo = contexto.Process(target=executar_worker_ocr, args=(redis_url, tuple(filas), burst),
+                                    name=f'ocr-worker-{indice}')
+        processo.start()
+        processos[indice] = processo
+
+    def parar(signum, frame):
+        if parando:
+            return
+        parando.append(signum)
+        print("⏹️  Parando workers OCR após os jobs em andamento...")
+        for processo in processos.values():
+            if processo.is_alive():
+                os.kill(processo.pid, signal.SIGTERM)
+
+    anteriores = {sinal: signal.signal(sinal, parar) for sinal in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        for indice in range(concorrencia):
+            iniciar(indice)
+
+        while processos:
+            wait([processo.sentinel for processo in processos.values()], timeout=1)
+            for indice, processo in list(processos.items()):
+                if processo.is_alive():
+                    continue
+                processo.join()
+                del processos[indice]
+                if processo.exitcode and not parando and not burst:
+                    print(f"⚠️ Worker OCR {indice} terminou com código {processo.exitcode}, reiniciando")
+                    iniciar(indice)
+                elif processo.exitcode:
+                    codigo = processo.exitcode
+    finally:
+        for sinal, anterior in anteriores.items():
+            signal.signal(sinal, anterior)
+    return codigo
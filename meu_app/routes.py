@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify, session, current_app, send_from_directory, Response
 from . import db
-from .models import Cliente, Produto, Pedido, ItemPedido, Pagamento, Coleta, Usuario, Apuracao
+from .models import Cliente, Produto, Pedido, ItemPedido, Pagamento, Usuario, Apuracao
 import os
 from datetime import datetime, timedelta
 from sqlalchemy import func
@@ -188,23 +188,25 @@ def painel():
         data_limite = datetime.now() - timedelta(days=7)
         alertas_coleta = []
         
-        # Buscar pedidos pagos mas não coletados
-        pedidos_pagos_nao_coletados = db.session.query(Pedido).join(Pagamento, Pedido.id == Pagamento.pedido_id).filter(
-            Pedido.data <= data_limite
-        ).distinct().all()
+        # Buscar pedidos pagos sem nada coletado (contador persistido nos itens)
+        pedidos_pagos_nao_coletados = (
+            db.session.query(Pedido, func.coalesce(func.sum(ItemPedido.valor_total_venda), 0))
+            .outerjoin(ItemPedido, ItemPedido.pedido_id == Pedido.id)
+            .filter(Pedido.data <= data_limite, Pedido.pagamentos.any())
+            .group_by(Pedido.id)
+            .having(func.coalesce(func.sum(ItemPedido.quantidade_coletada), 0) == 0)
+            .options(db.selectinload(Pedido.cliente))
+            .all()
+        )
         
-        for pedido in pedidos_pagos_nao_coletados:
-            # Verificar se foi coletado
-            coletado = db.session.query(Coleta).filter_by(pedido_id=pedido.id).first()
-            if not coletado:
-                valor_pedido = sum(item.valor_total_venda for item in pedido.itens)
-                dias_pendente = (datetime.now() - pedido.data).days
-                alertas_coleta.append({
-                    'pedido_id': pedido.id,
-                    'cliente': pedido.cliente.nome if pedido.cliente else 'N/A',
-                    'valor': float(valor_pedido),
-                    'dias': dias_pendente
-                })
+        for pedido, valor_pedido in pedidos_pagos_nao_coletados:
+            dias_pendente = (datetime.now() - pedido.data).days
+            alertas_coleta.append({
+                'pedido_id': pedido.id,
+                'cliente': pedido.cliente.nome if pedido.cliente else 'N/A',
+                'valor': float(valor_pedido),
+                'dias': dias_pendente
+            })
 
         total_clientes = Cliente.query.count()
         total_produtos = Produto.query.count()
@@ -47,6 +47,38 @@ document.addEventListener('DOMContentLoaded', () => {
         return null;
     };
 
+    const lerRespostaOcr = (response) => {
+        console.log('📥 Response status:', response.status);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        return response.json();
+    };
+
+    // OCR assíncrono: a resposta 202 traz a resultado_url, consultada em intervalos até o
+    // resultado sair; se nenhum worker pegar o job, desiste e libera a digitação manual
+    const OCR_INTERVALO_MS = 1500;
+    const OCR_TEMPO_MAXIMO_MS = 90000;
+    const esperar = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+    const aguardarResultadoOcr = (data, inicio = Date.now()) => {
+        if (!data || data.ocr_status !== 'queued' || !data.resultado_url) {
+            return data;
+        }
+        if (Date.now() - inicio >= OCR_TEMPO_MAXIMO_MS) {
+            console.warn('⌛ OCR não terminou a tempo:', data.job_id);
+            return {
+                ocr_status: 'failed',
+                ocr_message: 'A leitura do comprovante está demorando - digite os dados manualmente'
+            };
+        }
+        console.log('⏳ OCR na fila, aguardando resultado do job:', data.job_id);
+        return esperar(OCR_INTERVALO_MS)
+            .then(() => fetch(data.resultado_url, { headers: { Accept: 'application/json' } }))
+            .then(lerRespostaOcr)
+            .then((proximo) => aguardarResultadoOcr(proximo, inicio));
+    };
+
     if (metodoPagamentoInput) {
         metodoPagamentoInput.addEventListener('input', function () {
             if (this.value.toLowerCase().includes('pix')) {
@@ -125,13 +157,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     'X-CSRFToken': csrfTokenInput ? csrfTokenInput.value : ''
                 }
             })
-                .then((response) => {
-                    console.log('📥 Response status:', response.status);
-                    if (!response.ok) {
-                        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-                    }
-                    return response.json();
-                })
+                .then(lerRespostaOcr)
+                .then(aguardarResultadoOcr)
                 .then((data) => {
                     console.log('✅ OCR retorno completo:', data);
                     let foundSomething = false;
@@ -191,6 +218,17 @@ document.addEventListener('DOMContentLoaded', () => {
                         foundSomething = true;
                     }
 
+                    // Comprovante quase idêntico a um já registrado (outra foto/captura)
+                    if (data.duplicata_provavel) {
+                        const duplicata = data.duplicata_provavel;
+                        const duplicataDiv = document.createElement('div');
+                        duplicataDiv.className = 'validation-box validation-warning';
+                        duplicataDiv.innerHTML = `⚠️ Comprovante muito parecido com o do pagamento ` +
+                            `<strong>#${duplicata.pagamento_id}</strong> (pedido #${duplicata.pedido_id}). ` +
+                            `Verifique se não é um pagamento repetido.`;
+                        ocrStatus.appendChild(duplicataDiv);
+                    }
+
                     // Preencher campos hidden com dados do OCR
                     if (data.data_encontrada && dataComprovanteInput) {
                         dataComprovanteInput.value = data.data_encontrada;
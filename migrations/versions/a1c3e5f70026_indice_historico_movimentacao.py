@@ -0,0 +1,28 @@
+"""indice composto para historico de movimentacao de estoque
+
+Revision ID: a1c3e5f70026
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f70026'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_movimentacao_estoque_produto_data_id',
+        'movimentacao_estoque',
+        ['produto_id', 'data_movimentacao', 'id'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_movimentacao_estoque_produto_data_id', table_name='movimentacao_estoque')
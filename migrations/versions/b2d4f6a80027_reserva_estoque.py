@@ -0,0 +1,52 @@
+"""tabela reserva_estoque com carga inicial a partir dos pedidos confirmados
+
+Revision ID: b2d4f6a80027
+Revises: a1c3e5f70026
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a80027'
+down_revision = 'a1c3e5f70026'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'reserva_estoque',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('produto_id', sa.Integer(), nullable=False),
+        sa.Column('quantidade_reservada', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('data_atualizacao', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['produto_id'], ['produto.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('produto_id')
+    )
+
+    # Reserva inicial = pendente (pedido − coletado) dos pedidos confirmados e não cancelados
+    op.execute("""
+        INSERT INTO reserva_estoque (produto_id, quantidade_reservada, data_atualizacao)
+        SELECT ip.produto_id,
+               SUM(ip.quantidade - COALESCE(col.quantidade, 0)),
+               CURRENT_TIMESTAMP
+        FROM item_pedido ip
+        JOIN pedido p ON p.id = ip.pedido_id
+        LEFT JOIN (
+            SELECT item_pedido_id, SUM(quantidade_coletada) AS quantidade
+            FROM item_coletado
+            GROUP BY item_pedido_id
+        ) col ON col.item_pedido_id = ip.id
+        WHERE p.confirmado_comercial = TRUE
+          AND (p.status IS NULL OR p.status <> 'Cancelado')
+        GROUP BY ip.produto_id
+        HAVING SUM(ip.quantidade - COALESCE(col.quantidade, 0)) > 0
+    """)
+
+
+def downgrade():
+    op.drop_table('reserva_estoque')
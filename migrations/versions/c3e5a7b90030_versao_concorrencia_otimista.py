@@ -0,0 +1,31 @@
+"""coluna de versao para concorrencia otimista em pedido, item_pedido e estoque
+
+Revision ID: c3e5a7b90030
+Revises: b2d4f6a80027
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b90030'
+down_revision = 'b2d4f6a80027'
+branch_labels = None
+depends_on = None
+
+
+TABELAS = ('pedido', 'item_pedido', 'estoque')
+
+
+def upgrade():
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.add_column(sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    for tabela in reversed(TABELAS):
+        with op.batch_alter_table(tabela) as batch_op:
+            batch_op.drop_column('versao')
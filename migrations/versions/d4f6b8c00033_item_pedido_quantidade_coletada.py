@@ -0,0 +1,36 @@
+"""contador persistido de quantidade coletada em item_pedido
+
+Revision ID: d4f6b8c00033
+Revises: c3e5a7b90030
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c00033'
+down_revision = 'c3e5a7b90030'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item_pedido') as batch_op:
+        batch_op.add_column(sa.Column('quantidade_coletada', sa.Integer(), nullable=False, server_default='0'))
+
+    # Carga inicial a partir das coletas já registradas
+    op.execute("""
+        UPDATE item_pedido
+        SET quantidade_coletada = COALESCE((
+            SELECT SUM(item_coletado.quantidade_coletada)
+            FROM item_coletado
+            WHERE item_coletado.item_pedido_id = item_pedido.id
+        ), 0)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('item_pedido') as batch_op:
+        batch_op.drop_column('quantidade_coletada')
@@ -0,0 +1,26 @@
+"""hash perceptual do comprovante em pagamento
+
+Revision ID: e5a7c9d10041
+Revises: d4f6b8c00033
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d10041'
+down_revision = 'd4f6b8c00033'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pagamento') as batch_op:
+        batch_op.add_column(sa.Column('recibo_phash', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('pagamento') as batch_op:
+        batch_op.drop_column('recibo_phash')
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark da extração de campos de comprovantes sobre o corpus dos testes
+
+Mede, por layout reconhecido, o tempo médio de extrair_campos por comprovante
+e quantos campos batem com o gabarito (tests/financeiro/corpus_recibos/
+esperado_layout.json). A acurácia também é verificada pelos testes; o tempo
+fica aqui, fora da suíte, porque depende da máquina.
+
+Uso:
+    python scripts/benchmark_extracao_recibo.py [--repeticoes 50] [--limite-us 5000]
+
+Com --limite-us, sai com código 1 se algum layout passar do limite.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from meu_app.financeiro.layout_recibo import extrair_campos  # noqa: E402
+
+CORPUS = RAIZ / 'tests' / 'financeiro' / 'corpus_recibos'
+
+
+def campos(texto: str) -> dict:
+    resultado = extrair_campos(texto)
+    return dict(resultado['bank_info'], layout=resultado['layout'], amount=resultado['amount'],
+                transaction_id=resultado['transaction_id'], date=resultado['date'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeticoes', type=int, default=50, help='Extrações de cada comprovante')
+    parser.add_argument('--limite-us', type=float, default=None,
+                        help='Tempo máximo por comprovante em µs (falha se algum layout passar)')
+    args = parser.parse_args()
+
+    esperado = json.loads((CORPUS / 'esperado_layout.json').read_text(encoding='utf-8'))
+    por_layout = defaultdict(lambda: {'acertos': 0, 'total': 0, 'segundos': 0.0, 'textos': 0})
+
+    for arquivo, gabarito in sorted(esperado.items()):
+        texto = (CORPUS / arquivo).read_text(encoding='utf-8')
+        inicio = time.perf_counter()
+        for _ in range(args.repeticoes):
+            extrair_campos(texto)
+        linha = por_layout[gabarito['layout'] or 'genérico']
+        linha['segundos'] += (time.perf_counter() - inicio) / args.repeticoes
+        linha['textos'] += 1
+        extraidos = campos(texto)
+        linha['total'] += len(gabarito)
+        linha['acertos'] += sum(extraidos[chave] == valor for chave, valor in gabarito.items())
+
+    print(f"{len(esperado)} comprovantes, {args.repeticoes} repetições; Python {sys.version.split()[0]} "
+          f"em {os.cpu_count()} CPUs")
+    print(f"{'layout':<16} {'campos':>8} {'µs/comprovante':>15}")
+    acima = []
+    for layout, linha in sorted(por_layout.items()):
+        micros = linha['segundos'] / linha['textos'] * 1e6
+        print(f"{layout:<16} {linha['acertos']:>3}/{linha['total']:<4} {micros:>15.0f}")
+        if args.limite_us is not None and micros > args.limite_us:
+            acima.append(layout)
+
+    acertos = sum(linha['acertos'] for linha in por_layout.values())
+    total = sum(linha['total'] for linha in por_layout.values())
+    print(f"Total: {acertos}/{total} campos corretos")
+    if acima:
+        sys.exit(f"Acima de {args.limite_us:.0f} µs/comprovante: {', '.join(acima)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pré-processamento de imagens antes do OCR
+
+Compara, por comprovante, os bytes enviados ao Vision e a latência do OCR sem
+e com o pré-processamento (EXIF, redução, tons de cinza, JPEG).
+
+Uso:
+    python scripts/benchmark_preprocessamento_ocr.py [imagens...] [--banda-mbps 10] [--vision]
+
+Sem imagens, gera fotos sintéticas no formato de câmera de celular (4032x3024,
+JPEG com orientação no EXIF). Sem --vision, a latência ponta a ponta é estimada
+como pré-processamento + envio na banda informada; com --vision (credenciais
+configuradas), mede a chamada real ao Google Vision nos dois modos.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from meu_app.financeiro.config import FinanceiroConfig  # noqa: E402
+from meu_app.financeiro.preprocessamento_ocr import PreprocessadorImagem  # noqa: E402
+
+
+LINHAS_RECIBO = [
+    'Comprovante de transferência', 'Pix', 'Valor R$ 1.250,00', 'Destino', 'GRUPO SERTAO COMERCIO LTDA',
+    'CNPJ 30.080.209/0004-16', 'Instituição BANCO DO BRASIL S.A.', 'Agência 1234  Conta 56789-0',
+    'ID da transação E18236120202510081732s1a2b3c4d5e', '08 OUT 2025 - 14:32:10',
+]
+
+
+def foto_sintetica(caminho: str, semente: int):
+    """Foto de celular de um comprovante: papel com ruído de sensor, girada e com EXIF de orientação"""
+    aleatorio = random.Random(semente)
+    foto = Image.new('RGB', (3024, 4032), (205, 200, 190))
+    desenho = ImageDraw.Draw(foto)
+    desenho.rectangle([300, 400, 2724, 3632], fill=(250, 248, 240))
+    for indice, linha in enumerate(LINHAS_RECIBO):
+        desenho.text((420, 560 + indice * 300), linha, fill=(20, 20, 20), font_size=110)
+    ruido = Image.effect_noise((3024, 4032), 24).convert('RGB')
+    foto = Image.blend(foto, ruido, 0.12).filter(ImageFilter.GaussianBlur(aleatorio.uniform(0.6, 1.2)))
+    # Câmera grava deitada e indica a rotação no EXIF (orientação 6 = 90° horário)
+    foto = foto.transpose(Image.Transpose.ROTATE_90)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    foto.save(caminho, 'JPEG', quality=92, exif=exif)
+
+
+def medir_vision(caminho: str, preprocessar: bool) -> float:
+    from meu_app.financeiro.vision_service import VisionOcrService
+
+    os.environ['FINANCEIRO_OCR_PREPROCESSAMENTO'] = '1' if preprocessar else '0'
+    inicio = time.perf_counter()
+    VisionOcrService.extract_text(caminho)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('imagens', nargs='*', help='Imagens de comprovantes (padrão: fotos sintéticas)')
+    parser.add_argument('--sinteticas', type=int, default=5, help='Quantidade de fotos sintéticas')
+    parser.add_argument('--banda-mbps', type=float, default=10.0, help='Banda de envio para a estimativa')
+    parser.add_argument('--vision', action='store_true', help='Medir a latência real no Google Vision')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        imagens = args.imagens
+        if not imagens:
+            imagens = [os.path.join(temporario, f'foto_{indice}.jpg') for indice in range(args.sinteticas)]
+            for indice, caminho in enumerate(imagens):
+                foto_sintetica(caminho, indice)
+
+        print(f"Lado máximo {FinanceiroConfig.get_ocr_imagem_lado_maximo()} px, "
+              f"JPEG q{FinanceiroConfig.get_ocr_imagem_qualidade()}, banda {args.banda_mbps:g} Mbps")
+        print(f"{'arquivo':<24} {'antes (KB)':>11} {'depois (KB)':>12} {'prep. (ms)':>11} "
+              f"{'OCR antes (ms)':>15} {'OCR depois (ms)':>16}")
+
+        totais = [0, 0, 0.0, 0.0, 0.0]
+        bytes_por_segundo = args.banda_mbps * 1e6 / 8
+        for caminho in imagens:
+            antes = os.path.getsize(caminho)
+            inicio = time.perf_counter()
+            preparado = PreprocessadorImagem.preparar(caminho)
+            preparo = time.perf_counter() - inicio
+            depois = len(preparado) if preparado is not None else antes
+
+            if args.vision:
+                latencia_antes = medir_vision(caminho, False)
+                latencia_depois = medir_vision(caminho, True)
+            else:
+                latencia_antes = antes / bytes_por_segundo
+                latencia_depois = preparo + depois / bytes_por_segundo
+
+            for posicao, valor in enumerate((antes, depois, preparo, latencia_antes, latencia_depois)):
+                totais[posicao] += valor
+            print(f"{os.path.basename(caminho)[:24]:<24} {antes / 1024:>11.0f} {depois / 1024:>12.0f} "
+                  f"{preparo * 1000:>11.0f} {latencia_antes * 1000:>15.0f} {latencia_depois * 1000:>16.0f}")
+
+        quantidade = len(imagens)
+        print(f"{'média':<24} {totais[0] / quantidade / 1024:>11.0f} {totais[1] / quantidade / 1024:>12.0f} "
+              f"{totais[2] / quantidade * 1000:>11.0f} {totais[3] / quantidade * 1000:>15.0f} "
+              f"{totais[4] / quantidade * 1000:>16.0f}")
+        print(f"Bytes enviados: {totais[1] / totais[0]:.1%} do original"
+              f"{'' if args.vision else ' (latência estimada: envio na banda + pré-processamento)'}")
+
+
+if __name__ == '__main__':
+    main()
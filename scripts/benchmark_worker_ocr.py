@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark de jobs de OCR por minuto: Worker padrão do RQ x pool de vida longa
+
+Enfileira jobs de OCR de um comprovante (process_ocr_lote_task) com o motor
+falso e mede quanto cada modo leva para esvaziar a fila (burst):
+- antes: Worker padrão (fork por job; o filho importa o OCR e inicializa o
+  cliente do zero a cada job), como `python worker.py`
+- depois: pool de processos de vida longa (`python worker.py --ocr`), com 1
+  processo e com a concorrência pedida; o tempo inclui subir os processos
+
+Uso:
+    python scripts/benchmark_worker_ocr.py [--jobs 200] [--concorrencia 4]
+        [--latencia-ms 50] [--inicializacao-ms 300] [--redis-url redis://localhost:6379/15]
+
+A inicialização simula o custo de credenciais e canal gRPC dos clientes do
+Vision/Storage. Usa uma fila própria ('ocr-benchmark'), esvaziada no início.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis import Redis  # noqa: E402
+from rq import Queue, Worker  # noqa: E402
+from rq.job import JobStatus  # noqa: E402
+
+FILA = 'ocr-benchmark'
+
+
+def enfileirar(conexao: Redis, diretorio: str, quantidade: int) -> list:
+    from meu_app.queue.tasks import process_ocr_lote_task
+
+    fila = Queue(FILA, connection=conexao)
+    jobs = []
+    for indice in range(quantidade):
+        caminho = os.path.join(diretorio, f'recibo_{indice}.png')
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f'Comprovante PIX\nValor: R$ {indice + 1},00\nData: 10/03/2024')
+        # Mesmos argumentos de enqueue_ocr_lote_job, sem cache nem quota
+        jobs.append(fila.enqueue(process_ocr_lote_task, [caminho], None, 0, 0, None, None, 'falso',
+                                 result_ttl=600))
+    return jobs
+
+
+def concluidos(jobs: list) -> int:
+    return sum(1 for job in jobs if job.get_status(refresh=True) == JobStatus.FINISHED)
+
+
+def medir(nome: str, conexao: Redis, quantidade: int, executar) -> float:
+    with tempfile.TemporaryDirectory() as diretorio:
+        jobs = enfileirar(conexao, diretorio, quantidade)
+        inicio = time.perf_counter()
+        executar()
+        duracao = time.perf_counter() - inicio
+    ok = concluidos(jobs)
+    por_minuto = ok / duracao * 60
+    print(f"{nome:<40} {ok:>5}/{quantidade:<5} {duracao:>9.1f} s {por_minuto:>12.0f}")
+    return por_minuto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--concorrencia', type=int, default=4)
+    parser.add_argument('--latencia-ms', type=int, default=50, help='Latência simulada de cada chamada de OCR')
+    parser.add_argument('--inicializacao-ms', type=int, default=300,
+                        help='Custo simulado de inicializar o cliente de OCR num processo novo')
+    parser.add_argument('--redis-url', default=os.getenv('REDIS_URL', 'redis://localhost:6379/15'))
+    args = parser.parse_args()
+
+    # Herdado pelos filhos (fork do RQ e processos do pool)
+    os.environ['FINANCEIRO_OCR_BACKEND'] = 'falso'
+    os.environ['FINANCEIRO_OCR_FALSO_LATENCIA_MS'] = str(args.latencia_ms)
+    os.environ['FINANCEIRO_OCR_FALSO_INICIALIZACAO_MS'] = str(args.inicializacao_ms)
+
+    conexao = Redis.from_url(args.redis_url)
+    try:
+        conexao.ping()
+    except Exception as e:
+        sys.exit(f"Redis indisponível em {args.redis_url}: {e}")
+    Queue(FILA, connection=conexao).empty()
+
+    from meu_app.queue.worker_ocr import iniciar_pool_ocr
+
+    print(f"Motor falso: latência {args.latencia_ms} ms, inicialização {args.inicializacao_ms} ms; {args.jobs} jobs")
+    print(f"{'modo':<40} {'ok':>11} {'tempo':>11} {'jobs/min':>12}")
+    antes = medir('antes: Worker (fork por job)', conexao, args.jobs,
+                  lambda: Worker([Queue(FILA, connection=conexao)], connection=conexao).work(burst=True,
+                                                                                             logging_level='WARNING'))
+    medir('depois: pool de vida longa, 1 processo', conexao, args.jobs,
+          lambda: iniciar_pool_ocr(args.redis_url, 1, filas=[FILA], burst=True))
+    depois = medir(f'depois: pool de vida longa, {args.concorrencia} processos', conexao, args.jobs,
+                   lambda: iniciar_pool_ocr(args.redis_url, args.concorrencia, filas=[FILA], burst=True))
+    print(f"Ganho: {depois / antes:.1f}x jobs por minuto")
+
+
+if __name__ == '__main__':
+    main()
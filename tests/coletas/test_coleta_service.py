@@ -38,7 +38,7 @@ class TestColetaService:
         resultado = ColetaService.listar_pedidos_para_coleta()
         
         # Assert
-        assert resultado == []
+        assert resultado['pedidos'] == []
 
     @patch('meu_app.coletas.services.coleta_service.db.session')
     @patch('meu_app.coletas.services.coleta_service.Pedido')
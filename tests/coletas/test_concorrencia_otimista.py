@@ -0,0 +1,112 @@
+"""
+Testes do controle de concorrência otimista (coluna de versão) na coleta
+"""
+import pytest
+from sqlalchemy import event, text
+
+from meu_app.models import (
+    db, Cliente, Produto, Estoque, Pedido, Coleta, ItemPedido, ItemColetado, MovimentacaoEstoque,
+    StatusPedido
+)
+from meu_app.coletas.services.coleta_service import ColetaService
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """
+    SQLite em arquivo: a escrita concorrente simulada usa outra conexão do
+    pool, como faria outro worker
+    """
+    return {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'coletas.db'}"}
+
+
+@pytest.fixture
+def pedido(app):
+    cliente = Cliente(nome='Cliente Concorrência')
+    produto = Produto(nome='Produto Concorrência')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+    db.session.add(Estoque(produto_id=produto.id, quantidade=100, conferente='Teste'))
+    pedido = Pedido(cliente_id=cliente.id, status=StatusPedido.PAGAMENTO_APROVADO)
+    db.session.add(pedido)
+    db.session.flush()
+    db.session.add(ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=5, preco_venda=10,
+                              preco_compra=5, valor_total_venda=50, valor_total_compra=25, lucro_bruto=25))
+    db.session.commit()
+    return pedido
+
+
+def _simular_escrita_concorrente(vezes):
+    """
+    Depois que a coleta leu o estoque e antes de ela começar a escrever,
+    outra conexão tira 5 unidades (incrementando a versão), como uma coleta
+    concorrente confirmada nesse intervalo
+    """
+    chamadas = {'total': 0}
+
+    def _antes_do_flush(session, flush_context, instances):
+        if chamadas['total'] >= vezes:
+            return
+        if not any(isinstance(obj, Coleta) for obj in session.new):
+            return
+        chamadas['total'] += 1
+        with db.engine.begin() as conexao:
+            conexao.execute(text(
+                "UPDATE estoque SET quantidade = quantidade - 5, versao = versao + 1"
+            ))
+
+    event.listen(db.session, 'before_flush', _antes_do_flush)
+    return chamadas, lambda: event.remove(db.session, 'before_flush', _antes_do_flush)
+
+
+def _coletar(pedido, quantidade=2):
+    item = pedido.itens[0]
+    return ColetaService.processar_coleta(
+        pedido_id=pedido.id,
+        responsavel_coleta_id=1,
+        nome_retirada='Teste',
+        documento_retirada='12345678901',
+        itens_coleta=[{'item_id': item.id, 'quantidade': quantidade}]
+    )
+
+
+def test_versao_incrementa_na_coleta(pedido):
+    versao_pedido = pedido.versao
+
+    sucesso, mensagem, _ = _coletar(pedido)
+
+    assert sucesso, mensagem
+    assert pedido.versao == versao_pedido + 1
+    assert Estoque.query.one().versao == 2
+    assert pedido.itens[0].quantidade_coletada == 2
+    assert pedido.itens[0].quantidade_pendente == 3
+
+
+def test_conflito_de_versao_refaz_a_coleta(pedido):
+    chamadas, parar = _simular_escrita_concorrente(vezes=1)
+    try:
+        sucesso, mensagem, _ = _coletar(pedido)
+    finally:
+        parar()
+
+    assert sucesso, mensagem
+    assert chamadas['total'] == 1
+    estoque = Estoque.query.one()
+    assert estoque.quantidade == 93
+    assert ItemColetado.query.count() == 1
+    movimentacao = MovimentacaoEstoque.query.one()
+    assert movimentacao.quantidade_anterior == 95
+    assert pedido.itens[0].quantidade_coletada == 2
+
+
+def test_conflito_persistente_retorna_erro(pedido):
+    chamadas, parar = _simular_escrita_concorrente(vezes=10)
+    try:
+        sucesso, mensagem, coleta = _coletar(pedido)
+    finally:
+        parar()
+
+    assert not sucesso
+    assert coleta is None
+    assert 'alterado por outra operação' in mensagem
+    assert ItemColetado.query.count() == 0
@@ -0,0 +1,142 @@
+"""
+Testes das listagens de coleta com totais agregados no SQL
+"""
+import pytest
+from sqlalchemy import event
+
+from meu_app.models import (
+    db, Cliente, Produto, Estoque, Pedido, ItemPedido, Pagamento, Coleta, ItemColetado,
+    StatusPedido, StatusColeta
+)
+from meu_app.coletas.services.coleta_service import ColetaService
+
+
+@pytest.fixture
+def pedidos(app):
+    """
+    10 pedidos pagos de 2 itens (3 un. cada):
+    pedidos 0-3 sem coleta, 4-6 com coleta parcial, 7-9 totalmente coletados;
+    mais 2 pedidos sem pagamento.
+    """
+    cliente = Cliente(nome='Cliente Coleta')
+    produto = Produto(nome='Produto Coleta')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+    db.session.add(Estoque(produto_id=produto.id, quantidade=1000, conferente='Teste'))
+
+    criados = []
+    for i in range(12):
+        pedido = Pedido(cliente_id=cliente.id, status=StatusPedido.PAGAMENTO_APROVADO)
+        db.session.add(pedido)
+        db.session.flush()
+        itens = [
+            ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=3, preco_venda=10,
+                       preco_compra=5, valor_total_venda=30, valor_total_compra=15, lucro_bruto=15)
+            for _ in range(2)
+        ]
+        db.session.add_all(itens)
+        db.session.flush()
+        if i < 10:
+            db.session.add(Pagamento(pedido_id=pedido.id, valor=60))
+        if 4 <= i < 10:
+            coleta = Coleta(pedido_id=pedido.id, responsavel_coleta_id=1, nome_retirada='A',
+                            documento_retirada='1', status=StatusColeta.PARCIALMENTE_COLETADO)
+            db.session.add(coleta)
+            db.session.flush()
+            quantidade = 3 if i >= 7 else 1
+            for item in itens:
+                db.session.add(ItemColetado(coleta_id=coleta.id, item_pedido_id=item.id,
+                                            quantidade_coletada=quantidade))
+        criados.append(pedido)
+    db.session.commit()
+    # Itens coletados inseridos direto: o contador é reconstruído pelo reparo
+    ColetaService.recalcular_quantidades_coletadas()
+    return criados
+
+
+def _contar_queries():
+    contador = {'total': 0}
+
+    def _antes(*args, **kwargs):
+        contador['total'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', _antes)
+    return contador, lambda: event.remove(db.engine, 'before_cursor_execute', _antes)
+
+
+def test_filtro_pendentes_no_sql(pedidos):
+    resultado = ColetaService.listar_pedidos_para_coleta('pendentes', per_page=50)
+
+    assert resultado['total'] == 7
+    assert resultado['resumo']['pendentes'] == 7
+    assert all(not item['coletado_completo'] for item in resultado['pedidos'])
+    parcial = next(i for i in resultado['pedidos'] if i['itens_coletados'])
+    assert parcial['itens_coletados'] == 2
+    assert parcial['itens_pendentes'] == 4
+
+
+def test_filtro_coletados_e_todos(pedidos):
+    coletados = ColetaService.listar_pedidos_para_coleta('coletados', per_page=50)
+    todos = ColetaService.listar_pedidos_para_coleta('todos', per_page=50)
+
+    assert coletados['total'] == 3
+    assert todos['total'] == 12
+    assert todos['resumo']['coletados'] == 3
+    assert todos['resumo']['valor_total'] == pytest.approx(720.0)
+
+
+def test_paginacao(pedidos):
+    primeira = ColetaService.listar_pedidos_para_coleta('todos', page=1, per_page=5)
+    ultima = ColetaService.listar_pedidos_para_coleta('todos', page=3, per_page=5)
+
+    assert len(primeira['pedidos']) == 5
+    assert primeira['has_next'] and not primeira['has_prev']
+    assert len(ultima['pedidos']) == 2
+    assert not ultima['has_next']
+
+
+def test_quantidade_de_queries_nao_depende_do_numero_de_pedidos(pedidos):
+    contador, parar = _contar_queries()
+    try:
+        ColetaService.listar_pedidos_para_coleta('todos', per_page=50)
+    finally:
+        parar()
+
+    assert contador['total'] <= 3
+
+
+def test_listar_pedidos_coletados(pedidos):
+    resultado = ColetaService.listar_pedidos_coletados(per_page=50)
+
+    assert resultado['total'] == 6
+    assert resultado['resumo']['qtd_coletada'] == 3 * 2 * 1 + 3 * 2 * 3
+    pedido, qtd_total, qtd_coletada, total_venda = resultado['pedidos'][0]
+    assert qtd_total == 6
+
+
+def test_buscar_detalhes_pedido_agrega_coletado(pedidos):
+    pedido = pedidos[5]
+    detalhes = ColetaService.buscar_detalhes_pedido(pedido.id)
+
+    assert [item.quantidade_coletada for item in detalhes['itens']] == [1, 1]
+    assert [item.quantidade_pendente for item in detalhes['itens']] == [2, 2]
+    assert all(item.estoque_disponivel == 1000 for item in detalhes['itens'])
+
+
+def test_recalcular_quantidades_coletadas_corrige_divergencias(pedidos):
+    item = pedidos[8].itens[0]
+    item.quantidade_coletada = 0
+    db.session.commit()
+
+    assert ColetaService.recalcular_quantidades_coletadas() == 1
+    db.session.refresh(item)
+    assert item.quantidade_coletada == 3
+    assert item.quantidade_pendente == 0
+    assert ColetaService.recalcular_quantidades_coletadas() == 0
+
+
+def test_quantidade_pendente_em_filtro_sql(pedidos):
+    pendentes = ItemPedido.query.filter(ItemPedido.quantidade_pendente > 0).count()
+
+    # 2 itens em cada um dos 9 pedidos não totalmente coletados (pagos ou não)
+    assert pendentes == 2 * 9
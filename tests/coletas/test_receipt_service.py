@@ -0,0 +1,74 @@
+"""
+Testes do recibo de coleta renderizado em memória e do arquivamento por hash dos dados
+"""
+import os
+import time
+
+import pytest
+
+from meu_app.coletas.receipt_service import ReceiptService
+
+
+@pytest.fixture
+def app_config():
+    return {'RECIBOS_ARQUIVAR': True, 'RECIBOS_RETENCAO_DIAS': 30}
+
+
+@pytest.fixture
+def coleta_data():
+    return {
+        'pedido_id': 42,
+        'cliente_nome': 'Cliente Recibo',
+        'nome_retirada': 'Fulano',
+        'documento_retirada': '12345678901',
+        'nome_conferente': 'Conferente',
+        'cpf_conferente': '10987654321',
+        'itens_coleta': [{'produto_nome': 'Produto A', 'quantidade': 3}],
+    }
+
+
+def test_renderiza_pdf_em_memoria_sem_gravar_arquivo(app, coleta_data):
+    app.config['RECIBOS_ARQUIVAR'] = False
+
+    pdf = ReceiptService.renderizar_recibo(coleta_data)
+
+    assert pdf.startswith(b'%PDF')
+    assert ReceiptService.arquivar_recibo(pdf, coleta_data) is None
+    assert not os.path.exists(os.path.join(app.instance_path, 'recibos'))
+
+
+def test_layout_montado_uma_vez(app, coleta_data):
+    ReceiptService.renderizar_recibo(coleta_data)
+    layout = ReceiptService._layout()
+
+    ReceiptService.renderizar_recibo(coleta_data)
+
+    assert ReceiptService._layout() is layout
+
+
+def test_mesma_coleta_e_arquivada_uma_vez(app, coleta_data):
+    primeiro = ReceiptService.renderizar_recibo(coleta_data)
+    caminho = ReceiptService.arquivar_recibo(primeiro, coleta_data)
+    # Outra emissão: o rodapé (data/hora) e os metadados do PDF mudam
+    segundo = primeiro.replace(b'%PDF', b'%PDF ', 1)
+
+    assert ReceiptService.arquivar_recibo(segundo, coleta_data) == caminho
+    assert os.path.dirname(caminho).startswith(os.path.join(app.instance_path, 'recibos'))
+    assert os.path.basename(caminho).startswith('42_')
+    assert sum(len(nomes) for _, _, nomes in os.walk(os.path.join(app.instance_path, 'recibos'))) == 1
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == primeiro
+
+    outra = ReceiptService.arquivar_recibo(primeiro, dict(coleta_data, nome_retirada='Beltrano'))
+    assert outra != caminho
+
+
+def test_limpeza_respeita_retencao(app, coleta_data):
+    antigo = ReceiptService.arquivar_recibo(b'%PDF antigo', coleta_data)
+    recente = ReceiptService.arquivar_recibo(b'%PDF recente', dict(coleta_data, pedido_id=43))
+    vencido = time.time() - 31 * 86400
+    os.utime(antigo, (vencido, vencido))
+
+    assert ReceiptService.limpar_recibos_antigos() == 1
+    assert not os.path.exists(antigo)
+    assert os.path.exists(recente)
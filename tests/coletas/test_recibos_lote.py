@@ -0,0 +1,104 @@
+"""
+Testes da reimpressão de recibos de coleta em lote
+"""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from meu_app import queue as filas
+from meu_app.coletas.receipt_service import ReceiptService
+from meu_app.coletas.services.coleta_service import ColetaService
+from meu_app.queue.tasks import gerar_lote_recibos_task
+from meu_app.models import (
+    db, Cliente, Produto, Pedido, ItemPedido, Coleta, ItemColetado, StatusPedido, StatusColeta
+)
+
+
+@pytest.fixture
+def app_config():
+    return {'RECIBOS_LOTE_PROCESSOS': 1}
+
+
+@pytest.fixture
+def coletas(app):
+    cliente = Cliente(nome='Cliente Lote')
+    produto = Produto(nome='Produto Lote')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+    criadas = []
+    for dia in (10, 11, 12):
+        pedido = Pedido(cliente_id=cliente.id, status=StatusPedido.COLETA_CONCLUIDA)
+        db.session.add(pedido)
+        db.session.flush()
+        item = ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=2, preco_venda=10,
+                          preco_compra=5, valor_total_venda=20, valor_total_compra=10, lucro_bruto=10)
+        coleta = Coleta(pedido_id=pedido.id, responsavel_coleta_id=1, nome_retirada='Fulano',
+                        documento_retirada='123', status=StatusColeta.TOTALMENTE_COLETADO,
+                        data_coleta=datetime(2026, 10, dia, 15, 0))
+        db.session.add_all([item, coleta])
+        db.session.flush()
+        db.session.add(ItemColetado(coleta_id=coleta.id, item_pedido_id=item.id, quantidade_coletada=2))
+        criadas.append(coleta)
+    db.session.commit()
+    return criadas
+
+
+def test_pdf_com_uma_pagina_por_recibo(coletas):
+    dados = ColetaService.dados_recibos([coleta.id for coleta in coletas])
+
+    pdf = ReceiptService.renderizar_recibos(dados)
+
+    assert pdf.startswith(b'%PDF')
+    assert pdf.count(b'/Type /Page\n') + pdf.count(b'/Type /Page ') == 3
+
+
+def test_dados_recibos_por_periodo(coletas):
+    dados = ColetaService.dados_recibos(
+        data_inicio=datetime(2026, 10, 11), data_fim=datetime(2026, 10, 13)
+    )
+
+    assert [item['pedido_id'] for item in dados] == [coletas[1].pedido_id, coletas[2].pedido_id]
+    assert dados[0]['cliente_nome'] == 'Cliente Lote'
+    assert dados[0]['itens_coleta'] == [{'produto_nome': 'Produto Lote', 'quantidade': 2}]
+
+
+def test_job_no_pool_local_sem_redis(app, coletas, tmp_path, monkeypatch):
+    monkeypatch.setattr(filas, 'recibos_queue', None)
+    dados = ColetaService.dados_recibos([coleta.id for coleta in coletas])
+    destino = str(tmp_path / 'recibos' / 'lotes' / 'abc.pdf')
+
+    job_id = filas.enqueue_lote_recibos_job('abc', dados, destino, '/coletas/recibos/lote/abc.pdf')
+    status = filas.aguardar_job(job_id, 120)
+
+    assert status['status'] == 'finished'
+    assert status['result']['success'] is True
+    assert status['result']['data']['total_recibos'] == 3
+    assert status['result']['data']['download_url'] == '/coletas/recibos/lote/abc.pdf'
+    with open(destino, 'rb') as arquivo:
+        assert arquivo.read().startswith(b'%PDF')
+    # O Future sai da memória ao terminar; o status continua visível a todos os processos
+    prazo = time.monotonic() + 5
+    while job_id in filas._local_jobs and time.monotonic() < prazo:
+        time.sleep(0.01)
+    assert job_id not in filas._local_jobs
+    assert filas.get_job_status(job_id)['result']['data']['total_recibos'] == 3
+
+
+def test_job_remove_lotes_vencidos(coletas, tmp_path):
+    lotes = tmp_path / 'lotes'
+    lotes.mkdir()
+    antigo = lotes / 'antigo.pdf'
+    antigo.write_bytes(b'%PDF antigo')
+    orfao = lotes / 'antigo.pdf.123.tmp'
+    orfao.write_bytes(b'%PDF')
+    duas_horas = time.time() - 2 * 3600
+    for caminho in (antigo, orfao):
+        os.utime(caminho, (duas_horas, duas_horas))
+    dados = ColetaService.dados_recibos([coletas[0].id])
+
+    resultado = gerar_lote_recibos_task(dados, str(lotes / 'novo.pdf'), '/novo.pdf', retencao_horas=1)
+
+    assert resultado['success']
+    assert sorted(os.listdir(lotes)) == ['novo.pdf']
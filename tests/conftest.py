@@ -0,0 +1,47 @@
+"""
+Fixtures compartilhadas dos testes
+"""
+import pytest
+from flask import Flask
+
+from meu_app.financeiro import ocr_cache
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.models import db
+
+
+@pytest.fixture
+def app_config():
+    """Configuração extra da app mínima (sobrescreva no módulo de teste)"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """
+    App mínima com SQLite em memória, raiz (uploads) e instance em diretório temporário
+
+    Módulos que precisam de mais (blueprints, extensões, monkeypatch) definem
+    a própria fixture app recebendo esta.
+    """
+    raiz = tmp_path / 'app'
+    raiz.mkdir()
+    app = Flask(__name__, root_path=str(raiz), instance_path=str(tmp_path / 'instance'))
+    app.config['SECRET_KEY'] = 'teste'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(app_config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    ocr_cache._discos.clear()
+
+
+@pytest.fixture
+def quota_liberada(monkeypatch):
+    """Quota de OCR sempre disponível, sem contador"""
+    monkeypatch.setattr(QuotaOcrService, 'reservar', classmethod(lambda cls, quantidade=1, periodo=None: True))
+    monkeypatch.setattr(QuotaOcrService, 'devolver',
+                        classmethod(lambda cls, quantidade=1, periodo=None, conexao=None: None))
@@ -0,0 +1,96 @@
+"""
+Testes do histórico de movimentação paginado por keyset
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from meu_app.models import db, Produto, MovimentacaoEstoque
+from meu_app.estoques.services import EstoqueService
+
+
+@pytest.fixture
+def produto(app):
+    produto = Produto(nome='Produto Histórico')
+    db.session.add(produto)
+    db.session.flush()
+
+    base = datetime(2025, 1, 1, 8, 0, 0)
+    # 25 movimentações, as 5 primeiras com a mesma data para exercitar o desempate por id
+    for i in range(25):
+        data = base if i < 5 else base + timedelta(days=i)
+        db.session.add(MovimentacaoEstoque(
+            produto_id=produto.id,
+            tipo_movimentacao='Entrada',
+            quantidade_anterior=i,
+            quantidade_movimentada=1,
+            quantidade_atual=i + 1,
+            motivo='Teste',
+            responsavel='Teste',
+            data_movimentacao=data
+        ))
+    db.session.commit()
+    return produto
+
+
+def test_paginacao_keyset_percorre_todo_historico(produto):
+    ids = []
+    cursor = None
+    paginas = 0
+    while True:
+        pagina = EstoqueService.buscar_historico_movimentacao(produto.id, cursor=cursor, per_page=10)
+        ids.extend(mov.id for mov in pagina['movimentacoes'])
+        paginas += 1
+        if not pagina['has_next']:
+            break
+        cursor = pagina['proximo_cursor']
+
+    assert paginas == 3
+    assert len(ids) == 25
+    assert ids == sorted(ids)
+
+
+def test_totais_acumulados_por_pagina(produto):
+    primeira = EstoqueService.buscar_historico_movimentacao(produto.id, per_page=10)
+    segunda = EstoqueService.buscar_historico_movimentacao(
+        produto.id, cursor=primeira['proximo_cursor'], per_page=10
+    )
+
+    assert primeira['total_pagina'] == 10
+    assert segunda['saldo_anterior'] == 10
+    assert segunda['total_acumulado'] == 20
+    assert [m.total_acumulado for m in segunda['movimentacoes']] == list(range(11, 21))
+
+
+def test_cursor_carrega_total_acumulado(produto):
+    segunda = EstoqueService.buscar_historico_movimentacao(
+        produto.id, cursor=EstoqueService.buscar_historico_movimentacao(produto.id, per_page=10)['proximo_cursor'],
+        per_page=10
+    )
+    terceira = EstoqueService.buscar_historico_movimentacao(produto.id, cursor=segunda['proximo_cursor'], per_page=10)
+
+    assert segunda['proximo_cursor'].endswith('|20')
+    assert terceira['saldo_anterior'] == 20
+    assert terceira['total_acumulado'] == 25
+    assert [m.total_acumulado for m in terceira['movimentacoes']] == list(range(21, 26))
+
+
+def test_filtro_por_periodo(produto):
+    pagina = EstoqueService.buscar_historico_movimentacao(
+        produto.id, data_inicio='2025-01-10', data_fim='2025-01-12', per_page=50
+    )
+
+    assert len(pagina['movimentacoes']) == 3
+    assert not pagina['has_next']
+
+
+def test_filtro_data_invalida(produto):
+    with pytest.raises(ValueError):
+        EstoqueService.buscar_historico_movimentacao(produto.id, data_inicio='10/01/2025')
+
+
+def test_iterar_historico_em_lotes(produto):
+    movimentacoes = list(EstoqueService.iterar_historico_movimentacao(produto.id, lote=7))
+
+    assert len(movimentacoes) == 25
+    assert len({m.id for m in movimentacoes}) == 25
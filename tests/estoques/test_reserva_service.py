@@ -0,0 +1,200 @@
+"""
+Testes da reserva de estoque para pedidos confirmados
+
+Além do serviço isolado, cobre as regras pelos pontos de entrada: confirmar,
+editar e excluir pedido (PedidoService) e processar coleta (ColetaService).
+"""
+import pytest
+
+from meu_app.models import (
+    db, Cliente, Produto, Estoque, Pedido, ItemPedido, Coleta, ItemColetado,
+    ReservaEstoque, StatusPedido, StatusColeta, Usuario
+)
+from meu_app.coletas.services.coleta_service import ColetaService
+from meu_app.estoques.reserva_service import ReservaEstoqueService
+from meu_app.pedidos.services import PedidoService
+
+
+def _criar_pedido(produto, quantidade, confirmado=True, status=None):
+    cliente = Cliente(nome='Cliente Reserva')
+    db.session.add(cliente)
+    db.session.flush()
+    pedido = Pedido(cliente_id=cliente.id, confirmado_comercial=confirmado)
+    if status:
+        pedido.status = status
+    db.session.add(pedido)
+    db.session.flush()
+    item = ItemPedido(
+        pedido_id=pedido.id, produto_id=produto.id, quantidade=quantidade,
+        preco_venda=10, preco_compra=5, valor_total_venda=10 * quantidade,
+        valor_total_compra=5 * quantidade, lucro_bruto=5 * quantidade
+    )
+    db.session.add(item)
+    db.session.commit()
+    return pedido, item
+
+
+@pytest.fixture
+def produto(app):
+    produto = Produto(nome='Produto Reserva')
+    db.session.add(produto)
+    db.session.flush()
+    db.session.add(Estoque(produto_id=produto.id, quantidade=10, conferente='Teste'))
+    db.session.commit()
+    return produto
+
+
+def test_reservar_e_liberar_pedido(produto):
+    pedido, _ = _criar_pedido(produto, 4)
+
+    ReservaEstoqueService.reservar_pedido(pedido.id)
+    db.session.commit()
+
+    estoque = Estoque.query.filter_by(produto_id=produto.id).first()
+    assert estoque.quantidade_reservada == 4
+    assert estoque.quantidade_disponivel == 6
+
+    ReservaEstoqueService.liberar_pedido(pedido.id)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert ReservaEstoqueService.disponibilidade([produto.id])[produto.id]['disponivel'] == 10
+
+
+def test_reserva_desconta_quantidade_coletada(produto):
+    pedido, item = _criar_pedido(produto, 5)
+    coleta = Coleta(
+        pedido_id=pedido.id, responsavel_coleta_id=1, nome_retirada='A',
+        documento_retirada='1', status=StatusColeta.PARCIALMENTE_COLETADO
+    )
+    db.session.add(coleta)
+    db.session.flush()
+    db.session.add(ItemColetado(coleta_id=coleta.id, item_pedido_id=item.id, quantidade_coletada=2))
+    item.quantidade_coletada = 2
+    db.session.commit()
+
+    assert ReservaEstoqueService.pendente_por_produto(pedido.id) == {produto.id: 3}
+
+
+def test_consumir_coleta_baixa_reserva(produto):
+    pedido, _ = _criar_pedido(produto, 5)
+    ReservaEstoqueService.reservar_pedido(pedido.id)
+    ReservaEstoqueService.consumir_coleta({produto.id: 2})
+    db.session.commit()
+
+    assert ReservaEstoque.query.filter_by(produto_id=produto.id).one().quantidade_reservada == 3
+
+
+def test_recalcular_ignora_nao_confirmados_e_cancelados(produto):
+    _criar_pedido(produto, 3)
+    _criar_pedido(produto, 7, confirmado=False)
+    cancelado, _ = _criar_pedido(produto, 2)
+    cancelado.status = StatusPedido.CANCELADO
+    db.session.commit()
+
+    assert ReservaEstoqueService.recalcular() == 1
+    assert ReservaEstoque.query.filter_by(produto_id=produto.id).one().quantidade_reservada == 3
+
+
+@pytest.fixture
+def requisicao(app):
+    """Contexto de requisição (os serviços de pedido leem a sessão) e um admin com senha"""
+    admin = Usuario(nome='admin', senha_hash='', tipo='admin')
+    admin.set_senha('senha-admin')
+    db.session.add(admin)
+    db.session.commit()
+    with app.test_request_context():
+        yield
+
+
+def _disponivel(produto):
+    db.session.expire_all()
+    return ReservaEstoqueService.disponibilidade([produto.id])[produto.id]['disponivel']
+
+
+def test_confirmar_pedido_reserva_uma_vez(produto, requisicao):
+    pedido, _ = _criar_pedido(produto, 4, confirmado=False)
+    assert _disponivel(produto) == 10
+
+    assert PedidoService.confirmar_pedido_comercial(pedido.id, 'senha-admin')[0]
+    assert _disponivel(produto) == 6
+
+    # Confirmar de novo não reserva outra vez
+    assert PedidoService.confirmar_pedido_comercial(pedido.id, 'senha-admin')[0]
+    assert _disponivel(produto) == 6
+
+
+def test_confirmar_com_senha_errada_nao_reserva(produto, requisicao):
+    pedido, _ = _criar_pedido(produto, 4, confirmado=False)
+
+    assert PedidoService.confirmar_pedido_comercial(pedido.id, 'errada') == (False, "Senha incorreta")
+    assert _disponivel(produto) == 10
+
+
+def test_editar_pedido_confirmado_troca_a_reserva(produto, requisicao):
+    pedido, _ = _criar_pedido(produto, 4, confirmado=False)
+    PedidoService.confirmar_pedido_comercial(pedido.id, 'senha-admin')
+
+    sucesso, mensagem, _ = PedidoService.editar_pedido(
+        pedido.id, pedido.cliente_id, [{'produto_id': produto.id, 'quantidade': 7, 'preco_venda': 10}]
+    )
+
+    assert sucesso, mensagem
+    assert _disponivel(produto) == 3
+
+
+def test_editar_pedido_nao_confirmado_nao_reserva(produto, requisicao):
+    pedido, _ = _criar_pedido(produto, 4, confirmado=False)
+
+    PedidoService.editar_pedido(
+        pedido.id, pedido.cliente_id, [{'produto_id': produto.id, 'quantidade': 7, 'preco_venda': 10}]
+    )
+
+    assert _disponivel(produto) == 10
+
+
+def test_excluir_pedido_confirmado_libera_a_reserva(produto, requisicao):
+    pedido, _ = _criar_pedido(produto, 4, confirmado=False)
+    PedidoService.confirmar_pedido_comercial(pedido.id, 'senha-admin')
+
+    sucesso, mensagem = PedidoService.excluir_pedido(pedido.id)
+
+    assert sucesso, mensagem
+    assert _disponivel(produto) == 10
+
+
+def _coletar(pedido, item, quantidade):
+    return ColetaService.processar_coleta(
+        pedido_id=pedido.id,
+        responsavel_coleta_id=1,
+        nome_retirada='Teste',
+        documento_retirada='12345678901',
+        itens_coleta=[{'item_id': item.id, 'quantidade': quantidade}]
+    )
+
+
+def test_coleta_nao_consome_reserva_de_outro_pedido(produto, requisicao):
+    reservado, _ = _criar_pedido(produto, 8, confirmado=False)
+    PedidoService.confirmar_pedido_comercial(reservado.id, 'senha-admin')
+    outro, item = _criar_pedido(produto, 5, confirmado=False, status=StatusPedido.PAGAMENTO_APROVADO)
+
+    sucesso, mensagem, _ = _coletar(outro, item, 5)
+
+    assert not sucesso
+    assert 'reservas de outros pedidos' in mensagem
+    assert Estoque.query.filter_by(produto_id=produto.id).one().quantidade == 10
+
+    sucesso, mensagem, _ = _coletar(outro, item, 2)
+    assert sucesso, mensagem
+    assert _disponivel(produto) == 0
+
+
+def test_coleta_do_pedido_usa_a_propria_reserva(produto, requisicao):
+    pedido, item = _criar_pedido(produto, 8, confirmado=False, status=StatusPedido.PAGAMENTO_APROVADO)
+    PedidoService.confirmar_pedido_comercial(pedido.id, 'senha-admin')
+
+    sucesso, mensagem, _ = _coletar(pedido, item, 8)
+
+    assert sucesso, mensagem
+    assert ReservaEstoque.query.filter_by(produto_id=produto.id).one().quantidade_reservada == 0
+    assert _disponivel(produto) == 2
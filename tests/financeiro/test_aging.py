@@ -0,0 +1,93 @@
+"""
+Testes do aging de recebíveis (faixas em SQL e cache invalidado por eventos)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from meu_app import flask_cache
+from meu_app.models import db, Cliente, Produto, Pedido, ItemPedido, Pagamento, StatusPedido
+from meu_app.financeiro.services import FinanceiroService
+
+REFERENCIA = datetime(2024, 6, 30, 18, 0)
+
+
+@pytest.fixture
+def app_config():
+    return {'CACHE_TYPE': 'SimpleCache', 'CACHE_KEY_PREFIX': 'flask_cache_'}
+
+
+@pytest.fixture
+def app(app):
+    """App mínima com SimpleCache"""
+    flask_cache.init_app(app)
+    flask_cache.clear()
+    return app
+
+
+def _pedido(cliente, produto, dias, valor=100, pago=0, **kwargs):
+    kwargs.setdefault('confirmado_comercial', True)
+    pedido = Pedido(cliente_id=cliente.id, data=REFERENCIA - timedelta(days=dias), **kwargs)
+    db.session.add(pedido)
+    db.session.flush()
+    db.session.add(ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=1, preco_venda=valor,
+                              preco_compra=0, valor_total_venda=valor, valor_total_compra=0, lucro_bruto=valor))
+    if pago:
+        db.session.add(Pagamento(pedido_id=pedido.id, valor=pago, metodo_pagamento='PIX'))
+    return pedido
+
+
+@pytest.fixture
+def carteira(app):
+    """Ana com um pedido em cada faixa; Bruno com um pedido quitado, um cancelado e um não confirmado"""
+    ana, bruno = Cliente(nome='Ana'), Cliente(nome='Bruno')
+    produto = Produto(nome='Produto Aging')
+    db.session.add_all([ana, bruno, produto])
+    db.session.flush()
+    pedidos = {
+        'ate_7': _pedido(ana, produto, 7, pago=40),
+        'de_8_a_30': _pedido(ana, produto, 8),
+        'de_31_a_60': _pedido(ana, produto, 60),
+        'acima_60': _pedido(ana, produto, 61),
+    }
+    _pedido(bruno, produto, 3, pago=100)
+    _pedido(bruno, produto, 3, status=StatusPedido.CANCELADO)
+    _pedido(bruno, produto, 3, confirmado_comercial=False)
+    db.session.commit()
+    return {chave: pedido.id for chave, pedido in pedidos.items()}
+
+
+def test_aging_separa_saldos_por_faixa(carteira):
+    relatorio = FinanceiroService.relatorio_aging('2024-06-30')
+
+    assert relatorio['data_referencia'] == '2024-06-30'
+    assert [c['cliente'] for c in relatorio['clientes']] == ['Ana']
+    ana = relatorio['clientes'][0]
+    assert ana['pedidos'] == 4
+    assert (ana['ate_7'], ana['de_8_a_30'], ana['de_31_a_60'], ana['acima_60']) == (60.0, 100.0, 100.0, 100.0)
+    assert ana['total'] == 360.0
+    assert relatorio['totais']['total'] == 360.0
+
+
+def test_aging_em_cache_ate_um_pagamento(carteira):
+    assert FinanceiroService.relatorio_aging('2024-06-30')['totais']['total'] == 360.0
+
+    # Alteração direta no banco não dispara evento: o relatório continua vindo do cache
+    db.session.add(Pagamento(pedido_id=carteira['acima_60'], valor=100, metodo_pagamento='PIX'))
+    db.session.commit()
+    assert FinanceiroService.relatorio_aging('2024-06-30')['totais']['total'] == 360.0
+
+    sucesso, _, _ = FinanceiroService.registrar_pagamento(carteira['de_8_a_30'], 50, 'Dinheiro')
+
+    assert sucesso
+    relatorio = FinanceiroService.relatorio_aging('2024-06-30')
+    assert relatorio['totais']['de_8_a_30'] == 50.0
+    assert relatorio['totais']['acima_60'] == 0.0
+
+
+def test_aging_sem_saldos(app):
+    relatorio = FinanceiroService.relatorio_aging('2024-06-30')
+
+    assert relatorio['clientes'] == []
+    assert relatorio['faixas'] == ['ate_7', 'de_8_a_30', 'de_31_a_60', 'acima_60']
+    assert relatorio['totais']['total'] == 0.0
@@ -0,0 +1,110 @@
+"""
+Testes da galeria de comprovantes: paginação por cliente e miniaturas em disco
+"""
+import os
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from meu_app.models import db, Cliente, Pedido, Pagamento
+from meu_app.financeiro.services import FinanceiroService
+from meu_app.financeiro.miniatura_service import MiniaturaService, _pendentes
+from meu_app.financeiro.config import FinanceiroConfig
+from meu_app.queue.tasks import gerar_miniaturas_task
+
+
+@pytest.fixture
+def app(app):
+    yield app
+    _pendentes.clear()
+
+
+@pytest.fixture
+def comprovantes(app):
+    """3 clientes (Ana, Bruno, Carla) com 2, 1 e 3 comprovantes; 1 pagamento sem recibo"""
+    diretorio = FinanceiroConfig.get_upload_directory('recibos')
+    for indice, (nome, quantidade) in enumerate([('Carla', 3), ('Ana', 2), ('Bruno', 1)]):
+        cliente = Cliente(nome=nome)
+        db.session.add(cliente)
+        db.session.flush()
+        pedido = Pedido(cliente_id=cliente.id)
+        db.session.add(pedido)
+        db.session.flush()
+        for n in range(quantidade):
+            arquivo = f'recibo_{indice}_{n}.png'
+            Image.new('RGB', (1200, 1600), 'white').save(os.path.join(diretorio, arquivo))
+            db.session.add(Pagamento(pedido_id=pedido.id, valor=10, metodo_pagamento='PIX',
+                                     caminho_recibo=arquivo, recibo_sha256=f'{indice}{n}' + 'a' * 62,
+                                     data_pagamento=datetime(2024, 3, 1 + n)))
+        db.session.add(Pagamento(pedido_id=pedido.id, valor=5, metodo_pagamento='Dinheiro'))
+    db.session.commit()
+
+
+def test_paginacao_por_cliente(comprovantes):
+    pagina1 = FinanceiroService.listar_comprovantes_por_cliente(page=1, per_page=2)
+    pagina2 = FinanceiroService.listar_comprovantes_por_cliente(page=2, per_page=2)
+
+    assert pagina1['total_comprovantes'] == 6
+    assert pagina1['total'] == 3 and pagina1['total_paginas'] == 2
+    assert [c['cliente']['nome'] for c in pagina1['clientes']] == ['Ana', 'Bruno']
+    assert [c['cliente']['nome'] for c in pagina2['clientes']] == ['Carla']
+    datas = [c['data_pagamento'] for c in pagina2['clientes'][0]['comprovantes']]
+    assert datas == sorted(datas, reverse=True)
+
+
+def test_filtro_de_periodo(comprovantes):
+    dados = FinanceiroService.listar_comprovantes_por_cliente(mes='3', ano='2024')
+    assert dados['total_comprovantes'] == 6
+
+    dados = FinanceiroService.listar_comprovantes_por_cliente(mes='4', ano='2024')
+    assert dados['total_comprovantes'] == 0
+    assert dados['clientes'] == []
+
+
+def test_gerar_miniatura_de_imagem_e_pdf(tmp_path):
+    imagem = tmp_path / 'grande.jpg'
+    Image.new('RGB', (2000, 1000), 'red').save(imagem)
+    destino = tmp_path / 'mini' / 'ab' / 'x.jpg'
+
+    assert MiniaturaService.gerar_miniatura(str(imagem), str(destino), 320)
+    with Image.open(destino) as miniatura:
+        assert max(miniatura.size) == 320
+
+    pdf = tmp_path / 'recibo.pdf'
+    pdf.write_bytes(b'%PDF-1.4\n%%EOF\n')
+    destino_pdf = tmp_path / 'mini' / 'cd' / 'y.jpg'
+    assert MiniaturaService.gerar_miniatura(str(pdf), str(destino_pdf), 320)
+    assert destino_pdf.exists()
+
+    assert not MiniaturaService.gerar_miniatura(str(tmp_path / 'nao_existe.png'), str(tmp_path / 'z.jpg'))
+
+
+def test_galeria_agenda_uma_vez_e_marca_prontas(comprovantes, monkeypatch):
+    jobs = []
+
+    def executar_na_hora(itens, tamanho=320):
+        jobs.append(len(itens))
+        gerar_miniaturas_task(itens, tamanho)
+        return f'job-{len(jobs)}'
+
+    monkeypatch.setattr('meu_app.queue.enqueue_miniaturas_job', executar_na_hora)
+
+    dados = FinanceiroService.listar_comprovantes_por_cliente(page=1, per_page=2)
+    assert MiniaturaService.preparar_galeria(dados['clientes']) == 'job-1'
+    assert jobs == [3]
+    assert not any(c['miniatura_pronta'] for cliente in dados['clientes'] for c in cliente['comprovantes'])
+
+    # Segunda visita: tudo em disco, nada a enfileirar
+    dados = FinanceiroService.listar_comprovantes_por_cliente(page=1, per_page=2)
+    assert MiniaturaService.preparar_galeria(dados['clientes']) is None
+    assert all(c['miniatura_pronta'] for cliente in dados['clientes'] for c in cliente['comprovantes'])
+
+    comprovante = dados['clientes'][0]['comprovantes'][0]
+    _, destino = MiniaturaService.caminhos(comprovante['caminho_recibo'], comprovante['recibo_sha256'])
+    assert os.path.basename(destino) == f"{comprovante['recibo_sha256']}.jpg"
+
+
+def test_nome_fora_da_pasta_de_recibos_nao_e_agendado(app):
+    origem, _ = MiniaturaService.caminhos('../../etc/passwd', None)
+    assert origem is None
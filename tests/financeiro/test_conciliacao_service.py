@@ -0,0 +1,184 @@
+"""
+Testes da conciliação bancária (OFX/CSV x Pagamento)
+"""
+import io
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from meu_app.models import db, Cliente, Pedido, Pagamento
+from meu_app.financeiro.conciliacao_service import ConciliacaoService
+from meu_app.financeiro.exceptions import ArquivoInvalidoError
+
+
+@pytest.fixture
+def pedido_id(app):
+    cliente = Cliente(nome='Cliente Conciliação')
+    db.session.add(cliente)
+    db.session.flush()
+    pedido = Pedido(cliente_id=cliente.id)
+    db.session.add(pedido)
+    db.session.commit()
+    return pedido.id
+
+
+def _pagamento(pedido_id, valor, data_comprovante=None, id_transacao=None, chave_pix=None):
+    pagamento = Pagamento(pedido_id=pedido_id, valor=valor, metodo_pagamento='PIX',
+                          data_comprovante=data_comprovante, id_transacao=id_transacao,
+                          chave_pix_recebedor=chave_pix)
+    db.session.add(pagamento)
+    db.session.flush()
+    return pagamento.id
+
+
+OFX = b"""OFXHEADER:100
+DATA:OFXSGML
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240310120000[-3:BRT]
+<TRNAMT>150.00
+<FITID>BANCO-001
+<MEMO>PIX RECEBIDO E00000000202403101200ABCDEFGHIJK
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240311
+<TRNAMT>-20.00
+<FITID>BANCO-002
+<MEMO>TARIFA
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_ler_ofx_extrai_e2e_da_descricao(app):
+    lancamentos = ConciliacaoService.ler_extrato(OFX, 'extrato.ofx')
+
+    assert len(lancamentos) == 2
+    assert lancamentos[0]['data'] == date(2024, 3, 10)
+    assert lancamentos[0]['valor'] == Decimal('150.00')
+    assert lancamentos[0]['ids'] == ['BANCO-001', 'E00000000202403101200ABCDEFGHIJK']
+    assert lancamentos[1]['valor'] == Decimal('-20.00')
+
+
+def test_ler_csv_formato_brasileiro(app):
+    csv = 'Data;Histórico;Valor;Chave PIX\n10/03/2024;PIX recebido;1.234,56;Pix@GrupoSertao.com\n'.encode('cp1252')
+
+    lancamento = ConciliacaoService.ler_extrato(csv, 'extrato.csv')[0]
+
+    assert lancamento['valor'] == Decimal('1234.56')
+    assert lancamento['descricao'] == 'PIX recebido'
+    assert lancamento['chave_pix'] == 'pix@gruposertao.com'
+
+
+def test_csv_sem_colunas_obrigatorias(app):
+    with pytest.raises(ArquivoInvalidoError):
+        ConciliacaoService.ler_extrato(b'foo;bar\n1;2\n', 'extrato.csv')
+
+
+def test_conciliar_por_id_e_por_valor_data(pedido_id):
+    por_e2e = _pagamento(pedido_id, 150, date(2024, 3, 9), id_transacao='E00000000202403101200ABCDEFGHIJK')
+    por_data = _pagamento(pedido_id, 80, date(2024, 3, 13), chave_pix='pix@gruposertao.com')
+    _pagamento(pedido_id, 80, date(2024, 3, 13), chave_pix='outra@chave.com')
+    _pagamento(pedido_id, 999, date(2024, 3, 12))
+    db.session.commit()
+
+    csv = ('data;valor;descricao;chave_pix\n'
+           '12/03/2024;80,00;PIX;pix@gruposertao.com\n'
+           '12/03/2024;55,00;Sem par;\n').encode()
+    lancamentos = ConciliacaoService.ler_extrato(OFX, 'extrato.ofx') + ConciliacaoService.ler_extrato(csv, 'extrato.csv')
+
+    resultado = ConciliacaoService.conciliar(lancamentos, tolerancia_dias=2)
+
+    conciliados = {c['pagamento']['pagamento_id']: c['criterio'] for c in resultado['conciliados']}
+    assert conciliados == {por_e2e: 'id_transacao', por_data: 'valor_data'}
+    assert [lancamento['valor'] for lancamento in resultado['nao_conciliados']] == [55.0]
+    assert len(resultado['ignorados']) == 1
+    assert resultado['resumo']['valor_conciliado'] == 230.0
+
+
+def test_conciliar_ambiguo_e_pagamento_usado_uma_vez(pedido_id):
+    a = _pagamento(pedido_id, 100, date(2024, 5, 2))
+    b = _pagamento(pedido_id, 100, date(2024, 5, 3))
+    db.session.commit()
+
+    csv = b'data;valor\n02/05/2024;100,00\n'
+    resultado = ConciliacaoService.conciliar(ConciliacaoService.ler_extrato(csv, 'x.csv'), tolerancia_dias=1)
+    assert resultado['resumo']['ambiguos'] == 1
+    assert {c['pagamento_id'] for c in resultado['ambiguos'][0]['candidatos']} == {a, b}
+
+    csv = b'data;valor\n01/05/2024;100,00\n01/05/2024;100,00\n'
+    resultado = ConciliacaoService.conciliar(ConciliacaoService.ler_extrato(csv, 'x.csv'), tolerancia_dias=1)
+    # Só o pagamento de 02/05 está na janela; o segundo lançamento fica sem par
+    assert resultado['resumo']['conciliados'] == 1
+    assert resultado['conciliados'][0]['pagamento']['pagamento_id'] == a
+    assert resultado['resumo']['nao_conciliados'] == 1
+
+
+def test_pagamento_sem_data_comprovante_usa_data_pagamento(pedido_id):
+    pagamento_id = _pagamento(pedido_id, 42)
+    db.session.get(Pagamento, pagamento_id).data_pagamento = datetime(2024, 6, 1, 15, 30)
+    db.session.commit()
+
+    resultado = ConciliacaoService.conciliar(
+        ConciliacaoService.ler_extrato(b'data;valor\n2024-06-01;42.00\n', 'x.csv'), tolerancia_dias=0
+    )
+
+    assert resultado['conciliados'][0]['pagamento']['pagamento_id'] == pagamento_id
+
+
+def test_extrato_de_10k_linhas_em_segundos(pedido_id):
+    inicio_mes = date(2024, 7, 1)
+    db.session.add_all([
+        Pagamento(pedido_id=pedido_id, valor=Decimal(1000 + i) / 100, metodo_pagamento='PIX',
+                  data_comprovante=inicio_mes + timedelta(days=i % 28),
+                  id_transacao=f'TX{i:06d}' if i % 2 else None)
+        for i in range(10000)
+    ])
+    db.session.commit()
+
+    linhas = ['data;valor;id_transacao']
+    for i in range(10000):
+        linhas.append(f"{(inicio_mes + timedelta(days=i % 28)).strftime('%d/%m/%Y')};"
+                      f"{(1000 + i) / 100:.2f};{f'TX{i:06d}' if i % 2 else ''}")
+    conteudo = '\n'.join(linhas).encode()
+
+    inicio = time.perf_counter()
+    sucesso, _, resultado = ConciliacaoService.conciliar_arquivo(conteudo, 'mensal.csv', tolerancia_dias=0)
+    duracao = time.perf_counter() - inicio
+
+    assert sucesso
+    assert resultado['resumo']['conciliados'] == 10000
+    assert duracao < 10
+
+
+@pytest.mark.parametrize('tolerancia', ['10000000', '-1', '31', 'abc'])
+def test_rota_recusa_tolerancia_fora_do_limite(app, tolerancia, monkeypatch):
+    from meu_app.financeiro.routes import financeiro_bp
+    app.config['SECRET_KEY'] = 'teste'
+    app.register_blueprint(financeiro_bp)
+    monkeypatch.setattr(ConciliacaoService, 'conciliar_arquivo',
+                        staticmethod(lambda *args: pytest.fail('Conciliação não deveria rodar')))
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['usuario_id'] = 1
+        sessao['usuario_tipo'] = 'admin'
+
+    resposta = cliente.post('/financeiro/conciliacao', content_type='multipart/form-data', data={
+        'extrato': (io.BytesIO(OFX), 'extrato.ofx'), 'tolerancia_dias': tolerancia
+    })
+
+    assert resposta.status_code == 400
+    assert 'tolerancia_dias' in resposta.get_json()['message']
+
+
+def test_tolerancia_e_limitada_no_servico(pedido_id):
+    _pagamento(pedido_id, 42, data_comprovante=date(2024, 1, 1))
+    lancamentos = ConciliacaoService.ler_extrato(b'data;valor\n2024-06-01;42.00\n', 'x.csv')
+
+    resultado = ConciliacaoService.conciliar(lancamentos, tolerancia_dias=10000000)
+
+    assert resultado['resumo']['conciliados'] == 0
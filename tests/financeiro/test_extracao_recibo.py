@@ -0,0 +1,145 @@
+"""
+Testes do extrator de campos de comprovantes
+
+O corpus em corpus_recibos/ reúne textos de comprovantes no formato devolvido pelo
+OCR (dados pessoais trocados por fictícios); esperado.json guarda os campos
+corretos de cada um. O tempo de extração por comprovante é medido fora da suíte,
+em scripts/benchmark_extracao_recibo.py.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from meu_app.financeiro.extracao_recibo import ExtratorRecibo, converter_valor
+from meu_app.financeiro.vision_service import VisionOcrService
+
+
+CORPUS = Path(__file__).parent / 'corpus_recibos'
+ESPERADO = json.loads((CORPUS / 'esperado.json').read_text(encoding='utf-8'))
+
+
+def _campos(texto):
+    resultado = ExtratorRecibo.extrair(texto)
+    return dict(resultado['bank_info'], amount=resultado['amount'],
+                transaction_id=resultado['transaction_id'], date=resultado['date'])
+
+
+def test_corpus_tem_gabarito_para_todos_os_textos():
+    assert sorted(ESPERADO) == sorted(p.name for p in CORPUS.glob('*.txt'))
+
+
+@pytest.mark.parametrize('arquivo', sorted(ESPERADO))
+def test_corpus_campos_extraidos(arquivo):
+    campos = _campos((CORPUS / arquivo).read_text(encoding='utf-8'))
+
+    assert {chave: campos[chave] for chave in ESPERADO[arquivo]} == ESPERADO[arquivo]
+
+
+def test_texto_normalizado_uma_vez_preserva_grafia_da_chave():
+    campos = _campos("Pix enviado R$\t42,00\nChave: Cobranca.Ágil@Exemplo.com.br\n")
+
+    assert campos['amount'] == 42.0
+    assert campos['chave_pix_recebedor'] == 'Cobranca.Ágil@Exemplo.com.br'
+
+
+def test_chave_da_empresa_tem_preferencia():
+    campos = _campos("Pagador: contato@cliente.com\nChave: PIX@GRUPOSERTAO.COM\nValor: R$ 10,00")
+
+    assert campos['chave_pix_recebedor'] == 'PIX@GRUPOSERTAO.COM'
+
+
+def test_documentos_e_ids_nao_viram_valor():
+    campos = _campos(
+        "R$ 75,50\n"
+        "CPF 123.456.789-00\n"
+        "CNPJ 11.222.333/0001-44\n"
+        "Conta 1234567-8\n"
+        "ID da transação E00416968202510031840ABcDeF12345"
+    )
+
+    assert campos['amount'] == 75.5
+    assert campos['conta_recebedor'] == '1234567'
+
+
+def test_valor_rotulado_sem_centavos():
+    assert _campos("Valor: R$ 25.000\nControle: 4418820")['amount'] == 25000.0
+
+
+def test_uuid_apos_rotulo_vem_inteiro():
+    campos = _campos("ID da transação: 3fa85f64-5717-4562-b3fc-2c963f66afa6")
+
+    assert campos['transaction_id'] == '3FA85F64-5717-4562-B3FC-2C963F66AFA6'
+
+
+def test_palavra_apos_rotulo_nao_e_id():
+    campos = _campos("DOCUMENTO AUXILIAR DA NOTA FISCAL\nProtocolo: 135250000123456")
+
+    assert campos['transaction_id'] == '135250000123456'
+
+
+def test_nome_do_recebedor_termina_na_linha():
+    campos = _campos("Para: Grupo Sertão\nCNPJ: 30.080.209/0004-16")
+
+    assert campos['nome_recebedor'] == 'GRUPO SERTAO'
+    assert campos['cnpj_recebedor'] == '30080209000416'
+    assert campos['cpf_cnpj_recebedor'] == '30.080.209/0004-16'
+
+
+def test_data_do_pagamento_tem_preferencia_sobre_vencimento():
+    campos = _campos("Vencimento 20/10/2025\nData do pagamento: 18/10/2025")
+
+    assert campos['date'] == '18/10/2025'
+
+
+def test_valor_da_transacao_apos_dados_da_transacao():
+    campos = _campos("Taxa: R$ 161,72\nDados da Transação\nData: 30/09/2025\nValor: R$ 100,00")
+
+    assert campos['amount'] == 100.0
+
+
+def test_texto_vazio():
+    resultado = ExtratorRecibo.extrair('')
+
+    assert resultado['amount'] is None
+    assert resultado['transaction_id'] is None
+    assert resultado['date'] is None
+    assert set(resultado['bank_info'].values()) == {None}
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('1.234,56', 1234.56),
+    ('1,234.56', 1234.56),
+    ('10000,00', 10000.0),
+    ('1 5O0,00', 1500.0),
+])
+def test_converter_valor(texto, esperado):
+    assert converter_valor(texto) == esperado
+
+
+def test_parse_text_extrai_uma_vez(monkeypatch):
+    from meu_app.financeiro import vision_service
+
+    chamadas = []
+    original = vision_service.extrair_campos
+    monkeypatch.setattr(vision_service, 'extrair_campos', lambda texto: chamadas.append(texto) or original(texto))
+    texto = (CORPUS / 'itau_pix.txt').read_text(encoding='utf-8')
+
+    resultado = VisionOcrService.parse_text(texto)
+
+    assert len(chamadas) == 1
+    assert resultado['layout'] == 'itau'
+    assert resultado['amount'] == 3480.9
+    assert resultado['transaction_id'] == 'E60701190202510021939DY5UHQ6VXCJ'
+    assert resultado['date'] == '02/10/2025'
+    assert resultado['bank_info']['chave_pix_recebedor'] == 'pix@gruposertao.com'
+
+
+def test_metodos_antigos_delegam_ao_extrator():
+    texto = (CORPUS / 'validacao_correto.txt').read_text(encoding='utf-8')
+
+    assert VisionOcrService._find_amount_in_text(texto) == 500.0
+    assert VisionOcrService._find_transaction_id_in_text(texto) == 'TEST123456789'
+    assert VisionOcrService._find_date_in_text(texto) == '08/10/2025'
+    assert VisionOcrService._find_bank_info_in_text(texto)['cnpj_recebedor'] == '30080209000416'
+    assert VisionOcrService._parse_currency_value('1.234,56') == 1234.56
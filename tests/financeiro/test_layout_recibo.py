@@ -0,0 +1,122 @@
+"""
+Testes do classificador de layout e dos modelos de extração por banco/app
+
+esperado_layout.json guarda, para cada texto do corpus, o layout reconhecido
+(null = extração genérica) e todos os campos esperados de extrair_campos. O tempo
+por layout é medido em scripts/benchmark_extracao_recibo.py.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from meu_app.financeiro import layout_recibo
+from meu_app.financeiro.config import FinanceiroConfig
+from meu_app.financeiro.extracao_recibo import TextoRecibo
+from meu_app.financeiro.layout_recibo import LayoutRecibo, extrair_campos, get_classificador
+
+
+CORPUS = Path(__file__).parent / 'corpus_recibos'
+ESPERADO = json.loads((CORPUS / 'esperado_layout.json').read_text(encoding='utf-8'))
+
+
+def _campos(texto):
+    resultado = extrair_campos(texto)
+    return dict(resultado['bank_info'], layout=resultado['layout'], amount=resultado['amount'],
+                transaction_id=resultado['transaction_id'], date=resultado['date'])
+
+
+@pytest.fixture
+def diretorio_layouts(tmp_path, monkeypatch):
+    """Diretório de layouts temporário, com o cache de classificadores limpo"""
+    monkeypatch.setattr(FinanceiroConfig, 'OCR_LAYOUTS_DIR', str(tmp_path))
+    monkeypatch.delenv('FINANCEIRO_OCR_LAYOUTS_DIR', raising=False)
+    layout_recibo._classificadores.clear()
+    yield tmp_path
+    layout_recibo._classificadores.clear()
+
+
+def test_corpus_tem_gabarito_para_todos_os_textos():
+    assert sorted(ESPERADO) == sorted(p.name for p in CORPUS.glob('*.txt'))
+
+
+@pytest.mark.parametrize('arquivo', sorted(ESPERADO))
+def test_corpus_layout_e_campos(arquivo):
+    assert _campos((CORPUS / arquivo).read_text(encoding='utf-8')) == ESPERADO[arquivo]
+
+
+def test_ancora_fora_do_cabecalho_nao_conta():
+    texto = "Comprovante de Pix\nValor R$ 10,00\nInstituição: PICPAY\nIdentificador\nE1234567890"
+
+    assert get_classificador().classificar(TextoRecibo(texto)) is None
+
+
+def test_novo_layout_so_com_arquivo(diretorio_layouts):
+    (diretorio_layouts / 'banco_x.json').write_text(json.dumps({
+        'layout': 'banco_x',
+        'ancoras': [{'texto': 'BANCO X', 'ate_linha': 1}, 'RECIBO X'],
+        'ancoras_minimas': 2,
+        'banco_emitente': 'BANCO X',
+        'campos': {
+            'amount': {'rotulo': 'TOTAL PAGO', 'tipo': 'valor'},
+            'transaction_id': {'rotulo': 'PROTOCOLO', 'tipo': 'digitos'},
+            'nome_recebedor': {'rotulo': 'RECEBEDOR', 'tipo': 'nome'},
+        },
+    }), encoding='utf-8')
+    texto = "Banco X\nRecibo X\nTotal pago: R$ 1.234,56\nProtocolo: 998.877\nRecebedor: Grupo Sertão\n02/10/2025"
+
+    campos = _campos(texto)
+
+    assert campos['layout'] == 'banco_x'
+    assert campos['banco_emitente'] == 'BANCO X'
+    assert campos['amount'] == 1234.56
+    assert campos['transaction_id'] == '998877'
+    assert campos['nome_recebedor'] == 'GRUPO SERTAO'
+    # Data não está no modelo: vem da extração genérica
+    assert campos['date'] == '02/10/2025'
+
+
+def test_campo_nao_encontrado_vem_da_extracao_generica(diretorio_layouts):
+    (diretorio_layouts / 'banco_x.json').write_text(json.dumps({
+        'layout': 'banco_x',
+        'ancoras': ['BANCO X'],
+        'campos': {'amount': {'rotulo': 'TOTAL PAGO', 'tipo': 'valor'}},
+    }), encoding='utf-8')
+
+    campos = _campos("Banco X\nValor: R$ 42,00")
+
+    assert campos['layout'] == 'banco_x'
+    assert campos['amount'] == 42.0
+
+
+def test_layout_invalido_e_ignorado(diretorio_layouts, capsys):
+    (diretorio_layouts / 'quebrado.json').write_text('{"layout": ', encoding='utf-8')
+    (diretorio_layouts / 'campo_errado.json').write_text(json.dumps({
+        'layout': 'errado', 'ancoras': ['BANCO X'], 'campos': {'saldo': {'tipo': 'valor'}},
+    }), encoding='utf-8')
+
+    assert get_classificador().layouts == []
+    assert _campos("Banco X\nValor: R$ 42,00")['layout'] is None
+    saida = capsys.readouterr().out
+    assert 'quebrado.json' in saida and 'campo_errado.json' in saida
+
+
+def test_layouts_carregados_uma_vez_por_processo(diretorio_layouts):
+    assert get_classificador() is get_classificador()
+
+
+def test_tipo_de_campo_desconhecido():
+    with pytest.raises(ValueError):
+        LayoutRecibo({'layout': 'x', 'ancoras': ['X'], 'campos': {'amount': {'tipo': 'moeda'}}})
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('Pago em 14.08.2025', '14/08/2025'),
+    ('08 OUT 2025 - 14:32', '08/10/2025'),
+    ('23 de setembro de 2025', '23/09/2025'),
+    ('Data: 5/1/25', '05/01/2025'),
+])
+def test_datas_normalizadas(texto, esperado):
+    layout = LayoutRecibo({'layout': 'x', 'ancoras': ['X'], 'campos': {'date': {'tipo': 'data'}}})
+
+    assert layout.extrair(TextoRecibo(texto))['date'] == esperado
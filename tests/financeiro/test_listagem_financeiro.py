@@ -0,0 +1,108 @@
+"""
+Testes da listagem financeira com status de pagamento calculado no SQL
+"""
+from datetime import datetime
+
+import pytest
+
+from meu_app.models import db, Cliente, Produto, Pedido, ItemPedido, Pagamento
+from meu_app.financeiro.services import FinanceiroService
+
+
+@pytest.fixture
+def pedidos(app):
+    """
+    Pedidos confirmados de R$ 100 (2 itens de R$ 50):
+    5 pagos, 3 parciais (R$ 40), 4 sem pagamento, 1 sem itens;
+    mais 2 pedidos não confirmados pelo comercial (ignorados).
+    """
+    cliente = Cliente(nome='Cliente Financeiro')
+    produto = Produto(nome='Produto Financeiro')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+
+    def criar(pagamento, confirmado=True, itens=True, data=None):
+        pedido = Pedido(cliente_id=cliente.id, confirmado_comercial=confirmado,
+                        data=data or datetime(2024, 3, 10))
+        db.session.add(pedido)
+        db.session.flush()
+        if itens:
+            db.session.add_all([
+                ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=5, preco_venda=10,
+                           preco_compra=5, valor_total_venda=50, valor_total_compra=25, lucro_bruto=25)
+                for _ in range(2)
+            ])
+        if pagamento:
+            db.session.add(Pagamento(pedido_id=pedido.id, valor=pagamento))
+        return pedido
+
+    for _ in range(5):
+        criar(100)
+    for _ in range(3):
+        criar(40)
+    for _ in range(4):
+        criar(None)
+    criar(None, itens=False)
+    criar(None, confirmado=False)
+    criar(100, confirmado=False)
+    db.session.commit()
+
+
+def test_pendentes_inclui_parciais_e_sem_pagamento(pedidos):
+    resultado = FinanceiroService.listar_pedidos_financeiro('pendentes')
+
+    assert resultado['total'] == 7
+    status = sorted(item['status'] for item in resultado['pedidos'])
+    assert status == ['Parcial'] * 3 + ['Pendente'] * 4
+    assert resultado['resumo'] == {
+        'total_pedidos': 7,
+        'total_receita': 700.0,
+        'total_recebido': 120.0,
+        'total_pendente': 580.0
+    }
+
+
+def test_pagos(pedidos):
+    resultado = FinanceiroService.listar_pedidos_financeiro('pagos')
+
+    assert resultado['total'] == 5
+    for item in resultado['pedidos']:
+        assert item['status'] == 'Pago'
+        assert item['saldo'] == 0
+        assert item['status'] == item['pedido'].obter_status_pagamento()
+
+
+def test_todos_paginado(pedidos):
+    pagina1 = FinanceiroService.listar_pedidos_financeiro('todos', page=1, per_page=5)
+    pagina3 = FinanceiroService.listar_pedidos_financeiro('todos', page=3, per_page=5)
+
+    assert pagina1['total'] == 13
+    assert pagina1['total_paginas'] == 3
+    assert pagina1['has_next'] and not pagina1['has_prev']
+    assert len(pagina1['pedidos']) == 5
+    assert len(pagina3['pedidos']) == 3
+    assert pagina3['has_prev'] and not pagina3['has_next']
+    # Resumo cobre o filtro inteiro, não só a página
+    assert pagina3['resumo']['total_receita'] == 1200.0
+    assert 'Sem Valor' in {item['status'] for item in pagina1['pedidos'] + pagina3['pedidos']}
+
+
+def test_filtro_de_data(pedidos):
+    cliente = Cliente.query.first()
+    db.session.add(Pedido(cliente_id=cliente.id, confirmado_comercial=True, data=datetime(2024, 4, 2)))
+    db.session.commit()
+
+    assert FinanceiroService.listar_pedidos_financeiro('todos', mes='04', ano='2024')['total'] == 1
+    assert FinanceiroService.listar_pedidos_financeiro('todos', mes='03', ano='2024')['total'] == 13
+
+
+def test_exportar_retorna_dados_serializaveis(pedidos):
+    dados = FinanceiroService.exportar_dados_financeiro()
+
+    assert len(dados['pedidos']) == 13
+    assert dados['total_receita'] == 1200.0
+    assert dados['total_recebido'] == 620.0
+    assert dados['total_pendente'] == 580.0
+    linha = dados['pedidos'][0]
+    assert set(linha) == {'pedido_id', 'cliente', 'data', 'total_pedido', 'total_pago', 'saldo', 'status'}
+    assert linha['cliente'] == 'Cliente Financeiro'
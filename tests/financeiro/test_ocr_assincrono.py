@@ -0,0 +1,206 @@
+"""
+Testes do OCR assíncrono do formulário de pagamento: job no pool de threads
+local (sem Redis) e resultado consultado por qualquer processo
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from meu_app import queue as filas
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.routes import financeiro_bp
+from meu_app.financeiro.vision_service import VisionOcrService
+from meu_app.queue.tasks import process_ocr_lote_task
+
+
+class VisionLento:
+    """extract_texts_batch falso que só responde depois de liberado"""
+
+    def __init__(self):
+        self.liberado = threading.Event()
+        self.chamadas = 0
+
+    def __call__(self, file_paths, batch_size=None):
+        self.chamadas += 1
+        self.liberado.wait(5)
+        return [('Comprovante PIX\nValor: R$ 123,45\nData: 10/03/2024\nID da transação: E123456789', None)
+                for _ in file_paths]
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    falso = VisionLento()
+    monkeypatch.setattr(VisionOcrService, 'extract_texts_batch', staticmethod(falso))
+    yield falso
+    falso.liberado.set()
+
+
+@pytest.fixture
+def app_config():
+    return {'OCR_THREADS': 2}
+
+
+@pytest.fixture
+def app(app, monkeypatch, quota_liberada):
+    """App mínima sem Redis, com as rotas do financeiro e quota liberada"""
+    app.register_blueprint(financeiro_bp)
+    monkeypatch.setattr(filas, 'ocr_queue', None)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['usuario_id'] = 1
+    return cliente
+
+
+def _png(cor='white'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 60), cor).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _recibo(tmp_path, nome='recibo.png', cor='white'):
+    caminho = tmp_path / nome
+    caminho.write_bytes(_png(cor))
+    return str(caminho)
+
+
+def _liberado(job_id):
+    """Espera o callback de conclusão tirar o Future da memória (roda logo depois do resultado)"""
+    prazo = time.monotonic() + 5
+    while job_id in filas._local_jobs and time.monotonic() < prazo:
+        time.sleep(0.01)
+    return job_id not in filas._local_jobs
+
+
+def test_sem_redis_job_vai_ao_pool_de_threads(app, vision, tmp_path):
+    caminho = _recibo(tmp_path)
+
+    resultado, job_id = OcrService.agendar_receipt(caminho)
+
+    # A requisição não espera o Vision
+    assert resultado is None
+    assert job_id.startswith('ocr-')
+    assert filas.aguardar_job(job_id, 0)['status'] in ('queued', 'started')
+
+    vision.liberado.set()
+    status = filas.aguardar_job(job_id, 5)
+
+    assert status['status'] == 'finished'
+    assert OcrService.resultado_do_job(status)['amount'] == 123.45
+    assert not os.path.exists(caminho)
+    # O resultado vai para o cache: o mesmo arquivo não volta ao Vision
+    segundo = _recibo(tmp_path, 'de_novo.png')
+    resultado, job_id = OcrService.agendar_receipt(segundo)
+    assert job_id is None and resultado['amount'] == 123.45
+    assert vision.chamadas == 1
+
+
+def test_status_do_job_local_e_visto_por_outro_processo(app, vision, tmp_path, monkeypatch):
+    _, job_id = OcrService.agendar_receipt(_recibo(tmp_path))
+    # Outro worker do gunicorn: não tem o Future do job em memória
+    monkeypatch.setattr(filas, '_local_jobs', {})
+
+    assert filas.get_job_status(job_id)['status'] == 'queued'
+
+    vision.liberado.set()
+    status = filas.aguardar_job(job_id, 5)
+
+    assert status['status'] == 'finished'
+    assert OcrService.resultado_do_job(status)['amount'] == 123.45
+
+
+def test_job_local_concluido_sai_da_memoria_e_expira(app, vision, tmp_path, monkeypatch):
+    vision.liberado.set()
+    _, job_id = OcrService.agendar_receipt(_recibo(tmp_path))
+    assert filas.aguardar_job(job_id, 5)['status'] == 'finished'
+
+    assert _liberado(job_id)
+    assert filas.get_job_status(job_id)['status'] == 'finished'
+    monkeypatch.setattr(filas, '_RESULTADO_LOCAL_TTL', -1)
+    _, expirado = OcrService.agendar_receipt(_recibo(tmp_path, 'b.png', 'black'))
+    filas.aguardar_job(expirado, 5)
+    assert _liberado(expirado)
+    assert filas.get_job_status(expirado)['status'] == 'unavailable'
+    assert filas.get_job_status('../../segredo')['status'] == 'unavailable'
+
+
+def test_falha_ao_gravar_job_local_vai_para_o_log(tmp_path, monkeypatch, caplog):
+    def falhar(*args):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(filas, '_gravar_job_local', falhar)
+    monkeypatch.setattr(filas, '_local_jobs', {'job-1': None})
+    future = Future()
+    future.set_result({'ok': True})
+
+    filas._concluir_job_local(str(tmp_path), 'job-1', future, 60)
+
+    assert 'job-1' not in filas._local_jobs
+    registro = next(r for r in caplog.records if r.name == 'meu_app.queue')
+    assert 'job-1' in registro.getMessage()
+    assert registro.exc_info[1].args == ("disco cheio",)
+
+
+def test_pool_cheio_recusa_sem_ocr_sincrono(app, vision, tmp_path):
+    app.config['OCR_THREADS_FILA'] = 1
+    _, primeiro = OcrService.agendar_receipt(_recibo(tmp_path, 'a.png', 'white'))
+
+    resultado, job_id = OcrService.agendar_receipt(_recibo(tmp_path, 'b.png', 'black'))
+
+    assert primeiro is not None
+    assert job_id is None
+    assert 'ocupada' in resultado['error']
+    vision.liberado.set()
+    filas.aguardar_job(primeiro, 5)
+    assert vision.chamadas == 1
+
+
+def test_rota_responde_202_e_long_poll_entrega_resultado(client, vision):
+    resposta = client.post('/financeiro/processar-recibo-ocr',
+                           data={'recibo': (io.BytesIO(_png()), 'comprovante.png')},
+                           content_type='multipart/form-data')
+
+    assert resposta.status_code == 202
+    dados = resposta.get_json()
+    assert dados['ocr_status'] == 'queued'
+    assert dados['resultado_url'] == f"/financeiro/processar-recibo-ocr/{dados['job_id']}"
+
+    pendente = client.get(dados['resultado_url'] + '?espera=0')
+    assert pendente.status_code == 202
+
+    vision.liberado.set()
+    final = client.get(dados['resultado_url'] + '?espera=2')
+
+    assert final.status_code == 200
+    assert final.get_json()['ocr_status'] == 'success'
+    assert final.get_json()['valor_encontrado'] == 123.45
+    assert final.get_json()['id_transacao_encontrado'] == 'E123456789'
+
+
+def test_job_desconhecido_sem_redis(client):
+    resposta = client.get('/financeiro/processar-recibo-ocr/nao-existe?espera=0')
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()['ocr_status'] == 'failed'
+
+
+def test_task_anexa_duplicata_sem_gravar_no_cache(vision, tmp_path):
+    vision.liberado.set()
+    cache_dir = tmp_path / 'cache'
+    duplicata = {'pagamento_id': 7, 'pedido_id': 3, 'distancia': 2}
+
+    resultado = process_ocr_lote_task([_recibo(tmp_path)], str(cache_dir), 10 ** 6, 100, [duplicata])
+
+    assert resultado['data']['resultados'][0]['duplicata_provavel'] == duplicata
+    gravados = [os.path.join(raiz, nome) for raiz, _, nomes in os.walk(cache_dir) for nome in nomes]
+    assert len(gravados) == 1
+    assert b'duplicata_provavel' not in open(gravados[0], 'rb').read()
@@ -0,0 +1,271 @@
+"""
+Testes dos motores de OCR intercambiáveis (Vision, Tesseract, falso) e do failover
+"""
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from meu_app.financeiro import ocr_backends
+from meu_app.financeiro.config import FinanceiroConfig
+from meu_app.financeiro.exceptions import OcrProcessingError
+from meu_app.financeiro.ocr_backends import (
+    CadeiaOcrBackend, FakeOcrBackend, TesseractOcrBackend, aquecer_motores, get_ocr_backend, unidades_cobradas
+)
+from meu_app.financeiro.ocr_cache import get_ocr_cache
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.financeiro.upload_utils import calculate_file_hash
+from meu_app.financeiro.vision_service import VisionOcrService
+
+
+@pytest.fixture(autouse=True)
+def limpar_backends():
+    ocr_backends._backends.clear()
+    yield
+    ocr_backends._backends.clear()
+
+
+@pytest.fixture
+def app(app, monkeypatch):
+    """App mínima com quota registrada"""
+    app.add_url_rule('/notas', 'leitura_notas.index', lambda: '')
+    reservas = []
+    monkeypatch.setattr(QuotaOcrService, 'reservar',
+                        classmethod(lambda cls, quantidade=1, periodo=None: reservas.append(quantidade) or True))
+    monkeypatch.setattr(QuotaOcrService, 'devolver',
+                        classmethod(lambda cls, quantidade=1, periodo=None, conexao=None: reservas.append(-quantidade)))
+    app.reservas = reservas
+    return app
+
+
+@pytest.fixture
+def vision_fora(monkeypatch):
+    """Vision indisponível (sem credenciais ou rede)"""
+    def falhar(cls):
+        raise OcrProcessingError('Google Vision não configurado')
+    monkeypatch.setattr(VisionOcrService, '_client', None)
+    monkeypatch.setattr(VisionOcrService, '_get_client', classmethod(falhar))
+
+
+def _arquivo(diretorio, nome, conteudo: bytes):
+    caminho = diretorio / nome
+    caminho.write_bytes(conteudo)
+    return str(caminho)
+
+
+def test_falso_e_deterministico_e_gera_comprovante_legivel(tmp_path):
+    foto = _arquivo(tmp_path, 'foto.jpg', bytes(range(256)) * 40)
+    copia = _arquivo(tmp_path, 'copia.jpg', bytes(range(256)) * 40)
+    motor = FakeOcrBackend(latencia=0)
+
+    resultado = motor.process_receipt(foto)
+
+    assert motor.extract_text(foto) == motor.extract_text(copia)
+    assert resultado['motor'] == 'falso'
+    assert resultado['amount'] > 0
+    assert resultado['transaction_id'].startswith('E') and len(resultado['transaction_id']) == 32
+    assert resultado['date'].endswith('/2025')
+
+
+def test_falso_devolve_texto_e_simula_falha(tmp_path):
+    texto = _arquivo(tmp_path, 'recibo.png', 'Comprovante PIX\nValor: R$ 87,40'.encode())
+    erro = _arquivo(tmp_path, 'erro.png', b'ERRO')
+    motor = FakeOcrBackend(latencia=0)
+
+    resultados = motor.process_receipts_batch([texto, erro, str(tmp_path / 'nao_existe.png')])
+
+    assert resultados[0]['amount'] == 87.4
+    assert 'simulada' in resultados[1]['error']
+    assert 'Falha ao ler arquivo' in resultados[2]['error']
+
+
+def test_falso_espera_uma_latencia_por_lote(tmp_path, monkeypatch):
+    esperas = []
+    monkeypatch.setattr(ocr_backends.time, 'sleep', esperas.append)
+    monkeypatch.setenv('FINANCEIRO_OCR_BATCH_SIZE', '16')
+    caminhos = [_arquivo(tmp_path, f'r{indice}.png', b'Valor: R$ 1,00') for indice in range(20)]
+
+    FakeOcrBackend(latencia=0.2).extract_texts_batch(caminhos)
+
+    assert esperas == [0.2, 0.2]
+
+
+def test_falso_inicializa_o_cliente_uma_vez_por_processo(tmp_path, monkeypatch):
+    esperas = []
+    monkeypatch.setattr(ocr_backends.time, 'sleep', esperas.append)
+    monkeypatch.setattr(FakeOcrBackend, '_conectado', False)
+    monkeypatch.setenv('FINANCEIRO_OCR_FALSO_INICIALIZACAO_MS', '300')
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 1,00')
+
+    FakeOcrBackend(latencia=0.05).process_receipt(caminho)
+    FakeOcrBackend(latencia=0.05).process_receipt(caminho)
+
+    assert esperas == [0.3, 0.05, 0.05]
+
+
+def test_aquecer_motores_das_cadeias_configuradas(monkeypatch):
+    aquecidos = []
+    monkeypatch.setattr(VisionOcrService, 'aquecer', classmethod(lambda cls: aquecidos.append('vision') or True))
+    monkeypatch.setattr(FakeOcrBackend, '_conectar', classmethod(lambda cls: aquecidos.append('falso')))
+    monkeypatch.setattr(ocr_backends, 'pytesseract', None)
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND', 'vision')
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND_ROTAS', 'leitura_notas.index=falso; outra.rota=tesseract,vision')
+
+    aquecer_motores()
+
+    assert sorted(aquecidos) == ['falso', 'vision', 'vision']
+
+
+def test_aquecer_vision_sem_credenciais_nao_falha(vision_fora, monkeypatch):
+    monkeypatch.setattr(VisionOcrService, '_storage_client', None)
+
+    assert VisionOcrService.aquecer() is False
+
+
+def test_failover_vision_para_falso(vision_fora, tmp_path):
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 12,50')
+    motor = get_ocr_backend('vision, falso')
+
+    resultados = motor.process_receipts_batch([caminho, caminho])
+
+    assert isinstance(motor, CadeiaOcrBackend)
+    assert motor.usa_quota and not motor.local
+    assert [resultado['motor'] for resultado in resultados] == ['falso', 'falso']
+    assert resultados[0]['amount'] == 12.5
+    assert motor.extract_text(caminho) == 'Valor: R$ 12,50'
+    assert unidades_cobradas(resultados) == 0
+
+
+def test_cadeia_pula_tesseract_nao_instalado(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr_backends, 'pytesseract', None)
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 3,00')
+
+    assert not TesseractOcrBackend().disponivel()
+    with pytest.raises(OcrProcessingError):
+        TesseractOcrBackend().extract_text(caminho)
+    assert get_ocr_backend('tesseract,falso').process_receipt(caminho)['motor'] == 'falso'
+    assert 'Nenhum motor' in get_ocr_backend('tesseract,tesseract').process_receipt(caminho)['error']
+
+
+class PoolTravado:
+    """Pool em que o OCR não termina dentro do prazo"""
+
+    def submit(self, *args):
+        futuro = Future()
+        futuro.set_running_or_notify_cancel()
+        return futuro
+
+
+def test_tesseract_excede_tempo_e_cadeia_segue_para_o_proximo(monkeypatch, tmp_path):
+    monkeypatch.setattr(TesseractOcrBackend, 'disponivel', lambda self: True)
+    monkeypatch.setattr(ocr_backends, '_get_pool_tesseract', lambda: PoolTravado())
+    monkeypatch.setattr(FinanceiroConfig, 'get_ocr_operation_timeout', classmethod(lambda cls: 0.01))
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 7,00')
+
+    with pytest.raises(OcrProcessingError, match='tempo limite'):
+        TesseractOcrBackend().extract_text(caminho)
+    assert get_ocr_backend('tesseract,falso').extract_text(caminho) == 'Valor: R$ 7,00'
+    resultado = get_ocr_backend('tesseract,falso').process_receipt(caminho)
+    assert resultado['motor'] == 'falso' and resultado['amount'] == 7.0
+
+
+def test_tesseract_recebe_o_prazo_restante(monkeypatch, tmp_path):
+    chamadas = []
+
+    def image_to_string(imagem, lang, timeout):
+        chamadas.append(timeout)
+        raise RuntimeError('Tesseract process timeout')
+
+    monkeypatch.setattr(ocr_backends, 'pytesseract', SimpleNamespace(image_to_string=image_to_string))
+    from PIL import Image
+    caminho = str(tmp_path / 'recibo.png')
+    Image.new('L', (40, 20), 255).save(caminho)
+
+    texto, erro = ocr_backends._tesseract_arquivo(caminho, 'por', 300, 30)
+
+    assert texto == '' and 'timeout' in erro
+    assert 0 < chamadas[0] <= 30
+
+
+def test_tesseract_le_imagem(tmp_path):
+    if not TesseractOcrBackend().disponivel():
+        pytest.skip('Tesseract não instalado')
+    from PIL import Image, ImageDraw
+    imagem = Image.new('L', (900, 200), 255)
+    ImageDraw.Draw(imagem).text((20, 60), 'Valor R$ 45,90', fill=0, font_size=60)
+    caminho = str(tmp_path / 'recibo.png')
+    imagem.save(caminho)
+
+    assert '45,90' in TesseractOcrBackend().extract_text(caminho)
+
+
+def test_motor_por_rota(app, monkeypatch):
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND_ROTAS', 'leitura_notas.index=falso; outra.rota=tesseract,vision')
+
+    assert get_ocr_backend().nome == 'vision'
+    assert get_ocr_backend(rota='outra.rota').nome == 'tesseract,vision'
+    with app.test_request_context('/notas'):
+        assert get_ocr_backend().nome == 'falso'
+
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND', 'desconhecido')
+    assert get_ocr_backend().nome == 'vision'
+
+
+def test_ocr_service_com_motor_falso_nao_usa_quota_nem_cache(app, monkeypatch, tmp_path):
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND', 'falso')
+    caminho = _arquivo(tmp_path, 'foto.jpg', bytes(range(256)) * 40)
+
+    resultado = OcrService.process_receipts([caminho])[0]
+
+    assert resultado['motor'] == 'falso'
+    assert app.reservas == [0, 0]
+    assert get_ocr_cache().get(calculate_file_hash(caminho)) is None
+
+
+def test_ocr_service_devolve_quota_no_failover(app, vision_fora, monkeypatch, tmp_path):
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND', 'vision,falso')
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 9,99')
+
+    resultado = OcrService.process_receipt(caminho)
+
+    assert resultado['amount'] == 9.99
+    assert app.reservas == [1, -1]
+
+
+@pytest.fixture
+def vision_sem_texto(monkeypatch):
+    """Vision responde, mas sem texto no primeiro arquivo e com erro da imagem no segundo"""
+    def extrair(cls, file_paths, batch_size=None):
+        return [("", None), ("", "Erro do Google Vision: Bad image data")][:len(file_paths)]
+    monkeypatch.setattr(VisionOcrService, 'extract_text', classmethod(lambda cls, file_path: ""))
+    monkeypatch.setattr(VisionOcrService, 'extract_texts_batch', classmethod(extrair))
+
+
+def test_vision_sem_texto_e_cobrado_e_erro_da_imagem_nao(vision_sem_texto, tmp_path):
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 5,00')
+
+    resultados = get_ocr_backend('vision').process_receipts_batch([caminho, caminho])
+
+    assert 'extrair texto' in resultados[0]['error']
+    assert 'Bad image data' in resultados[1]['error']
+    assert unidades_cobradas(resultados) == 1
+
+
+def test_ocr_service_nao_devolve_quota_de_leitura_sem_texto_no_failover(app, vision_sem_texto, monkeypatch,
+                                                                       tmp_path):
+    monkeypatch.setenv('FINANCEIRO_OCR_BACKEND', 'vision,falso')
+    caminho = _arquivo(tmp_path, 'recibo.png', b'Valor: R$ 9,99')
+
+    resultado = OcrService.process_receipt(caminho)
+
+    assert resultado['motor'] == 'falso' and resultado['amount'] == 9.99
+    assert app.reservas == [1, 0]
+
+
+def test_capacidades():
+    assert get_ocr_backend('vision').capacidades() == {
+        'nome': 'vision', 'usa_quota': True, 'suporta_pdf': True, 'suporta_lote': True,
+        'local': False, 'disponivel': True,
+    }
+    assert FakeOcrBackend(latencia=0).capacidades()['usa_quota'] is False
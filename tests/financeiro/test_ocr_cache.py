@@ -0,0 +1,145 @@
+"""
+Testes do cache de resultados de OCR (disco com despejo LRU, Redis e camadas)
+"""
+import os
+import time
+
+from meu_app.financeiro.exceptions import OcrProcessingError
+from meu_app.financeiro import ocr_cache
+from meu_app.financeiro.ocr_cache import CamadasOcrCache, DiskOcrCache, RedisOcrCache, get_disk_cache
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.financeiro.upload_utils import calculate_file_hash
+from meu_app.financeiro.vision_service import VisionOcrService
+from meu_app.obs.metrics import ocr_cache_operations_total
+
+SHA_A = 'aa' + '0' * 62
+SHA_B = 'bb' + '0' * 62
+SHA_C = 'cc' + '0' * 62
+
+
+class RedisFalso:
+    """Subconjunto de get/set/delete do cliente Redis (decode_responses=True)"""
+
+    def __init__(self):
+        self.dados = {}
+        self.ttls = {}
+
+    def get(self, chave):
+        return self.dados.get(chave)
+
+    def set(self, chave, valor, ex=None):
+        self.dados[chave] = valor
+        self.ttls[chave] = ex
+
+    def delete(self, chave):
+        self.dados.pop(chave, None)
+
+
+def _contador(backend, result):
+    return ocr_cache_operations_total.labels(backend=backend, result=result)._value.get()
+
+
+def test_disco_particiona_e_conta_hits(tmp_path):
+    cache = DiskOcrCache(str(tmp_path), max_bytes=10 ** 6, max_entradas=100)
+    hits, misses = _contador('disco', 'hit'), _contador('disco', 'miss')
+
+    assert cache.get(SHA_A) is None
+    cache.set(SHA_A, {'amount': 10.0, 'transaction_id': 'E1'})
+
+    assert os.path.exists(tmp_path / 'aa' / f'{SHA_A}.json')
+    assert cache.get(SHA_A) == {'amount': 10.0, 'transaction_id': 'E1'}
+    assert _contador('disco', 'hit') == hits + 1
+    assert _contador('disco', 'miss') == misses + 1
+
+
+def test_disco_migra_arquivo_legado(tmp_path):
+    (tmp_path / f'{SHA_A}.json').write_text('{"amount": 5.0}', encoding='utf-8')
+    cache = DiskOcrCache(str(tmp_path), max_bytes=10 ** 6, max_entradas=100)
+
+    assert cache.get(SHA_A) == {'amount': 5.0}
+    assert not (tmp_path / f'{SHA_A}.json').exists()
+    assert (tmp_path / 'aa' / f'{SHA_A}.json').exists()
+
+
+def test_disco_despeja_menos_usados(tmp_path):
+    cache = DiskOcrCache(str(tmp_path), max_bytes=10 ** 6, max_entradas=2)
+    cache.VARREDURA_A_CADA, cache.FOLGA = 1, 1.0
+    for sha in (SHA_A, SHA_B):
+        cache.set(sha, {'amount': 1.0})
+    antigo = time.time() - 60
+    os.utime(cache.caminho(SHA_A), (antigo, antigo))
+    os.utime(cache.caminho(SHA_B), (antigo - 60, antigo - 60))
+
+    # Leitura renova A; B passa a ser o menos usado
+    assert cache.get(SHA_A) is not None
+    cache.set(SHA_C, {'amount': 1.0})
+
+    assert cache.get(SHA_B) is None
+    assert cache.get(SHA_A) is not None and cache.get(SHA_C) is not None
+
+
+def test_disco_despeja_por_tamanho(tmp_path):
+    cache = DiskOcrCache(str(tmp_path), max_bytes=300, max_entradas=100)
+    cache.VARREDURA_A_CADA = 1
+    for indice in range(5):
+        cache.set(f'{indice:02d}' + '0' * 62, {'texto': 'x' * 80})
+
+    total = sum(os.path.getsize(os.path.join(raiz, nome))
+                for raiz, _, nomes in os.walk(tmp_path) for nome in nomes)
+    assert total <= 300
+
+
+def test_disco_compartilhado_so_varre_apos_n_gravacoes(tmp_path, monkeypatch):
+    varreduras = []
+    monkeypatch.setattr(DiskOcrCache, 'despejar', lambda self: varreduras.append(self) or 0)
+    monkeypatch.setattr(DiskOcrCache, 'VARREDURA_A_CADA', 3)
+    monkeypatch.setattr(ocr_cache, '_discos', {})
+
+    for sha in (SHA_A, SHA_B):
+        get_disk_cache(str(tmp_path), 10 ** 6, 100).set(sha, {'amount': 1.0})
+    assert varreduras == []
+
+    get_disk_cache(str(tmp_path), 10 ** 6, 100).set(SHA_C, {'amount': 1.0})
+    assert varreduras == [get_disk_cache(str(tmp_path), 10 ** 6, 100)]
+
+
+def test_camadas_aquecem_disco_a_partir_do_redis(tmp_path):
+    redis = RedisFalso()
+    disco = DiskOcrCache(str(tmp_path), max_bytes=10 ** 6, max_entradas=100)
+    compartilhado = RedisOcrCache(redis, ttl=3600)
+    compartilhado.set(SHA_A, {'amount': 7.0})
+
+    cache = CamadasOcrCache([disco, compartilhado])
+
+    assert cache.get(SHA_A) == {'amount': 7.0}
+    assert disco.get(SHA_A) == {'amount': 7.0}
+    assert redis.ttls[f'{RedisOcrCache.PREFIXO}{SHA_A}'] == 3600
+
+    cache.delete(SHA_A)
+    assert cache.get(SHA_A) is None
+
+
+def test_process_receipt_usa_cache_e_nao_guarda_erros(app, tmp_path, monkeypatch):
+    chamadas = []
+
+    def vision(cls, caminho):
+        chamadas.append(caminho)
+        if len(chamadas) == 1:
+            raise OcrProcessingError('falha transitória')
+        return 'Valor: R$ 42,00'
+
+    monkeypatch.setattr(VisionOcrService, 'extract_text', classmethod(vision))
+    monkeypatch.setattr(QuotaOcrService, 'reservar', classmethod(lambda cls, quantidade=1, periodo=None: True))
+    monkeypatch.setattr(QuotaOcrService, 'devolver', classmethod(lambda cls, quantidade=1, periodo=None, conexao=None: None))
+    recibo = tmp_path / 'recibo.png'
+    recibo.write_bytes(b'conteudo do comprovante')
+
+    assert OcrService.process_receipt(str(recibo))['error'] == 'falha transitória'
+    assert OcrService.process_receipt(str(recibo))['amount'] == 42.0
+    assert OcrService.process_receipt(str(recibo))['amount'] == 42.0
+
+    assert len(chamadas) == 2
+    sha256 = calculate_file_hash(str(recibo))
+    diretorio = os.path.join(app.root_path, '..', 'uploads', '.ocr_cache')
+    assert os.path.exists(os.path.join(diretorio, sha256[:2], f'{sha256}.json'))
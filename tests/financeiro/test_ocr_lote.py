@@ -0,0 +1,98 @@
+"""
+Testes do OCR em lote (batch_annotate_images) com cliente Vision falso
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.vision_service import VisionOcrService
+from meu_app.queue.tasks import process_ocr_lote_task
+
+pytestmark = pytest.mark.usefixtures('quota_liberada')
+
+
+class VisionFalso:
+    """Responde com o próprio conteúdo da imagem como texto; 'ERRO' vira erro do Vision"""
+
+    def __init__(self):
+        self.lotes = []
+
+    def batch_annotate_images(self, requests):
+        self.lotes.append(len(requests))
+        respostas = []
+        for request in requests:
+            texto = request.image.content.decode()
+            if texto == 'ERRO':
+                respostas.append(SimpleNamespace(error=SimpleNamespace(code=3, message='imagem ruim'),
+                                                 text_annotations=[]))
+            else:
+                respostas.append(SimpleNamespace(error=SimpleNamespace(code=0, message=''),
+                                                 text_annotations=[SimpleNamespace(description=texto)]))
+        return SimpleNamespace(responses=respostas)
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    cliente = VisionFalso()
+    monkeypatch.setattr(VisionOcrService, '_client', cliente)
+    return cliente
+
+
+def _recibos(diretorio, textos):
+    caminhos = []
+    for indice, texto in enumerate(textos):
+        caminho = diretorio / f'recibo_{indice}.png'
+        caminho.write_bytes(texto.encode())
+        caminhos.append(str(caminho))
+    return caminhos
+
+
+def _texto(valor):
+    return f'Comprovante de transferência PIX\nValor: R$ {valor}\nData: 10/03/2024'
+
+
+def test_lote_agrupa_imagens_e_preserva_ordem(vision, tmp_path):
+    caminhos = _recibos(tmp_path, [_texto('10,00'), _texto('20,00'), 'ERRO', _texto('40,00'), _texto('50,00')])
+
+    resultados = VisionOcrService.process_receipts_batch(caminhos, batch_size=2)
+
+    assert vision.lotes == [2, 2, 1]
+    assert [r.get('amount') for r in resultados] == [10.0, 20.0, None, 40.0, 50.0]
+    assert 'imagem ruim' in resultados[2]['error']
+
+
+def test_lote_respeita_tamanho_do_payload(vision, tmp_path, monkeypatch):
+    monkeypatch.setattr('meu_app.financeiro.config.FinanceiroConfig.OCR_BATCH_MAX_BYTES', 120)
+    caminhos = _recibos(tmp_path, [_texto('1,00')] * 3)
+
+    VisionOcrService.process_receipts_batch(caminhos, batch_size=16)
+
+    assert vision.lotes == [1, 1, 1]
+
+
+def test_process_receipts_pula_arquivos_em_cache(app, vision, tmp_path):
+    primeiros = _recibos(tmp_path, [_texto('10,00'), 'ERRO', _texto('30,00')])
+    OcrService.process_receipts(primeiros)
+    assert vision.lotes == [3]
+
+    novo = tmp_path / 'novo.png'
+    novo.write_bytes(_texto('99,00').encode())
+    resultados = OcrService.process_receipts(primeiros + [str(novo)])
+
+    # Só o que falhou antes e o arquivo novo voltam ao Vision
+    assert vision.lotes == [3, 2]
+    assert [r.get('amount') for r in resultados] == [10.0, None, 30.0, 99.0]
+
+
+def test_task_grava_cache_em_disco_e_remove_arquivos(app, vision, tmp_path):
+    caminhos = _recibos(tmp_path, [_texto('12,34'), _texto('56,78')])
+    cache_dir = tmp_path / 'cache'
+
+    resultado = process_ocr_lote_task(caminhos, str(cache_dir), 10 ** 6, 100)
+
+    assert resultado['success']
+    assert [r['amount'] for r in resultado['data']['resultados']] == [12.34, 56.78]
+    assert not any(os.path.exists(c) for c in caminhos)
+    assert sum(len(arquivos) for _, _, arquivos in os.walk(cache_dir)) == 2
@@ -0,0 +1,167 @@
+"""
+Testes do registro de pagamentos em lote
+"""
+import pytest
+from sqlalchemy import event
+
+from meu_app.models import db, Cliente, Produto, Pedido, ItemPedido, Pagamento, StatusPedido
+from meu_app.financeiro.services import FinanceiroService
+
+
+@pytest.fixture
+def pedidos(app):
+    """4 pedidos pendentes de R$ 100 (um item cada)"""
+    cliente = Cliente(nome='Cliente Lote')
+    produto = Produto(nome='Produto Lote')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+    ids = []
+    for _ in range(4):
+        pedido = Pedido(cliente_id=cliente.id, status=StatusPedido.PENDENTE, confirmado_comercial=True)
+        db.session.add(pedido)
+        db.session.flush()
+        db.session.add(ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=10, preco_venda=10,
+                                  preco_compra=5, valor_total_venda=100, valor_total_compra=50, lucro_bruto=50))
+        ids.append(pedido.id)
+    db.session.commit()
+    return ids
+
+
+def _status(pedido_id):
+    db.session.expire_all()
+    return db.session.get(Pedido, pedido_id).status
+
+
+def test_lote_registra_e_aprova_pedidos_quitados(pedidos):
+    pagamentos = [
+        {'pedido_id': pedidos[0], 'valor': 60, 'forma_pagamento': 'PIX', 'id_transacao': 'L-1'},
+        {'pedido_id': pedidos[0], 'valor': 40, 'forma_pagamento': 'PIX', 'id_transacao': 'L-2',
+         'data_comprovante': '05/03/2024', 'chave_pix_recebedor': ' pix@gruposertao.com '},
+        {'pedido_id': pedidos[1], 'valor': 30, 'forma_pagamento': 'Dinheiro'},
+    ]
+
+    sucesso, mensagem, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos)
+
+    assert sucesso
+    assert mensagem == '3 de 3 pagamentos registrados'
+    assert all(r['sucesso'] and r['pagamento_id'] for r in resultados)
+    assert _status(pedidos[0]) == StatusPedido.PAGAMENTO_APROVADO
+    assert _status(pedidos[1]) == StatusPedido.PENDENTE
+    pagamento = db.session.get(Pagamento, resultados[1]['pagamento_id'])
+    assert pagamento.id_transacao == 'L-2'
+    assert pagamento.data_comprovante.isoformat() == '2024-03-05'
+    assert pagamento.chave_pix_recebedor == 'pix@gruposertao.com'
+
+
+def test_lote_aceita_numeros_nos_campos_de_texto_e_recusa_valor_nao_finito(pedidos):
+    pagamentos = [
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 'PIX', 'id_transacao': 123456,
+         'agencia_recebedor': 1234, 'conta_recebedor': 98765},
+        {'pedido_id': pedidos[0], 'valor': 'NaN', 'forma_pagamento': 'PIX'},
+        {'pedido_id': pedidos[0], 'valor': float('inf'), 'forma_pagamento': 'PIX'},
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 7},
+    ]
+
+    sucesso, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos)
+
+    assert sucesso
+    assert [r['sucesso'] for r in resultados] == [True, False, False, True]
+    assert 'inválido' in resultados[1]['mensagem'] and 'inválido' in resultados[2]['mensagem']
+    pagamento = db.session.get(Pagamento, resultados[0]['pagamento_id'])
+    assert pagamento.id_transacao == '123456'
+    assert pagamento.agencia_recebedor == '1234' and pagamento.conta_recebedor == '98765'
+    assert db.session.get(Pagamento, resultados[3]['pagamento_id']).metodo_pagamento == '7'
+
+
+def test_lote_ignora_hash_e_ocr_enviados_pelo_cliente(pedidos):
+    pagamentos = [{'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 'PIX',
+                   'recibo_phash': '0' * 16, 'ocr_json': '{"amount": 10.0, "transaction_id": "E1"}'}]
+
+    _, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos)
+
+    pagamento = db.session.get(Pagamento, resultados[0]['pagamento_id'])
+    assert pagamento.recibo_phash is None and pagamento.ocr_json is None
+
+
+def test_lote_recusa_linhas_invalidas_e_duplicadas(pedidos):
+    FinanceiroService.registrar_pagamento(pedidos[2], 10, 'PIX', id_transacao='JA-EXISTE')
+
+    pagamentos = [
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 'PIX', 'id_transacao': 'NOVO'},
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 'PIX', 'id_transacao': 'NOVO'},
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': 'PIX', 'id_transacao': 'JA-EXISTE'},
+        {'pedido_id': 9999, 'valor': 10, 'forma_pagamento': 'PIX'},
+        {'pedido_id': pedidos[0], 'valor': 0, 'forma_pagamento': 'PIX'},
+        {'pedido_id': pedidos[0], 'valor': 'abc', 'forma_pagamento': 'PIX'},
+        {'pedido_id': pedidos[0], 'valor': 10, 'forma_pagamento': ''},
+    ]
+
+    sucesso, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos)
+
+    assert sucesso
+    assert [r['sucesso'] for r in resultados] == [True] + [False] * 6
+    assert 'repetido no lote' in resultados[1]['mensagem']
+    assert 'JA-EXISTE' in resultados[2]['mensagem'] and f'#{pedidos[2]}' in resultados[2]['mensagem']
+    assert 'não encontrado' in resultados[3]['mensagem']
+    assert 'maior que zero' in resultados[4]['mensagem']
+    assert 'inválido' in resultados[5]['mensagem']
+    assert 'Forma de pagamento' in resultados[6]['mensagem']
+    assert Pagamento.query.filter_by(pedido_id=pedidos[0]).count() == 1
+
+
+def test_lote_com_queries_constantes(app, pedidos):
+    statements = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().split()[0].upper())
+
+    pagamentos = [
+        {'pedido_id': pedidos[i % 4], 'valor': 1, 'forma_pagamento': 'PIX', 'id_transacao': f'Q-{i}'}
+        for i in range(200)
+    ]
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        sucesso, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    assert sucesso and all(r['sucesso'] for r in resultados)
+    # pedidos + id_transacao + trava dos pedidos; UPDATE agrupado. O INSERT é
+    # um executemany com RETURNING ordenado (em lote no PostgreSQL; o SQLite
+    # não garante a ordem e o SQLAlchemy executa linha a linha)
+    assert statements.count('SELECT') == 3
+    assert statements.count('UPDATE') == 1
+
+
+def test_lote_em_blocos_isola_falhas(pedidos, monkeypatch):
+    chamadas = []
+    original = FinanceiroService._aprovar_pedidos_quitados
+
+    def falhar_segundo_bloco(pedido_ids):
+        chamadas.append(pedido_ids)
+        if len(chamadas) == 2:
+            raise RuntimeError('falha simulada')
+        return original(pedido_ids)
+
+    monkeypatch.setattr(FinanceiroService, '_aprovar_pedidos_quitados', staticmethod(falhar_segundo_bloco))
+    pagamentos = [{'pedido_id': pedidos[0], 'valor': 1, 'forma_pagamento': 'PIX'} for _ in range(5)]
+
+    sucesso, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos, tamanho_lote=2)
+
+    assert sucesso
+    assert [r['sucesso'] for r in resultados] == [True, True, False, False, True]
+    assert Pagamento.query.count() == 3
+
+
+def test_lote_atomico_reverte_tudo(pedidos, monkeypatch):
+    def falhar(pedido_ids):
+        raise RuntimeError('falha simulada')
+
+    monkeypatch.setattr(FinanceiroService, '_aprovar_pedidos_quitados', staticmethod(falhar))
+    pagamentos = [{'pedido_id': pedidos[0], 'valor': 1, 'forma_pagamento': 'PIX'} for _ in range(5)]
+
+    sucesso, _, resultados = FinanceiroService.registrar_pagamentos_lote(pagamentos, tamanho_lote=0)
+
+    assert not sucesso
+    assert not any(r['sucesso'] for r in resultados)
+    assert Pagamento.query.count() == 0
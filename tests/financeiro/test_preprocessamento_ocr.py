@@ -0,0 +1,114 @@
+"""
+Testes do pré-processamento de imagens antes do envio ao Vision
+"""
+import io
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from meu_app.financeiro.ocr_cache import get_ocr_cache
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.preprocessamento_ocr import PreprocessadorImagem
+from meu_app.financeiro.upload_utils import calculate_file_hash
+from meu_app.financeiro.vision_service import VisionOcrService
+
+pytestmark = pytest.mark.usefixtures('quota_liberada')
+
+
+class VisionFalso:
+    """Guarda o conteúdo recebido e responde com um comprovante fixo"""
+
+    def __init__(self):
+        self.conteudos = []
+
+    def batch_annotate_images(self, requests):
+        self.conteudos.extend(request.image.content for request in requests)
+        texto = 'Comprovante PIX\nValor: R$ 87,40\nData: 10/03/2024'
+        return SimpleNamespace(responses=[
+            SimpleNamespace(error=SimpleNamespace(code=0, message=''),
+                            text_annotations=[SimpleNamespace(description=texto)])
+            for _ in requests
+        ])
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    cliente = VisionFalso()
+    monkeypatch.setattr(VisionOcrService, '_client', cliente)
+    return cliente
+
+
+def _foto(caminho, tamanho=(2400, 1800), orientacao=None, qualidade=95):
+    """Foto com ruído (comprime mal, como a de uma câmera), opcionalmente com orientação no EXIF"""
+    foto = Image.merge('RGB', [Image.effect_noise(tamanho, 40)] * 3)
+    exif = Image.Exif()
+    if orientacao:
+        exif[0x0112] = orientacao
+    foto.save(caminho, 'JPEG', quality=qualidade, exif=exif)
+    return str(caminho)
+
+
+def test_reduz_gira_e_converte_para_cinza(tmp_path):
+    # Deitada no arquivo, em pé segundo o EXIF (6 = girar 90° no sentido horário)
+    caminho = _foto(tmp_path / 'foto.jpg', (2400, 1800), orientacao=6)
+
+    preparado = PreprocessadorImagem.preparar(caminho, lado_maximo=1600)
+
+    imagem = Image.open(io.BytesIO(preparado))
+    assert imagem.format == 'JPEG'
+    assert imagem.mode == 'L'
+    assert imagem.size == (1200, 1600)
+    assert 0x0112 not in imagem.getexif()
+
+
+def test_imagem_pequena_ou_invalida_vai_original(tmp_path):
+    pequena = tmp_path / 'pequena.png'
+    Image.new('RGB', (200, 100), 'white').save(pequena)
+    invalida = tmp_path / 'texto.png'
+    invalida.write_bytes(b'nao e imagem')
+    documento = tmp_path / 'recibo.docx'
+    documento.write_bytes(b'PK')
+
+    assert PreprocessadorImagem.preparar(str(pequena)) is None
+    assert PreprocessadorImagem.conteudo(str(pequena)) == pequena.read_bytes()
+    assert PreprocessadorImagem.conteudo(str(invalida)) == b'nao e imagem'
+    assert PreprocessadorImagem.preparar(str(documento)) is None
+
+
+def test_desligado_envia_o_original(tmp_path, monkeypatch):
+    monkeypatch.setenv('FINANCEIRO_OCR_PREPROCESSAMENTO', '0')
+    caminho = _foto(tmp_path / 'foto.jpg')
+
+    assert PreprocessadorImagem.conteudo(caminho) == open(caminho, 'rb').read()
+    assert PreprocessadorImagem.preparar_lote([caminho, caminho]) == [None, None]
+
+
+def test_lote_envia_imagens_reduzidas_e_cache_usa_sha_do_original(app, vision, tmp_path):
+    caminhos = [_foto(tmp_path / f'foto_{indice}.jpg') for indice in range(3)]
+    originais = [open(caminho, 'rb').read() for caminho in caminhos]
+
+    resultados = OcrService.process_receipts(caminhos)
+
+    assert [r['amount'] for r in resultados] == [87.4] * 3
+    assert all(len(enviado) < len(original) / 3 for enviado, original in zip(vision.conteudos, originais))
+    assert all(Image.open(io.BytesIO(enviado)).mode == 'L' for enviado in vision.conteudos)
+    # Arquivos intactos e o resultado guardado pelo SHA-256 do original
+    assert [open(caminho, 'rb').read() for caminho in caminhos] == originais
+    assert get_ocr_cache().get(calculate_file_hash(caminhos[0]))['amount'] == 87.4
+
+
+def test_bytes_enviados_e_tempo(tmp_path):
+    caminhos = [_foto(tmp_path / f'foto_{indice}.jpg', (3024, 4032)) for indice in range(2)]
+    antes = sum(len(open(caminho, 'rb').read()) for caminho in caminhos)
+
+    inicio = time.perf_counter()
+    preparados = PreprocessadorImagem.preparar_lote(caminhos)
+    por_imagem = (time.perf_counter() - inicio) / len(caminhos)
+
+    depois = sum(len(preparado) for preparado in preparados)
+    print(f"\nPré-processamento: {antes / len(caminhos) / 1024:.0f} KB -> {depois / len(caminhos) / 1024:.0f} KB "
+          f"por imagem ({depois / antes:.1%}), {por_imagem * 1000:.0f} ms/imagem")
+
+    assert depois < antes / 4
@@ -0,0 +1,210 @@
+"""
+Testes da reserva atômica da quota mensal de OCR
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from meu_app.models import db, OcrQuota
+from meu_app.financeiro import quota_ocr
+from meu_app.financeiro.config import FinanceiroConfig
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.financeiro.vision_service import VisionOcrService
+
+
+PERIODO = (2025, 10)
+
+
+class RedisFalso:
+    """Contadores em memória; executa os dois scripts de quota como o Redis (atomicamente)"""
+
+    def __init__(self):
+        self.valores = {}
+        self.lock = threading.Lock()
+
+    def get(self, chave):
+        valor = self.valores.get(chave)
+        return None if valor is None else str(valor)
+
+    def set(self, chave, valor, nx=False, ex=None):
+        with self.lock:
+            if nx and chave in self.valores:
+                return None
+            self.valores[chave] = int(valor)
+            return True
+
+    def eval(self, script, numkeys, chave, *args):
+        with self.lock:
+            if script == quota_ocr._SCRIPT_RESERVAR:
+                quantidade, limite = int(args[0]), int(args[1])
+                total = self.valores.get(chave, 0) + quantidade
+                if total > limite:
+                    return -1
+                self.valores[chave] = total
+                return total
+            if chave not in self.valores:
+                return 0
+            self.valores[chave] = max(self.valores[chave] - int(args[0]), 0)
+            return self.valores[chave]
+
+
+class VisionFalso:
+    """Responde com o conteúdo do arquivo como texto; 'ERRO' vira erro do Vision"""
+
+    def batch_annotate_images(self, requests):
+        respostas = []
+        for request in requests:
+            texto = request.image.content.decode()
+            erro = SimpleNamespace(code=3 if texto == 'ERRO' else 0, message='imagem ruim' if texto == 'ERRO' else '')
+            anotacoes = [] if texto == 'ERRO' else [SimpleNamespace(description=texto)]
+            respostas.append(SimpleNamespace(error=erro, text_annotations=anotacoes))
+        return SimpleNamespace(responses=respostas)
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """SQLite em arquivo, compartilhado entre threads"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'quota.db'}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}},
+    }
+
+
+@pytest.fixture
+def app(app, monkeypatch):
+    """App mínima com limite mensal baixo e sem Redis"""
+    monkeypatch.setattr(FinanceiroConfig, 'OCR_ENFORCE_LIMIT', True)
+    monkeypatch.setattr(FinanceiroConfig, 'OCR_MONTHLY_LIMIT', 10)
+    monkeypatch.setattr(QuotaOcrService, '_redis', staticmethod(lambda: None))
+    yield app
+    quota_ocr._chaves_iniciadas.clear()
+    quota_ocr._ultima_sincronizacao.clear()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    conexao = RedisFalso()
+    monkeypatch.setattr(QuotaOcrService, '_redis', staticmethod(lambda: conexao))
+    return conexao
+
+
+def _contador(periodo=PERIODO):
+    db.session.expire_all()
+    quota = OcrQuota.query.filter_by(ano=periodo[0], mes=periodo[1]).first()
+    return quota.contador if quota else None
+
+
+def test_reserva_no_banco_cria_o_mes_e_respeita_o_limite(app):
+    assert _contador() is None
+
+    assert QuotaOcrService.reservar(4, PERIODO)
+    assert QuotaOcrService.reservar(6, PERIODO)
+    assert not QuotaOcrService.reservar(1, PERIODO)
+    assert not QuotaOcrService.reservar(11, (2025, 11))
+
+    assert _contador() == 10
+    assert OcrQuota.query.count() == 1
+
+
+def test_devolucao_no_banco_nao_fica_negativa(app):
+    assert QuotaOcrService.reservar(3, PERIODO)
+
+    QuotaOcrService.devolver(2, PERIODO)
+    assert _contador() == 1
+    QuotaOcrService.devolver(5, PERIODO)
+    assert _contador() == 1
+    QuotaOcrService.devolver(1, PERIODO)
+    assert _contador() == 0
+
+
+def test_reservas_concorrentes_nao_passam_do_limite(app):
+    aceitas = []
+    inicio = threading.Barrier(8)
+
+    def trabalhador():
+        with app.app_context():
+            inicio.wait()
+            for _ in range(5):
+                aceitas.append(QuotaOcrService.reservar(1, PERIODO))
+            db.session.remove()
+
+    threads = [threading.Thread(target=trabalhador) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert aceitas.count(True) == 10
+    assert _contador() == 10
+    assert OcrQuota.query.count() == 1
+
+
+def test_limite_desligado_nao_conta(app, monkeypatch):
+    monkeypatch.setattr(FinanceiroConfig, 'OCR_ENFORCE_LIMIT', False)
+
+    assert QuotaOcrService.reservar(50, PERIODO)
+    assert _contador() is None
+
+
+def test_redis_parte_do_banco_e_sincroniza_para_relatorio(app, redis):
+    db.session.add(OcrQuota(ano=PERIODO[0], mes=PERIODO[1], contador=7))
+    db.session.commit()
+
+    assert QuotaOcrService.reservar(2, PERIODO)
+    assert not QuotaOcrService.reservar(2, PERIODO)
+    assert QuotaOcrService.consumo(PERIODO) == 9
+    # A tabela só muda na sincronização
+    assert _contador() == 7
+
+    QuotaOcrService.devolver(3, PERIODO)
+    assert QuotaOcrService.sincronizar(PERIODO) == 6
+    assert _contador() == 6
+
+
+def test_redis_sincroniza_periodicamente(app, redis, monkeypatch):
+    monkeypatch.setenv('FINANCEIRO_OCR_QUOTA_SINCRONIZAR_SEGUNDOS', '0')
+
+    assert QuotaOcrService.reservar(3, PERIODO)
+    assert _contador() == 3
+    assert QuotaOcrService.reservar(1, PERIODO)
+    assert _contador() == 4
+
+
+def test_vision_com_erro_devolve_a_unidade(app, monkeypatch, tmp_path):
+    recibo = tmp_path / 'recibo.png'
+    recibo.write_bytes(b'ERRO')
+    monkeypatch.setattr(VisionOcrService, '_client', VisionFalso())
+
+    resultado = OcrService.process_receipt(str(recibo))
+
+    assert resultado['error']
+    assert QuotaOcrService.consumo() == 0
+
+
+def test_lote_devolve_so_os_arquivos_com_erro(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(VisionOcrService, '_client', VisionFalso())
+    caminhos = []
+    for indice, texto in enumerate(['Valor: R$ 10,00', 'ERRO', 'Valor: R$ 30,00']):
+        caminho = tmp_path / f'recibo_{indice}.png'
+        caminho.write_bytes(texto.encode())
+        caminhos.append(str(caminho))
+
+    resultados = OcrService.process_receipts(caminhos)
+
+    assert [bool(resultado.get('error')) for resultado in resultados] == [False, True, False]
+    assert QuotaOcrService.consumo() == 2
+
+
+def test_sem_quota_nao_chama_o_vision(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(FinanceiroConfig, 'OCR_MONTHLY_LIMIT', 0)
+    monkeypatch.setattr(VisionOcrService, '_client', None)
+    monkeypatch.setattr(VisionOcrService, '_get_client',
+                        classmethod(lambda cls: pytest.fail('Vision não deveria ser chamado')))
+    recibo = tmp_path / 'recibo.png'
+    recibo.write_bytes(b'Valor: R$ 10,00')
+
+    resultado = OcrService.process_receipt(str(recibo))
+
+    assert resultado['error'].startswith('Limite mensal de OCR atingido')
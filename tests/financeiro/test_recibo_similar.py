@@ -0,0 +1,122 @@
+"""
+Testes da detecção de comprovantes quase idênticos (hash perceptual)
+"""
+import json
+
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from meu_app.models import db, Cliente, Pedido, Pagamento
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.financeiro.phash_service import ReciboSimilarService, contar_bits
+from meu_app.financeiro.vision_service import VisionOcrService
+
+
+def _comprovante(caminho, texto='PIX R$ 150,00', tamanho=(600, 900), **salvar):
+    imagem = Image.new('RGB', tamanho, 'white')
+    desenho = ImageDraw.Draw(imagem)
+    desenho.rectangle([0, 0, tamanho[0], tamanho[1] // 6], fill='#7b1fa2')
+    desenho.text((40, tamanho[1] // 3), texto, fill='black', font_size=tamanho[0] // 10)
+    desenho.rectangle([40, tamanho[1] * 2 // 3, tamanho[0] - 40, tamanho[1] * 3 // 4], fill='#cccccc')
+    imagem.save(caminho, **salvar)
+    return imagem
+
+
+def test_recaptura_fica_perto_e_outro_comprovante_longe(tmp_path):
+    original = _comprovante(tmp_path / 'original.png')
+    # Mesmo comprovante: redimensionado, levemente desfocado e salvo como JPEG
+    original.resize((450, 675)).filter(ImageFilter.GaussianBlur(1)).save(tmp_path / 'recaptura.jpg', quality=70)
+    _comprovante(tmp_path / 'outro.png', texto='TED R$ 9.999,99', tamanho=(900, 600))
+
+    base = ReciboSimilarService.calcular(str(tmp_path / 'original.png'))
+    recaptura = ReciboSimilarService.calcular(str(tmp_path / 'recaptura.jpg'))
+    outro = ReciboSimilarService.calcular(str(tmp_path / 'outro.png'))
+
+    assert len(base) == 16
+    assert ReciboSimilarService.distancia(base, recaptura) <= 6
+    assert ReciboSimilarService.distancia(base, outro) > 6
+
+
+@pytest.mark.parametrize('valor, bits', [(0, 0), (1, 1), (0b1011, 3), (2 ** 64 - 1, 64), (1 << 63, 1)])
+def test_contar_bits(valor, bits):
+    assert contar_bits(valor) == bits
+
+
+def test_distancia_entre_hashes_hexadecimais():
+    assert ReciboSimilarService.distancia('0' * 16, '0' * 16) == 0
+    assert ReciboSimilarService.distancia('0' * 16, 'f' * 16) == 64
+    assert ReciboSimilarService.distancia('00000000000000f0', '0000000000000010') == 3
+
+
+def test_arquivo_ilegivel_nao_tem_hash(tmp_path):
+    (tmp_path / 'x.png').write_bytes(b'nao e imagem')
+    assert ReciboSimilarService.calcular(str(tmp_path / 'x.png')) is None
+
+
+def _pagamento(recibo_phash):
+    cliente = Cliente(nome='Cliente pHash')
+    db.session.add(cliente)
+    db.session.flush()
+    pedido = Pedido(cliente_id=cliente.id)
+    db.session.add(pedido)
+    db.session.flush()
+    pagamento = Pagamento(pedido_id=pedido.id, valor=150, metodo_pagamento='PIX', recibo_phash=recibo_phash,
+                          ocr_json=json.dumps({'amount': 150.0, 'transaction_id': 'E123'}))
+    db.session.add(pagamento)
+    db.session.commit()
+    return pagamento
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(VisionOcrService, 'extract_text', classmethod(
+        lambda cls, caminho: chamadas.append(caminho) or 'Valor: R$ 99,90\nID da transação: E99999999'))
+    monkeypatch.setattr(QuotaOcrService, 'reservar', classmethod(lambda cls, quantidade=1, periodo=None: True))
+    monkeypatch.setattr(QuotaOcrService, 'devolver', classmethod(lambda cls, quantidade=1, periodo=None, conexao=None: None))
+    return chamadas
+
+
+def test_comprovante_parecido_so_sinaliza_e_o_arquivo_e_lido(app, tmp_path, vision):
+    original = _comprovante(tmp_path / 'original.png')
+    pagamento = _pagamento(ReciboSimilarService.calcular(str(tmp_path / 'original.png')))
+
+    original.resize((500, 750)).save(tmp_path / 'foto.jpg', quality=75)
+    resultado = OcrService.process_receipt(str(tmp_path / 'foto.jpg'))
+
+    # O valor e o ID vêm da leitura do arquivo novo, nunca do pagamento antigo
+    assert len(vision) == 1
+    assert resultado['amount'] == 99.9 and resultado['transaction_id'] == 'E99999999'
+    assert resultado['duplicata_provavel']['pagamento_id'] == pagamento.id
+    assert resultado['duplicata_provavel']['pedido_id'] == pagamento.pedido_id
+
+    # Comprovante diferente segue para o Vision, sem sinalização
+    _comprovante(tmp_path / 'outro.png', texto='TED R$ 9.999,99', tamanho=(900, 600))
+    resultado = OcrService.process_receipt(str(tmp_path / 'outro.png'))
+    assert len(vision) == 2
+    assert 'duplicata_provavel' not in resultado
+
+
+def test_mesmo_layout_com_outro_valor_nao_reaproveita_extracao(app, tmp_path, vision):
+    _comprovante(tmp_path / 'antigo.png', texto='PIX R$ 150,00')
+    _pagamento(ReciboSimilarService.calcular(str(tmp_path / 'antigo.png')))
+    # Mesmo banco, outro valor: dHash idêntico (distância 0)
+    _comprovante(tmp_path / 'novo.png', texto='PIX R$ 750,00')
+
+    resultado = OcrService.process_receipt(str(tmp_path / 'novo.png'))
+
+    assert resultado['duplicata_provavel']['distancia'] == 0
+    assert len(vision) == 1
+    assert resultado['amount'] == 99.9 and resultado['transaction_id'] == 'E99999999'
+
+
+def test_hash_invalido_no_banco_nao_desliga_a_busca(app, tmp_path):
+    _comprovante(tmp_path / 'original.png')
+    phash = ReciboSimilarService.calcular(str(tmp_path / 'original.png'))
+    _pagamento('nao-hexadecimal')
+    pagamento = _pagamento(phash)
+
+    similar = ReciboSimilarService.buscar_similar(phash, 6)
+
+    assert similar == {'pagamento_id': pagamento.id, 'pedido_id': pagamento.pedido_id, 'distancia': 0}
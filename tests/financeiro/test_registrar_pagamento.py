@@ -0,0 +1,88 @@
+"""
+Testes do registro de pagamento com totais agregados e duplicidade pela constraint
+"""
+import pytest
+from sqlalchemy import event
+
+from meu_app.models import db, Cliente, Produto, Pedido, ItemPedido, Pagamento, StatusPedido
+from meu_app.financeiro.services import FinanceiroService
+
+
+@pytest.fixture
+def pedido(app):
+    """Pedido confirmado de R$ 100 com 20 itens e 10 pagamentos antigos de R$ 1"""
+    cliente = Cliente(nome='Cliente Pagamento')
+    produto = Produto(nome='Produto Pagamento')
+    db.session.add_all([cliente, produto])
+    db.session.flush()
+    pedido = Pedido(cliente_id=cliente.id, confirmado_comercial=True, status=StatusPedido.PENDENTE)
+    db.session.add(pedido)
+    db.session.flush()
+    db.session.add_all([
+        ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=1, preco_venda=5,
+                   preco_compra=2, valor_total_venda=5, valor_total_compra=2, lucro_bruto=3)
+        for _ in range(20)
+    ])
+    db.session.add_all([Pagamento(pedido_id=pedido.id, valor=1, metodo_pagamento='Dinheiro') for _ in range(10)])
+    db.session.commit()
+    return pedido.id
+
+
+def _contar_selects():
+    selects = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            selects.append(statement)
+
+    return selects, contar
+
+
+def test_pagamento_parcial_mantem_status(pedido):
+    sucesso, _, pagamento = FinanceiroService.registrar_pagamento(pedido, 50, 'Dinheiro')
+
+    assert sucesso
+    assert pagamento.id
+    assert db.session.get(Pedido, pedido).status == StatusPedido.PENDENTE
+
+
+def test_pagamento_que_quita_aprova_pedido(pedido):
+    sucesso, _, _ = FinanceiroService.registrar_pagamento(pedido, 90, 'Dinheiro')
+
+    assert sucesso
+    assert db.session.get(Pedido, pedido).status == StatusPedido.PAGAMENTO_APROVADO
+
+
+def test_custo_constante_sem_carregar_itens_e_pagamentos(app, pedido):
+    selects, contar = _contar_selects()
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        sucesso, _, _ = FinanceiroService.registrar_pagamento(pedido, 90, 'Dinheiro', id_transacao='TX-1')
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
+
+    assert sucesso
+    # Pedido travado + query agregada; nenhuma consulta prévia de duplicidade
+    assert len(selects) == 2
+
+
+def test_id_transacao_duplicado(pedido):
+    sucesso, _, _ = FinanceiroService.registrar_pagamento(pedido, 10, 'Dinheiro', id_transacao=' TX-9 ')
+    assert sucesso
+
+    sucesso, mensagem, pagamento = FinanceiroService.registrar_pagamento(pedido, 10, 'Dinheiro', id_transacao='TX-9')
+
+    assert not sucesso
+    assert pagamento is None
+    assert 'TX-9' in mensagem and f'#{pedido}' in mensagem
+    assert Pagamento.query.filter_by(pedido_id=pedido).count() == 11
+
+
+def test_comprovante_duplicado(pedido):
+    FinanceiroService.registrar_pagamento(pedido, 10, 'Dinheiro', recibo_sha256='a' * 64)
+
+    sucesso, mensagem, _ = FinanceiroService.registrar_pagamento(pedido, 10, 'Dinheiro', recibo_sha256='a' * 64)
+
+    assert not sucesso
+    assert 'comprovante já foi utilizado' in mensagem
@@ -0,0 +1,131 @@
+"""
+Testes da leitura local da camada de texto de comprovantes em PDF
+"""
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from meu_app.financeiro import texto_pdf
+from meu_app.financeiro.exceptions import OcrProcessingError
+from meu_app.financeiro.ocr_service import OcrService
+from meu_app.financeiro.phash_service import ReciboSimilarService
+from meu_app.financeiro.quota_ocr import QuotaOcrService
+from meu_app.financeiro.texto_pdf import TextoPdf
+from meu_app.financeiro.vision_service import VisionOcrService
+
+
+CORPUS = Path(__file__).parent / 'corpus_recibos'
+
+
+@pytest.fixture
+def sem_vision(monkeypatch):
+    """Falha se o Vision, o GCS ou a quota forem usados; devolve a lista de chamadas"""
+    chamadas = []
+
+    def registrar(nome):
+        def chamada(*args, **kwargs):
+            chamadas.append(nome)
+            raise OcrProcessingError(f'{nome} não deveria ser chamado')
+        return chamada
+
+    monkeypatch.setattr(VisionOcrService, '_get_client', classmethod(lambda cls: registrar('vision')()))
+    monkeypatch.setattr(VisionOcrService, '_upload_pdf_to_gcs', classmethod(lambda cls, caminho: registrar('gcs')()))
+    monkeypatch.setattr(QuotaOcrService, 'reservar',
+                        classmethod(lambda cls, quantidade=1, periodo=None: chamadas.append('quota') or True))
+    monkeypatch.setattr(QuotaOcrService, 'devolver',
+                        classmethod(lambda cls, quantidade=1, periodo=None, conexao=None: chamadas.append('quota')))
+    return chamadas
+
+
+def _pdf_digital(caminho, arquivo_corpus='itau_pix.txt'):
+    """PDF gerado como nos apps dos bancos: cada linha do comprovante como texto"""
+    pdf = canvas.Canvas(str(caminho), pagesize=A4)
+    y = 800
+    for linha in (CORPUS / arquivo_corpus).read_text(encoding='utf-8').splitlines():
+        pdf.drawString(60, y, linha)
+        y -= 18
+    pdf.save()
+    return str(caminho)
+
+
+def _pdf_digitalizado(caminho, tmp_path):
+    """PDF de scanner: só uma imagem na página"""
+    imagem = tmp_path / 'pagina.png'
+    Image.new('RGB', (600, 800), 'white').save(imagem)
+    pdf = canvas.Canvas(str(caminho), pagesize=A4)
+    pdf.drawImage(str(imagem), 0, 0, width=A4[0], height=A4[1])
+    pdf.save()
+    return str(caminho)
+
+
+def test_pdf_digital_nao_usa_vision_nem_quota(app, sem_vision, tmp_path):
+    pytest.importorskip('fitz')
+    caminho = _pdf_digital(tmp_path / 'itau.pdf')
+
+    resultado = OcrService.process_receipt(caminho)
+
+    assert sem_vision == []
+    assert resultado['fonte'] == 'pdf_texto'
+    assert resultado['layout'] == 'itau'
+    assert resultado['amount'] == 3480.9
+    assert resultado['transaction_id'] == 'E60701190202510021939DY5UHQ6VXCJ'
+    assert resultado['bank_info']['chave_pix_recebedor'] == 'pix@gruposertao.com'
+
+
+def test_pdf_digital_parecido_com_outro_pagamento_usa_o_proprio_texto(app, sem_vision, tmp_path, monkeypatch):
+    pytest.importorskip('fitz')
+    caminho = _pdf_digital(tmp_path / 'itau.pdf')
+    monkeypatch.setattr(ReciboSimilarService, 'buscar_similar', staticmethod(
+        lambda phash, distancia_maxima: {'pagamento_id': 7, 'pedido_id': 3, 'distancia': 1}
+    ))
+
+    resultado = OcrService.process_receipt(caminho)
+
+    assert sem_vision == []
+    assert resultado['transaction_id'] == 'E60701190202510021939DY5UHQ6VXCJ'
+    assert resultado['duplicata_provavel'] == {'pagamento_id': 7, 'pedido_id': 3, 'distancia': 1}
+
+
+def test_extract_text_le_pdf_digital_localmente(sem_vision, tmp_path):
+    pytest.importorskip('fitz')
+    caminho = _pdf_digital(tmp_path / 'nubank.pdf', 'nubank_pix.txt')
+
+    texto = VisionOcrService.extract_text(caminho)
+
+    assert sem_vision == []
+    assert 'ID da transação:' in texto
+    assert texto.splitlines()[:2] == ['Comprovante de transferência', '08 OUT 2025 - 14:32:10']
+
+
+def test_pdf_digitalizado_vai_ao_vision(app, sem_vision, tmp_path):
+    pytest.importorskip('fitz')
+    caminho = _pdf_digitalizado(tmp_path / 'scanner.pdf', tmp_path)
+
+    assert TextoPdf.extrair(caminho) is None
+    resultado = OcrService.process_receipt(caminho)
+
+    assert 'quota' in sem_vision and 'vision' in sem_vision
+    assert resultado['error']
+
+
+def test_sem_pymupdf_pdf_vai_ao_vision(sem_vision, tmp_path, monkeypatch):
+    monkeypatch.setattr(texto_pdf, 'fitz', None)
+    caminho = _pdf_digital(tmp_path / 'itau.pdf')
+
+    assert TextoPdf.extrair(caminho) is None
+    with pytest.raises(OcrProcessingError):
+        VisionOcrService.extract_text(caminho)
+    assert sem_vision == ['vision']
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('Pix enviado\nValor R$ 10,00\nID E123456789012345', True),
+    ('Comprovante', False),
+    ('�' * 20 + ' Valor R$ 10,00 ID E123456789012345 ' + '�' * 20, False),
+    ('Comprovante de transferência sem nenhum número legível aqui', False),
+])
+def test_texto_utilizavel(texto, esperado):
+    assert TextoPdf.utilizavel(texto) is esperado
@@ -1,12 +1,15 @@
 """
 Teste de integração para concorrência no módulo coletas
 """
+import os
+import queue
 import pytest
 import threading
 import time
 from flask import Flask
+from sqlalchemy import event
 from meu_app import create_app
-from meu_app.models import db, Pedido, ItemPedido, Produto, Cliente, Estoque, StatusPedido
+from meu_app.models import db, Pedido, ItemPedido, Produto, Cliente, Estoque, MovimentacaoEstoque, StatusPedido
 from meu_app.coletas.services.coleta_service import ColetaService
 
 
@@ -204,3 +207,174 @@ def test_coleta_pedido_inexistente():
         # Verificações
         assert sucesso is False, "Coleta deve falhar com pedido inexistente"
         assert "não encontrado" in mensagem.lower() or "não disponível" in mensagem.lower(), "Mensagem deve indicar pedido não encontrado"
+
+
+def _criar_app_benchmark(tmp_path):
+    """
+    App mínima para o benchmark; usa TEST_DATABASE_URL (ex.: PostgreSQL)
+    quando definido, senão um SQLite em arquivo compartilhado pelas threads
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'TEST_DATABASE_URL', f"sqlite:///{tmp_path / 'coletas_benchmark.db'}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # SQLite não tem SELECT ... FOR UPDATE: BEGIN IMMEDIATE faz o papel
+            # do lock e evita SQLITE_BUSY na promoção de leitura para escrita
+            @event.listens_for(db.engine, 'connect')
+            def _sem_begin_implicito(dbapi_connection, connection_record):
+                dbapi_connection.isolation_level = None
+
+            @event.listens_for(db.engine, 'begin')
+            def _begin_immediate(conn):
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+        db.create_all()
+    return app
+
+
+def _contar_queries(engine):
+    """Conta SELECTs e INSERTs (os UPDATEs de estoque são um por linha por causa da versão)"""
+    contador = {'total': 0}
+
+    def _antes(conn, cursor, statement, *args, **kwargs):
+        if statement.lstrip().upper().startswith(('SELECT', 'INSERT')):
+            contador['total'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _antes)
+    return contador, lambda: event.remove(engine, 'before_cursor_execute', _antes)
+
+
+def _criar_pedidos_benchmark(quantidade_pedidos, produtos_por_pedido, estoque_inicial):
+    """Cria pedidos pagos que compartilham os mesmos produtos"""
+    cliente = Cliente(nome="Cliente Benchmark Coleta")
+    produtos = [Produto(nome=f"Produto Benchmark {i}") for i in range(produtos_por_pedido)]
+    db.session.add(cliente)
+    db.session.add_all(produtos)
+    db.session.flush()
+    db.session.add_all([
+        Estoque(produto_id=produto.id, quantidade=estoque_inicial, conferente="Benchmark")
+        for produto in produtos
+    ])
+
+    pedidos = []
+    for indice in range(quantidade_pedidos):
+        pedido = Pedido(cliente_id=cliente.id, status=StatusPedido.PAGAMENTO_APROVADO)
+        db.session.add(pedido)
+        db.session.flush()
+        # Metade dos pedidos cadastra os produtos na ordem inversa
+        ordem = produtos if indice % 2 == 0 else list(reversed(produtos))
+        db.session.add_all([
+            ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=2, preco_venda=10,
+                       preco_compra=5, valor_total_venda=20, valor_total_compra=10, lucro_bruto=10)
+            for produto in ordem
+        ])
+        pedidos.append(pedido)
+    db.session.commit()
+
+    return [produto.id for produto in produtos], {
+        pedido.id: [item.id for item in pedido.itens] for pedido in pedidos
+    }
+
+
+def test_processar_coleta_quantidade_de_queries_fixa(tmp_path):
+    """O número de leituras e inserts não cresce com a quantidade de itens da coleta"""
+    app = _criar_app_benchmark(tmp_path)
+
+    with app.app_context():
+        _, itens_por_pedido = _criar_pedidos_benchmark(2, 8, 100)
+        (pedido_pequeno, itens_pequeno), (pedido_grande, itens_grande) = itens_por_pedido.items()
+
+        queries = []
+        for pedido_id, itens in ((pedido_pequeno, itens_pequeno[:1]), (pedido_grande, itens_grande)):
+            contador, parar = _contar_queries(db.engine)
+            try:
+                sucesso, mensagem, _ = ColetaService.processar_coleta(
+                    pedido_id=pedido_id,
+                    responsavel_coleta_id=1,
+                    nome_retirada="Teste",
+                    documento_retirada="12345678901",
+                    itens_coleta=[{'item_id': item_id, 'quantidade': 2} for item_id in itens]
+                )
+            finally:
+                parar()
+            assert sucesso, mensagem
+            queries.append(contador['total'])
+
+        assert queries[0] == queries[1]
+        assert MovimentacaoEstoque.query.count() == 9
+
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+def test_benchmark_vazao_coletas_concorrentes(tmp_path):
+    """
+    Benchmark de vazão: várias threads processam coletas de pedidos com os
+    mesmos produtos (cadastrados em ordens diferentes) sem deadlock nem
+    perda de baixa de estoque
+    """
+    quantidade_pedidos = int(os.environ.get('BENCHMARK_COLETAS_PEDIDOS', 60))
+    quantidade_threads = int(os.environ.get('BENCHMARK_COLETAS_THREADS', 4))
+    produtos_por_pedido = 5
+    estoque_inicial = 10000
+
+    app = _criar_app_benchmark(tmp_path)
+    with app.app_context():
+        produto_ids, itens_por_pedido = _criar_pedidos_benchmark(
+            quantidade_pedidos, produtos_por_pedido, estoque_inicial
+        )
+
+    fila = queue.Queue()
+    for pedido_id, itens in itens_por_pedido.items():
+        fila.put((pedido_id, itens))
+    resultados = []
+
+    def trabalhador():
+        with app.app_context():
+            while True:
+                try:
+                    pedido_id, itens = fila.get_nowait()
+                except queue.Empty:
+                    break
+                resultados.append(ColetaService.processar_coleta(
+                    pedido_id=pedido_id,
+                    responsavel_coleta_id=1,
+                    nome_retirada="Benchmark",
+                    documento_retirada="12345678901",
+                    itens_coleta=[{'item_id': item_id, 'quantidade': 2} for item_id in itens]
+                ))
+            db.session.remove()
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador) for _ in range(quantidade_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    print(f"\nColetas: {quantidade_pedidos} em {duracao:.2f}s "
+          f"({quantidade_pedidos / duracao:.1f} coletas/s, {quantidade_threads} threads)")
+
+    falhas = [mensagem for sucesso, mensagem, _ in resultados if not sucesso]
+    assert not falhas, falhas[:3]
+    assert len(resultados) == quantidade_pedidos
+
+    with app.app_context():
+        esperado = estoque_inicial - 2 * quantidade_pedidos
+        for estoque in Estoque.query.filter(Estoque.produto_id.in_(produto_ids)).all():
+            assert estoque.quantidade == esperado
+        assert MovimentacaoEstoque.query.count() == quantidade_pedidos * produtos_por_pedido
+        assert Pedido.query.filter_by(status=StatusPedido.COLETA_CONCLUIDA).count() == quantidade_pedidos
+
+        db.session.remove()
+        db.drop_all()
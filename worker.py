@@ -8,8 +8,13 @@ Uso:
 
 Ou com múltiplos workers:
     python worker.py & python worker.py & python worker.py
+
+Worker de OCR de vida longa (app criado uma vez por processo, clientes do
+Vision reaproveitados entre jobs, sem fork por job):
+    python worker.py --ocr [--concorrencia 4]
 """
 
+import argparse
 import os
 import sys
 from redis import Redis
@@ -26,6 +31,14 @@ def main():
     """
     Inicia o worker RQ para processar jobs
     """
+    parser = argparse.ArgumentParser(description='Worker RQ do Sistema SAP')
+    parser.add_argument('--ocr', action='store_true',
+                        help="Pool de workers de vida longa só para a fila 'ocr'")
+    parser.add_argument('--concorrencia', type=int, default=int(os.getenv('OCR_WORKER_CONCORRENCIA', 4)),
+                        help='Processos do pool de OCR (padrão: OCR_WORKER_CONCORRENCIA ou 4)')
+    parser.add_argument('--burst', action='store_true', help='Sair quando as filas esvaziarem')
+    args = parser.parse_args()
+    
     # Obter URL do Redis
     redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     
@@ -33,7 +46,10 @@ def main():
     print("🚀 RQ Worker - Sistema SAP")
     print("=" * 70)
     print(f"Redis: {redis_url}")
-    print(f"Filas: ocr")
+    if args.ocr:
+        print(f"Fila: ocr ({args.concorrencia} processos de vida longa)")
+    else:
+        print("Filas: ocr, recibos")
     print("=" * 70)
     print()
     
@@ -48,9 +64,17 @@ def main():
         print(f"   Verifique se o Redis está rodando: redis-server")
         sys.exit(1)
     
+    if args.ocr:
+        from meu_app.queue.worker_ocr import iniciar_pool_ocr
+        
+        print("✅ Pool de OCR iniciado, aguardando jobs...")
+        print("   (Ctrl+C para parar)")
+        print()
+        sys.exit(iniciar_pool_ocr(redis_url, args.concorrencia, burst=args.burst))
+    
     # Criar worker
     with Connection(redis_conn):
-        queues = [Queue('ocr')]
+        queues = [Queue('ocr'), Queue('recibos')]
         worker = Worker(queues)
         
         print("✅ Worker iniciado, aguardando jobs...")
@@ -58,7 +82,7 @@ def main():
         print()
         
         # Iniciar processamento
-        worker.work()
+        worker.work(burst=args.burst)
 
 
 if __name__ == '__main__':